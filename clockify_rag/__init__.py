@@ -39,11 +39,27 @@ from .embedding import embed_texts, embed_local_batch, validate_ollama_embedding
 from .indexing import build, load_index, build_bm25, bm25_scores, build_faiss_index
 
 # Caching
-from .caching import QueryCache, RateLimiter, get_query_cache, get_rate_limiter
+from .caching import (
+    QueryCache,
+    RateLimiter,
+    QueryEmbeddingCache,
+    RerankCache,
+    SemanticAnswerCache,
+    TokenBucketLimiter,
+    get_query_cache,
+    get_rate_limiter,
+    get_answer_cache,
+    get_query_embedding_cache,
+    get_rerank_cache,
+    get_semantic_cache,
+    retain_index_generation,
+)
+from .shared_cache import SQLiteAnswerCache
 
 # Retrieval
 from .retrieval import (
     expand_query,
+    expand_query_tokens,
     embed_query,
     normalize_scores_zscore,
     DenseScoreStore,
@@ -58,9 +74,14 @@ from .retrieval import (
     truncate_to_token_budget,
 )
 
+# Token counting
+from .tokenizer import TokenCounter, get_token_counter
+
 # Metrics
 from .metrics import (
+    HistogramSketch,
     MetricsCollector,
+    ShardedMetricsCollector,
     MetricSnapshot,
     AggregatedMetrics,
     get_metrics,
@@ -74,6 +95,7 @@ from .metrics import (
 # Answer generation
 from .answer import (
     apply_mmr_diversification,
+    apply_mmr_diversification_batch,
     apply_reranking,
     extract_citations,
     validate_citations,
@@ -99,9 +121,14 @@ from .precomputed_cache import (
     PrecomputedCache,
     build_faq_cache,
     load_faq_list,
+    faq_questions_from_query_log,
+    convert_faq_cache,
     get_precomputed_cache,
 )
 
+# Query log workload analytics
+from .log_analysis import analyze_query_log, suggested_faq_questions
+
 # Logging configuration (Issue #11: Centralized logging)
 from .logging_config import (
     setup_logging,
@@ -151,10 +178,21 @@ __all__ = [
     # Caching
     "QueryCache",
     "RateLimiter",
+    "TokenBucketLimiter",
     "get_query_cache",
     "get_rate_limiter",
+    "RerankCache",
+    "get_rerank_cache",
+    "SemanticAnswerCache",
+    "get_semantic_cache",
+    "SQLiteAnswerCache",
+    "get_answer_cache",
+    "QueryEmbeddingCache",
+    "get_query_embedding_cache",
+    "retain_index_generation",
     # Retrieval
     "expand_query",
+    "expand_query_tokens",
     "embed_query",
     "normalize_scores_zscore",
     "DenseScoreStore",
@@ -167,8 +205,13 @@ __all__ = [
     "tokenize",
     "count_tokens",
     "truncate_to_token_budget",
+    # Token counting
+    "TokenCounter",
+    "get_token_counter",
     # Metrics
     "MetricsCollector",
+    "HistogramSketch",
+    "ShardedMetricsCollector",
     "MetricSnapshot",
     "AggregatedMetrics",
     "get_metrics",
@@ -179,6 +222,7 @@ __all__ = [
     "MetricNames",
     # Answer generation
     "apply_mmr_diversification",
+    "apply_mmr_diversification_batch",
     "apply_reranking",
     "extract_citations",
     "validate_citations",
@@ -198,7 +242,12 @@ __all__ = [
     "PrecomputedCache",
     "build_faq_cache",
     "load_faq_list",
+    "faq_questions_from_query_log",
+    "convert_faq_cache",
     "get_precomputed_cache",
+    # Query log analytics
+    "analyze_query_log",
+    "suggested_faq_questions",
     # Logging
     "setup_logging",
     "get_logger",
@@ -12,6 +12,7 @@ This module contains the complete answer generation pipeline:
 
 from __future__ import annotations
 
+import copy
 import hashlib
 import json
 import logging
@@ -20,6 +21,7 @@ from typing import Dict, List, Tuple, Optional, Any
 
 import numpy as np
 
+from . import config
 from .config import (
     DEFAULT_TOP_K,
     DEFAULT_PACK_TOP,
@@ -34,17 +36,26 @@ from .config import (
     get_llm_client_mode,
 )
 from .retrieval import (
+    _article_key,
     retrieve,
     rerank_with_llm,
+    rerank_with_cross_encoder,
     pack_snippets,
     coverage_ok,
     ask_llm,
+    embed_query,
+    normalize_query,
+    validate_query_length,
 )
-from .exceptions import LLMError, LLMUnavailableError
+from .caching import get_answer_cache, get_query_embedding_cache, get_semantic_cache
+from .indexing import get_index_generation
+from .deadline import check_deadline, expired as deadline_expired, skip_optional_stage, track_degradation
+from .exceptions import DeadlineExceededError, LLMError, LLMOverloadedError, LLMUnavailableError
 from .confidence_routing import get_routing_action
 from .metrics import MetricNames
 from . import metrics as metrics_module
 from .utils import sanitize_for_log
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -151,69 +162,178 @@ def parse_qwen_json(raw_text: str) -> Dict[str, Any]:
     }
 
 
+def _gather_dense_scores(dense: Any, indices: List[int]) -> np.ndarray:
+    """Gather dense relevance scores for ``indices`` as a float32 array.
+
+    Uses ``DenseScoreStore.take`` / numpy fancy indexing when available and only
+    falls back to per-item lookups for plain sequences or mappings.
+    """
+    take = getattr(dense, "take", None)
+    if callable(take) and not isinstance(dense, np.ndarray):
+        return np.asarray(take(indices), dtype=np.float32)
+    if isinstance(dense, np.ndarray):
+        return dense[np.asarray(indices, dtype=np.int64)].astype(np.float32, copy=False)
+    return np.array([dense[j] for j in indices], dtype=np.float32)
+
+
 def apply_mmr_diversification(
-    selected: List[int], scores: Dict[str, Any], vecs_n: np.ndarray, pack_top: int
+    selected: List[int],
+    scores: Dict[str, Any],
+    vecs_n: np.ndarray,
+    pack_top: int,
+    mmr_lambda: Optional[float] = None,
 ) -> List[int]:
     """Apply Maximal Marginal Relevance diversification to selected chunks.
 
+    OPTIMIZATION: Keeps a running max-similarity vector over the candidates and
+    updates it with one mat-vec per pick, instead of recomputing the full
+    [candidates x selected] similarity matrix every iteration.
+
     Args:
         selected: List of selected chunk indices
         scores: Dict with "dense" scores
         vecs_n: Normalized embedding vectors
         pack_top: Maximum number of chunks to select
+        mmr_lambda: Relevance/diversity trade-off (defaults to config MMR_LAMBDA)
 
     Returns:
         List of diversified chunk indices
     """
-    mmr_selected = []
-    cand = list(selected)
-
-    # Always include the top dense score first for better recall
-    if cand:
-        top_dense_idx = max(cand, key=lambda j: scores["dense"][j])
-        mmr_selected.append(top_dense_idx)
-        cand.remove(top_dense_idx)
-
-    # Then diversify the rest using vectorized MMR
-    if cand and len(mmr_selected) < pack_top:
-        # Convert to numpy arrays for vectorized operations
-        cand_array = np.array(cand, dtype=np.int32)
-        relevance_scores = np.array([scores["dense"][j] for j in cand], dtype=np.float32)
+    if not selected:
+        return []
 
-        # Get embedding vectors for candidates
-        cand_vecs = vecs_n[cand_array]  # [num_candidates, emb_dim]
+    lam = MMR_LAMBDA if mmr_lambda is None else float(mmr_lambda)
+    cand_array = np.asarray(selected, dtype=np.int64)
+    relevance = _gather_dense_scores(scores["dense"], selected)
 
-        # Iteratively select using MMR
-        remaining_mask = np.ones(len(cand_array), dtype=bool)
-
-        while np.any(remaining_mask) and len(mmr_selected) < pack_top:
-            # Compute MMR scores for remaining candidates
-            mmr_scores = MMR_LAMBDA * relevance_scores.copy()
-
-            if len(mmr_selected) > 0:  # Only apply diversity when we have prior selections
-                # Get vectors of all already-selected items
-                selected_vecs = vecs_n[mmr_selected]  # [num_selected, emb_dim]
+    # Always include the top dense score first for better recall
+    first = int(relevance.argmax())
+    mmr_selected = [int(cand_array[first])]
+    if len(cand_array) == 1 or pack_top <= 1:
+        return mmr_selected
+
+    cand_vecs = vecs_n[cand_array]  # [num_candidates, emb_dim]
+    base_scores = lam * relevance
+    penalty = 1 - lam
+    max_sim = cand_vecs @ cand_vecs[first]
+    remaining = np.ones(len(cand_array), dtype=bool)
+    remaining[first] = False
+
+    limit = min(pack_top, len(cand_array))
+    while len(mmr_selected) < limit:
+        mmr_scores = base_scores - penalty * max_sim
+        mmr_scores[~remaining] = -np.inf
+        best = int(mmr_scores.argmax())
+        mmr_selected.append(int(cand_array[best]))
+        remaining[best] = False
+        np.maximum(max_sim, cand_vecs @ cand_vecs[best], out=max_sim)
 
-                # Compute similarity matrix: [num_candidates, num_selected]
-                similarity_matrix = cand_vecs @ selected_vecs.T
+    return mmr_selected
 
-                # Get max similarity for each candidate
-                max_similarities = similarity_matrix.max(axis=1)
 
-                # Update MMR scores with diversity penalty
-                mmr_scores -= (1 - MMR_LAMBDA) * max_similarities
+def apply_mmr_diversification_batch(
+    selected_lists: List[List[int]],
+    scores_list: List[Dict[str, Any]],
+    vecs_n: np.ndarray,
+    pack_top: int,
+) -> List[List[int]]:
+    """Batched MMR for several queries against the same embedding matrix.
 
-            # Mask out already-selected candidates
-            mmr_scores[~remaining_mask] = -np.inf
+    Candidate lists are padded into a [batch, max_candidates, dim] tensor so each
+    pick is a single batched mat-vec across all queries. Produces the same
+    selections as calling ``apply_mmr_diversification`` per query.
 
-            # Select candidate with highest MMR score
-            best_idx = mmr_scores.argmax()
-            selected_chunk_idx = cand_array[best_idx]
+    Args:
+        selected_lists: Per-query lists of selected chunk indices
+        scores_list: Per-query score dicts with "dense" scores
+        vecs_n: Normalized embedding vectors
+        pack_top: Maximum number of chunks to select per query
 
-            mmr_selected.append(int(selected_chunk_idx))
-            remaining_mask[best_idx] = False
+    Returns:
+        Per-query lists of diversified chunk indices
+    """
+    if len(selected_lists) != len(scores_list):
+        raise ValueError("selected_lists and scores_list must have the same length")
+
+    batch = len(selected_lists)
+    width = max((len(s) for s in selected_lists), default=0)
+    if batch == 0 or width == 0:
+        return [[] for _ in range(batch)]
+
+    cand = np.zeros((batch, width), dtype=np.int64)
+    valid = np.zeros((batch, width), dtype=bool)
+    relevance = np.zeros((batch, width), dtype=np.float32)
+    for b, (sel, sc) in enumerate(zip(selected_lists, scores_list)):
+        n = len(sel)
+        if n:
+            cand[b, :n] = sel
+            valid[b, :n] = True
+            relevance[b, :n] = _gather_dense_scores(sc["dense"], sel)
+
+    rows = np.arange(batch)
+    cand_vecs = vecs_n[cand]  # [batch, width, emb_dim]
+    base_scores = np.where(valid, MMR_LAMBDA * relevance, -np.inf)
+    penalty = 1 - MMR_LAMBDA
+    remaining = valid.copy()
+    # Top dense candidate is always kept, matching apply_mmr_diversification
+    limits = np.minimum(valid.sum(axis=1), max(1, pack_top))
+    results: List[List[int]] = [[] for _ in range(batch)]
+
+    # First pick per query: top dense score
+    best = np.where(valid, relevance, -np.inf).argmax(axis=1)
+    max_sim = np.einsum("bwd,bd->bw", cand_vecs, cand_vecs[rows, best])
+    for step in range(int(limits.max())):
+        if step > 0:
+            mmr_scores = base_scores - penalty * max_sim
+            mmr_scores[~remaining] = -np.inf
+            best = mmr_scores.argmax(axis=1)
+            np.maximum(max_sim, np.einsum("bwd,bd->bw", cand_vecs, cand_vecs[rows, best]), out=max_sim)
+        active = step < limits
+        for b in np.nonzero(active)[0]:
+            results[b].append(int(cand[b, best[b]]))
+        remaining[rows[active], best[active]] = False
+
+    return results
+
+
+def evaluate_rerank_gate(scores: Dict[str, Any], candidates: List[int]) -> Dict[str, Any]:
+    """Decide whether reranking can be skipped because retrieval has a clear winner.
+
+    Signals (thresholds from config.RERANK_GATE_*):
+    - margin: top-1 minus top-2 hybrid score over the candidates (z-score units)
+    - entropy: softmax entropy over candidate hybrid scores, normalized to [0, 1]
+    - intent_confidence: from classify_intent via scores["intent_metadata"] (None if disabled)
 
-    return mmr_selected
+    Returns:
+        Dict with "skip" plus the measured signals, for logging/metadata
+    """
+    decision: Dict[str, Any] = {"skip": False, "margin": None, "entropy": None, "intent_confidence": None}
+    hybrid = scores.get("hybrid")
+    if hybrid is None or len(candidates) < 2:
+        return decision
+
+    values = np.asarray(hybrid, dtype=np.float64)[np.asarray(candidates, dtype=np.int64)]
+    if not np.all(np.isfinite(values)):
+        return decision
+
+    top2 = np.sort(values)[-2:]
+    margin = float(top2[1] - top2[0])
+    shifted = np.exp(values - values.max())
+    probs = shifted / shifted.sum()
+    entropy = float(-(probs * np.log(np.clip(probs, 1e-12, None))).sum() / np.log(len(values)))
+
+    intent_conf = (scores.get("intent_metadata") or {}).get("intent_confidence")
+    decision.update(
+        margin=round(margin, 4),
+        entropy=round(entropy, 4),
+        intent_confidence=intent_conf,
+    )
+    decision["skip"] = (
+        margin >= config.RERANK_GATE_MIN_MARGIN
+        and entropy <= config.RERANK_GATE_MAX_ENTROPY
+        and (intent_conf is None or float(intent_conf) >= config.RERANK_GATE_MIN_INTENT_CONFIDENCE)
+    )
+    return decision
 
 
 def apply_reranking(
@@ -226,8 +346,10 @@ def apply_reranking(
     num_ctx: int = DEFAULT_NUM_CTX,
     num_predict: int = DEFAULT_NUM_PREDICT,
     retries: int = DEFAULT_RETRIES,
+    rerank_mode: Optional[str] = None,
+    gate: Optional[bool] = None,
 ) -> Tuple[List[int], Dict, bool, str, float]:
-    """Apply optional LLM reranking to MMR-selected chunks.
+    """Apply optional reranking to MMR-selected chunks.
 
     Args:
         question: User question
@@ -236,21 +358,53 @@ def apply_reranking(
         scores: Dict with relevance scores
         use_rerank: Whether to apply reranking
         seed, num_ctx, num_predict, retries: LLM parameters
+        rerank_mode: "llm", "cross_encoder" or "none" (defaults to config.RERANK_MODE)
+        gate: Skip reranking when retrieval is already confident (defaults to
+            config.RERANK_GATE_ENABLED); skipped calls report reason "gate_confident"
 
     Returns:
         Tuple of (reranked_chunks, rerank_scores, rerank_applied, rerank_reason, timing)
     """
-    rerank_scores = {}
+    rerank_scores: Dict[int, float] = {}
     rerank_applied = False
     rerank_reason = "disabled"
     timing = 0.0
 
-    if use_rerank:
-        logger.debug(json.dumps({"event": "rerank_start", "candidates": len(mmr_selected)}))
-        t0 = time.time()
-        mmr_selected, rerank_scores, rerank_applied, rerank_reason = rerank_with_llm(
-            question, chunks, mmr_selected, scores, seed=seed, num_ctx=num_ctx, num_predict=num_predict, retries=retries
+    mode = (rerank_mode or config.RERANK_MODE or "llm").lower()
+    if gate is None:
+        gate = config.RERANK_GATE_ENABLED
+    if use_rerank and mode != "none" and gate and len(mmr_selected) > 1:
+        gate_decision = evaluate_rerank_gate(scores, mmr_selected)
+        decision_label = "skip" if gate_decision["skip"] else "rerank"
+        metrics_module.get_metrics().increment_counter(
+            MetricNames.RERANK_GATE_TOTAL, labels={"decision": decision_label, "mode": mode}
         )
+        logger.debug(json.dumps({"event": "rerank_gate", "decision": decision_label, **gate_decision}))
+        if gate_decision["skip"]:
+            return mmr_selected, rerank_scores, rerank_applied, "gate_confident", timing
+
+    if use_rerank and mode != "none" and len(mmr_selected) > 1 and skip_optional_stage("rerank"):
+        # Not enough request budget left to rerank and still generate an answer
+        return mmr_selected, rerank_scores, rerank_applied, "deadline", timing
+
+    if use_rerank and mode != "none":
+        logger.debug(json.dumps({"event": "rerank_start", "mode": mode, "candidates": len(mmr_selected)}))
+        t0 = time.time()
+        if mode == "cross_encoder":
+            mmr_selected, rerank_scores, rerank_applied, rerank_reason = rerank_with_cross_encoder(
+                question, chunks, mmr_selected
+            )
+        else:
+            mmr_selected, rerank_scores, rerank_applied, rerank_reason = rerank_with_llm(
+                question,
+                chunks,
+                mmr_selected,
+                scores,
+                seed=seed,
+                num_ctx=num_ctx,
+                num_predict=num_predict,
+                retries=retries,
+            )
         timing = time.time() - t0
         logger.debug(json.dumps({"event": "rerank_done", "selected": len(mmr_selected), "scored": len(rerank_scores)}))
 
@@ -503,6 +657,19 @@ def generate_llm_answer(
     )
 
 
+def _embed_query_cached(question: str, generation: str, retries: int) -> np.ndarray:
+    """Embed a (normalized) question, reusing the vector cached for this index generation."""
+    cache = get_query_embedding_cache()
+    if cache is not None:
+        cached = cache.get(question, generation)
+        if cached is not None:
+            return cached
+    vec = embed_query(question, retries=retries)
+    if cache is not None:
+        cache.put(question, generation, vec)
+    return vec
+
+
 def answer_once(
     question: str,
     chunks: List[Dict],
@@ -518,6 +685,9 @@ def answer_once(
     num_predict: int = DEFAULT_NUM_PREDICT,
     retries: int = DEFAULT_RETRIES,
     faiss_index_path: Optional[str] = None,
+    query_vec: Optional[np.ndarray] = None,
+    index_generation: Optional[str] = None,
+    use_answer_cache: bool = True,
 ) -> Dict[str, Any]:
     """Complete answer generation pipeline.
 
@@ -533,6 +703,12 @@ def answer_once(
         use_rerank: Whether to apply LLM reranking
         seed, num_ctx, num_predict, retries: LLM parameters
         faiss_index_path: Path to FAISS index file
+        query_vec: Precomputed normalized embedding of the question (e.g. from a batch
+            embedding pass); skips the per-question embedding call
+        index_generation: Generation of the index passed in (tags cached answers); read
+            from index.meta.json when omitted, which can be newer than the loaded index
+        use_answer_cache: Read and write the exact and semantic answer caches (False
+            always computes a fresh answer for this exact question, e.g. FAQ builds)
 
     Returns:
         Dict with answer and metadata
@@ -566,11 +742,78 @@ def answer_once(
         )
     )
 
+    # OPTIMIZATION: Answer caches, bound to the index generation (inactive without a versioned index).
+    # The exact-match cache (per process, or shared by every worker with QUERY_CACHE_BACKEND=sqlite) is
+    # checked before any work; the semantic cache lets paraphrases skip MMR, rerank and the LLM.
+    answer_cache = get_answer_cache() if use_answer_cache else None
+    semantic_cache = get_semantic_cache() if use_answer_cache else None
+    # Stages skipped for the request deadline land here; such answers are served but never cached
+    degraded = track_degradation()
+    caching_enabled = answer_cache is not None or semantic_cache is not None or get_query_embedding_cache() is not None
+    if not caching_enabled:
+        generation = ""
+    else:
+        generation = index_generation if index_generation is not None else get_index_generation()
+    cache_question = validate_query_length(normalize_query(question)) if generation else question
+    cache_params = {
+        "top_k": top_k,
+        "pack_top": pack_top,
+        "threshold": threshold,
+        "use_rerank": bool(use_rerank),
+        "num_ctx": num_ctx,
+        "num_predict": num_predict,
+        "model": config.RAG_CHAT_MODEL,
+        "generation": generation,
+    }
+
+    def _cache_hit(result: Dict[str, Any], cache: str, retrieve_ms: float, **extra: Any) -> Dict[str, Any]:
+        total_time = time.time() - t_start
+        metrics.observe_histogram(MetricNames.QUERY_LATENCY, total_time * 1000)
+        logger.info(
+            json.dumps(
+                {
+                    "event": "rag.query.cache_hit",
+                    "question_hash": question_hash,
+                    "cache": cache,
+                    "total_ms": round(total_time * 1000, 2),
+                    **extra,
+                }
+            )
+        )
+        result["timing"] = {
+            "total_ms": total_time * 1000,
+            "retrieve_ms": retrieve_ms,
+            "mmr_ms": 0,
+            "rerank_ms": 0,
+            "llm_ms": 0,
+        }
+        result["metadata"] = {**result.get("metadata", {}), "cache": cache, **extra}
+        return result
+
+    if generation and answer_cache is not None:
+        cached_entry = answer_cache.get(cache_question, cache_params)
+        if cached_entry is not None:
+            cached_result = copy.deepcopy(cached_entry[1])
+            cached_result.pop("timestamp", None)
+            return _cache_hit(cached_result, "exact", 0)
+
     # Retrieve
     t0 = time.time()
-    selected, scores = retrieve(
-        question, chunks, vecs_n, bm, top_k=top_k, hnsw=hnsw, retries=retries, faiss_index_path=faiss_index_path
-    )
+    with span("retrieve", top_k=top_k):
+        if generation and query_vec is None:
+            # Embed once (or reuse the cached vector): it drives dense retrieval and the semantic lookup
+            query_vec = _embed_query_cached(cache_question, generation, retries)
+        selected, scores = retrieve(
+            question,
+            chunks,
+            vecs_n,
+            bm,
+            top_k=top_k,
+            hnsw=hnsw,
+            retries=retries,
+            faiss_index_path=faiss_index_path,
+            query_vec=query_vec,
+        )
     retrieve_time = time.time() - t0
 
     # Check coverage
@@ -608,28 +851,50 @@ def answer_once(
             "routing": get_routing_action(None, refused=True, critical=False),
         }
 
+    cache_articles: List[str] = []
+    if generation and query_vec is not None and semantic_cache is not None:
+        for idx in selected:
+            key = _article_key(chunks[idx])
+            if key not in cache_articles:
+                cache_articles.append(key)
+                if len(cache_articles) >= config.SEMANTIC_CACHE_TOP_ARTICLES:
+                    break
+        semantic_params = tuple(sorted(cache_params.items()))
+        cached = semantic_cache.get(query_vec, cache_articles, generation, semantic_params)
+        if cached is not None:
+            result, similarity = cached
+            metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, retrieve_time * 1000)
+            return _cache_hit(result, "semantic", retrieve_time * 1000, cache_similarity=round(similarity, 4))
+
     # Apply MMR diversification
     t0 = time.time()
-    mmr_selected = apply_mmr_diversification(selected, scores, vecs_n, pack_top)
+    with span("mmr", pack_top=pack_top):
+        mmr_selected = apply_mmr_diversification(selected, scores, vecs_n, pack_top)
     mmr_time = time.time() - t0
 
-    # Optional reranking
-    mmr_selected, rerank_scores, rerank_applied, rerank_reason, rerank_time = apply_reranking(
-        question,
-        chunks,
-        mmr_selected,
-        scores,
-        use_rerank,
-        seed=seed,
-        num_ctx=num_ctx,
-        num_predict=num_predict,
-        retries=retries,
-    )
+    # Optional reranking (backend selected by config.RERANK_MODE)
+    rerank_mode = config.RERANK_MODE if use_rerank else "none"
+    with span("rerank", mode=rerank_mode) as rerank_span:
+        mmr_selected, rerank_scores, rerank_applied, rerank_reason, rerank_time = apply_reranking(
+            question,
+            chunks,
+            mmr_selected,
+            scores,
+            use_rerank,
+            seed=seed,
+            num_ctx=num_ctx,
+            num_predict=num_predict,
+            retries=retries,
+        )
+        rerank_span.set_attribute("applied", bool(rerank_applied))
+        rerank_span.set_attribute("reason", rerank_reason or "")
 
     # Pack snippets grouped by article
-    context_block, packed_ids, used_tokens, article_blocks = pack_snippets(
-        chunks, mmr_selected, pack_top=pack_top, num_ctx=num_ctx
-    )
+    with span("pack") as pack_span:
+        context_block, packed_ids, used_tokens, article_blocks = pack_snippets(
+            chunks, mmr_selected, pack_top=pack_top, num_ctx=num_ctx
+        )
+        pack_span.set_attribute("used_tokens", int(used_tokens))
 
     def _llm_failure(reason: str, error: Exception) -> Dict[str, Any]:
         total_time = time.time() - t_start
@@ -667,6 +932,7 @@ def answer_once(
                 "used_tokens": used_tokens,
                 "rerank_applied": rerank_applied,
                 "rerank_reason": rerank_reason,
+                "rerank_mode": rerank_mode,
                 "llm_error": reason,
                 "llm_error_msg": str(error),
                 "source_chunk_ids": _normalize_chunk_ids(packed_ids),
@@ -675,21 +941,29 @@ def answer_once(
         }
 
     # Generate answer
+    check_deadline("llm")
     try:
-        answer, llm_time, confidence, reasoning, sources_used, structured_meta = generate_llm_answer(
-            question,
-            context_block,
-            seed=seed,
-            num_ctx=num_ctx,
-            num_predict=num_predict,
-            retries=retries,
-            packed_ids=packed_ids,
-            all_chunks=chunks,
-            selected_indices=selected,
-            scores_dict=scores,
-            article_blocks=article_blocks,
-        )
+        with span("llm"):
+            answer, llm_time, confidence, reasoning, sources_used, structured_meta = generate_llm_answer(
+                question,
+                context_block,
+                seed=seed,
+                num_ctx=num_ctx,
+                num_predict=num_predict,
+                retries=retries,
+                packed_ids=packed_ids,
+                all_chunks=chunks,
+                selected_indices=selected,
+                scores_dict=scores,
+                article_blocks=article_blocks,
+            )
+    except LLMOverloadedError:
+        # Shed by the concurrency limiter: surface as 503 + Retry-After, not a refusal
+        raise
     except LLMUnavailableError as exc:
+        if deadline_expired():
+            # The read timeout was clamped to the request budget: the caller has given up
+            raise DeadlineExceededError("llm") from exc
         logger.error(f"LLM unavailable during answer generation: {exc}")
         return _llm_failure("llm_unavailable", exc)
     except LLMError as exc:
@@ -724,7 +998,7 @@ def answer_once(
     # Auto-escalate low-confidence queries to human review
     routing = get_routing_action(confidence, refused=refused, critical=False)
 
-    return {
+    result = {
         "answer": answer,
         "refused": refused,
         "confidence": confidence,
@@ -752,6 +1026,7 @@ def answer_once(
             "used_tokens": used_tokens,
             "rerank_applied": rerank_applied,
             "rerank_reason": rerank_reason,
+            "rerank_mode": rerank_mode,
             "source_chunk_ids": _normalize_chunk_ids(packed_ids),
             "reasoning": reasoning,  # LLM's explanation (new JSON format)
             "sources_used": sources_used,  # LLM's cited sources (new JSON format)
@@ -759,6 +1034,12 @@ def answer_once(
         },
         "routing": routing,  # Add routing recommendation
     }
+    if generation and not refused and not degraded:
+        if answer_cache is not None:
+            answer_cache.put(cache_question, answer, result, cache_params)
+        if query_vec is not None and semantic_cache is not None:
+            semantic_cache.put(query_vec, cache_articles, generation, result, semantic_params)
+    return result
 
 
 def answer_to_json(
@@ -829,6 +1110,7 @@ __all__ = [
     "parse_qwen_json",
     "apply_mmr_diversification",
     "apply_reranking",
+    "evaluate_rerank_gate",
     "extract_citations",
     "validate_citations",
     "generate_llm_answer",
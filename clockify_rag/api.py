@@ -10,8 +10,10 @@ Provides REST API endpoints:
 """
 
 import asyncio
+import contextvars
 import json
 import logging
+import math
 import os
 import platform
 import threading
@@ -29,7 +31,16 @@ from pydantic import BaseModel, Field, field_validator
 
 from . import config
 from .answer import answer_once
-from .caching import get_rate_limiter as _get_rate_limiter
+from .caching import (
+    TokenBucketLimiter,
+    close_query_cache,
+    close_query_log,
+    get_rate_limiter as _get_rate_limiter,
+    hottest_cached_questions,
+    retain_index_generation,
+    rewarm_answer_caches,
+    save_rerank_cache,
+)
 from .cli import ensure_index_ready
 from .correlation import (
     generate_correlation_id,
@@ -38,9 +49,20 @@ from .correlation import (
     clear_correlation_id,
     validate_correlation_id,
 )
-from .exceptions import ValidationError
-from .indexing import build
-from .metrics import MetricNames, get_metrics
+from .deadline import reset_deadline, set_deadline
+from .exceptions import DeadlineExceededError, LLMOverloadedError, ValidationError
+from .indexing import build, get_index_generation
+from .logging_utils import log_query_event
+from .tracing import close_trace_export, end_trace, get_recent_traces, span, start_trace
+from .metrics import (
+    MetricNames,
+    clear_multiprocess_dir,
+    get_fleet_metrics,
+    get_metrics,
+    start_metrics_flusher,
+    stop_metrics_flusher,
+)
+from .profiling import SamplingProfiler, get_continuous_profiler, start_continuous_profiler, stop_continuous_profiler
 from .utils import check_ollama_connectivity, resolve_corpus_path
 
 # Re-export for tests that monkeypatch api.get_rate_limiter
@@ -52,6 +74,8 @@ logger = logging.getLogger(__name__)
 def _threadpool_workers() -> int:
     """Compute a threadpool size that can handle small concurrent bursts."""
 
+    if config.API_THREADPOOL_WORKERS > 0:
+        return config.API_THREADPOOL_WORKERS
     cpu_count = os.cpu_count() or 1
     return max(4, min(32, cpu_count * 4))
 
@@ -71,6 +95,9 @@ class QueryRequest(BaseModel):
     pack_top: Optional[int] = Field(config.DEFAULT_PACK_TOP, ge=1, le=50, description="Number of chunks in context")
     threshold: Optional[float] = Field(config.DEFAULT_THRESHOLD, ge=0.0, le=1.0, description="Minimum similarity")
     debug: Optional[bool] = Field(False, description="Include debug information")
+    timeout_ms: Optional[int] = Field(
+        None, ge=100, description="End-to-end deadline in milliseconds (overrides the timeout header)"
+    )
 
     @field_validator("question")
     @classmethod
@@ -122,6 +149,9 @@ class QueryResponse(BaseModel):
     routing: Optional[Dict[str, Any]] = Field(None, description="Routing recommendation (if available)")
     timing: Optional[Dict[str, Any]] = Field(None, description="Latency breakdown in milliseconds")
     correlation_id: Optional[str] = Field(None, description="Request correlation ID for tracing")
+    trace: Optional[Dict[str, Any]] = Field(
+        None, description="Per-stage span breakdown (only when the debug trace header is set)"
+    )
 
 
 class HealthResponse(BaseModel):
@@ -178,6 +208,7 @@ def create_app() -> FastAPI:
             target_app.state.vecs_n = None
             target_app.state.bm = None
             target_app.state.hnsw = None
+            target_app.state.index_generation = None
             target_app.state.index_ready = False
 
     def _set_index_state(target_app: FastAPI, result) -> None:
@@ -192,18 +223,30 @@ def create_app() -> FastAPI:
                 target_app.state.vecs_n = vecs_n
                 target_app.state.bm = bm
                 target_app.state.hnsw = hnsw
+                # Generation of the artifacts just loaded (None for plain tuples: answer_once reads it from disk)
+                target_app.state.index_generation = getattr(result, "generation", None)
                 target_app.state.index_ready = True
 
         # Call clear outside lock if needed (RLock is reentrant so this is safe, but clearer)
         if not result:
             _clear_index_state(target_app)
 
+    def _loaded_generation(target_app: FastAPI) -> str:
+        """Generation of the index in memory (index.meta.json when it was loaded from a plain tuple)."""
+        generation = getattr(target_app.state, "index_generation", None)
+        return get_index_generation() if generation is None else generation
+
     @asynccontextmanager
     async def lifespan(_app: FastAPI):
         # Ensure a sufficiently-sized executor for run_in_executor workloads (queries/ingest)
         executor = ThreadPoolExecutor(max_workers=_threadpool_workers())
         asyncio.get_running_loop().set_default_executor(executor)
         _app.state.executor = executor
+        if start_metrics_flusher():
+            logger.info("Flushing metrics to %s for multi-worker aggregation", config.METRICS_MULTIPROC_DIR)
+        if config.PROFILE_CONTINUOUS:
+            start_continuous_profiler()
+            logger.info("Continuous sampling profiler running every %.0f ms", config.PROFILE_CONTINUOUS_INTERVAL_MS)
         try:
             logger.info("Loading index on startup...")
             try:
@@ -220,6 +263,12 @@ def create_app() -> FastAPI:
         finally:
             logger.info("Initiating graceful shutdown...")
             executor.shutdown(wait=True)
+            save_rerank_cache()
+            close_query_cache()
+            close_query_log()
+            close_trace_export()
+            stop_continuous_profiler()
+            stop_metrics_flusher()
             _clear_index_state(_app)
             logger.info("Graceful shutdown complete")
 
@@ -247,6 +296,8 @@ def create_app() -> FastAPI:
                 "accept",
                 "x-correlation-id",
                 "x-request-id",
+                config.TRACE_DEBUG_HEADER,
+                config.REQUEST_TIMEOUT_HEADER,
             ],
         )
 
@@ -291,6 +342,42 @@ def create_app() -> FastAPI:
         if api_key not in config.API_ALLOWED_KEYS:
             raise HTTPException(status_code=403, detail="Invalid API key")
 
+    def _rate_limit_key(req: Request) -> str:
+        """Bucket key for the caller per RATE_LIMIT_KEY_BY.
+
+        API keys are only trusted after ``_require_api_key`` validated them
+        (API_AUTH_MODE=api_key). Without auth every caller is keyed by client IP,
+        so sending a fresh random header cannot mint a new, full bucket.
+        """
+        client_ip = req.client.host if req.client else "unknown"
+        ip_key = f"ip:{client_ip}"
+        if config.RATE_LIMIT_KEY_BY == "ip" or config.API_AUTH_MODE != "api_key":
+            return ip_key
+        api_key = req.headers.get(config.API_KEY_HEADER or "x-api-key")
+        if not api_key:
+            return ip_key
+        if config.RATE_LIMIT_KEY_BY == "api_key_ip":
+            return f"key:{api_key}|{ip_key}"
+        return f"key:{api_key}"
+
+    def _request_timeout(body: QueryRequest, req: Request) -> Optional[float]:
+        """Deadline in seconds: body ``timeout_ms``, then the timeout header, then RAG_REQUEST_TIMEOUT_MS."""
+        timeout_ms: Optional[float] = body.timeout_ms
+        if timeout_ms is None:
+            header_value = req.headers.get(config.REQUEST_TIMEOUT_HEADER)
+            if header_value:
+                try:
+                    timeout_ms = max(100.0, float(header_value))
+                except ValueError:
+                    logger.debug("Ignoring invalid %s header: %r", config.REQUEST_TIMEOUT_HEADER, header_value)
+        if timeout_ms is None:
+            timeout_ms = config.REQUEST_TIMEOUT_MS or None
+        if timeout_ms is None:
+            return None
+        if config.REQUEST_TIMEOUT_MAX_MS:
+            timeout_ms = min(timeout_ms, config.REQUEST_TIMEOUT_MAX_MS)
+        return timeout_ms / 1000.0
+
     # ========================================================================
     # Exception Handlers (ensure correlation ID on error responses)
     # ========================================================================
@@ -302,10 +389,12 @@ def create_app() -> FastAPI:
         correlation_id = (
             getattr(request.state, "correlation_id", None) or get_correlation_id() or generate_correlation_id()
         )
+        headers = dict(exc.headers or {})  # keep e.g. Retry-After
+        headers["x-correlation-id"] = correlation_id
         return JSONResponse(
             status_code=exc.status_code,
             content={"detail": exc.detail},
-            headers={"x-correlation-id": correlation_id},
+            headers=headers,
         )
 
     @app.exception_handler(Exception)
@@ -431,25 +520,37 @@ def create_app() -> FastAPI:
             vecs_n = app.state.vecs_n
             bm = app.state.bm
             hnsw = app.state.hnsw
+            index_generation = app.state.index_generation
 
+        debug_header = raw_request.headers.get(config.TRACE_DEBUG_HEADER, "")
+        debug_trace = debug_header.strip().lower() in ("1", "true", "yes", "on")
+        trace = start_trace()
         try:
             start_time = time.time()
             metrics = get_metrics()
             rate_limiter = get_rate_limiter()
-            if rate_limiter:
-                if rate_limiter.allow_request():
+            if rate_limiter is not None:
+                wait_seconds = 0.0
+                if isinstance(rate_limiter, TokenBucketLimiter):
+                    # Single O(1) check that also yields the retry delay
+                    allowed, wait_seconds = rate_limiter.acquire(_rate_limit_key(raw_request))
+                else:
+                    allowed = rate_limiter.allow_request()
+                if allowed:
                     metrics.increment_counter(MetricNames.RATE_LIMIT_ALLOWED)
                 else:
                     metrics.increment_counter(MetricNames.RATE_LIMIT_BLOCKED)
-                    wait_seconds = 0.0
-                    if hasattr(rate_limiter, "wait_time"):
+                    if not wait_seconds and hasattr(rate_limiter, "wait_time"):
                         try:
                             wait_seconds = float(rate_limiter.wait_time())
                         except Exception:
                             wait_seconds = 0.0
+                    if math.isinf(wait_seconds):
+                        raise HTTPException(status_code=429, detail="Rate limit exceeded. Request exceeds burst quota.")
                     raise HTTPException(
                         status_code=429,
                         detail=f"Rate limit exceeded. Retry after {wait_seconds:.2f} seconds.",
+                        headers={"Retry-After": str(max(1, math.ceil(wait_seconds)))},
                     )
 
             loop = asyncio.get_running_loop()
@@ -466,13 +567,27 @@ def create_app() -> FastAPI:
                 top_k=resolved_top_k,
                 pack_top=resolved_pack_top,
                 threshold=resolved_threshold,
-                use_rerank=True,
+                # Reranker backend (llm / cross_encoder / none) comes from RAG_RERANK_MODE
+                use_rerank=config.RERANK_MODE != "none",
                 hnsw=hnsw,
+                index_generation=index_generation,
             )
             executor = getattr(app.state, "executor", None)
-            result = await loop.run_in_executor(executor, answer_future)
+            deadline_token = set_deadline(_request_timeout(request, raw_request))
+            try:
+                with span("query"):
+                    # Copy the context so the worker thread sees the correlation id, trace and deadline
+                    ctx = contextvars.copy_context()
+                    result = await loop.run_in_executor(executor, ctx.run, answer_future)
+            finally:
+                reset_deadline(deadline_token)
 
             elapsed_ms = (time.time() - start_time) * 1000
+            trace_payload = end_trace(trace)
+            if config.QUERY_LOG_ENABLED:
+                # With RAG_LOG_ASYNC (default) this only enqueues; chunk entries, sanitizing and
+                # rendering all happen in the writer thread
+                log_query_event(request.question, result, chunks, elapsed_ms, channel="api")
 
             metadata = result.get("metadata") or {}
             selected_chunks = result.get("selected_chunks", [])
@@ -495,6 +610,7 @@ def create_app() -> FastAPI:
                 routing=result.get("routing"),
                 timing=result.get("timing"),
                 correlation_id=get_correlation_id(),
+                trace=trace_payload if debug_trace else None,
             )
 
         except ValidationError as e:
@@ -504,10 +620,81 @@ def create_app() -> FastAPI:
         except HTTPException:
             # Re-raise HTTP exceptions (like 429 rate limit) without modification
             raise
+        except DeadlineExceededError as e:
+            logger.warning(f"Query deadline exceeded: {e}")
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+        except LLMOverloadedError as e:
+            # Shed by the LLM concurrency limiter: fail fast so the client can back off
+            raise HTTPException(
+                status_code=503,
+                detail="LLM is overloaded. Please retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
         except Exception as e:
             # Generic exceptions may contain internal details - sanitize
             logger.error(f"Query error: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail="Internal server error")
+        finally:
+            # No-op if already finished; records failed requests too
+            if trace is not None and trace.end_ns is None:
+                end_trace(trace)
+
+    @app.get("/v1/traces")
+    async def list_traces(raw_request: Request, limit: int = 20) -> Dict[str, Any]:
+        """Return the most recent per-request traces from the in-process ring buffer."""
+        _require_api_key(raw_request)
+        limit = max(1, min(int(limit), config.TRACE_RING_SIZE))
+        return {"traces": get_recent_traces(limit)}
+
+    # ========================================================================
+    # Profiling Endpoint (admin)
+    # ========================================================================
+
+    profile_lock = asyncio.Lock()
+
+    @app.get("/v1/admin/profile")
+    async def profile_endpoint(
+        raw_request: Request,
+        seconds: float = 5.0,
+        interval_ms: Optional[float] = None,
+        format: str = "collapsed",
+        include_idle: bool = False,
+        continuous: bool = False,
+        limit: int = 20,
+    ) -> Response:
+        """Sample all worker threads and return collapsed stacks for flamegraphs.
+
+        ``continuous=true`` returns the recent (decayed) samples of the continuous
+        profiler (RAG_PROFILE_CONTINUOUS) instead of running a new window.
+        """
+        _require_api_key(raw_request)
+        fmt = (format or "collapsed").lower()
+        if fmt not in ("collapsed", "json"):
+            raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'json'")
+
+        profiler: SamplingProfiler
+        if continuous:
+            continuous_profiler = get_continuous_profiler()
+            if continuous_profiler is None:
+                raise HTTPException(status_code=404, detail="Continuous profiler is not running")
+            profiler = continuous_profiler
+        else:
+            if seconds <= 0 or seconds > config.PROFILE_MAX_SECONDS:
+                raise HTTPException(status_code=400, detail=f"seconds must be in (0, {config.PROFILE_MAX_SECONDS:g}]")
+            if profile_lock.locked():
+                raise HTTPException(status_code=409, detail="A profile is already running")
+            async with profile_lock:
+                interval = (interval_ms or config.PROFILE_INTERVAL_MS) / 1000.0
+                # Sampler runs on its own thread; the event loop stays free (and is sampled too)
+                profiler = SamplingProfiler(interval=interval, include_idle=include_idle).start()
+                try:
+                    await asyncio.sleep(seconds)
+                finally:
+                    profiler.stop()
+
+        if fmt == "json":
+            return JSONResponse(profiler.to_dict(limit=max(1, limit)))
+        return Response(profiler.collapsed(), media_type="text/plain; charset=utf-8")
 
     # ========================================================================
     # Ingest Endpoint
@@ -543,11 +730,20 @@ def create_app() -> FastAPI:
                 logger.info(f"Starting ingest from {input_file}")
                 # Acquire lock to serialize concurrent ingest requests
                 with app.state.lock:
+                    previous_generation = _loaded_generation(app)
                     build(input_file, retries=2)
                     result = ensure_index_ready(retries=2)
                     _set_index_state(app, result)
+                    generation = _loaded_generation(app)
                 duration_ms = (time.time() - started_at) * 1000
                 logger.info(f"Ingest completed successfully in {duration_ms:.1f} ms")
+                if generation != previous_generation:
+                    # Capture the hottest questions before their entries are evicted as stale
+                    hot = hottest_cached_questions(config.CACHE_REWARM_TOP_N, previous_generation)
+                    retain_index_generation(generation)
+                    if hot and result:
+                        chunks, vecs_n, bm, hnsw = result
+                        rewarm_answer_caches(hot, chunks, vecs_n, bm, hnsw=hnsw, index_generation=generation)
             except Exception as e:
                 logger.error(f"Ingest failed: {e}", exc_info=True)
                 _clear_index_state(app)
@@ -567,8 +763,9 @@ def create_app() -> FastAPI:
 
     @app.get("/v1/metrics")
     async def get_metrics_endpoint(format: str = "json") -> Response:
-        """Expose in-process metrics in JSON, Prometheus, or CSV format."""
-        collector = get_metrics()
+        """Expose metrics in JSON, Prometheus, or CSV format (fleet-wide in multiprocess mode)."""
+        # Multiprocess merge reads worker files; keep that I/O off the event loop
+        collector = await asyncio.get_running_loop().run_in_executor(None, get_fleet_metrics)
         fmt = (format or "json").lower()
 
         if fmt == "prometheus":
@@ -578,8 +775,8 @@ def create_app() -> FastAPI:
             payload = collector.export_csv()
             return Response(payload, media_type="text/csv")
 
-        # Default JSON structure
-        snapshot_json = collector.export_json(include_histograms=True)
+        # Default JSON structure (stats only; raw windows are too large to scrape)
+        snapshot_json = collector.export_json(include_histograms=False)
         payload = json.loads(snapshot_json)
 
         # Read state atomically
@@ -602,7 +799,7 @@ def create_app() -> FastAPI:
                 static_configs:
                   - targets: ['localhost:8000']
         """
-        collector = get_metrics()
+        collector = await asyncio.get_running_loop().run_in_executor(None, get_fleet_metrics)
         payload = collector.export_prometheus()
         return Response(payload, media_type="text/plain; version=0.0.4; charset=utf-8")
 
@@ -633,6 +830,9 @@ def run_server(
     """
     import uvicorn
 
+    if config.METRICS_MULTIPROC_DIR:
+        # Start the fleet from a clean slate, before any worker flushes (prometheus_client multiprocess rule)
+        clear_multiprocess_dir(config.METRICS_MULTIPROC_DIR)
     uvicorn.run(
         "clockify_rag.api:app",
         host=host,
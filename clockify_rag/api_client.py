@@ -35,8 +35,16 @@ from .config import (
     get_llm_client_mode,
 )
 from .circuit_breaker import CircuitOpenError, get_ollama_circuit_breaker
-from .exceptions import LLMError, EmbeddingError, LLMUnavailableError, LLMBadResponseError
-from .http_utils import get_session
+from .concurrency import default_llm_deadline, get_llm_limiter
+from .deadline import bound_timeout, deadline_exceeded, expired as deadline_expired, remaining
+from .exceptions import (
+    DeadlineExceededError,
+    EmbeddingError,
+    LLMBadResponseError,
+    LLMError,
+    LLMUnavailableError,
+)
+from .http_utils import get_session, get_single_try_session
 
 
 logger = logging.getLogger(__name__)
@@ -208,6 +216,9 @@ class OllamaAPIClient(BaseLLMClient):
     def _get_session(self, retries: int) -> requests.Session:
         """Return a requests.Session configured for the desired retry count."""
 
+        # A deadline-clamped timeout covers one attempt; a transport retry would spend it again
+        if remaining() is not None:
+            return get_single_try_session()
         if retries == self.retries:
             return self.session
 
@@ -239,6 +250,7 @@ class OllamaAPIClient(BaseLLMClient):
 
         Raises:
             LLMError: If the request fails after all retries
+            LLMOverloadedError: If no concurrency slot frees up before the deadline
             CircuitOpenError: If the LLM service circuit breaker is open
         """
         # Circuit breaker check before attempting request
@@ -264,9 +276,26 @@ class OllamaAPIClient(BaseLLMClient):
             "stream": stream,
         }
 
-        req_timeout = timeout or (self.chat_connect_timeout, self.chat_read_timeout)
         req_retries = retries or self.retries
+
+        # Adaptive concurrency limit: queue (or shed) here instead of piling onto Ollama
+        limiter = get_llm_limiter()
+        if limiter is not None:
+            limiter.acquire(deadline=default_llm_deadline())
+        # Clamp only after queueing so time spent waiting for a slot comes out of the read budget
+        base_timeout = timeout or (self.chat_connect_timeout, self.chat_read_timeout)
+        try:
+            req_timeout = bound_timeout(base_timeout, "llm")
+        except DeadlineExceededError:
+            if limiter is not None:
+                limiter.release()
+            raise
+        # A timeout the deadline shortened says nothing about Ollama's health
+        deadline_bound = req_timeout[1] < base_timeout[1]
         session = self._get_session(req_retries)
+        overloaded = False
+        llm_latency: Optional[float] = None
+        generated_tokens: Optional[float] = None
         start_time = time.time()
         response = None
 
@@ -274,7 +303,13 @@ class OllamaAPIClient(BaseLLMClient):
             response = session.post(self._chat_endpoint, json=payload, timeout=req_timeout, allow_redirects=False)
             response.raise_for_status()
             result = response.json()
+            llm_latency = time.time() - start_time
+            if isinstance(result, dict) and isinstance(result.get("eval_count"), (int, float)):
+                generated_tokens = float(result["eval_count"])
         except requests.exceptions.Timeout as e:
+            if deadline_bound:
+                raise deadline_exceeded("llm") from e
+            overloaded = True
             cb.record_failure()  # Track failure for circuit breaker
             logger.error(
                 "Chat completion timeout (read %.1fs) model=%s host=%s: %s",
@@ -285,6 +320,9 @@ class OllamaAPIClient(BaseLLMClient):
             )
             raise LLMUnavailableError(f"Chat completion timeout for model {model}") from e
         except requests.exceptions.ConnectionError as e:
+            if deadline_bound and deadline_expired():
+                raise deadline_exceeded("llm") from e
+            overloaded = True
             cb.record_failure()  # Track failure for circuit breaker
             logger.error(
                 "Chat completion connection error model=%s host=%s: %s",
@@ -296,6 +334,7 @@ class OllamaAPIClient(BaseLLMClient):
         except requests.exceptions.HTTPError as e:
             cb.record_failure()  # Track failure for circuit breaker
             status = getattr(e.response, "status_code", getattr(response, "status_code", "unknown"))
+            overloaded = status in (429, 503)
             logger.error(
                 "Chat completion HTTP error model=%s host=%s status=%s: %s",
                 model,
@@ -326,6 +365,15 @@ class OllamaAPIClient(BaseLLMClient):
             cb.record_failure()  # Track failure for circuit breaker
             logger.error("Chat completion unexpected error model=%s: %s", model, e)
             raise LLMError(f"Chat completion unexpected error: {e}") from e
+        finally:
+            if limiter is not None:
+                # Reranks and answers differ ~10x in cost: separate baselines, latency per generated token
+                limiter.release(
+                    llm_latency,
+                    overloaded=overloaded,
+                    call_class=f"{model}/{options.get('num_predict', '')}",
+                    work=generated_tokens,
+                )
 
         validated = self._validate_chat_response(result, model)
         cb.record_success()  # Track success for circuit breaker
@@ -392,7 +440,9 @@ class OllamaAPIClient(BaseLLMClient):
             )
 
         model = model or self.emb_model
-        req_timeout = timeout or (self.emb_connect_timeout, self.emb_read_timeout)
+        base_timeout = timeout or (self.emb_connect_timeout, self.emb_read_timeout)
+        req_timeout = bound_timeout(base_timeout, "embedding")
+        deadline_bound = req_timeout[1] < base_timeout[1]
         req_retries = retries or self.retries
 
         # Get session with appropriate retry settings for this request
@@ -413,6 +463,8 @@ class OllamaAPIClient(BaseLLMClient):
             return embedding
 
         except requests.exceptions.Timeout as e:
+            if deadline_bound:
+                raise deadline_exceeded("embedding") from e
             logger.error(
                 "Embedding creation timeout (read %.1fs) model=%s host=%s: %s",
                 req_timeout[1],
@@ -422,6 +474,8 @@ class OllamaAPIClient(BaseLLMClient):
             )
             raise EmbeddingError(f"Embedding creation timeout for model {model}") from e
         except requests.exceptions.ConnectionError as e:
+            if deadline_bound and deadline_expired():
+                raise deadline_exceeded("embedding") from e
             logger.error(
                 "Embedding creation connection error model=%s host=%s: %s",
                 model,
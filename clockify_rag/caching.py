@@ -1,20 +1,54 @@
 """Query caching and rate limiting for RAG system."""
 
+import copy
 import hashlib
 import logging
+import math
 import os
 import threading
 import time
 from collections import OrderedDict, deque
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+import numpy as np
 
 from .metrics import MetricNames, increment_counter, set_gauge
 
+if TYPE_CHECKING:
+    from .shared_cache import SQLiteAnswerCache
+
 logger = logging.getLogger(__name__)
 
 # FIX (Error #2): Declare globals at module level for safe initialization
-_RATE_LIMITER = None
-_QUERY_CACHE = None
+_RATE_LIMITER: "Optional[RateLimiter | TokenBucketLimiter]" = None
+_QUERY_CACHE: "Optional[QueryCache | SQLiteAnswerCache]" = None
+_QUERY_CACHE_LOCK = threading.Lock()
+_RERANK_CACHE = None
+_RERANK_CACHE_LOCK = threading.Lock()
+_SEMANTIC_CACHE = None
+_SEMANTIC_CACHE_LOCK = threading.Lock()
+_QUERY_EMBEDDING_CACHE = None
+_QUERY_EMBEDDING_CACHE_LOCK = threading.Lock()
+
+# Stale entries dropped per write once a new index generation is live (bounded, amortized eviction)
+_SWEEP_LIMIT = 8
+
+
+def _sweep_lru_front(entries: OrderedDict, is_stale, limit: int = _SWEEP_LIMIT) -> int:
+    """Drop up to ``limit`` stale entries from the least recently used end; stop at the first live one.
+
+    After a rebuild, entries of the old generation are never read again and so
+    drift to the front of the LRU order; sweeping a few per write empties them
+    out without a full scan under the lock.
+    """
+    removed = 0
+    while entries and removed < limit:
+        key = next(iter(entries))
+        if not is_stale(entries[key]):
+            break
+        del entries[key]
+        removed += 1
+    return removed
 
 
 class RateLimiter:
@@ -49,10 +83,138 @@ class RateLimiter:
             return max(0.0, (earliest + self.window_seconds) - now)
 
 
+class TokenBucketLimiter:
+    """Thread-safe token-bucket rate limiter keyed by caller (API key / client IP).
+
+    Each key holds only ``[tokens, last_refill]``, so a check is O(1) regardless of
+    the quota size, and one noisy tenant cannot drain another tenant's bucket.
+    Buckets refill continuously at ``rate`` tokens/second up to ``capacity``
+    (the burst size). Buckets idle for ``idle_ttl`` seconds are evicted lazily
+    (a full bucket after that long is indistinguishable from a new one), and
+    ``max_keys`` bounds memory against key/IP churn.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        idle_ttl: float = 600.0,
+        max_keys: int = 10000,
+        quotas: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        """Initialize limiter.
+
+        Args:
+            rate: Default refill rate in tokens (requests) per second
+            capacity: Default bucket size, i.e. the largest allowed burst
+            idle_ttl: Seconds after which an untouched bucket is dropped
+            max_keys: Maximum number of tracked buckets (least recently used evicted)
+            quotas: Optional per-key overrides of ``(rate, capacity)``
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.idle_ttl = float(idle_ttl)
+        self.max_keys = max(1, int(max_keys))
+        self.quotas: Dict[str, Tuple[float, float]] = dict(quotas or {})
+        # {key: [tokens, last_refill]}; order = least recently touched first
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _limits(self, key: str) -> Tuple[float, float]:
+        return self.quotas.get(key, (self.rate, self.capacity))
+
+    def _evict_idle(self, now: float) -> None:
+        # Oldest-touched first, so stop at the first bucket that is still active (amortized O(1))
+        while self._buckets:
+            _, state = next(iter(self._buckets.items()))
+            if now - state[1] < self.idle_ttl and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+
+    def acquire(self, key: str = "global", cost: float = 1.0) -> Tuple[bool, float]:
+        """Try to take ``cost`` tokens for ``key``.
+
+        Returns:
+            ``(allowed, retry_after)``; ``retry_after`` is the seconds until the
+            request would be allowed (0.0 when allowed, ``inf`` if ``cost`` exceeds the burst).
+        """
+        rate, capacity = self._limits(key)
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                state = [capacity, now]
+                self._buckets[key] = state
+                self._evict_idle(now)
+            else:
+                state[0] = min(capacity, state[0] + (now - state[1]) * rate)
+                state[1] = now
+                self._buckets.move_to_end(key)
+
+            if state[0] >= cost:
+                state[0] -= cost
+                return True, 0.0
+            if cost > capacity or rate <= 0:
+                return False, math.inf
+            return False, (cost - state[0]) / rate
+
+    def allow_request(self, key: str = "global") -> bool:
+        """Return True if a request for ``key`` is allowed (consumes a token)."""
+        return self.acquire(key)[0]
+
+    def wait_time(self, key: str = "global") -> float:
+        """Return seconds until ``key`` may make a request (without consuming a token)."""
+        rate, capacity = self._limits(key)
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                return 0.0
+            tokens = min(capacity, state[0] + (now - state[1]) * rate)
+        if tokens >= 1.0:
+            return 0.0
+        return (1.0 - tokens) / rate if rate > 0 else math.inf
+
+    @property
+    def tracked_keys(self) -> int:
+        """Number of buckets currently held in memory."""
+        return len(self._buckets)
+
+
+def parse_rate_limit_quotas(spec: str, window_seconds: float) -> Dict[str, Tuple[float, float]]:
+    """Parse ``key=requests[:burst],...`` into per-key ``(rate, capacity)`` overrides.
+
+    ``requests`` is per ``window_seconds`` (like ``RATE_LIMIT_REQUESTS``); ``burst``
+    defaults to ``requests``. Malformed entries are skipped with a warning.
+    """
+    quotas: Dict[str, Tuple[float, float]] = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, sep, value = item.rpartition("=")
+        try:
+            if not sep or not key:
+                raise ValueError("expected key=requests[:burst]")
+            requests_str, _, burst_str = value.partition(":")
+            requests = float(requests_str)
+            burst = float(burst_str) if burst_str else requests
+            if requests <= 0 or burst < 1:
+                raise ValueError("requests must be > 0 and burst >= 1")
+        except ValueError as exc:
+            logger.warning("Ignoring rate limit quota %r: %s", item, exc)
+            continue
+        quotas[key.strip()] = (requests / window_seconds, burst)
+    return quotas
+
+
 # Global rate limiter (10 queries per minute by default)
 def get_rate_limiter():
     """Get global rate limiter instance.
 
+    Returns a per-key ``TokenBucketLimiter`` unless ``RATE_LIMIT_BACKEND=sliding_window``
+    selects the legacy single global window.
+
     FIX (Error #2): Use proper `is None` check instead of fragile globals() check.
     """
     from . import config  # Import here to avoid circular import
@@ -62,7 +224,20 @@ def get_rate_limiter():
 
     global _RATE_LIMITER
     if _RATE_LIMITER is None:
-        _RATE_LIMITER = RateLimiter(max_requests=config.RATE_LIMIT_REQUESTS, window_seconds=config.RATE_LIMIT_WINDOW)
+        if getattr(config, "RATE_LIMIT_BACKEND", "token_bucket") == "sliding_window":
+            _RATE_LIMITER = RateLimiter(
+                max_requests=config.RATE_LIMIT_REQUESTS, window_seconds=config.RATE_LIMIT_WINDOW
+            )
+        else:
+            # Buckets of validated API keys are named "key:<api key>" (see api._rate_limit_key)
+            quotas = parse_rate_limit_quotas(config.RATE_LIMIT_QUOTAS, config.RATE_LIMIT_WINDOW)
+            _RATE_LIMITER = TokenBucketLimiter(
+                rate=config.RATE_LIMIT_REQUESTS / config.RATE_LIMIT_WINDOW,
+                capacity=config.RATE_LIMIT_BURST or config.RATE_LIMIT_REQUESTS,
+                idle_ttl=config.RATE_LIMIT_IDLE_TTL,
+                max_keys=config.RATE_LIMIT_MAX_KEYS,
+                quotas={f"key:{key}": quota for key, quota in quotas.items()},
+            )
     return _RATE_LIMITER
 
 
@@ -80,9 +255,12 @@ class QueryCache:
         self.ttl_seconds = ttl_seconds
         # PERF FIX: Use OrderedDict for O(1) LRU operations instead of dict + deque
         # OrderedDict.move_to_end() is O(1) vs deque.remove() which is O(n)
-        self._cache: OrderedDict = OrderedDict()  # {question_hash: (answer, metadata_with_timestamp, timestamp)}
+        # {question_hash: (answer, metadata_with_timestamp, timestamp, info)}; info holds the question,
+        # params, index generation and hit count (for re-warming the hottest questions after a rebuild)
+        self._cache: OrderedDict = OrderedDict()
         self.hits = 0
         self.misses = 0
+        self._generation: Optional[str] = None  # live index generation, set by retain_generation()
         self._lock = threading.RLock()  # Thread safety lock
 
     @property
@@ -105,6 +283,29 @@ class QueryCache:
             cache_input = question + str(sorted_params)
         return hashlib.md5(cache_input.encode("utf-8")).hexdigest()
 
+    def _is_stale(self, entry: tuple) -> bool:
+        """True for entries computed against an index generation other than the live one."""
+        return self._generation is not None and entry[3]["generation"] != self._generation
+
+    def _is_expired_or_stale(self, entry: tuple) -> bool:
+        return time.time() - entry[2] > self.ttl_seconds or self._is_stale(entry)
+
+    def retain_generation(self, generation: str) -> None:
+        """Mark ``generation`` as live; entries of other generations are evicted lazily."""
+        with self._lock:
+            self._generation = generation
+
+    def hottest(self, n: int, generation: Optional[str] = None) -> list:
+        """Return up to ``n`` (question, params) pairs with the most hits, optionally for one generation."""
+        with self._lock:
+            infos = [
+                entry[3]
+                for entry in self._cache.values()
+                if entry[3]["hits"] > 0 and (generation is None or entry[3]["generation"] == generation)
+            ]
+        infos.sort(key=lambda info: info["hits"], reverse=True)
+        return [(info["question"], dict(info["params"] or {})) for info in infos[:n]]
+
     def get(self, question: str, params: Optional[dict] = None):
         """Retrieve cached answer if available and not expired.
 
@@ -118,12 +319,13 @@ class QueryCache:
         with self._lock:
             key = self._hash_question(question, params)
 
-            if key not in self._cache:
+            if key not in self._cache or self._is_stale(self._cache[key]):
+                self._cache.pop(key, None)
                 self.misses += 1
                 increment_counter(MetricNames.CACHE_MISSES)
                 return None
 
-            answer, metadata, timestamp = self._cache[key]
+            answer, metadata, timestamp, info = self._cache[key]
             # Ensure metadata exposes cache timestamp for downstream logging
             metadata_timestamp = metadata.get("timestamp")
             if metadata_timestamp is None:
@@ -141,6 +343,7 @@ class QueryCache:
 
             # PERF FIX: O(1) move_to_end() instead of O(n) remove() + append()
             self._cache.move_to_end(key)
+            info["hits"] += 1
             self.hits += 1
             increment_counter(MetricNames.CACHE_HITS)
             logger.debug(f"[cache] HIT question_hash={key[:8]} age={age:.1f}s")
@@ -157,6 +360,7 @@ class QueryCache:
         """
         with self._lock:
             key = self._hash_question(question, params)
+            _sweep_lru_front(self._cache, self._is_expired_or_stale)
 
             # PERF FIX: O(1) eviction using OrderedDict
             # Evict oldest entry if cache full (oldest is first in OrderedDict)
@@ -172,10 +376,17 @@ class QueryCache:
             metadata_copy = copy.deepcopy(metadata) if metadata is not None else {}
             metadata_copy["timestamp"] = timestamp
 
+            info = {
+                "question": question,
+                "params": dict(params) if params else None,
+                "generation": str((params or {}).get("generation", "")),
+                "hits": self._cache[key][3]["hits"] if key in self._cache else 0,
+            }
+
             # PERF FIX: O(1) update - if key exists, move_to_end; otherwise just add
             if key in self._cache:
                 self._cache.move_to_end(key)
-            self._cache[key] = (answer, metadata_copy, timestamp)
+            self._cache[key] = (answer, metadata_copy, timestamp, info)
 
             logger.debug(f"[cache] PUT question_hash={key[:8]}")
             set_gauge(MetricNames.CACHE_SIZE, len(self._cache))
@@ -224,8 +435,8 @@ class QueryCache:
                     "maxsize": self.maxsize,
                     "ttl_seconds": self.ttl_seconds,
                     "entries": [
-                        {"key": key, "answer": answer, "metadata": metadata, "timestamp": timestamp}
-                        for key, (answer, metadata, timestamp) in self._cache.items()
+                        {"key": key, "answer": answer, "metadata": metadata, "timestamp": timestamp, **info}
+                        for key, (answer, metadata, timestamp, info) in self._cache.items()
                     ],
                     "hits": self.hits,
                     "misses": self.misses,
@@ -288,7 +499,13 @@ class QueryCache:
                     if age > self.ttl_seconds:
                         continue
 
-                    self._cache[key] = (answer, metadata, timestamp)
+                    info = {
+                        "question": entry.get("question", ""),
+                        "params": entry.get("params"),
+                        "generation": entry.get("generation", ""),
+                        "hits": int(entry.get("hits", 0)),
+                    }
+                    self._cache[key] = (answer, metadata, timestamp, info)
                     loaded_count += 1
 
                 # Restore stats (reset to avoid inflated numbers from old sessions)
@@ -315,39 +532,566 @@ def get_query_cache():
 
     global _QUERY_CACHE
     if _QUERY_CACHE is None:
-        _QUERY_CACHE = QueryCache(maxsize=config.CACHE_MAXSIZE, ttl_seconds=config.CACHE_TTL)
+        with _QUERY_CACHE_LOCK:
+            if _QUERY_CACHE is None:
+                if getattr(config, "QUERY_CACHE_BACKEND", "memory") == "sqlite":
+                    from .shared_cache import SQLiteAnswerCache
+
+                    _QUERY_CACHE = SQLiteAnswerCache(
+                        config.QUERY_CACHE_PATH,
+                        maxsize=config.CACHE_MAXSIZE,
+                        ttl_seconds=config.CACHE_TTL,
+                        write_queue_size=config.QUERY_CACHE_WRITE_QUEUE,
+                    )
+                else:
+                    _QUERY_CACHE = QueryCache(maxsize=config.CACHE_MAXSIZE, ttl_seconds=config.CACHE_TTL)
     return _QUERY_CACHE
 
 
-def log_query(
+def get_answer_cache():
+    """Get the exact-match answer cache used by answer_once (None when QUERY_CACHE_BACKEND=none).
+
+    Returns a QueryCache (per process) or, with QUERY_CACHE_BACKEND=sqlite, a
+    SQLiteAnswerCache shared by every worker on the host; both expose the same
+    get/put interface.
+    """
+    from . import config
+
+    if getattr(config, "QUERY_CACHE_BACKEND", "memory") == "none":
+        return None
+    return get_query_cache()
+
+
+def close_query_cache() -> None:
+    """Commit pending shared-cache writes and stop its writer thread (API shutdown)."""
+    global _QUERY_CACHE
+    with _QUERY_CACHE_LOCK:
+        cache, _QUERY_CACHE = _QUERY_CACHE, None
+    if cache is not None and hasattr(cache, "close"):
+        cache.close()
+
+
+class RerankCache:
+    """Bounded TTL cache of rerank results keyed by question and candidate set.
+
+    Keys combine the normalized question, the ordered candidate chunk ids, the
+    rerank model and the index generation, so a hit is only possible when the
+    reranker would see exactly the same prompt against the same index. Values
+    store chunk ids (not positional indices) so persisted entries stay valid.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl_seconds: int = 3600):
+        """Initialize rerank cache.
+
+        Args:
+            maxsize: Maximum number of cached rerank results (LRU eviction)
+            ttl_seconds: Time-to-live for cache entries in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._cache: OrderedDict = OrderedDict()  # {key: (order_ids, scores_by_id, timestamp, generation)}
+        self.hits = 0
+        self.misses = 0
+        self._generation: Optional[str] = None  # live index generation, set by retain_generation()
+        self._lock = threading.RLock()
+
+    def _is_expired_or_stale(self, entry: tuple) -> bool:
+        stale = self._generation is not None and entry[3] != self._generation
+        return stale or time.time() - entry[2] > self.ttl_seconds
+
+    def retain_generation(self, generation: str) -> None:
+        """Mark ``generation`` as live; entries of other generations are evicted lazily."""
+        with self._lock:
+            self._generation = generation
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Lowercase and collapse whitespace so trivial variants share a key."""
+        return " ".join(question.lower().split())
+
+    def make_key(self, question: str, candidate_ids: list, model: str, generation: str) -> str:
+        """Build cache key from question, ordered candidate ids, rerank model and index generation."""
+        import json
+
+        payload = json.dumps(
+            [self.normalize_question(question), [str(cid) for cid in candidate_ids], model, generation],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return (order_ids, scores_by_id) on hit, None on miss or expiry."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and self._is_expired_or_stale(entry):
+                del self._cache[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                increment_counter(MetricNames.RERANK_CACHE_MISSES)
+                return None
+
+            self._cache.move_to_end(key)
+            self.hits += 1
+            increment_counter(MetricNames.RERANK_CACHE_HITS)
+            order_ids, scores_by_id = entry[0], entry[1]
+            return list(order_ids), dict(scores_by_id)
+
+    def put(self, key: str, order_ids: list, scores_by_id: dict, generation: str = "") -> None:
+        """Store a successful rerank result (tagged with the index generation it was computed against)."""
+        with self._lock:
+            _sweep_lru_front(self._cache, self._is_expired_or_stale)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            elif len(self._cache) >= self.maxsize:
+                self._cache.popitem(last=False)
+            self._cache[key] = (list(order_ids), dict(scores_by_id), time.time(), generation)
+
+    def clear(self) -> None:
+        """Clear all cache entries."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+    def save(self, path: str) -> None:
+        """Persist unexpired entries to disk (JSON)."""
+        import json
+
+        with self._lock:
+            now = time.time()
+            entries = [
+                {
+                    "key": key,
+                    "order": order,
+                    "scores": [[cid, score] for cid, score in scores.items()],
+                    "ts": ts,
+                    "generation": generation,
+                }
+                for key, (order, scores, ts, generation) in self._cache.items()
+                if now - ts <= self.ttl_seconds
+            ]
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": "1.0", "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            logger.info(f"[rerank-cache] SAVE {len(entries)} entries to {path}")
+        except Exception as e:
+            logger.warning(f"[rerank-cache] Failed to save cache: {e}")
+
+    def load(self, path: str) -> int:
+        """Load unexpired entries from disk. Returns number of entries loaded."""
+        import json
+
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"[rerank-cache] Failed to load cache: {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for entry in data.get("entries", []):
+                if now - entry.get("ts", 0) > self.ttl_seconds:
+                    continue
+                scores = {cid: score for cid, score in entry.get("scores", [])}
+                self._cache[entry["key"]] = (entry.get("order", []), scores, entry["ts"], entry.get("generation", ""))
+                loaded += 1
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        logger.info(f"[rerank-cache] LOAD {loaded} entries from {path}")
+        return loaded
+
+
+def get_rerank_cache() -> Optional[RerankCache]:
+    """Get global rerank cache (None when disabled via RERANK_CACHE_ENABLED=0).
+
+    Loads persisted entries from config.RERANK_CACHE_PATH on first use.
+    """
+    from . import config  # Import here to avoid circular import
+
+    if not getattr(config, "RERANK_CACHE_ENABLED", True):
+        return None
+
+    global _RERANK_CACHE
+    if _RERANK_CACHE is None:
+        with _RERANK_CACHE_LOCK:
+            if _RERANK_CACHE is None:
+                cache = RerankCache(maxsize=config.RERANK_CACHE_MAXSIZE, ttl_seconds=config.RERANK_CACHE_TTL)
+                if config.RERANK_CACHE_PATH:
+                    cache.load(config.RERANK_CACHE_PATH)
+                _RERANK_CACHE = cache
+    return _RERANK_CACHE
+
+
+def save_rerank_cache() -> None:
+    """Persist the global rerank cache if a RERANK_CACHE_PATH is configured."""
+    from . import config
+
+    if _RERANK_CACHE is not None and config.RERANK_CACHE_PATH:
+        _RERANK_CACHE.save(config.RERANK_CACHE_PATH)
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed by query-embedding similarity instead of exact text.
+
+    Paraphrases ("how do I add a project?" / "how can I create a new project")
+    hash differently, so QueryCache misses them. This cache stores the normalized
+    query vector of every cached answer and reuses an answer when a new query is
+    within ``threshold`` cosine similarity *and* its retrieval surfaced the same
+    top articles, which keeps near-identical questions about different features
+    apart. Entries are bound to the index generation and the answer parameters.
+
+    Lookup is an exact inner-product scan over a preallocated matrix: for the few
+    thousand entries an answer cache holds, one mat-vec is cheaper than keeping
+    an ANN structure up to date and never misses the nearest neighbour.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl_seconds: int = 3600, threshold: float = 0.92):
+        """Initialize semantic answer cache.
+
+        Args:
+            maxsize: Maximum number of cached answers (LRU eviction)
+            ttl_seconds: Time-to-live for cache entries in seconds
+            threshold: Minimum cosine similarity between query embeddings for a hit
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._vecs: Optional[np.ndarray] = None  # (maxsize, dim) float32; row i belongs to slot i
+        self._entries: Dict[int, tuple] = {}  # {slot: (articles, params, generation, result, timestamp)}
+        self._lru: OrderedDict = OrderedDict()  # slots, least recently used first
+        self._free: list = []
+        self.hits = 0
+        self.misses = 0
+        self._generation: Optional[str] = None  # live index generation, set by retain_generation()
+        self._lock = threading.RLock()
+
+    def retain_generation(self, generation: str) -> None:
+        """Mark ``generation`` as live; entries of other generations are evicted lazily."""
+        with self._lock:
+            self._generation = generation
+
+    @staticmethod
+    def _normalize(query_vec) -> Optional[np.ndarray]:
+        vec = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        if vec.size == 0 or not math.isfinite(norm) or norm == 0.0:
+            return None
+        return vec / norm
+
+    def _evict(self, slot: int) -> None:
+        self._entries.pop(slot, None)
+        self._lru.pop(slot, None)
+        if self._vecs is not None:
+            self._vecs[slot] = 0.0
+        self._free.append(slot)
+
+    def _candidates(self, qv: np.ndarray):
+        """Yield (slot, similarity, entry) above the threshold, most similar first."""
+        if self._vecs is None or not self._entries or qv.shape[0] != self._vecs.shape[1]:
+            return
+        sims = self._vecs @ qv
+        above = np.flatnonzero(sims >= self.threshold)
+        for slot in above[np.argsort(-sims[above], kind="stable")]:
+            entry = self._entries.get(int(slot))
+            if entry is not None:
+                yield int(slot), float(sims[slot]), entry
+
+    def get(
+        self, query_vec, articles: Iterable[str], generation: str, params: Hashable = None
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (result, similarity) for the closest matching entry, None on miss.
+
+        Expired entries and entries from another index generation are evicted
+        as they are encountered.
+        """
+        qv = self._normalize(query_vec)
+        article_set = frozenset(articles)
+        with self._lock:
+            if qv is not None:
+                now = time.time()
+                for slot, similarity, entry in list(self._candidates(qv)):
+                    entry_articles, entry_params, entry_generation, result, ts = entry
+                    if entry_generation != generation or now - ts > self.ttl_seconds:
+                        self._evict(slot)
+                        continue
+                    if entry_params != params or entry_articles != article_set:
+                        continue
+                    self._lru.move_to_end(slot)
+                    self.hits += 1
+                    increment_counter(MetricNames.SEMANTIC_CACHE_HITS)
+                    return copy.deepcopy(result), similarity
+
+            self.misses += 1
+            increment_counter(MetricNames.SEMANTIC_CACHE_MISSES)
+            return None
+
+    def put(
+        self, query_vec, articles: Iterable[str], generation: str, result: Dict[str, Any], params: Hashable = None
+    ) -> None:
+        """Store an answer; replaces an equivalent entry instead of adding a near-duplicate."""
+        qv = self._normalize(query_vec)
+        if qv is None:
+            return
+        article_set = frozenset(articles)
+        entry = (article_set, params, generation, copy.deepcopy(result), time.time())
+        with self._lock:
+            if self._vecs is None or self._vecs.shape[1] != qv.shape[0]:
+                # First entry, or the embedding model changed: start over at the new dimension
+                self._vecs = np.zeros((self.maxsize, qv.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                self._lru.clear()
+                self._free = list(range(self.maxsize - 1, -1, -1))
+
+            slot = None
+            for candidate, similarity, (entry_articles, entry_params, entry_generation, _, _) in self._candidates(qv):
+                if similarity < 0.999:
+                    break
+                if (entry_articles, entry_params, entry_generation) == (article_set, params, generation):
+                    slot = candidate
+                    break
+            if slot is None:
+                now = time.time()
+                for _ in range(_SWEEP_LIMIT):
+                    oldest = next(iter(self._lru), None)
+                    if oldest is None:
+                        break
+                    _, _, oldest_generation, _, ts = self._entries[oldest]
+                    live = self._generation is None or oldest_generation == self._generation
+                    if live and now - ts <= self.ttl_seconds:
+                        break
+                    self._evict(oldest)
+                if not self._free:
+                    self._evict(next(iter(self._lru)))
+                slot = self._free.pop()
+
+            self._vecs[slot] = qv
+            self._entries[slot] = entry
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def clear(self) -> None:
+        """Clear all cache entries."""
+        with self._lock:
+            self._vecs = None
+            self._entries.clear()
+            self._lru.clear()
+            self._free = []
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+
+def get_semantic_cache() -> Optional[SemanticAnswerCache]:
+    """Get global semantic answer cache (None unless SEMANTIC_CACHE_ENABLED=1)."""
+    from . import config  # Import here to avoid circular import
+
+    if not getattr(config, "SEMANTIC_CACHE_ENABLED", False):
+        return None
+
+    global _SEMANTIC_CACHE
+    if _SEMANTIC_CACHE is None:
+        with _SEMANTIC_CACHE_LOCK:
+            if _SEMANTIC_CACHE is None:
+                _SEMANTIC_CACHE = SemanticAnswerCache(
+                    maxsize=config.SEMANTIC_CACHE_MAXSIZE,
+                    ttl_seconds=config.SEMANTIC_CACHE_TTL,
+                    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                )
+    return _SEMANTIC_CACHE
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings, tagged with the index generation.
+
+    Repeated questions skip the embedding round trip. Entries are bound to the
+    generation because a rebuild may switch the embedding model or dimension.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        """Initialize query embedding cache.
+
+        Args:
+            maxsize: Maximum number of cached query vectors (LRU eviction)
+        """
+        self.maxsize = maxsize
+        self._cache: OrderedDict = OrderedDict()  # {question: (vector, generation)}
+        self.hits = 0
+        self.misses = 0
+        self._generation: Optional[str] = None  # live index generation, set by retain_generation()
+        self._lock = threading.RLock()
+
+    def _is_stale(self, entry: tuple) -> bool:
+        return self._generation is not None and entry[1] != self._generation
+
+    def retain_generation(self, generation: str) -> None:
+        """Mark ``generation`` as live; entries of other generations are evicted lazily."""
+        with self._lock:
+            self._generation = generation
+
+    def get(self, question: str, generation: str) -> Optional[np.ndarray]:
+        """Return a copy of the cached vector, None on miss or generation mismatch."""
+        with self._lock:
+            entry = self._cache.get(question)
+            if entry is not None and (entry[1] != generation or self._is_stale(entry)):
+                del self._cache[question]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                increment_counter(MetricNames.QUERY_EMBEDDING_CACHE_MISSES)
+                return None
+            self._cache.move_to_end(question)
+            self.hits += 1
+            increment_counter(MetricNames.QUERY_EMBEDDING_CACHE_HITS)
+            return entry[0].copy()
+
+    def put(self, question: str, generation: str, vector) -> None:
+        """Store a query vector computed against ``generation``."""
+        vec = np.array(vector, dtype=np.float32)
+        with self._lock:
+            _sweep_lru_front(self._cache, self._is_stale)
+            if question in self._cache:
+                self._cache.move_to_end(question)
+            elif len(self._cache) >= self.maxsize:
+                self._cache.popitem(last=False)
+            self._cache[question] = (vec, generation)
+
+    def clear(self) -> None:
+        """Clear all cache entries."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+
+def get_query_embedding_cache() -> Optional[QueryEmbeddingCache]:
+    """Get global query embedding cache (None when QUERY_EMBEDDING_CACHE_SIZE=0)."""
+    from . import config  # Import here to avoid circular import
+
+    maxsize = getattr(config, "QUERY_EMBEDDING_CACHE_SIZE", 0)
+    if maxsize <= 0:
+        return None
+
+    global _QUERY_EMBEDDING_CACHE
+    if _QUERY_EMBEDDING_CACHE is None:
+        with _QUERY_EMBEDDING_CACHE_LOCK:
+            if _QUERY_EMBEDDING_CACHE is None:
+                _QUERY_EMBEDDING_CACHE = QueryEmbeddingCache(maxsize=maxsize)
+    return _QUERY_EMBEDDING_CACHE
+
+
+# Answer parameters recorded with cached answers that answer_once accepts back when re-warming
+_REWARM_PARAMS = ("top_k", "pack_top", "threshold", "use_rerank", "num_ctx", "num_predict")
+
+
+def retain_index_generation(generation: str) -> None:
+    """Point every live cache at the current index generation (call after an index rebuild).
+
+    Lookups already ignore entries of other generations; this also lets each
+    cache evict them lazily (when touched, or a few per write from the LRU end)
+    instead of holding capacity until their TTL runs out.
+    """
+    for cache in (_QUERY_CACHE, _RERANK_CACHE, _SEMANTIC_CACHE, _QUERY_EMBEDDING_CACHE):
+        if cache is not None and hasattr(cache, "retain_generation"):
+            cache.retain_generation(generation)
+
+
+def hottest_cached_questions(n: int, generation: Optional[str] = None) -> list:
+    """Return up to ``n`` (question, params) pairs with the most answer-cache hits."""
+    if n <= 0 or _QUERY_CACHE is None or not hasattr(_QUERY_CACHE, "hottest"):
+        return []
+    return _QUERY_CACHE.hottest(n, generation)
+
+
+def rewarm_answer_caches(questions: list, chunks, vecs_n, bm, hnsw=None, index_generation: Optional[str] = None) -> int:
+    """Recompute answers for (question, params) pairs so the new index starts with a warm cache.
+
+    ``index_generation`` is that of the index passed in (see answer_once).
+
+    Returns:
+        Number of questions answered (failures are logged and skipped)
+    """
+    from .answer import answer_once  # Import here to avoid circular import
+
+    warmed = 0
+    for question, params in questions:
+        kwargs = {name: params[name] for name in _REWARM_PARAMS if name in (params or {})}
+        try:
+            answer_once(question, chunks, vecs_n, bm, hnsw=hnsw, index_generation=index_generation, **kwargs)
+            warmed += 1
+        except Exception as e:
+            question_hash = hashlib.sha256(question.encode("utf-8")).hexdigest()[:12]
+            logger.warning(f"[cache] Re-warm failed for question_hash={question_hash}: {e}")
+    logger.info(f"[cache] REWARM {warmed}/{len(questions)} hot questions")
+    return warmed
+
+
+def build_query_log_entry(
     query: str,
     answer: str,
     retrieved_chunks: list,
     latency_ms: float,
     refused: bool = False,
     metadata: Optional[dict] = None,
-):
-    """Log query with structured JSON format for monitoring and analytics.
+    correlation_id: Optional[str] = None,
+    timestamp: Optional[float] = None,
+) -> dict:
+    """Build the structured query log entry (normalized scores, redacted chunks, sanitized text).
 
-    Uses rotating file handler to prevent unbounded disk usage.
     FIX (Error #6): Sanitizes user input to prevent log injection attacks.
     """
-    from . import config as _config
-
-    if not getattr(_config, "QUERY_LOG_ENABLED", False):
-        return
-
-    import json
     from .config import (
         LOG_QUERY_ANSWER_PLACEHOLDER,
         LOG_QUERY_INCLUDE_ANSWER,
         LOG_QUERY_INCLUDE_CHUNKS,
-        QUERY_LOG_FILE,
     )
-    from .correlation import get_correlation_id
-    from .logging_config import get_query_logger
     from .utils import sanitize_for_log
 
+    if timestamp is None:
+        timestamp = time.time()
+
     normalized_chunks = []
     for chunk in retrieved_chunks:
         if isinstance(chunk, dict):
@@ -380,8 +1124,6 @@ def log_query(
 
     # FIX: Sanitize metadata to prevent chunk text leaks
     # Deep copy and remove any 'text'/'chunk' fields from nested structures
-    import copy
-
     sanitized_metadata = copy.deepcopy(metadata) if metadata else {}
     if not LOG_QUERY_INCLUDE_CHUNKS and isinstance(sanitized_metadata, dict):
         # Remove chunk text from any nested chunk dicts in metadata
@@ -398,9 +1140,9 @@ def log_query(
 
     # FIX (Error #6): Sanitize query and answer to prevent log injection
     log_entry = {
-        "correlation_id": get_correlation_id() or "-",
-        "timestamp": time.time(),
-        "timestamp_iso": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "correlation_id": correlation_id or "-",
+        "timestamp": timestamp,
+        "timestamp_iso": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp)),
         "query": sanitize_for_log(query, max_length=2000),
         "refused": refused,
         "latency_ms": latency_ms,
@@ -422,19 +1164,121 @@ def log_query(
     elif LOG_QUERY_ANSWER_PLACEHOLDER:
         log_entry["answer"] = LOG_QUERY_ANSWER_PLACEHOLDER
 
+    return log_entry
+
+
+def _render_query_log_record(record: dict) -> str:
+    """Async writer callback: build and encode one entry in the writer thread.
+
+    Deferred fields (zero-argument callables, see log_query) are resolved here.
+    """
+    import json
+
+    fields = {key: value() if callable(value) else value for key, value in record.items()}
+    return json.dumps(build_query_log_entry(**fields), ensure_ascii=False)
+
+
+_QUERY_LOG_WRITER = None
+_QUERY_LOG_WRITER_LOCK = threading.Lock()
+
+
+def get_query_log_writer():
+    """Get the async query log writer for the configured log file (recreated if the path changes)."""
+    global _QUERY_LOG_WRITER
+    from . import config as _config
+    from .query_log import AsyncQueryLogWriter
+
+    path = str(_config.QUERY_LOG_FILE)
+    writer = _QUERY_LOG_WRITER
+    if writer is not None and writer.path == path:
+        return writer
+    with _QUERY_LOG_WRITER_LOCK:
+        if _QUERY_LOG_WRITER is not None and _QUERY_LOG_WRITER.path != path:
+            _QUERY_LOG_WRITER.close()
+            _QUERY_LOG_WRITER = None
+        if _QUERY_LOG_WRITER is None:
+            _QUERY_LOG_WRITER = AsyncQueryLogWriter(
+                path,
+                render=_render_query_log_record,
+                max_bytes=_config.QUERY_LOG_MAX_BYTES,
+                backup_count=_config.QUERY_LOG_BACKUP_COUNT,
+                rotate_seconds=_config.QUERY_LOG_ROTATE_SECONDS,
+                compress=_config.QUERY_LOG_COMPRESS,
+                queue_size=_config.QUERY_LOG_QUEUE_SIZE,
+                batch_size=_config.QUERY_LOG_BATCH_SIZE,
+            )
+        return _QUERY_LOG_WRITER
+
+
+def flush_query_log(timeout: Optional[float] = None) -> bool:
+    """Wait until queued query log entries are on disk. Returns False on timeout."""
+    writer = _QUERY_LOG_WRITER
+    return writer.flush(timeout=timeout) if writer is not None else True
+
+
+def close_query_log() -> None:
+    """Write pending query log entries and stop the writer thread (call on shutdown)."""
+    global _QUERY_LOG_WRITER
+    with _QUERY_LOG_WRITER_LOCK:
+        writer, _QUERY_LOG_WRITER = _QUERY_LOG_WRITER, None
+    if writer is not None:
+        writer.close()
+
+
+def log_query(
+    query: Union[str, Callable[[], str]],
+    answer: str,
+    retrieved_chunks: Union[list, Callable[[], list]],
+    latency_ms: float,
+    refused: bool = False,
+    metadata: Optional[dict] = None,
+):
+    """Log query with structured JSON format for monitoring and analytics.
+
+    With ``QUERY_LOG_ASYNC`` (default) the call only enqueues the raw arguments;
+    the entry is built, encoded and written by a background thread, and dropped
+    (counted in ``query_log_dropped_total``) if the queue is full. Callers must not
+    mutate ``retrieved_chunks``/``metadata`` afterwards. Otherwise the entry is
+    written synchronously through a rotating file handler.
+
+    ``query`` and ``retrieved_chunks`` may be zero-argument callables; they are
+    evaluated when the entry is rendered, so with the async writer their cost
+    (chunk lookups, sanitizing) stays off the caller's thread.
+    """
+    from . import config as _config
+
+    if not getattr(_config, "QUERY_LOG_ENABLED", False):
+        return
+
+    from .correlation import get_correlation_id
+
+    record = {
+        "query": query,
+        "answer": answer,
+        "retrieved_chunks": retrieved_chunks,
+        "latency_ms": latency_ms,
+        "refused": refused,
+        "metadata": metadata,
+        "correlation_id": get_correlation_id(),
+        "timestamp": time.time(),
+    }
+
     try:
+        if _config.QUERY_LOG_ASYNC:
+            get_query_log_writer().submit(record)
+            return
+
+        from .logging_config import flush_query_logger, get_query_logger
+
         # PERF FIX: Use rotating logger to prevent unbounded disk usage
         # Default: 10MB max file size, keeps 5 backups (rag_queries.jsonl.1, .2, etc.)
-        from .logging_config import flush_query_logger
-
         # Reset logger if file path changed (e.g., in tests)
-        # This ensures we get a fresh logger with the correct path
         query_logger = get_query_logger(
-            log_file=QUERY_LOG_FILE,
-            max_bytes=10 * 1024 * 1024,  # 10MB
-            backup_count=5,
+            log_file=_config.QUERY_LOG_FILE,
+            max_bytes=_config.QUERY_LOG_MAX_BYTES,
+            backup_count=_config.QUERY_LOG_BACKUP_COUNT,
         )
-        query_logger.info(json.dumps(log_entry, ensure_ascii=False))
+        query_logger.info(_render_query_log_record(record))
         # Flush immediately to ensure log is written (important for tests)
         flush_query_logger()
     except Exception as e:
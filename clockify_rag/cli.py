@@ -14,7 +14,7 @@ import numpy as np
 from typing import Tuple, List
 
 from . import config
-from .indexing import build, load_index
+from .indexing import build, generation_from_meta, load_index
 from .utils import _log_config_summary, validate_and_set_config, validate_chunk_config, check_pytorch_mps
 from .answer import answer_once, answer_to_json
 from .caching import get_query_cache, log_query, get_rate_limiter as _get_rate_limiter
@@ -60,12 +60,28 @@ def _extract_source_urls(chunks: list, result: dict) -> list[str]:
     return sorted(urls)
 
 
+class LoadedIndex(tuple):
+    """``(chunks, vecs_n, bm, hnsw)`` that also carries the generation of the loaded index.
+
+    Answer caches must be tagged with the generation of the artifacts actually in memory,
+    not whatever index.meta.json says now (a rebuild may have replaced it since).
+    """
+
+    generation: str
+
+    def __new__(cls, items, generation: str = ""):
+        loaded = super().__new__(cls, items)
+        loaded.generation = generation
+        return loaded
+
+
 def ensure_index_ready(retries=0) -> Tuple:
     """Ensure retrieval artifacts are present and return loaded index components.
 
     Returns:
         Tuple of (chunks, vecs_n, bm, hnsw) for backward compatibility with CLI code.
-        The library's load_index() returns a dict, which we unpack here.
+        The library's load_index() returns a dict, which we unpack here; the tuple is a
+        LoadedIndex whose ``generation`` is that of the metadata loaded with it.
     """
     from .error_handlers import log_and_raise
     from .exceptions import IndexLoadError
@@ -139,6 +155,7 @@ def ensure_index_ready(retries=0) -> Tuple:
         vecs_n = result["vecs_n"]
         bm = result["bm"]
         hnsw = result.get("faiss_index")  # Note: was "hnsw" in old code, but library returns "faiss_index"
+        return LoadedIndex((chunks, vecs_n, bm, hnsw), generation_from_meta(result.get("meta") or {}))
     elif isinstance(result, tuple):
         # Test mocks return a tuple (chunks, vecs_n, bm, hnsw)
         chunks, vecs_n, bm, hnsw = result
@@ -213,7 +230,7 @@ def chat_repl(
     # Rank 22: Persist query cache across REPL sessions
     query_cache = get_query_cache()
     query_cache.load()  # Load previous session's cache
-    logger.info(f"Query cache loaded: {len(query_cache.cache)} entries")
+    logger.info(f"Query cache loaded: {query_cache.stats()['size']} entries")
 
     # OPTIMIZATION (Analysis Section 9.1 #3): Load precomputed FAQ cache
     faq_cache = None
@@ -332,7 +349,7 @@ def chat_repl(
 
     # Save cache on exit
     query_cache.save()
-    logger.info(f"Query cache saved: {len(query_cache.cache)} entries")
+    logger.info(f"Query cache saved: {query_cache.stats()['size']} entries")
 
 
 def warmup_on_startup():
@@ -655,6 +655,117 @@ def eval(
         raise typer.Exit(1)
 
 
+# ============================================================================
+# Analyze-Log Command: Workload Analytics
+# ============================================================================
+
+
+def _latency_row(name: str, summary: dict) -> list:
+    cells = [summary.get(k) for k in ("count", "p50", "p95", "p99", "max")]
+    return [name] + ["—" if v is None else (f"{v:,}" if isinstance(v, int) else f"{v:.1f}") for v in cells]
+
+
+@app.command("analyze-log")
+def analyze_log(
+    log_file: str = typer.Argument(config.QUERY_LOG_FILE, help="Query log (rotated/.gz segments are read too)"),
+    top: int = typer.Option(20, "--top", "-n", help="Rows in each top list"),
+    chunks_file: str = typer.Option(
+        config.FILES["chunks"], "--chunks", help="chunks.jsonl of the current index (for never-retrieved chunks)"
+    ),
+    capacity: int = typer.Option(
+        10000, "--capacity", help="Distinct questions kept when pruning counts (memory bound)"
+    ),
+    json_output: bool = typer.Option(False, "--json", help="Print the full report as JSON"),
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="Also write the JSON report to this file"),
+    faq_out: Optional[str] = typer.Option(
+        None, "--faq-out", help="Write hot questions as an FAQ list for scripts/build_faq_cache.py"
+    ),
+    faq_min_count: int = typer.Option(2, "--faq-min-count", help="Minimum asks for a question to enter --faq-out"),
+) -> None:
+    """Analyze the structured query log to tune caches and the FAQ list.
+
+    Streams every log segment once with bounded memory and reports hot questions,
+    cache-hit potential, latency percentiles by stage and intent, refusal rates,
+    and the most- and never-retrieved chunks.
+
+    Example:
+        ragctl analyze-log rag_queries.jsonl --top 50 --faq-out config/hot_faqs.txt
+    """
+    from .log_analysis import analyze_query_log, suggested_faq_questions
+    from .query_log import query_log_segments
+
+    if not query_log_segments(log_file):
+        console.print(f"❌ Query log not found: {log_file} (enable with RAG_LOG_ENABLED=1)")
+        raise typer.Exit(1)
+
+    report = analyze_query_log(log_file, chunks_path=chunks_file, top_n=top, question_capacity=capacity)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if faq_out:
+        questions = suggested_faq_questions(report, min_count=faq_min_count)
+        with open(faq_out, "w", encoding="utf-8") as f:
+            f.write(f"# Hot questions from {log_file} (asked at least {faq_min_count} times)\n")
+            f.writelines(q + "\n" for q in questions)
+    if json_output:
+        typer.echo(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    total = report["queries"]
+    console.print(Panel(f"📈 Query log analysis: {total:,} queries from {log_file}", style="bold blue"))
+    console.print(
+        f"Distinct questions: ~{report['distinct_questions']:,}   "
+        f"Cache-hit potential: {report['cache_hit_potential']:.1%}   "
+        f"Refusal rate: {report['refusal_rate']:.1%}"
+    )
+    coverage = ", ".join(f"top {n}: {share:.1%}" for n, share in report["top_question_coverage"].items())
+    if coverage:
+        console.print(f"Queries covered by caching the hottest questions — {coverage}")
+    observed = ", ".join(f"{name}: {row['rate']:.1%}" for name, row in report["observed_cache_hits"].items())
+    if observed:
+        console.print(f"Observed cache hits — {observed}")
+    console.print()
+
+    hot_table = Table(title="🔥 Hot Questions")
+    hot_table.add_column("Count", justify="right", style="cyan")
+    hot_table.add_column("Refused", justify="right")
+    hot_table.add_column("Question")
+    for row in report["hot_questions"]:
+        hot_table.add_row(f"{row['count']:,}", str(row["refused"]), row["question"])
+    console.print(hot_table)
+
+    latency_table = Table(title="⏱️ Latency by Stage (ms)")
+    for column in ("Stage", "Count", "p50", "p95", "p99", "Max"):
+        latency_table.add_column(column, justify="left" if column == "Stage" else "right")
+    for stage, summary in report["latency_ms"].items():
+        latency_table.add_row(*_latency_row(stage, summary))
+    console.print(latency_table)
+
+    intent_table = Table(title="🎯 Intents")
+    for column in ("Intent", "Queries", "Refused", "p50 ms", "p95 ms", "p99 ms"):
+        intent_table.add_column(column, justify="left" if column == "Intent" else "right")
+    for intent, row in report["intents"].items():
+        lat = _latency_row(intent, row["latency_ms"])
+        intent_table.add_row(intent, f"{row['queries']:,}", f"{row['refusal_rate']:.1%}", *lat[2:5])
+    console.print(intent_table)
+
+    chunk_table = Table(title="📚 Most Retrieved Chunks")
+    chunk_table.add_column("Count", justify="right", style="cyan")
+    chunk_table.add_column("Chunk")
+    for row in report["most_retrieved_chunks"]:
+        chunk_table.add_row(f"{row['count']:,}", str(row["id"]))
+    console.print(chunk_table)
+    if "chunks" in report:
+        chunks_info = report["chunks"]
+        console.print(
+            f"Never retrieved: {chunks_info['never_retrieved_count']:,} of {chunks_info['total']:,} chunks "
+            "(full list in --json/--output)"
+        )
+    if faq_out:
+        console.print(f"✅ Wrote {len(questions)} FAQ questions to {faq_out}")
+
+
 # ============================================================================
 # Entry Point
 # ============================================================================
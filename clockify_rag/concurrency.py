@@ -0,0 +1,344 @@
+"""Adaptive concurrency limiting for LLM calls.
+
+Bounds how many ``chat_completion`` calls are in flight against Ollama. Without
+a bound, a traffic spike sends every executor thread to the LLM, Ollama queues
+internally, latency grows for *all* requests until timeouts trip the circuit
+breaker, and goodput collapses. Here excess requests wait in a bounded FIFO
+queue in front of the LLM instead, and requests that cannot be served before
+their deadline are shed immediately (fast 503 + Retry-After) rather than
+occupying a slot only to time out.
+
+The limit adapts with AIMD (additive increase, multiplicative decrease):
+
+* every call completing within ``latency_tolerance`` x the no-load baseline
+  latency raises the limit by ``1/limit`` (about +1 per round trip at full load);
+* a slow call, timeout or connection error cuts it by ``backoff_ratio``, at most
+  once per average call latency so one burst of slow replies is a single signal.
+
+The baseline is a slowly-drifting minimum of observed latencies, so it tracks
+model or hardware changes without being dragged up by queueing delay. Calls of
+very different cost must not share it (a 0.4 s rerank would make every
+multi-second answer look congested), so:
+
+* each ``call_class`` (e.g. model + ``num_predict``) keeps its own baseline;
+* when the caller reports the ``work`` done (generated tokens), the sample is
+  latency per unit of work, so long and short answers compare fairly;
+* a slow reply only counts as congestion if other calls were in flight with it.
+  A call that ran alone cannot have been slowed by this limiter's concurrency.
+
+Usage:
+    limiter = get_llm_limiter()
+    with limiter.slot(deadline=time.monotonic() + 30):
+        call_llm()
+"""
+
+import collections
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+from . import config
+from .deadline import get_deadline
+from .exceptions import LLMOverloadedError
+from .metrics import MetricNames, get_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AdaptiveConcurrencyLimiter:
+    """Thread-safe AIMD concurrency limiter with a bounded, deadline-aware wait queue.
+
+    Attributes:
+        name: Identifier used in logs and metric labels
+        limit: Current (fractional) concurrency limit; ``int(limit)`` slots are usable
+        min_limit: Lower bound for the limit
+        max_limit: Upper bound for the limit
+        max_queue: Maximum number of callers waiting for a slot
+    """
+
+    def __init__(
+        self,
+        name: str = "llm",
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        max_queue: int = 64,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.9,
+        baseline_drift: float = 0.01,
+    ):
+        self.name = name
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.max_queue = max(0, int(max_queue))
+        self.latency_tolerance = max(1.0, float(latency_tolerance))
+        self.backoff_ratio = min(0.99, max(0.1, float(backoff_ratio)))
+        self.baseline_drift = max(0.0, float(baseline_drift))
+
+        self._inflight = 0
+        self._waiters: Deque[int] = collections.deque()
+        self._tickets = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._baselines: Dict[str, float] = {}  # per call class: no-load latency (per unit of work)
+        self._avg_latency: Optional[float] = None  # seconds, EWMA of all samples
+        self._last_decrease = 0.0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "deadline": 0}
+
+    # ------------------------------------------------------------------ admission
+
+    def _has_capacity(self) -> bool:
+        return self._inflight < int(self.limit)
+
+    def estimated_wait(self, position: Optional[int] = None) -> float:
+        """Seconds a new caller at ``position`` in the queue would likely wait."""
+        with self._cond:
+            return self._estimated_wait_locked(len(self._waiters) if position is None else position)
+
+    def _estimated_wait_locked(self, position: int) -> float:
+        if self._has_capacity() and position == 0:
+            return 0.0
+        latency = self._avg_latency if self._avg_latency is not None else 0.0
+        # Slots free up at roughly limit/latency per second; we need position+1 of them
+        return (position + 1) * latency / max(1, int(self.limit))
+
+    def _reject(self, reason: str, retry_after: float) -> LLMOverloadedError:
+        self.shed[reason] += 1
+        metrics = get_metrics()
+        metrics.increment_counter(MetricNames.LLM_SHED_TOTAL, labels={"limiter": self.name, "reason": reason})
+        self._publish_locked()
+        logger.warning(
+            "concurrency_limiter: name=%s shed reason=%s inflight=%d limit=%.1f queued=%d",
+            self.name,
+            reason,
+            self._inflight,
+            self.limit,
+            len(self._waiters),
+        )
+        return LLMOverloadedError(f"LLM overloaded ({reason}); retry after {retry_after:.1f}s", retry_after)
+
+    def acquire(self, deadline: Optional[float] = None) -> float:
+        """Wait for a slot and return the time spent queued (seconds).
+
+        Args:
+            deadline: Absolute ``time.monotonic()`` by which the caller needs its
+                answer; callers that cannot get a slot in time are shed.
+
+        Raises:
+            LLMOverloadedError: Queue full, or the estimated/actual wait exceeds the deadline
+        """
+        start = time.monotonic()
+        with self._cond:
+            if not self._waiters and self._has_capacity():
+                self._inflight += 1
+                self.admitted += 1
+                self._publish_locked()
+                return 0.0
+
+            position = len(self._waiters)
+            estimate = self._estimated_wait_locked(position)
+            retry_after = max(estimate, self._avg_latency or 1.0)
+            if position >= self.max_queue:
+                raise self._reject("queue_full", retry_after)
+            if deadline is not None and start + estimate >= deadline:
+                raise self._reject("deadline", retry_after)
+
+            ticket = next(self._tickets)
+            self._waiters.append(ticket)
+            self._publish_locked()
+            try:
+                # FIFO: only the head of the queue may take a freed slot
+                while not (self._waiters[0] == ticket and self._has_capacity()):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise self._reject("deadline", retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                # A different waiter may now be at the head
+                self._cond.notify_all()
+            self._inflight += 1
+            self.admitted += 1
+            self._publish_locked()
+
+        waited = time.monotonic() - start
+        get_metrics().observe_histogram(MetricNames.LLM_QUEUE_WAIT, waited * 1000, labels={"limiter": self.name})
+        return waited
+
+    def release(
+        self,
+        latency: Optional[float] = None,
+        overloaded: bool = False,
+        call_class: str = "default",
+        work: Optional[float] = None,
+    ) -> None:
+        """Free a slot and feed the outcome into the AIMD controller.
+
+        Args:
+            latency: Seconds the call took (None when it failed for unrelated reasons)
+            overloaded: True for timeouts/connection errors/429/503 from the LLM
+            call_class: Calls with comparable cost (own latency baseline)
+            work: Units of work the call did (e.g. generated tokens), to normalize latency
+        """
+        with self._cond:
+            contended = self._inflight > 1
+            self._inflight = max(0, self._inflight - 1)
+            self._update_limit_locked(latency, overloaded, call_class, work, contended)
+            self._publish_locked()
+            self._cond.notify_all()
+
+    def _update_limit_locked(
+        self,
+        latency: Optional[float],
+        overloaded: bool,
+        call_class: str = "default",
+        work: Optional[float] = None,
+        contended: bool = True,
+    ) -> None:
+        now = time.monotonic()
+        round_trip = self._avg_latency or 0.0
+        slow = False
+        if latency is not None and latency > 0:
+            self._avg_latency = latency if self._avg_latency is None else 0.8 * self._avg_latency + 0.2 * latency
+            sample = latency / work if work and work > 0 else latency
+            baseline = self._baselines.get(call_class)
+            slow = baseline is not None and sample > self.latency_tolerance * baseline
+            self._baselines[call_class] = (
+                sample if baseline is None else min(sample, baseline * (1.0 + self.baseline_drift))
+            )
+
+        if overloaded or (slow and contended):
+            # One multiplicative decrease per round trip, however many slow replies arrive together
+            if now - self._last_decrease >= round_trip:
+                self._last_decrease = now
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+        elif latency is not None and not slow:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    @contextmanager
+    def slot(self, deadline: Optional[float] = None, call_class: str = "default") -> Iterator["_SlotOutcome"]:
+        """Hold a slot for the body; timing is recorded on release.
+
+        Mark ``outcome.overloaded = True`` inside the body to signal an overload failure,
+        and set ``outcome.work`` to normalize the latency sample.
+        Exceptions that are not overload signals release the slot without a latency sample.
+        """
+        self.acquire(deadline)
+        outcome = _SlotOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except BaseException:
+            self.release(None, overloaded=outcome.overloaded, call_class=call_class)
+            raise
+        self.release(time.monotonic() - start, overloaded=outcome.overloaded, call_class=call_class, work=outcome.work)
+
+    # ------------------------------------------------------------------ stats
+
+    def _publish_locked(self) -> None:
+        metrics = get_metrics()
+        labels = {"limiter": self.name}
+        metrics.set_gauge(MetricNames.LLM_INFLIGHT, float(self._inflight), labels)
+        metrics.set_gauge(MetricNames.LLM_QUEUE_DEPTH, float(len(self._waiters)), labels)
+        metrics.set_gauge(MetricNames.LLM_CONCURRENCY_LIMIT, round(self.limit, 3), labels)
+
+    def get_stats(self) -> Dict:
+        """Current limiter statistics."""
+        with self._cond:
+            total = self.admitted + sum(self.shed.values())
+            return {
+                "name": self.name,
+                "limit": round(self.limit, 3),
+                "inflight": self._inflight,
+                "queued": len(self._waiters),
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "shed_rate": (sum(self.shed.values()) / total) if total else 0.0,
+                "baselines_ms": {name: value * 1000 for name, value in self._baselines.items()},
+                "avg_latency_ms": None if self._avg_latency is None else self._avg_latency * 1000,
+            }
+
+
+class _SlotOutcome:
+    """Mutable outcome the ``slot()`` body uses to report overload failures and work done."""
+
+    __slots__ = ("overloaded", "work")
+
+    def __init__(self) -> None:
+        self.overloaded = False
+        self.work: Optional[float] = None
+
+
+_LLM_LIMITER: Optional[AdaptiveConcurrencyLimiter] = None
+_LLM_LIMITER_LOCK = threading.Lock()
+
+
+def get_llm_limiter() -> Optional[AdaptiveConcurrencyLimiter]:
+    """Process-wide limiter for LLM chat calls (None when disabled)."""
+    global _LLM_LIMITER
+    if not config.LLM_CONCURRENCY_ENABLED:
+        return None
+    if _LLM_LIMITER is None:
+        with _LLM_LIMITER_LOCK:
+            if _LLM_LIMITER is None:
+                _LLM_LIMITER = AdaptiveConcurrencyLimiter(
+                    name="llm",
+                    initial_limit=config.LLM_CONCURRENCY_INITIAL,
+                    min_limit=config.LLM_CONCURRENCY_MIN,
+                    max_limit=config.LLM_CONCURRENCY_MAX,
+                    max_queue=config.LLM_QUEUE_MAX,
+                    latency_tolerance=config.LLM_LATENCY_TOLERANCE,
+                    backoff_ratio=config.LLM_BACKOFF_RATIO,
+                )
+    return _LLM_LIMITER
+
+
+def reset_llm_limiter() -> None:
+    """Drop the process-wide limiter (next call rebuilds it from config)."""
+    global _LLM_LIMITER
+    with _LLM_LIMITER_LOCK:
+        _LLM_LIMITER = None
+
+
+def default_llm_deadline() -> float:
+    """Queueing deadline: the request deadline, capped at ``LLM_QUEUE_TIMEOUT`` from now."""
+    queue_deadline = time.monotonic() + config.LLM_QUEUE_TIMEOUT
+    request_deadline = get_deadline()
+    return queue_deadline if request_deadline is None else min(queue_deadline, request_deadline)
+
+
+def retry_on_overload(call: Callable[[], T], attempts: int = 5, max_wait: float = 30.0) -> T:
+    """Run ``call``, sleeping ``retry_after`` and retrying while the LLM limiter sheds it.
+
+    For batch jobs (FAQ precompute, answer evaluation) that should wait for capacity
+    instead of dropping the item; interactive requests surface the 503 instead.
+
+    Raises:
+        LLMOverloadedError: Still shed after ``attempts`` tries
+    """
+    attempt = 1
+    while True:
+        try:
+            return call()
+        except LLMOverloadedError as exc:
+            if attempt >= attempts:
+                raise
+            wait = min(max_wait, max(0.1, exc.retry_after))
+            logger.info("LLM overloaded, retrying in %.1fs (attempt %d/%d)", wait, attempt, attempts)
+            time.sleep(wait)
+            attempt += 1
+
+
+__all__ = [
+    "AdaptiveConcurrencyLimiter",
+    "retry_on_overload",
+    "get_llm_limiter",
+    "reset_llm_limiter",
+    "default_llm_deadline",
+]
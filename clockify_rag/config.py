@@ -424,6 +424,14 @@ MMR_LAMBDA = _parse_env_float("MMR_LAMBDA", 0.75, min_val=0.0, max_val=1.0)  # W
 # FIX (Error #13): Use safe env var parsing
 CTX_TOKEN_BUDGET = _parse_env_int("CTX_BUDGET", 12000, min_val=100, max_val=100000)  # Was 6000, now 12000
 
+# ====== TOKENIZER CONFIG ======
+# Optional path to the chat model's tokenizer.json (HuggingFace `tokenizers` format).
+# When set and loadable, token counting is exact for RAG_CHAT_MODEL instead of the
+# chars-per-token heuristic. Loaded from local disk only (no network).
+TOKENIZER_PATH = _get_env_value("RAG_TOKENIZER_PATH", "") or ""
+# Max cached per-chunk token counts (0 disables the cache)
+TOKEN_COUNT_CACHE_SIZE = _parse_env_int("RAG_TOKEN_COUNT_CACHE_SIZE", 50000, min_val=0, max_val=10000000)
+
 # ====== EMBEDDINGS BACKEND (v4.1) ======
 EMB_BACKEND = (_get_env_value("EMB_BACKEND", "ollama") or "ollama").lower()  # "local" or "ollama"
 
@@ -500,6 +508,32 @@ ALLOWED_ORIGINS = [
     origin.strip() for origin in (_get_env_value("ALLOWED_ORIGINS", "") or "").split(",") if origin.strip()
 ]
 
+# ====== LLM CONCURRENCY LIMIT ======
+# Adaptive (AIMD) cap on concurrent chat calls to Ollama with a bounded FIFO wait queue;
+# callers that cannot get a slot before their deadline are shed with HTTP 503 + Retry-After
+LLM_CONCURRENCY_ENABLED = _get_bool_env("RAG_LLM_CONCURRENCY_ENABLED", "1")
+LLM_CONCURRENCY_INITIAL = _parse_env_int("RAG_LLM_CONCURRENCY_INITIAL", 4, min_val=1, max_val=1024)
+LLM_CONCURRENCY_MIN = _parse_env_int("RAG_LLM_CONCURRENCY_MIN", 1, min_val=1, max_val=1024)
+LLM_CONCURRENCY_MAX = _parse_env_int("RAG_LLM_CONCURRENCY_MAX", 32, min_val=1, max_val=1024)
+LLM_QUEUE_MAX = _parse_env_int("RAG_LLM_QUEUE_MAX", 64, min_val=0, max_val=100000)
+# Longest a call may wait for a slot when the caller has no tighter deadline
+LLM_QUEUE_TIMEOUT = _parse_env_float("RAG_LLM_QUEUE_TIMEOUT", 30.0, min_val=0.0, max_val=3600.0)
+# Latency above tolerance x no-load baseline counts as congestion; limit shrinks by the backoff ratio
+LLM_LATENCY_TOLERANCE = _parse_env_float("RAG_LLM_LATENCY_TOLERANCE", 2.0, min_val=1.0, max_val=100.0)
+LLM_BACKOFF_RATIO = _parse_env_float("RAG_LLM_BACKOFF_RATIO", 0.9, min_val=0.1, max_val=0.99)
+
+# ====== REQUEST DEADLINES ======
+# End-to-end budget for /v1/query (overridable per request via the timeout_ms field or header);
+# per-call HTTP timeouts are clamped to what is left. 0 disables the default deadline.
+REQUEST_TIMEOUT_MS = _parse_env_int("RAG_REQUEST_TIMEOUT_MS", 60000, min_val=0, max_val=3600000)
+REQUEST_TIMEOUT_MAX_MS = _parse_env_int("RAG_REQUEST_TIMEOUT_MAX_MS", 300000, min_val=100, max_val=3600000)
+REQUEST_TIMEOUT_HEADER = (
+    _get_env_value("RAG_REQUEST_TIMEOUT_HEADER", "x-request-timeout-ms") or "x-request-timeout-ms"
+).lower()
+# Seconds kept back for answer generation: optional stages (query expansion, rerank) are skipped
+# when less than this remains, and rerank calls may only use the budget above it
+DEADLINE_GENERATION_RESERVE = _parse_env_float("RAG_DEADLINE_GENERATION_RESERVE", 15.0, min_val=0.0, max_val=600.0)
+
 # ====== EMBEDDING BATCHING CONFIG (Rank 10) ======
 # Parallel embedding generation for faster KB builds (3-5x speedup)
 # FIX (Error #13): Use safe env var parsing
@@ -521,22 +555,104 @@ LOG_QUERY_ANSWER_PLACEHOLDER = _get_env_value("RAG_LOG_ANSWER_PLACEHOLDER", "[RE
 LOG_QUERY_INCLUDE_CHUNKS = _get_bool_env(
     "RAG_LOG_INCLUDE_CHUNKS", "0"
 )  # Redact chunk text by default for security/privacy
+# Async writer: the query path only enqueues; a background thread renders and writes batches
+QUERY_LOG_ASYNC = _get_bool_env("RAG_LOG_ASYNC", "1")
+QUERY_LOG_QUEUE_SIZE = _parse_env_int("RAG_LOG_QUEUE_SIZE", 10000, min_val=1, max_val=1000000)  # Then drop
+QUERY_LOG_BATCH_SIZE = _parse_env_int("RAG_LOG_BATCH_SIZE", 256, min_val=1, max_val=10000)
+QUERY_LOG_MAX_BYTES = _parse_env_int("RAG_LOG_MAX_BYTES", 10 * 1024 * 1024, min_val=0, max_val=10 * 1024**3)
+QUERY_LOG_BACKUP_COUNT = _parse_env_int("RAG_LOG_BACKUP_COUNT", 5, min_val=0, max_val=1000)
+QUERY_LOG_ROTATE_SECONDS = _parse_env_int("RAG_LOG_ROTATE_SECONDS", 0, min_val=0, max_val=30 * 86400)  # 0 = size only
+QUERY_LOG_COMPRESS = _get_bool_env("RAG_LOG_COMPRESS", "0")  # Gzip rotated segments (async writer only)
 
 # Citation validation configuration
 STRICT_CITATIONS = _get_bool_env(
     "RAG_STRICT_CITATIONS", "0"
 )  # Refuse answers without citations (improves trust in regulated environments)
 
+# In-process metrics: per-thread shards keep the collector lock off the hot path
+METRICS_SHARDED = _get_bool_env("RAG_METRICS_SHARDED", "1")
+
+# Multi-worker metrics: each process flushes to this directory and exporters merge
+# the files (clear it before starting a new fleet, like prometheus_client)
+METRICS_MULTIPROC_DIR = _get_env_value("RAG_METRICS_MULTIPROC_DIR", "") or ""
+METRICS_FLUSH_INTERVAL = _parse_env_float("RAG_METRICS_FLUSH_INTERVAL", 5.0, min_val=0.1, max_val=3600.0)
+
+# ====== TRACING CONFIG ======
+# Per-request span traces (see clockify_rag/tracing.py)
+TRACE_ENABLED = _get_bool_env("RAG_TRACE_ENABLED", "1")
+TRACE_RING_SIZE = _parse_env_int("RAG_TRACE_RING_SIZE", 256, min_val=1, max_val=100000)
+TRACE_EXPORT_PATH = _get_env_value("RAG_TRACE_EXPORT_PATH", "") or ""  # OTLP/JSON lines
+TRACE_DEBUG_HEADER = (_get_env_value("RAG_TRACE_DEBUG_HEADER", "x-debug-trace") or "x-debug-trace").lower()
+
+# ====== PROFILING CONFIG ======
+# On-demand sampling profiler (/v1/admin/profile, see clockify_rag/profiling.py)
+PROFILE_MAX_SECONDS = _parse_env_float("RAG_PROFILE_MAX_SECONDS", 30.0, min_val=0.1, max_val=600.0)
+PROFILE_INTERVAL_MS = _parse_env_float("RAG_PROFILE_INTERVAL_MS", 10.0, min_val=1.0, max_val=1000.0)
+# Continuous low-rate sampling feeding the profile_hot_function_ratio gauge
+PROFILE_CONTINUOUS = _get_bool_env("RAG_PROFILE_CONTINUOUS", "0")
+PROFILE_CONTINUOUS_INTERVAL_MS = _parse_env_float(
+    "RAG_PROFILE_CONTINUOUS_INTERVAL_MS", 100.0, min_val=5.0, max_val=10000.0
+)
+PROFILE_PUBLISH_INTERVAL = _parse_env_float("RAG_PROFILE_PUBLISH_INTERVAL", 30.0, min_val=1.0, max_val=3600.0)
+PROFILE_TOP_N = _parse_env_int("RAG_PROFILE_TOP_N", 20, min_val=1, max_val=500)
+
 # ====== CACHING & RATE LIMITING CONFIG ======
 # Query cache size
-CACHE_MAXSIZE = _parse_env_int("CACHE_MAXSIZE", 100, min_val=1, max_val=10000)
-# Cache TTL in seconds
-CACHE_TTL = _parse_env_int("CACHE_TTL", 3600, min_val=60, max_val=86400)
+CACHE_MAXSIZE = _parse_env_int("CACHE_MAXSIZE", 100, min_val=1, max_val=100000)
+# Cache TTL in seconds (entries are bound to the index generation, so long TTLs never serve a stale index)
+CACHE_TTL = _parse_env_int("CACHE_TTL", 3600, min_val=60, max_val=604800)
+# Answer cache backend: memory (per process), sqlite (one file shared by every worker on the host), none
+QUERY_CACHE_BACKEND = (_get_env_value("QUERY_CACHE_BACKEND", "memory") or "memory").strip().lower()
+if QUERY_CACHE_BACKEND not in ("memory", "sqlite", "none"):
+    _logger.warning("Invalid QUERY_CACHE_BACKEND=%r, falling back to 'memory'", QUERY_CACHE_BACKEND)
+    QUERY_CACHE_BACKEND = "memory"
+# SQLite database for QUERY_CACHE_BACKEND=sqlite (must be on a local disk: WAL needs shared memory)
+QUERY_CACHE_PATH = _get_env_value("QUERY_CACHE_PATH", "query_cache.sqlite") or "query_cache.sqlite"
+# Pending shared-cache writes before new ones are dropped (writes never block requests)
+QUERY_CACHE_WRITE_QUEUE = _parse_env_int("QUERY_CACHE_WRITE_QUEUE", 1000, min_val=1, max_val=100000)
 # Rate limiting: max requests per window
 RATE_LIMIT_ENABLED = _get_bool_env("RATE_LIMIT_ENABLED", "0")
 RATE_LIMIT_REQUESTS = _parse_env_int("RATE_LIMIT_REQUESTS", 10, min_val=1, max_val=1000)
 # Rate limiting window in seconds
 RATE_LIMIT_WINDOW = _parse_env_int("RATE_LIMIT_WINDOW", 60, min_val=1, max_val=3600)
+# token_bucket (per API key / client IP) or sliding_window (legacy single global window)
+RATE_LIMIT_BACKEND = (_get_env_value("RATE_LIMIT_BACKEND", "token_bucket") or "token_bucket").strip().lower()
+if RATE_LIMIT_BACKEND not in ("token_bucket", "sliding_window"):
+    _logger.warning("Invalid RATE_LIMIT_BACKEND=%r, falling back to 'token_bucket'", RATE_LIMIT_BACKEND)
+    RATE_LIMIT_BACKEND = "token_bucket"
+# Bucket key: api_key, ip, or api_key_ip (requests without an API key fall back to the client IP)
+RATE_LIMIT_KEY_BY = (_get_env_value("RATE_LIMIT_KEY_BY", "api_key") or "api_key").strip().lower()
+if RATE_LIMIT_KEY_BY not in ("api_key", "ip", "api_key_ip"):
+    _logger.warning("Invalid RATE_LIMIT_KEY_BY=%r, falling back to 'api_key'", RATE_LIMIT_KEY_BY)
+    RATE_LIMIT_KEY_BY = "api_key"
+# Burst capacity per key (0 = RATE_LIMIT_REQUESTS)
+RATE_LIMIT_BURST = _parse_env_int("RATE_LIMIT_BURST", 0, min_val=0, max_val=10000)
+# Per-key overrides: "key=requests[:burst],..." (requests per RATE_LIMIT_WINDOW)
+RATE_LIMIT_QUOTAS = _get_env_value("RATE_LIMIT_QUOTAS", "") or ""
+# Idle buckets are evicted after this many seconds; tracked keys are capped at RATE_LIMIT_MAX_KEYS
+RATE_LIMIT_IDLE_TTL = _parse_env_int("RATE_LIMIT_IDLE_TTL", 600, min_val=1, max_val=86400)
+RATE_LIMIT_MAX_KEYS = _parse_env_int("RATE_LIMIT_MAX_KEYS", 10000, min_val=1, max_val=10000000)
+# Rerank result cache (LLM rerank output keyed by question + candidate ids + model + index generation)
+RERANK_CACHE_ENABLED = _get_bool_env("RERANK_CACHE_ENABLED", "1")
+RERANK_CACHE_MAXSIZE = _parse_env_int("RERANK_CACHE_MAXSIZE", 1000, min_val=1, max_val=100000)
+RERANK_CACHE_TTL = _parse_env_int("RERANK_CACHE_TTL", 3600, min_val=60, max_val=604800)
+# Optional JSON file to persist the rerank cache across restarts (empty = memory only)
+RERANK_CACHE_PATH = _get_env_value("RERANK_CACHE_PATH", "") or ""
+
+# ====== SEMANTIC ANSWER CACHE ======
+# Reuse an answer for paraphrased questions: query embeddings within SEMANTIC_CACHE_THRESHOLD cosine
+# similarity whose retrieval returns the same top SEMANTIC_CACHE_TOP_ARTICLES articles (same index generation)
+SEMANTIC_CACHE_ENABLED = _get_bool_env("SEMANTIC_CACHE_ENABLED", "0")
+SEMANTIC_CACHE_THRESHOLD = _parse_env_float("SEMANTIC_CACHE_THRESHOLD", 0.92, min_val=0.5, max_val=1.0)
+SEMANTIC_CACHE_TOP_ARTICLES = _parse_env_int("SEMANTIC_CACHE_TOP_ARTICLES", 3, min_val=1, max_val=20)
+SEMANTIC_CACHE_MAXSIZE = _parse_env_int("SEMANTIC_CACHE_MAXSIZE", 2000, min_val=1, max_val=100000)
+SEMANTIC_CACHE_TTL = _parse_env_int("SEMANTIC_CACHE_TTL", 3600, min_val=60, max_val=604800)
+
+# ====== CACHE INVALIDATION ======
+# Query vectors cached per normalized question and index generation (0 = off)
+QUERY_EMBEDDING_CACHE_SIZE = _parse_env_int("QUERY_EMBEDDING_CACHE_SIZE", 1000, min_val=0, max_val=100000)
+# After /v1/ingest, re-answer the N most-hit cached questions against the new index (0 = off; costs N LLM calls)
+CACHE_REWARM_TOP_N = _parse_env_int("CACHE_REWARM_TOP_N", 0, min_val=0, max_val=1000)
 
 # ====== API AUTH CONFIG ======
 API_AUTH_MODE = (_get_env_value("API_AUTH_MODE", "none") or "none").strip().lower()
@@ -546,6 +662,8 @@ if (_api_keys_raw or "").strip():
 else:
     API_ALLOWED_KEYS = frozenset()
 API_KEY_HEADER = (_get_env_value("API_KEY_HEADER", "x-api-key") or "x-api-key").strip() or "x-api-key"
+# Threads running /v1/query pipelines per API worker (0 = auto: 4 x CPUs, clamped to 4..32)
+API_THREADPOOL_WORKERS = _parse_env_int("RAG_API_THREADPOOL_WORKERS", 0, min_val=0, max_val=1024)
 
 # ====== WARMUP CONFIG ======
 # Warm-up on startup
@@ -625,6 +743,35 @@ ANN_CANDIDATE_MIN = _parse_env_int(
 RERANK_SNIPPET_MAX_CHARS = 500  # Truncate chunk text for reranking prompt
 RERANK_MAX_CHUNKS = 12  # Maximum chunks to send to reranking
 
+# ====== RERANK MODE ======
+# Which reranker apply_reranking uses when reranking is requested:
+#   "llm"           - JSON scoring prompt against RERANK_MODEL (extra LLM round trip)
+#   "cross_encoder" - local sentence-transformers cross-encoder (no network, ~10ms)
+#   "none"          - skip reranking entirely
+RERANK_MODE = (_get_env_value("RAG_RERANK_MODE", "llm") or "llm").strip().lower()
+if RERANK_MODE not in ("llm", "cross_encoder", "none"):
+    _logger.warning("Invalid RAG_RERANK_MODE=%r, falling back to 'llm'", RERANK_MODE)
+    RERANK_MODE = "llm"
+CROSS_ENCODER_MODEL = (
+    _get_env_value("RAG_CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-12-v2")
+    or "cross-encoder/ms-marco-MiniLM-L-12-v2"
+)
+CROSS_ENCODER_BATCH_SIZE = _parse_env_int("RAG_CROSS_ENCODER_BATCH_SIZE", 32, min_val=1, max_val=1024)
+# Max cached (query, chunk) cross-encoder scores (0 disables)
+CROSS_ENCODER_CACHE_SIZE = _parse_env_int("RAG_CROSS_ENCODER_CACHE_SIZE", 4096, min_val=0, max_val=1000000)
+
+# ====== ADAPTIVE RERANK GATE ======
+# Skip reranking when retrieval already has a clear winner. All three signals must agree:
+# - top-1 hybrid margin (z-score units) over the runner-up is at least MIN_MARGIN
+# - normalized softmax entropy over candidate hybrid scores is at most MAX_ENTROPY (0=peaked, 1=flat)
+# - intent classification confidence is at least MIN_INTENT_CONFIDENCE (ignored if intent is disabled)
+RERANK_GATE_ENABLED = _get_bool_env("RAG_RERANK_GATE", "1")
+RERANK_GATE_MIN_MARGIN = _parse_env_float("RAG_RERANK_GATE_MIN_MARGIN", 1.0, min_val=0.0, max_val=100.0)
+RERANK_GATE_MAX_ENTROPY = _parse_env_float("RAG_RERANK_GATE_MAX_ENTROPY", 0.6, min_val=0.0, max_val=1.0)
+RERANK_GATE_MIN_INTENT_CONFIDENCE = _parse_env_float(
+    "RAG_RERANK_GATE_MIN_INTENT_CONFIDENCE", 0.7, min_val=0.0, max_val=1.0
+)
+
 # Retrieval thresholds (Quick Win #6)
 COVERAGE_MIN_CHUNKS = 2  # Minimum chunks above threshold to proceed
 
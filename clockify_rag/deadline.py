@@ -0,0 +1,164 @@
+"""End-to-end request deadlines.
+
+A deadline is an absolute ``time.monotonic()`` bound to the current context
+(ContextVar), so it follows a request from the API handler into the executor
+thread (``contextvars.copy_context()``) and through retrieval, reranking and
+generation without being threaded through every signature.
+
+Stages use it in three ways:
+
+* ``check_deadline(stage)`` fails fast once the budget is gone;
+* ``bound_timeout((connect, read))`` shrinks per-call HTTP timeouts to the
+  remaining budget, so a single LLM call can no longer outlive the caller;
+* ``has_budget(seconds)`` lets optional stages (query expansion, rerank) step
+  aside when the remaining budget is needed for answer generation.
+
+Skipped stages are recorded on the request (``track_degradation()`` /
+``degraded_stages()``) so a degraded answer is never written to the answer caches.
+
+Code running without a deadline (CLI, eval scripts) sees no change: every helper
+is a pass-through when no deadline is set.
+
+Usage:
+    with deadline_scope(30.0):
+        answer_once(...)
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator, Optional, Set, Tuple
+
+from . import config
+from .exceptions import DeadlineExceededError
+from .metrics import MetricNames, get_metrics
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# Mutable on purpose: stages running in copied contexts (executor threads) add to the request's set
+_degraded: ContextVar[Optional[Set[str]]] = ContextVar("request_degraded_stages", default=None)
+
+
+def get_deadline() -> Optional[float]:
+    """Absolute monotonic deadline for the current context, if any."""
+    return _deadline.get()
+
+
+def set_deadline(seconds: Optional[float]) -> Token:
+    """Set a deadline ``seconds`` from now (None clears it); nested deadlines only tighten."""
+    if seconds is None:
+        return _deadline.set(None)
+    candidate = time.monotonic() + max(0.0, float(seconds))
+    current = _deadline.get()
+    return _deadline.set(candidate if current is None else min(current, candidate))
+
+
+def reset_deadline(token: Token) -> None:
+    """Restore the deadline that was active before ``set_deadline``."""
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """Run the body under a deadline ``seconds`` from now (no-op for None)."""
+    if seconds is None:
+        yield _deadline.get()
+        return
+    token = set_deadline(seconds)
+    try:
+        yield _deadline.get()
+    finally:
+        reset_deadline(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (negative once passed), or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    """True when a deadline is set and has passed."""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def deadline_exceeded(stage: str) -> DeadlineExceededError:
+    """Count a deadline miss at ``stage`` and return the error for the caller to raise."""
+    get_metrics().increment_counter(MetricNames.DEADLINE_EXCEEDED, labels={"stage": stage})
+    return DeadlineExceededError(stage)
+
+
+def check_deadline(stage: str) -> None:
+    """Raise ``DeadlineExceededError`` if the deadline has passed before ``stage``."""
+    if expired():
+        raise deadline_exceeded(stage)
+
+
+def has_budget(seconds: float) -> bool:
+    """True if there is no deadline or at least ``seconds`` remain."""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def skip_optional_stage(stage: str) -> bool:
+    """True (and counted) when ``stage`` should be skipped to save budget for generation."""
+    if has_budget(config.DEADLINE_GENERATION_RESERVE):
+        return False
+    get_metrics().increment_counter(MetricNames.DEADLINE_STAGE_SKIPPED, labels={"stage": stage})
+    mark_degraded(stage)
+    return True
+
+
+def track_degradation() -> Set[str]:
+    """Start a fresh record of optional stages skipped for the deadline; returns the live set."""
+    stages: Set[str] = set()
+    _degraded.set(stages)
+    return stages
+
+
+def mark_degraded(stage: str) -> None:
+    """Record that ``stage`` was cut short by the deadline (no-op outside ``track_degradation``)."""
+    stages = _degraded.get()
+    if stages is not None:
+        stages.add(stage)
+
+
+def degraded_stages() -> Set[str]:
+    """Optional stages skipped for the deadline since the last ``track_degradation()``."""
+    return set(_degraded.get() or ())
+
+
+def bound_timeout(timeout: Tuple[float, float], stage: str, reserve: float = 0.0) -> Tuple[float, float]:
+    """Clamp a ``(connect, read)`` timeout to the remaining budget minus ``reserve``.
+
+    Raises:
+        DeadlineExceededError: If no budget is left for the call
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    budget = left - reserve
+    if budget <= 0:
+        raise deadline_exceeded(stage)
+    connect, read = timeout
+    return (min(connect, budget), min(read, budget))
+
+
+__all__ = [
+    "get_deadline",
+    "set_deadline",
+    "reset_deadline",
+    "deadline_scope",
+    "remaining",
+    "expired",
+    "check_deadline",
+    "deadline_exceeded",
+    "has_budget",
+    "skip_optional_stage",
+    "track_degradation",
+    "mark_degraded",
+    "degraded_stages",
+    "bound_timeout",
+]
@@ -2,15 +2,18 @@
 
 import atexit
 import gc
+import hashlib
 import json
 import logging
 import os
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import numpy as np
 
 from . import config
-from .exceptions import EmbeddingError
+from .exceptions import DeadlineExceededError, EmbeddingError
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,11 @@ _MAX_OUTSTANDING_REQUESTS = 64
 
 # Global state for lazy-loaded cross-encoder (OPTIMIZATION: Fast, accurate reranking)
 _CROSS_ENCODER = None
+_CROSS_ENCODER_LOCK = threading.Lock()
+
+# LRU cache of cross-encoder scores keyed by (query hash, chunk id)
+_CE_SCORE_CACHE: "OrderedDict[tuple, float]" = OrderedDict()
+_CE_SCORE_CACHE_LOCK = threading.Lock()
 
 
 def cleanup_embedding_models():
@@ -49,6 +57,8 @@ def cleanup_embedding_models():
         _CROSS_ENCODER = None
         cleaned.append("CrossEncoder")
 
+    clear_cross_encoder_cache()
+
     if cleaned:
         # Force garbage collection to actually free memory
         gc.collect()
@@ -78,13 +88,76 @@ def _load_cross_encoder():
     """
     global _CROSS_ENCODER
     if _CROSS_ENCODER is None:
-        from sentence_transformers import CrossEncoder
+        # Double-checked locking: concurrent API workers must not load the model twice
+        with _CROSS_ENCODER_LOCK:
+            if _CROSS_ENCODER is None:
+                from sentence_transformers import CrossEncoder
 
-        _CROSS_ENCODER = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-12-v2")
-        logger.debug("Loaded CrossEncoder: ms-marco-MiniLM-L-12-v2 (for reranking)")
+                _CROSS_ENCODER = CrossEncoder(config.CROSS_ENCODER_MODEL)
+                logger.debug("Loaded CrossEncoder: %s (for reranking)", config.CROSS_ENCODER_MODEL)
     return _CROSS_ENCODER
 
 
+def clear_cross_encoder_cache() -> None:
+    """Drop all cached cross-encoder scores."""
+    with _CE_SCORE_CACHE_LOCK:
+        _CE_SCORE_CACHE.clear()
+
+
+def score_cross_encoder(query: str, chunks: list) -> np.ndarray:
+    """Score query-chunk pairs with the cross-encoder, reusing cached scores.
+
+    Scores are cached per (query hash, chunk id); only uncached pairs are sent
+    to the model, in a single batched ``predict`` call.
+
+    Args:
+        query: User question
+        chunks: List of chunk dicts with 'id' and 'text' fields
+
+    Returns:
+        float32 array of scores aligned with ``chunks``
+    """
+    if not chunks:
+        return np.zeros(0, dtype="float32")
+
+    qhash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+    cache_size = config.CROSS_ENCODER_CACHE_SIZE
+    scores = np.zeros(len(chunks), dtype="float32")
+    missing: list[int] = []
+
+    with _CE_SCORE_CACHE_LOCK:
+        for pos, chunk in enumerate(chunks):
+            key = (qhash, chunk.get("id"))
+            cached = _CE_SCORE_CACHE.get(key) if cache_size > 0 and key[1] is not None else None
+            if cached is None:
+                missing.append(pos)
+            else:
+                _CE_SCORE_CACHE.move_to_end(key)
+                scores[pos] = cached
+
+    if missing:
+        model = _load_cross_encoder()
+        pairs = [[query, chunks[pos].get("text", "")] for pos in missing]
+        predicted = np.asarray(
+            model.predict(pairs, batch_size=config.CROSS_ENCODER_BATCH_SIZE, show_progress_bar=False),
+            dtype="float32",
+        ).reshape(-1)
+        scores[missing] = predicted
+
+        if cache_size > 0:
+            with _CE_SCORE_CACHE_LOCK:
+                for pos, value in zip(missing, predicted):
+                    chunk_id = chunks[pos].get("id")
+                    if chunk_id is None:
+                        continue
+                    _CE_SCORE_CACHE[(qhash, chunk_id)] = float(value)
+                    _CE_SCORE_CACHE.move_to_end((qhash, chunk_id))
+                while len(_CE_SCORE_CACHE) > cache_size:
+                    _CE_SCORE_CACHE.popitem(last=False)
+
+    return scores
+
+
 def rerank_cross_encoder(query: str, chunks: list, top_k: int = 6) -> list:
     """Rerank chunks using cross-encoder for better relevance scoring.
 
@@ -102,13 +175,8 @@ def rerank_cross_encoder(query: str, chunks: list, top_k: int = 6) -> list:
     if not chunks:
         return []
 
-    model = _load_cross_encoder()
-
-    # Create query-document pairs
-    pairs = [[query, chunk.get("text", "")] for chunk in chunks]
-
-    # Score all pairs (batch prediction is fast)
-    scores = model.predict(pairs)
+    # Score all pairs (batched, cached per query/chunk)
+    scores = score_cross_encoder(query, chunks)
 
     # Sort by score (descending)
     ranked = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)
@@ -400,6 +468,9 @@ def embed_query(question: str, retries=0) -> np.ndarray:
             # embeddings_client.embed_query returns already-normalized 1D array
             vec = embed_query_remote(question, retries=retries)
             return vec
+        except DeadlineExceededError:
+            # No budget left for a fallback attempt either
+            raise
         except Exception as e:
             logger.error(f"Failed to embed query via embeddings_client: {e}")
             # Fallback: try embed_texts if single query fails
@@ -26,7 +26,8 @@ from .config import (
     RAG_OLLAMA_URL,
 )
 from .circuit_breaker import CircuitOpenError, get_embedding_circuit_breaker
-from .exceptions import EmbeddingError
+from .deadline import bound_timeout, deadline_exceeded, expired as deadline_expired, remaining
+from .exceptions import DeadlineExceededError, EmbeddingError
 from .http_utils import http_post_with_retries
 
 logger = logging.getLogger(__name__)
@@ -166,6 +167,8 @@ def _retry_embed(fn_name: str, retries: Optional[int], func):
     for attempt in range(1, max_attempts + 1):
         try:
             return func()
+        except DeadlineExceededError:
+            raise
         except _RETRYABLE_EXC as err:
             last_err = err
             logger.warning(
@@ -277,13 +280,23 @@ def embed_query(text: str, retries: Optional[int] = None) -> np.ndarray:
     if not cb.allow_request():
         raise CircuitOpenError("ollama_embeddings", cb.get_retry_after())
 
+    # Under a request deadline the clamped timeout covers a single attempt: no transport or wrapper retries
+    attempt_retries = 0 if remaining() is not None else retries
+
     def _embed_single() -> np.ndarray:
-        resp = http_post_with_retries(
-            f"{RAG_OLLAMA_URL}/api/embeddings",
-            {"model": RAG_EMBED_MODEL, "prompt": text},
-            retries=DEFAULT_RETRIES if retries is None else retries,
-            timeout=(EMB_CONNECT_T, EMB_READ_T),
-        )
+        # Query embeddings run inside requests: never wait past the request deadline
+        req_timeout = bound_timeout((EMB_CONNECT_T, EMB_READ_T), "embedding")
+        try:
+            resp = http_post_with_retries(
+                f"{RAG_OLLAMA_URL}/api/embeddings",
+                {"model": RAG_EMBED_MODEL, "prompt": text},
+                retries=DEFAULT_RETRIES if attempt_retries is None else attempt_retries,
+                timeout=req_timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            if req_timeout[1] < EMB_READ_T and deadline_expired():
+                raise deadline_exceeded("embedding") from e
+            raise
         embedding_list = resp.get("embedding") if isinstance(resp, dict) else None
         if not isinstance(embedding_list, list):
             raise EmbeddingError("Embedding response missing 'embedding' list")
@@ -303,9 +316,12 @@ def embed_query(text: str, retries: Optional[int] = None) -> np.ndarray:
         return embedding_array
 
     try:
-        result = _retry_embed("embed_query", retries, _embed_single)
+        result = _retry_embed("embed_query", attempt_retries, _embed_single)
         cb.record_success()
         return result
+    except DeadlineExceededError:
+        # Out of budget, not an Ollama failure: leave the breaker alone
+        raise
     except Exception:
         cb.record_failure()
         raise
@@ -0,0 +1,490 @@
+"""Parallel retrieval evaluation and parameter sweeps.
+
+``eval.py`` scores one configuration with one query at a time. This module runs
+the same metrics (MRR@10, Precision@5, NDCG@10) over a grid of
+``ALPHA_HYBRID`` x ``top_k`` x ``MMR_LAMBDA`` values and reports quality next to
+p50/p95 latency, so retrieval can be tuned for quality and speed together.
+
+Where the time goes, and what is done about it:
+
+* Query embeddings are computed once per index generation (batched in the
+  parent) and cached on disk; worker processes never load the embedding model.
+* Retrieval for each (alpha, top_k) pair runs in a process pool, with queries
+  split into batches so the hybrid scoring runs on all cores.
+* MMR is a cheap re-ordering of the retrieved list, applied in the parent, so
+  sweeping ``MMR_LAMBDA`` costs no extra retrieval.
+* Per-configuration retrieval results are cached on disk keyed by index
+  generation plus the retrieval-relevant config, so re-running a sweep after
+  widening the grid only computes the new points.
+
+Answer metrics use ``run_answer_eval``, which runs ``answer_once`` with a bounded
+number of concurrent LLM calls.
+
+Usage:
+    queries = [EvalQuery("How do I track time?", frozenset({3, 7}))]
+    configs = sweep_grid(alphas=[0.3, 0.5, 0.7], top_ks=[8, 12], mmr_lambdas=[0.6, 0.75])
+    results = run_retrieval_sweep(queries, chunks, vecs_n, bm, configs, workers=8)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import config
+from .indexing import get_index_generation
+
+logger = logging.getLogger(__name__)
+
+# Config values that change retrieval output; part of the results cache key
+_RETRIEVAL_CONFIG_KEYS = (
+    "EMB_BACKEND",
+    "EMB_MODEL",
+    "ALPHA_HYBRID",
+    "USE_ANN",
+    "USE_INTENT_CLASSIFICATION",
+    "HUB_PAGE_SCORE_MULTIPLIER",
+    "BM25_K1",
+    "BM25_B",
+    "CLOCKIFY_QUERY_EXPANSIONS",
+    "FAISS_CANDIDATE_MULTIPLIER",
+    "ANN_CANDIDATE_MIN",
+    "ANN_NPROBE",
+)
+
+
+# ====== Metrics ======
+
+
+def compute_mrr(retrieved_ids: Sequence[int], relevant_ids: Iterable[int]) -> float:
+    """Reciprocal rank of the first relevant result (0 if none)."""
+    relevant = set(relevant_ids)
+    for i, doc_id in enumerate(retrieved_ids, 1):
+        if doc_id in relevant:
+            return 1.0 / i
+    return 0.0
+
+
+def compute_precision_at_k(retrieved_ids: Sequence[int], relevant_ids: Iterable[int], k: int = 5) -> float:
+    """Fraction of the top ``k`` results that are relevant."""
+    if k == 0:
+        return 0.0
+    hits = len(set(retrieved_ids[:k]) & set(relevant_ids))
+    return hits / k
+
+
+def compute_ndcg_at_k(retrieved_ids: Sequence[int], relevant_ids: Iterable[int], k: int = 10) -> float:
+    """Normalized discounted cumulative gain over the top ``k`` results (binary relevance)."""
+    relevant = set(relevant_ids)
+    dcg = sum(1.0 / np.log2(i + 2) if doc_id in relevant else 0.0 for i, doc_id in enumerate(retrieved_ids[:k]))
+    idcg = sum(1.0 / np.log2(i + 2) for i in range(min(len(relevant), k)))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 3) if len(values) else None
+
+
+# ====== Sweep definition ======
+
+
+@dataclass(frozen=True)
+class EvalQuery:
+    """An evaluation query with its resolved relevant chunk indices."""
+
+    query: str
+    relevant: FrozenSet[int]
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    """One point of the parameter grid (``mmr_lambda=None`` keeps retrieval order)."""
+
+    alpha: Optional[float]
+    top_k: int
+    mmr_lambda: Optional[float] = None
+
+    def retrieval_key(self) -> Tuple[Optional[float], int]:
+        """Part of the config that determines what ``retrieve`` returns."""
+        return (self.alpha, self.top_k)
+
+
+def sweep_grid(
+    alphas: Optional[Sequence[float]] = None,
+    top_ks: Optional[Sequence[int]] = None,
+    mmr_lambdas: Optional[Sequence[Optional[float]]] = None,
+) -> List[SweepConfig]:
+    """Cartesian product of the given values; omitted axes use the current config.
+
+    An omitted alpha axis keeps ``retrieve``'s own choice (intent-specific alpha when
+    intent classification is enabled); an omitted MMR axis scores retrieval order.
+    """
+    alpha_axis: Sequence[Optional[float]] = alphas or [None]
+    return [
+        SweepConfig(alpha=alpha, top_k=int(top_k), mmr_lambda=lam)
+        for alpha in alpha_axis
+        for top_k in (top_ks or [config.DEFAULT_TOP_K])
+        for lam in (mmr_lambdas or [None])
+    ]
+
+
+# ====== Disk cache ======
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class EvalCache:
+    """On-disk cache of query embeddings and retrieval results for one index generation.
+
+    Layout: ``<cache_dir>/<generation>/embeddings-<model>.npz`` and
+    ``<cache_dir>/<generation>/retrieval-<config>.json``. A rebuilt index gets a new
+    generation and therefore a fresh directory, so stale results are never reused.
+    """
+
+    def __init__(self, cache_dir: str, generation: Optional[str] = None) -> None:
+        self.generation = get_index_generation() if generation is None else generation
+        self.enabled = bool(self.generation)
+        if not self.enabled:
+            logger.warning("Eval cache disabled: no index generation (index.meta.json missing)")
+        self.path = os.path.join(cache_dir, self.generation or "_none")
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @staticmethod
+    def _embedding_name() -> str:
+        return f"embeddings-{_digest([config.EMB_BACKEND, config.EMB_MODEL])}.npz"
+
+    @staticmethod
+    def _retrieval_name(key: Tuple[Optional[float], int]) -> str:
+        fingerprint = {name: getattr(config, name, None) for name in _RETRIEVAL_CONFIG_KEYS}
+        return f"retrieval-{_digest([list(key), fingerprint])}.json"
+
+    def _write_atomic(self, name: str, write) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        final = self._file(name)
+        tmp = f"{final}.tmp.{os.getpid()}"
+        write(tmp)
+        os.replace(tmp, final)
+
+    def load_embeddings(self) -> Dict[str, np.ndarray]:
+        if not self.enabled:
+            return {}
+        try:
+            with np.load(self._file(self._embedding_name()), allow_pickle=False) as data:
+                return {str(q): vec for q, vec in zip(data["queries"], data["vecs"])}
+        except (OSError, KeyError, ValueError):
+            return {}
+
+    def save_embeddings(self, vectors: Dict[str, np.ndarray]) -> None:
+        if not self.enabled or not vectors:
+            return
+        queries = sorted(vectors)
+        vecs = np.stack([np.asarray(vectors[q], dtype=np.float32) for q in queries])
+
+        def write(tmp: str) -> None:
+            with open(tmp, "wb") as f:
+                np.savez(f, queries=np.array(queries), vecs=vecs)
+
+        self._write_atomic(self._embedding_name(), write)
+
+    def load_results(self, key: Tuple[Optional[float], int]) -> Dict[str, Dict[str, Any]]:
+        if not self.enabled:
+            return {}
+        try:
+            with open(self._file(self._retrieval_name(key)), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_results(self, key: Tuple[Optional[float], int], rows: Dict[str, Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+
+        def write(tmp: str) -> None:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f)
+
+        self._write_atomic(self._retrieval_name(key), write)
+
+
+# ====== Query embeddings ======
+
+
+def embed_queries(queries: Sequence[str], cache: Optional[EvalCache] = None) -> Dict[str, np.ndarray]:
+    """Normalized query embeddings, computed once per index generation.
+
+    Queries are normalized exactly as ``retrieve`` does before embedding, so the
+    cached vectors can be passed straight to ``retrieve(query_vec=...)``.
+    """
+    from .embedding import embed_local_batch, embed_query
+    from .retrieval import normalize_query
+
+    vectors = cache.load_embeddings() if cache else {}
+    missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+    if missing:
+        started = time.perf_counter()
+        normalized = [normalize_query(q) for q in missing]
+        if config.EMB_BACKEND == "local":
+            fresh = list(embed_local_batch(normalized, normalize=True))
+        else:
+            # Same client as retrieve(); the embedding client bounds its own connection pool
+            with ThreadPoolExecutor(max_workers=config.EMB_MAX_WORKERS) as pool:
+                fresh = list(pool.map(embed_query, normalized))
+        vectors.update({q: np.asarray(v, dtype=np.float32) for q, v in zip(missing, fresh)})
+        logger.info("eval: embedded %d queries in %.2fs", len(missing), time.perf_counter() - started)
+        if cache:
+            cache.save_embeddings(vectors)
+    return {q: vectors[q] for q in queries}
+
+
+# ====== Retrieval workers ======
+
+_WORKER_INDEX: Optional[Tuple[Any, Any, Any, Optional[str]]] = None
+
+
+def _init_worker(chunks, vecs_n, bm, faiss_index_path: Optional[str]) -> None:
+    """Process-pool initializer: keep the index in the worker for all its tasks."""
+    global _WORKER_INDEX
+    _WORKER_INDEX = (chunks, vecs_n, bm, faiss_index_path)
+
+
+def _retrieve_batch(
+    alpha: Optional[float], top_k: int, items: List[Tuple[str, np.ndarray]]
+) -> List[Tuple[str, List[int], List[float], float]]:
+    """Retrieve a batch of queries; returns (query, ids, dense scores of ids, latency ms)."""
+    from .answer import _gather_dense_scores
+    from .retrieval import retrieve
+
+    assert _WORKER_INDEX is not None, "worker index not initialized"
+    chunks, vecs_n, bm, faiss_index_path = _WORKER_INDEX
+    out = []
+    for query, vec in items:
+        started = time.perf_counter()
+        ids, scores = retrieve(
+            query, chunks, vecs_n, bm, top_k=top_k, faiss_index_path=faiss_index_path, alpha=alpha, query_vec=vec
+        )
+        latency_ms = (time.perf_counter() - started) * 1000
+        ids = [int(i) for i in ids]
+        dense = _gather_dense_scores(scores["dense"], ids).tolist() if ids else []
+        out.append((query, ids, dense, latency_ms))
+    return out
+
+
+def _batches(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _score(queries: Sequence[EvalQuery], ordered: Dict[str, List[int]], latencies: Dict[str, float]) -> Dict[str, Any]:
+    mrr, p5, ndcg, lat = [], [], [], []
+    for item in queries:
+        ids = ordered[item.query]
+        mrr.append(compute_mrr(ids, item.relevant))
+        p5.append(compute_precision_at_k(ids, item.relevant, k=5))
+        ndcg.append(compute_ndcg_at_k(ids, item.relevant, k=10))
+        lat.append(latencies[item.query])
+    return {
+        "mrr_at_10": float(np.mean(mrr)) if mrr else 0.0,
+        "precision_at_5": float(np.mean(p5)) if p5 else 0.0,
+        "ndcg_at_10": float(np.mean(ndcg)) if ndcg else 0.0,
+        "latency_p50_ms": _percentile(lat, 50),
+        "latency_p95_ms": _percentile(lat, 95),
+    }
+
+
+def run_retrieval_sweep(
+    queries: Sequence[EvalQuery],
+    chunks,
+    vecs_n: np.ndarray,
+    bm,
+    configs: Sequence[SweepConfig],
+    workers: Optional[int] = None,
+    cache: Optional[EvalCache] = None,
+    faiss_index_path: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Evaluate every config in ``configs`` and return one result dict per config.
+
+    Args:
+        queries: Queries with resolved relevant chunk indices
+        chunks, vecs_n, bm: Loaded index artifacts
+        configs: Grid points (see ``sweep_grid``)
+        workers: Retrieval processes (default: CPU count; <= 1 runs in-process)
+        cache: Embedding/result cache for the current index generation
+        faiss_index_path: FAISS index file for workers (each process loads its own copy)
+
+    Returns:
+        Result dicts with the config, MRR@10, Precision@5, NDCG@10, p50/p95 latency
+        (retrieval + MMR, query embedding excluded) and the share served from cache
+    """
+    workers = (os.cpu_count() or 1) if workers is None else max(1, int(workers))
+    texts = [q.query for q in queries]
+    vectors = embed_queries(texts, cache)
+
+    # Retrieval once per distinct (alpha, top_k); MMR variants reuse it
+    retrieval_keys = list(dict.fromkeys(c.retrieval_key() for c in configs))
+    retrieved: Dict[Tuple[Optional[float], int], Dict[str, Dict[str, Any]]] = {}
+    cached_share: Dict[Tuple[Optional[float], int], float] = {}
+    jobs: List[Tuple[Tuple[Optional[float], int], List[Any]]] = []
+    for key in retrieval_keys:
+        rows = cache.load_results(key) if cache else {}
+        missing = [q for q in dict.fromkeys(texts) if q not in rows]
+        retrieved[key] = rows
+        cached_share[key] = 1.0 - len(missing) / max(1, len(set(texts)))
+        if missing:
+            size = max(1, math.ceil(len(missing) / (workers * 4)))
+            jobs.extend((key, batch) for batch in _batches([(q, vectors[q]) for q in missing], size))
+
+    started = time.perf_counter()
+    if jobs:
+        if workers <= 1:
+            _init_worker(chunks, vecs_n, bm, faiss_index_path)
+            outputs = [(key, _retrieve_batch(key[0], key[1], batch)) for key, batch in jobs]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(chunks, vecs_n, bm, faiss_index_path)
+            ) as pool:
+                futures = [(key, pool.submit(_retrieve_batch, key[0], key[1], batch)) for key, batch in jobs]
+                outputs = [(key, future.result()) for key, future in futures]
+        for key, batch_out in outputs:
+            for query, ids, dense, latency_ms in batch_out:
+                retrieved[key][query] = {"ids": ids, "dense": dense, "latency_ms": latency_ms}
+        if cache:
+            for key in {key for key, _ in jobs}:
+                cache.save_results(key, retrieved[key])
+    logger.info(
+        "eval: %d retrieval configs x %d queries (%d batches, %d workers) in %.2fs",
+        len(retrieval_keys),
+        len(texts),
+        len(jobs),
+        workers,
+        time.perf_counter() - started,
+    )
+
+    from .answer import apply_mmr_diversification
+
+    results = []
+    for cfg in configs:
+        rows = retrieved[cfg.retrieval_key()]
+        ordered: Dict[str, List[int]] = {}
+        latencies: Dict[str, float] = {}
+        for query in texts:
+            row = rows[query]
+            ids = list(row["ids"])
+            latency_ms = float(row["latency_ms"])
+            if cfg.mmr_lambda is not None and ids:
+                t0 = time.perf_counter()
+                dense_by_id = dict(zip(ids, row["dense"]))
+                ids = apply_mmr_diversification(
+                    ids, {"dense": dense_by_id}, vecs_n, len(ids), mmr_lambda=cfg.mmr_lambda
+                )
+                latency_ms += (time.perf_counter() - t0) * 1000
+            ordered[query] = ids
+            latencies[query] = latency_ms
+        result = asdict(cfg)
+        result.update(_score(queries, ordered, latencies))
+        result["queries"] = len(queries)
+        result["cached"] = round(cached_share[cfg.retrieval_key()], 3)
+        results.append(result)
+    return results
+
+
+def best_config(results: Sequence[Dict[str, Any]], metric: str = "ndcg_at_10") -> Optional[Dict[str, Any]]:
+    """Highest ``metric``; ties go to the lower p95 latency."""
+    if not results:
+        return None
+    return max(results, key=lambda r: (r[metric], -(r.get("latency_p95_ms") or 0.0)))
+
+
+# ====== Answer evaluation ======
+
+
+def run_answer_eval(
+    queries: Sequence[EvalQuery],
+    chunks,
+    vecs_n,
+    bm,
+    concurrency: int = 4,
+    hnsw=None,
+    faiss_index_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run ``answer_once`` for every query with at most ``concurrency`` calls in flight.
+
+    Returns:
+        Dict with per-query ``rows`` (answer, confidence, refusal, latency, whether a
+        relevant chunk made it into the packed context) and a ``summary``
+    """
+    from .answer import answer_once
+    from .concurrency import retry_on_overload
+
+    def run(item: EvalQuery) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            # A shed LLM call means "come back later", not a failed answer; cached answers would skip the
+            # pipeline under evaluation (and their latency), so every query runs end to end
+            payload = retry_on_overload(
+                lambda: answer_once(
+                    item.query,
+                    chunks,
+                    vecs_n,
+                    bm,
+                    hnsw=hnsw,
+                    faiss_index_path=faiss_index_path,
+                    use_answer_cache=False,
+                )
+            )
+        except Exception as exc:  # keep the rest of the run going
+            logger.warning("eval: answer failed for %r: %s", item.query, exc)
+            return {"query": item.query, "error": type(exc).__name__, "latency_ms": None}
+        packed = payload.get("packed_chunks") or payload.get("selected_chunks") or []
+        return {
+            "query": item.query,
+            "answer": payload.get("answer"),
+            "confidence": payload.get("confidence"),
+            "refused": payload.get("refused"),
+            "metadata": payload.get("metadata", {}),
+            "context_hit": bool(item.relevant & {int(i) for i in packed if isinstance(i, (int, np.integer))}),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency))) as pool:
+        rows = list(pool.map(run, queries))
+
+    answered = [r for r in rows if "error" not in r]
+    latencies = [r["latency_ms"] for r in answered]
+    confidences = [float(r["confidence"]) for r in answered if r.get("confidence") is not None]
+    summary = {
+        "queries": len(rows),
+        "errors": len(rows) - len(answered),
+        "refusal_rate": (sum(1 for r in answered if r["refused"]) / len(answered)) if answered else 0.0,
+        "context_hit_rate": (sum(1 for r in answered if r["context_hit"]) / len(answered)) if answered else 0.0,
+        "mean_confidence": float(np.mean(confidences)) if confidences else None,
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+    }
+    return {"rows": rows, "summary": summary}
+
+
+__all__ = [
+    "EvalQuery",
+    "SweepConfig",
+    "EvalCache",
+    "sweep_grid",
+    "embed_queries",
+    "run_retrieval_sweep",
+    "run_answer_eval",
+    "best_config",
+    "compute_mrr",
+    "compute_precision_at_k",
+    "compute_ndcg_at_k",
+]
@@ -19,12 +19,32 @@ class LLMUnavailableError(LLMError):
     pass
 
 
+class LLMOverloadedError(LLMError):
+    """LLM admission was refused because the concurrency limiter is saturated.
+
+    Raised before any request is sent, so callers can fail fast (HTTP 503)
+    instead of queueing past their deadline.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class LLMBadResponseError(LLMError):
     """LLM returned a malformed or incomplete payload."""
 
     pass
 
 
+class DeadlineExceededError(Exception):
+    """The request's end-to-end deadline passed before ``stage`` could run."""
+
+    def __init__(self, stage: str = "request"):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+
 class IndexLoadError(Exception):
     """Index loading or validation failed."""
 
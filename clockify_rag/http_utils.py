@@ -165,6 +165,22 @@ def get_session(retries=0, use_thread_local=True) -> requests.Session:
         return REQUESTS_SESSION
 
 
+def get_single_try_session() -> requests.Session:
+    """Get the thread-local session that never retries at the transport level.
+
+    ``get_session`` only ever upgrades a thread's retry count, so ``retries=0``
+    cannot switch retries back off; calls bound by a request deadline use this
+    session instead so a clamped timeout is spent exactly once.
+    """
+    from .config import allow_proxies_enabled  # Import here to avoid circular import
+
+    if not hasattr(_thread_local, "single_try_session"):
+        _thread_local.single_try_session = requests.Session()
+        _thread_local.single_try_session.trust_env = allow_proxies_enabled()
+        _sessions_registry.add(_thread_local.single_try_session)
+    return _thread_local.single_try_session
+
+
 def http_post_with_retries(url: str, json_payload: dict, retries=3, backoff=0.5, timeout=None, use_thread_local=True):
     """POST with exponential backoff retry.
 
@@ -192,7 +208,10 @@ def http_post_with_retries(url: str, json_payload: dict, retries=3, backoff=0.5,
     # FIX: Pass retries to get_session() to use adapter-level retry logic
     # instead of manual retry loop. This ensures connection pooling and
     # backoff are handled consistently across all HTTP calls.
-    s = get_session(retries=retries, use_thread_local=use_thread_local)
+    if retries == 0 and use_thread_local:
+        s = get_single_try_session()
+    else:
+        s = get_session(retries=retries, use_thread_local=use_thread_local)
 
     try:
         r = s.post(url, json=json_payload, timeout=timeout, allow_redirects=False)
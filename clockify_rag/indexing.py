@@ -9,7 +9,7 @@ import platform
 import threading
 import time
 from collections import Counter
-from typing import Optional
+from typing import List, Optional, Union
 
 import numpy as np
 
@@ -209,6 +209,58 @@ def reset_faiss_index():
         logger.debug("Reset global FAISS index cache")
 
 
+# ====== INDEX GENERATION ======
+# Cached (meta path, mtime_ns) -> generation so hot paths avoid re-reading index.meta.json
+_GENERATION_CACHE: tuple = (None, None, "")
+_GENERATION_LOCK = threading.Lock()
+
+
+def _derive_generation(meta: dict) -> str:
+    """Stable generation id from index metadata (for indexes built before 'generation' existed)."""
+    basis = f"{meta.get('kb_sha256', '')}|{meta.get('built_at', '')}|{meta.get('chunks', '')}"
+    return hashlib.sha256(basis.encode("utf-8")).hexdigest()[:16]
+
+
+def generation_from_meta(meta: dict) -> str:
+    """Generation id recorded in (or derived from) loaded index metadata."""
+    return str(meta.get("generation") or _derive_generation(meta))
+
+
+def get_index_generation(meta_path: Optional[str] = None) -> str:
+    """Return the current index generation id.
+
+    The generation changes on every build, so caches keyed by it (rerank results,
+    answers, eval artifacts) never serve results computed against an older index.
+
+    Args:
+        meta_path: Path to index.meta.json (defaults to config.FILES["index_meta"])
+
+    Returns:
+        Generation id string, or "" when no index metadata exists
+    """
+    global _GENERATION_CACHE
+    path = meta_path or config.FILES["index_meta"]
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return ""
+
+    cached_path, cached_mtime, cached_gen = _GENERATION_CACHE
+    if cached_path == path and cached_mtime == mtime:
+        return cached_gen
+
+    with _GENERATION_LOCK:
+        try:
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug("Could not read index generation from %s: %s", path, e)
+            return ""
+        generation = generation_from_meta(meta)
+        _GENERATION_CACHE = (path, mtime, generation)
+    return generation
+
+
 # ====== BM25 ======
 def build_bm25(chunks: list) -> dict:
     """Build BM25 index."""
@@ -236,14 +288,22 @@ def build_bm25(chunks: list) -> dict:
 
 
 def bm25_scores(
-    query: str, bm: dict, k1: Optional[float] = None, b: Optional[float] = None, top_k: Optional[int] = None
+    query: Union[str, List[str]],
+    bm: dict,
+    k1: Optional[float] = None,
+    b: Optional[float] = None,
+    top_k: Optional[int] = None,
 ) -> np.ndarray:
-    """Compute BM25 scores with optional early termination (Rank 24)."""
+    """Compute BM25 scores with optional early termination (Rank 24).
+
+    ``query`` may be a raw string or an already tokenized list of terms
+    (e.g. from ``retrieval.expand_query_tokens``).
+    """
     if k1 is None:
         k1 = config.BM25_K1
     if b is None:
         b = config.BM25_B
-    q = tokenize(query)
+    q = tokenize(query) if isinstance(query, str) else list(query)
     idf = bm["idf"]
     avgdl = bm["avgdl"]
     doc_lens = bm["doc_lens"]
@@ -468,6 +528,10 @@ def build(md_path: str, retries=None):
             "ann": config.USE_ANN,
             "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         }
+        # Unique per build (includes wall-clock ns) so rebuilding the same KB still invalidates caches
+        index_meta["generation"] = hashlib.sha256(
+            f"{kb_sha}|{index_meta['built_at']}|{time.time_ns()}".encode("utf-8")
+        ).hexdigest()[:16]
         atomic_write_json(config.FILES["index_meta"], index_meta)
         logger.info("  Saved index metadata")
 
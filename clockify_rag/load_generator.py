@@ -0,0 +1,506 @@
+"""HTTP load generator for the ``/v1/query`` server path.
+
+``tests/test_load.py`` calls Python functions directly, which skips everything
+between the socket and ``answer_once``: middleware, request validation, the
+executor hand-off and JSON serialization. This tool drives the real FastAPI app
+instead, so its numbers can be used to size API threads and workers.
+
+Targets:
+    ``inproc`` (default)  ASGI app in this process via ``httpx.ASGITransport``
+    ``serve``             same app behind uvicorn on 127.0.0.1 (real sockets)
+    ``--url``             an already running server (its own index and LLM)
+
+For ``inproc``/``serve`` the index is a synthetic corpus (see
+``scaling_benchmark``) and the LLM is a ``MockLLMClient`` that sleeps for a
+sampled latency while holding an adaptive-concurrency slot, exactly like the
+Ollama client, so queueing and shedding behave as in production.
+
+Load models:
+    closed loop  ``--concurrency N``: N users, each sends its next request when
+                 the previous one finishes (measures capacity at fixed load)
+    open loop    ``--rate R``: Poisson arrivals at R req/s regardless of
+                 completions (measures behaviour past saturation; latency is
+                 measured from the scheduled arrival, so queueing on the client
+                 side is not hidden by coordinated omission)
+
+Reported per run: throughput, latency percentiles, server-side queueing
+(``processing_time_ms`` minus the pipeline's own ``timing.total_ms``, i.e. the
+wait for an executor thread), LLM admission-queue wait (mock LLM only) and
+shed (429/503), timeout (504) and error rates.
+
+Usage:
+    python -m clockify_rag.load_generator --concurrency 1,4,16 --duration 20
+    python -m clockify_rag.load_generator --rate 5,10,20 --llm-latency lognormal:800:0.4 --threads 16
+    python -m clockify_rag.load_generator --url http://localhost:8000 --rate 2 --questions questions.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import config
+from .api_client import ChatCompletionOptions, ChatCompletionResponse, ChatMessage, MockLLMClient
+from .concurrency import default_llm_deadline, get_llm_limiter, reset_llm_limiter
+from .deadline import bound_timeout, check_deadline, remaining
+
+SHED_STATUSES = (429, 503)
+TIMEOUT_STATUS = 504
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """Latency distribution parsed from ``kind:param[:param]`` (milliseconds).
+
+    ``fixed:MS``, ``uniform:LO:HI``, ``exp:MEAN`` and ``lognormal:MEDIAN:SIGMA``;
+    a bare number means ``fixed``.
+    """
+
+    kind: str
+    params: Tuple[float, ...]
+
+    _ARITY = {"fixed": 1, "uniform": 2, "exp": 1, "lognormal": 2}
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        parts = [p.strip() for p in spec.strip().lower().split(":")]
+        if len(parts) == 1:
+            parts = ["fixed", parts[0]]
+        kind, raw = parts[0], parts[1:]
+        if kind not in cls._ARITY:
+            raise ValueError(f"Unknown latency model {kind!r} (expected one of {', '.join(cls._ARITY)})")
+        if len(raw) != cls._ARITY[kind]:
+            raise ValueError(f"Latency model {kind!r} takes {cls._ARITY[kind]} parameter(s), got {spec!r}")
+        try:
+            params = tuple(float(p) for p in raw)
+        except ValueError as exc:
+            raise ValueError(f"Invalid latency model {spec!r}: {exc}") from exc
+        if any(p < 0 for p in params) or (kind == "uniform" and params[0] > params[1]):
+            raise ValueError(f"Invalid latency model {spec!r}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency in seconds."""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "exp":
+            ms = rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        else:
+            median, sigma = self.params
+            ms = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return ms / 1000.0
+
+    def __str__(self) -> str:
+        return ":".join([self.kind, *(f"{p:g}" for p in self.params)])
+
+
+class LatencyMockLLMClient(MockLLMClient):
+    """``MockLLMClient`` whose chat calls take a sampled time under the LLM concurrency limiter.
+
+    Replies use the structured JSON answer contract. Admission-queue waits are
+    recorded in ``queue_waits`` (seconds).
+    """
+
+    def __init__(
+        self,
+        chat_latency: LatencyModel,
+        embed_dim: Optional[int] = None,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(embed_dim=embed_dim)
+        self.chat_latency = chat_latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.queue_waits: List[float] = []
+
+    def chat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        stream: bool = False,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> ChatCompletionResponse:
+        with self._lock:
+            delay = self.chat_latency.sample(self._rng)
+        limiter = get_llm_limiter()
+        waited = limiter.acquire(deadline=default_llm_deadline()) if limiter is not None else 0.0
+        with self._lock:
+            self.queue_waits.append(waited)
+        try:
+            bound_timeout((1.0, delay), "llm")
+            left = remaining()
+            time.sleep(delay if left is None else max(0.0, min(delay, left)))
+            check_deadline("llm")
+        finally:
+            if limiter is not None:
+                limiter.release(delay)
+        response = super().chat_completion(messages, model=model, options=options, stream=stream)
+        # Structured reply so answer_once exercises its normal JSON path rather than the parse-failure fallback
+        content = response["message"]["content"]
+        response["message"]["content"] = json.dumps({"answer": content, "confidence": 80, "sources_used": []})
+        return response
+
+
+# ============================================================================
+# Targets
+# ============================================================================
+
+
+@contextmanager
+def synthetic_app(
+    n_chunks: int = 2_000,
+    llm_latency: Optional[LatencyModel] = None,
+    threads: int = 0,
+    dim: int = 384,
+    seed: int = 0,
+) -> Iterator[Tuple[Any, List[str], LatencyMockLLMClient]]:
+    """Build the API app over a synthetic index with a latency-modelled mock LLM.
+
+    Yields ``(app, questions, llm_client)``; process-wide patches are undone on exit.
+    """
+    from . import api as api_module
+    from .indexing import build_bm25
+    from .scaling_benchmark import generate_corpus, offline_pipeline
+
+    corpus = generate_corpus(n_chunks, dim=dim, seed=seed)
+    bm = build_bm25(corpus.chunks)
+    llm = LatencyMockLLMClient(llm_latency or LatencyModel("fixed", (0.0,)), embed_dim=dim, seed=seed)
+
+    saved = (api_module.ensure_index_ready, config.API_THREADPOOL_WORKERS)
+    api_module.ensure_index_ready = lambda retries=2: (corpus.chunks, corpus.vecs_n, bm, None)
+    config.API_THREADPOOL_WORKERS = threads or config.API_THREADPOOL_WORKERS
+    reset_llm_limiter()  # fresh AIMD state per run
+    try:
+        with offline_pipeline(corpus.query_vecs, llm_client=llm):
+            yield api_module.create_app(), list(corpus.queries), llm
+    finally:
+        api_module.ensure_index_ready, config.API_THREADPOOL_WORKERS = saved
+        reset_llm_limiter()
+
+
+def _http_client(base_url: str, transport: Any = None, timeout: float = 120.0) -> Any:
+    import httpx
+
+    # No client-side connection cap: the server, not the pool, must be the bottleneck
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    return httpx.AsyncClient(base_url=base_url, transport=transport, timeout=timeout, limits=limits)
+
+
+@asynccontextmanager
+async def inproc_client(app: Any, timeout: float = 120.0) -> AsyncIterator[Any]:
+    """HTTP client bound to ``app`` through ASGI (runs the app lifespan)."""
+    import httpx
+
+    async with app.router.lifespan_context(app):
+        async with _http_client("http://loadgen", httpx.ASGITransport(app=app), timeout) as client:
+            yield client
+
+
+@asynccontextmanager
+async def served_client(app: Any, timeout: float = 120.0, startup_timeout: float = 30.0) -> AsyncIterator[Any]:
+    """Serve ``app`` with uvicorn on an ephemeral localhost port and connect to it."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="loadgen-uvicorn", daemon=True)
+    thread.start()
+    try:
+        give_up = time.monotonic() + startup_timeout
+        while not server.started:
+            if not thread.is_alive() or time.monotonic() > give_up:
+                raise RuntimeError("uvicorn failed to start")
+            await asyncio.sleep(0.02)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        async with _http_client(f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            yield client
+    finally:
+        server.should_exit = True
+        await asyncio.get_running_loop().run_in_executor(None, thread.join, startup_timeout)
+
+
+# ============================================================================
+# Load models
+# ============================================================================
+
+
+@dataclass
+class RequestRecord:
+    """One request; times are ``time.perf_counter()`` seconds."""
+
+    scheduled: float
+    sent: float
+    done: float
+    status: int  # 0 = transport error, -1 = client timeout, -2 = dropped by the client
+    server_ms: Optional[float] = None
+    service_ms: Optional[float] = None
+
+
+async def _send(client: Any, question: str, scheduled: float, timeout_ms: Optional[int]) -> RequestRecord:
+    import httpx
+
+    body: Dict[str, Any] = {"question": question}
+    if timeout_ms:
+        body["timeout_ms"] = timeout_ms
+    sent = time.perf_counter()
+    try:
+        response = await client.post("/v1/query", json=body)
+    except httpx.TimeoutException:
+        return RequestRecord(scheduled, sent, time.perf_counter(), -1)
+    except httpx.HTTPError:
+        return RequestRecord(scheduled, sent, time.perf_counter(), 0)
+    done = time.perf_counter()
+    record = RequestRecord(scheduled, sent, done, response.status_code)
+    if response.status_code == 200:
+        payload = response.json()
+        record.server_ms = payload.get("processing_time_ms")
+        record.service_ms = (payload.get("timing") or {}).get("total_ms")
+    return record
+
+
+async def run_closed_loop(
+    client: Any,
+    questions: Sequence[str],
+    concurrency: int,
+    duration: float,
+    max_requests: Optional[int] = None,
+    think_time: float = 0.0,
+    timeout_ms: Optional[int] = None,
+) -> List[RequestRecord]:
+    """``concurrency`` users issue requests back to back until ``duration`` or ``max_requests``."""
+    records: List[RequestRecord] = []
+    stop_at = time.perf_counter() + duration
+    counter = iter(range(max_requests if max_requests is not None else sys.maxsize))
+
+    async def user(offset: int) -> None:
+        i = offset
+        while time.perf_counter() < stop_at and next(counter, None) is not None:
+            records.append(await _send(client, questions[i % len(questions)], time.perf_counter(), timeout_ms))
+            i += concurrency
+            if think_time:
+                await asyncio.sleep(think_time)
+
+    await asyncio.gather(*(user(u) for u in range(concurrency)))
+    return records
+
+
+async def run_open_loop(
+    client: Any,
+    questions: Sequence[str],
+    rate: float,
+    duration: float,
+    seed: int = 0,
+    max_outstanding: int = 10_000,
+    timeout_ms: Optional[int] = None,
+) -> List[RequestRecord]:
+    """Poisson arrivals at ``rate`` req/s for ``duration`` seconds.
+
+    Arrivals beyond ``max_outstanding`` in-flight requests are recorded as
+    client drops (status -2) rather than queued, so an overloaded target cannot
+    make the generator itself unbounded.
+    """
+    rng = random.Random(seed)
+    records: List[RequestRecord] = []
+    tasks: List[asyncio.Task] = []
+    inflight = 0
+    start = time.perf_counter()
+    scheduled = start
+
+    async def fire(question: str, at: float) -> None:
+        nonlocal inflight
+        try:
+            records.append(await _send(client, question, at, timeout_ms))
+        finally:
+            inflight -= 1
+
+    i = 0
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if inflight >= max_outstanding:
+            now = time.perf_counter()
+            records.append(RequestRecord(scheduled, now, now, -2))
+        else:
+            inflight += 1
+            tasks.append(asyncio.create_task(fire(questions[i % len(questions)], scheduled)))
+        i += 1
+    await asyncio.gather(*tasks)
+    return records
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+
+def _distribution(values_ms: Sequence[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {}
+    values = np.asarray(values_ms, dtype=np.float64)
+    stats = {f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES}
+    stats["mean"] = round(float(values.mean()), 2)
+    stats["max"] = round(float(values.max()), 2)
+    return stats
+
+
+def summarize(records: Sequence[RequestRecord], wall_s: float, queue_waits: Sequence[float] = ()) -> Dict[str, Any]:
+    """Aggregate request records into throughput, latency and failure-rate figures."""
+    total = len(records)
+    ok = [r for r in records if r.status == 200]
+    counts: Dict[str, int] = {}
+    for r in records:
+        counts[str(r.status)] = counts.get(str(r.status), 0) + 1
+    shed = sum(1 for r in records if r.status in SHED_STATUSES or r.status == -2)
+    timeouts = sum(1 for r in records if r.status in (TIMEOUT_STATUS, -1))
+    errors = total - len(ok) - shed - timeouts
+
+    def rate(n: int) -> float:
+        return round(n / total, 4) if total else 0.0
+
+    server_queue = [
+        max(0.0, r.server_ms - r.service_ms) for r in ok if r.server_ms is not None and r.service_ms is not None
+    ]
+    return {
+        "requests": total,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(ok) / wall_s, 2) if wall_s > 0 else 0.0,
+        "status_counts": counts,
+        "ok": len(ok),
+        "shed_rate": rate(shed),
+        "timeout_rate": rate(timeouts),
+        "error_rate": rate(errors),
+        "latency_ms": _distribution([(r.done - r.scheduled) * 1000 for r in ok]),
+        "service_ms": _distribution([r.service_ms for r in ok if r.service_ms is not None]),
+        "server_queue_ms": _distribution(server_queue),
+        "client_lag_ms": _distribution([(r.sent - r.scheduled) * 1000 for r in records]),
+        "llm_queue_ms": _distribution([w * 1000 for w in queue_waits]),
+    }
+
+
+def _parse_list(raw: Optional[str], cast: Any) -> List[Any]:
+    return [cast(v) for v in raw.split(",") if v.strip()] if raw else []
+
+
+async def run_plan(client: Any, questions: Sequence[str], args: argparse.Namespace, llm: Any = None) -> List[Dict]:
+    """Warm up, then run every requested concurrency level / arrival rate in turn."""
+    for i in range(args.warmup):
+        await _send(client, questions[i % len(questions)], time.perf_counter(), args.timeout_ms)
+
+    plan = [("closed", c) for c in _parse_list(args.concurrency, int)]
+    plan += [("open", r) for r in _parse_list(args.rate, float)]
+    results = []
+    for mode, level in plan:
+        if llm is not None:
+            llm.queue_waits.clear()
+        started = time.perf_counter()
+        if mode == "closed":
+            records = await run_closed_loop(
+                client, questions, level, args.duration, args.requests, args.think_time, args.timeout_ms
+            )
+        else:
+            records = await run_open_loop(
+                client, questions, level, args.duration, args.seed, args.max_outstanding, args.timeout_ms
+            )
+        summary = summarize(records, time.perf_counter() - started, llm.queue_waits if llm is not None else ())
+        results.append({"mode": mode, "concurrency" if mode == "closed" else "rate_rps": level, **summary})
+        _print_row(results[-1])
+    return results
+
+
+def _print_row(result: Dict[str, Any]) -> None:
+    load = f"c={result['concurrency']}" if result["mode"] == "closed" else f"λ={result['rate_rps']:g}/s"
+    lat = result["latency_ms"] or {}
+    queue = result["server_queue_ms"] or {}
+    print(
+        f"{result['mode']:<6} {load:<10} {result['throughput_rps']:>8.2f} rps  "
+        f"p50 {lat.get('p50', 0):>8.1f}  p95 {lat.get('p95', 0):>8.1f}  p99 {lat.get('p99', 0):>8.1f} ms  "
+        f"queue p95 {queue.get('p95', 0):>7.1f} ms  shed {result['shed_rate']:.1%}  "
+        f"timeout {result['timeout_rate']:.1%}  err {result['error_rate']:.1%}"
+    )
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    questions = _read_questions(args.questions) if args.questions else []
+    if args.url:
+        if not questions:
+            raise SystemExit("--url needs --questions (questions the target index can answer)")
+        async with _http_client(args.url.rstrip("/"), timeout=args.client_timeout) as client:
+            return {"target": args.url, "results": await run_plan(client, questions, args)}
+
+    latency = LatencyModel.parse(args.llm_latency)
+    with synthetic_app(args.chunks, latency, args.threads, seed=args.seed) as (app, synthetic_questions, llm):
+        open_client = inproc_client if args.target == "inproc" else served_client
+        async with open_client(app, timeout=args.client_timeout) as client:
+            results = await run_plan(client, questions or synthetic_questions, args, llm)
+    return {
+        "target": args.target,
+        "chunks": args.chunks,
+        "llm_latency": str(latency),
+        "threads": args.threads or "auto",
+        "llm_concurrency_enabled": config.LLM_CONCURRENCY_ENABLED,
+        "results": results,
+    }
+
+
+def _read_questions(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Closed/open-loop HTTP load generator for /v1/query")
+    parser.add_argument("--target", choices=["inproc", "serve"], default="inproc", help="How to run the app")
+    parser.add_argument("--url", help="Load an already running server instead (e.g. http://localhost:8000)")
+    parser.add_argument("--concurrency", help="Closed-loop users, comma-separated for a sweep (e.g. 1,4,16)")
+    parser.add_argument("--rate", help="Open-loop Poisson arrival rates in req/s, comma-separated")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run (default: 10)")
+    parser.add_argument("--requests", type=int, help="Closed loop: stop after this many requests")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: pause between requests (s)")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded sequential requests first (default: 5)")
+    parser.add_argument("--timeout-ms", type=int, help="Per-request deadline sent as timeout_ms")
+    parser.add_argument("--client-timeout", type=float, default=120.0, help="HTTP client timeout (s)")
+    parser.add_argument("--max-outstanding", type=int, default=10_000, help="Open loop: in-flight cap")
+    parser.add_argument("--llm-latency", default="lognormal:500:0.5", help="Mock LLM latency model (ms)")
+    parser.add_argument("--threads", type=int, default=0, help="API executor threads (0 = server default)")
+    parser.add_argument("--chunks", type=int, default=2_000, help="Synthetic index size (default: 2000)")
+    parser.add_argument("--questions", help="File with one question per line (default: synthetic queries)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    if not args.concurrency and not args.rate:
+        args.concurrency = "1,4,16"
+    try:
+        LatencyModel.parse(args.llm_latency)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    report = asyncio.run(_run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""Workload analytics over the structured query log.
+
+``analyze_query_log`` streams ``rag_queries.jsonl`` and its rotated (optionally
+gzipped) segments once and reports what the cache and FAQ settings should be
+tuned for: hot questions, how many queries a cache could have answered, latency
+percentiles per pipeline stage and per intent, refusal rates, and which chunks are
+retrieved most or never.
+
+Memory stays bounded regardless of log size:
+
+- Question counts use lossy counting: once more than ``2 * question_capacity``
+  distinct questions are tracked, only the ``question_capacity`` most frequent
+  are kept. A pruned question that comes back restarts at 1, so every count is a
+  lower bound; it is exact only for questions that were never pruned (in practice
+  the heavy hitters, which stay above the cut from early on).
+- Distinct questions are estimated with a HyperLogLog sketch (~1% error).
+- Latencies go into fixed log-scale histograms (~2.5% relative error per percentile).
+- Chunk counters are bounded by the size of the corpus.
+"""
+
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from .precomputed_cache import PrecomputedCache
+from .query_log import iter_query_log
+
+STAGES = ("retrieve_ms", "mmr_ms", "rerank_ms", "llm_ms")
+COVERAGE_POINTS = (10, 100, 1000, 10000)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram: constant memory, percentiles within ~2.5%."""
+
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        value = max(float(value), 0.0)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.buckets[math.floor(math.log(value, self.GROWTH)) if value >= 1e-3 else None] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Geometric midpoint of the bucket, capped at the observed maximum
+                return 0.0 if bucket is None else min(self.GROWTH ** (bucket + 0.5), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2) if self.count else None,
+            "p50": _round(self.percentile(50)),
+            "p95": _round(self.percentile(95)),
+            "p99": _round(self.percentile(99)),
+            "max": round(self.max, 2) if self.count else None,
+        }
+
+
+class DistinctCounter:
+    """HyperLogLog cardinality estimate (2**precision registers of one byte)."""
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: str) -> None:
+        h = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            raw = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(raw))
+
+
+class _HotQuestions:
+    """Lossy top-k counter over normalized questions, remembering one phrasing each."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.counts: Counter = Counter()
+        self.phrasing: Dict[str, str] = {}
+        self.refused: Counter = Counter()
+
+    def add(self, key: str, question: str, refused: bool) -> None:
+        self.counts[key] += 1
+        self.phrasing.setdefault(key, question)
+        if refused:
+            self.refused[key] += 1
+        if len(self.counts) > 2 * self.capacity:
+            kept = dict(self.counts.most_common(self.capacity))
+            self.counts = Counter(kept)
+            self.phrasing = {k: self.phrasing[k] for k in kept}
+            self.refused = Counter({k: self.refused[k] for k in kept if k in self.refused})
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        return [
+            {"question": self.phrasing[key], "count": count, "refused": self.refused.get(key, 0)}
+            for key, count in self.counts.most_common(n)
+        ]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def _entry_metadata(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Answer metadata: nested under ``result_metadata`` for API/event logs, top level for the CLI."""
+    metadata = entry.get("metadata")
+    if not isinstance(metadata, dict):
+        return {}
+    nested = metadata.get("result_metadata")
+    return nested if isinstance(nested, dict) else metadata
+
+
+def _load_chunk_ids(chunks_path: str) -> List[str]:
+    ids = []
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                chunk = json.loads(line)
+            except ValueError:
+                continue
+            ident = chunk.get("id") or chunk.get("chunk_id")
+            if ident is not None:
+                ids.append(str(ident))
+    return ids
+
+
+def analyze_entries(
+    entries: Iterable[Dict[str, Any]],
+    chunk_ids: Optional[List[str]] = None,
+    top_n: int = 20,
+    question_capacity: int = 10000,
+) -> Dict[str, Any]:
+    """Aggregate query log entries into a workload report.
+
+    Args:
+        entries: Parsed query log entries (e.g. from ``iter_query_log``)
+        chunk_ids: All chunk ids in the index, to find never-retrieved chunks (optional)
+        top_n: Rows in each "top" list
+        question_capacity: Distinct questions kept when the counter is pruned (memory bound)
+
+    Returns:
+        Report dict (JSON-serializable)
+    """
+    normalizer = PrecomputedCache()
+    hot = _HotQuestions(question_capacity)
+    distinct = DistinctCounter()
+    total_latency = LatencyHistogram()
+    stage_latency = {stage: LatencyHistogram() for stage in STAGES}
+    intent_latency: Dict[str, LatencyHistogram] = {}
+    intent_queries: Counter = Counter()
+    intent_refused: Counter = Counter()
+    cache_hits: Counter = Counter()
+    chunk_counts: Counter = Counter()
+    total = refused = 0
+    first_ts = last_ts = None
+
+    for entry in entries:
+        total += 1
+        is_refused = bool(entry.get("refused"))
+        refused += is_refused
+        ts = entry.get("timestamp")
+        if isinstance(ts, (int, float)):
+            first_ts = ts if first_ts is None else min(first_ts, ts)
+            last_ts = ts if last_ts is None else max(last_ts, ts)
+
+        question = str(entry.get("query") or "").strip()
+        key = normalizer._normalize_question(question)
+        if key:
+            hot.add(key, question, is_refused)
+            distinct.add(key)
+
+        metadata = _entry_metadata(entry)
+        timing = (entry.get("metadata") or {}).get("timing") or metadata.get("timing") or {}
+        latency = entry.get("latency_ms")
+        if not isinstance(latency, (int, float)):
+            latency = timing.get("total_ms")
+        intent = str(metadata.get("intent") or "unknown")
+        intent_queries[intent] += 1
+        intent_refused[intent] += is_refused
+        if isinstance(latency, (int, float)):
+            total_latency.add(latency)
+            if intent not in intent_latency:
+                intent_latency[intent] = LatencyHistogram()
+            intent_latency[intent].add(latency)
+        for stage in STAGES:
+            value = timing.get(stage)
+            if isinstance(value, (int, float)):
+                stage_latency[stage].add(value)
+        if metadata.get("cache"):
+            cache_hits[str(metadata["cache"])] += 1
+
+        for chunk_id in entry.get("chunk_ids") or []:
+            if chunk_id is not None:
+                chunk_counts[str(chunk_id)] += 1
+
+    distinct_questions = min(distinct.estimate(), total)
+    report: Dict[str, Any] = {
+        "queries": total,
+        "time_range": {"first": first_ts, "last": last_ts},
+        "refusal_rate": round(refused / total, 4) if total else 0.0,
+        "distinct_questions": distinct_questions,
+        # An unbounded exact cache misses once per distinct question and hits every repeat
+        "cache_hit_potential": round(1 - distinct_questions / total, 4) if total else 0.0,
+        "observed_cache_hits": {
+            name: {"count": n, "rate": round(n / total, 4)} for name, n in sorted(cache_hits.items())
+        },
+        "top_question_coverage": {},
+        "hot_questions": hot.top(top_n),
+        "latency_ms": {"total": total_latency.summary(), **{s: h.summary() for s, h in stage_latency.items()}},
+        "intents": {
+            intent: {
+                "queries": n,
+                "refusal_rate": round(intent_refused[intent] / n, 4),
+                "latency_ms": intent_latency.get(intent, LatencyHistogram()).summary(),
+            }
+            for intent, n in intent_queries.most_common()
+        },
+        "most_retrieved_chunks": [{"id": cid, "count": n} for cid, n in chunk_counts.most_common(top_n)],
+    }
+
+    # Share of all queries answered by caching the N hottest questions (FAQ / cache sizing)
+    ranked = [count for _, count in hot.counts.most_common()]
+    for n in COVERAGE_POINTS:
+        if total and (n == COVERAGE_POINTS[0] or n <= len(ranked)):
+            report["top_question_coverage"][str(n)] = round(sum(ranked[:n]) / total, 4)
+
+    if chunk_ids is not None:
+        never = [cid for cid in chunk_ids if cid not in chunk_counts]
+        report["chunks"] = {
+            "total": len(chunk_ids),
+            "retrieved": len(chunk_ids) - len(never),
+            "never_retrieved_count": len(never),
+            "never_retrieved": never,
+        }
+    return report
+
+
+def analyze_query_log(
+    log_file: str,
+    chunks_path: Optional[str] = None,
+    top_n: int = 20,
+    question_capacity: int = 10000,
+) -> Dict[str, Any]:
+    """Stream the query log (all rotated segments) and build the workload report.
+
+    Args:
+        log_file: Active query log path (``rag_queries.jsonl``)
+        chunks_path: ``chunks.jsonl`` of the current index, for never-retrieved chunks
+        top_n: Rows in each "top" list
+        question_capacity: Distinct questions tracked exactly (memory bound)
+    """
+    chunk_ids = _load_chunk_ids(chunks_path) if chunks_path and os.path.exists(chunks_path) else None
+    report = analyze_entries(iter_query_log(log_file), chunk_ids, top_n=top_n, question_capacity=question_capacity)
+    report["log_file"] = log_file
+    return report
+
+
+def suggested_faq_questions(report: Dict[str, Any], min_count: int = 2) -> List[str]:
+    """Hot, non-refused questions from a report, one per line for ``scripts/build_faq_cache.py``."""
+    return [
+        row["question"]
+        for row in report["hot_questions"]
+        if row["count"] >= min_count and row["refused"] < row["count"]
+    ]
@@ -48,13 +48,8 @@ def build_chunk_log_entries(
 
     log_entries: List[Dict[str, Any]] = []
     total_chunks = len(chunks) if chunks is not None else 0
-    chunk_id_lookup: Dict[str, Mapping[str, Any]] = {}
-
-    if chunks is not None:
-        for chunk in chunks:
-            ident = chunk.get("id") or chunk.get("chunk_id")
-            if ident is not None:
-                chunk_id_lookup[str(ident)] = chunk
+    # Only needed when a selection is not a valid index; building it scans every chunk
+    chunk_id_lookup: Optional[Dict[str, Mapping[str, Any]]] = None
 
     seq_indices = list(selected_chunks or [])
     seq_ids = list(selected_chunk_ids or [])
@@ -85,7 +80,13 @@ def build_chunk_log_entries(
 
         if idx_value is not None and 0 <= idx_value < total_chunks and chunks is not None:
             chunk_obj = chunks[idx_value]
-        elif chunk_id is not None:
+        elif chunk_id is not None and chunks is not None:
+            if chunk_id_lookup is None:
+                chunk_id_lookup = {}
+                for chunk in chunks:
+                    ident = chunk.get("id") or chunk.get("chunk_id")
+                    if ident is not None:
+                        chunk_id_lookup[str(ident)] = chunk
             chunk_obj = chunk_id_lookup.get(str(chunk_id))
 
         if chunk_obj is not None:
@@ -119,7 +120,12 @@ def log_query_event(
     channel: Optional[str] = None,
     disabled: bool = False,
 ) -> None:
-    """Write a structured query log entry when logging is enabled."""
+    """Write a structured query log entry when logging is enabled.
+
+    Chunk entries and the sanitized question are built lazily by log_query's
+    renderer, i.e. in the writer thread when the async query log is on, so
+    calling this from an event loop only enqueues.
+    """
 
     if disabled:
         return
@@ -127,11 +133,8 @@ def log_query_event(
     if not question or not isinstance(result, Mapping):
         return
 
-    retrieved_chunks = build_chunk_log_entries(
-        chunks,
-        result.get("selected_chunks"),
-        result.get("selected_chunk_ids"),
-    )
+    selected_chunks = result.get("selected_chunks")
+    selected_chunk_ids = result.get("selected_chunk_ids")
     timing = result.get("timing") or {}
     computed_latency = latency_ms if latency_ms is not None else timing.get("total_ms")
 
@@ -145,11 +148,10 @@ def log_query_event(
         metadata["channel"] = channel
 
     try:
-        safe_question = sanitize_for_log(question, max_length=500)
         log_query(
-            safe_question,
+            lambda: sanitize_for_log(question, max_length=500),
             result.get("answer", ""),
-            retrieved_chunks,
+            lambda: build_chunk_log_entries(chunks, selected_chunks, selected_chunk_ids),
             float(computed_latency) if computed_latency is not None else 0.0,
             refused=bool(result.get("refused")),
             metadata=metadata,
@@ -6,6 +6,12 @@ system used only inside this process. It is designed to:
 - Be thread-safe for concurrent updates
 - Avoid side effects on import (no I/O, no network)
 
+For multi-worker deployments each process can flush its state to a shared
+directory (``RAG_METRICS_MULTIPROC_DIR``) and exporters merge the files, in
+the spirit of prometheus_client's multiprocess mode: the directory is wiped
+when the server starts, and exiting workers fold their counters into an
+aggregate file and delete their own.
+
 It is NOT a full external monitoring backend. Export helpers produce
 text/JSON for inspection and can be hooked into real monitoring by the
 caller if desired.
@@ -13,11 +19,28 @@ caller if desired.
 
 from __future__ import annotations
 
+import itertools
 import json
+import logging
+import math
+import os
+import tempfile
 import threading
+import uuid
+import weakref
 import time
+from array import array
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Dict, Tuple, Optional, Any, Iterable
+from typing import Dict, Tuple, Optional, Any, Iterable, Iterator, List
+
+try:
+    import fcntl
+
+    _HAS_FCNTL = True
+except ImportError:  # Windows: folding is best-effort without a directory lock
+    _HAS_FCNTL = False
 
 
 # ========================= Metric name constants =========================
@@ -34,21 +57,40 @@ class MetricNames:
     QUERIES_TOTAL = "queries_total"
     CACHE_HITS = "cache_hits"
     CACHE_MISSES = "cache_misses"
+    CACHE_WRITES_DROPPED = "cache_writes_dropped_total"
+    QUERY_LOG_DROPPED = "query_log_dropped_total"
+    TRACE_EXPORT_DROPPED = "trace_export_dropped_total"
     ERRORS_TOTAL = "errors_total"
     INGESTIONS_TOTAL = "ingestions_total"
     REFUSALS_TOTAL = "refusals_total"
     RATE_LIMIT_ALLOWED = "rate_limit_allowed"
     RATE_LIMIT_BLOCKED = "rate_limit_blocked"
+    RERANK_GATE_TOTAL = "rerank_gate_total"  # labels: decision=skip|rerank
+    RERANK_CACHE_HITS = "rerank_cache_hits"
+    RERANK_CACHE_MISSES = "rerank_cache_misses"
+    SEMANTIC_CACHE_HITS = "semantic_cache_hits"
+    SEMANTIC_CACHE_MISSES = "semantic_cache_misses"
+    QUERY_EMBEDDING_CACHE_HITS = "query_embedding_cache_hits"
+    QUERY_EMBEDDING_CACHE_MISSES = "query_embedding_cache_misses"
+    LLM_SHED_TOTAL = "llm_shed_total"  # labels: limiter, reason=queue_full|deadline
+    DEADLINE_EXCEEDED = "deadline_exceeded_total"  # labels: stage
+    DEADLINE_STAGE_SKIPPED = "deadline_stage_skipped_total"  # labels: stage=expansion|rerank
 
     # Latencies
     QUERY_LATENCY = "query_latency_ms"
     RETRIEVAL_LATENCY = "retrieval_latency_ms"
     LLM_LATENCY = "llm_latency_ms"
     INGESTION_LATENCY = "ingestion_latency_ms"
+    LLM_QUEUE_WAIT = "llm_queue_wait_ms"
 
     # Gauges
     CACHE_SIZE = "cache_size"
     INDEX_SIZE = "index_size"
+    LLM_INFLIGHT = "llm_inflight"
+    LLM_QUEUE_DEPTH = "llm_queue_depth"
+    LLM_CONCURRENCY_LIMIT = "llm_concurrency_limit"
+    PROFILE_HOT_FUNCTION = "profile_hot_function_ratio"  # labels: function=file.py:name
+    PROFILE_SAMPLES = "profile_samples"
 
 
 # ========================= Internal helpers =============================
@@ -74,6 +116,290 @@ class HistogramStats:
     p99: float
 
 
+class HistogramSketch:
+    """Fixed-memory streaming quantile sketch (DDSketch-style).
+
+    Observations are counted in logarithmic buckets whose width guarantees
+    ``relative_accuracy`` on every quantile estimate. ``add`` and ``remove``
+    are O(1); quantile queries and exports are O(buckets), independent of the
+    number of observations. Count, sum, min and max are tracked exactly, and
+    the lowest/highest ranks return the exact min/max.
+
+    Sketches with the same accuracy merge by adding bucket counts, so
+    per-process or per-thread sketches can be combined losslessly.
+    """
+
+    __slots__ = (
+        "relative_accuracy",
+        "max_buckets",
+        "_gamma",
+        "_log_gamma",
+        "_pos",
+        "_neg",
+        "zero_count",
+        "count",
+        "sum",
+        "min",
+        "max",
+    )
+
+    # Magnitudes below this land in the zero bucket
+    MIN_INDEXABLE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = float(relative_accuracy)
+        self.max_buckets = max(16, int(max_buckets))
+        self._gamma = (1.0 + self.relative_accuracy) / (1.0 - self.relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._pos: Dict[int, int] = {}
+        self._neg: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # ----- bucket mapping -----
+
+    def _key(self, magnitude: float) -> int:
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _value(self, key: int) -> float:
+        return 2.0 * self._gamma**key / (self._gamma + 1.0)
+
+    def _store_for(self, value: float) -> Tuple[Optional[Dict[int, int]], int]:
+        if value > self.MIN_INDEXABLE:
+            return self._pos, self._key(value)
+        if value < -self.MIN_INDEXABLE:
+            return self._neg, self._key(-value)
+        return None, 0
+
+    def _collapse(self, store: Dict[int, int]) -> None:
+        # Fold the two lowest-magnitude buckets together to cap memory; this
+        # only loses accuracy for the smallest values of very wide ranges.
+        while len(self._pos) + len(self._neg) > self.max_buckets and len(store) > 1:
+            lowest, second = sorted(store)[:2]
+            store[second] += store.pop(lowest)
+
+    # ----- updates -----
+
+    def add(self, value: float, count: int = 1) -> None:
+        v = float(value)
+        if not math.isfinite(v):
+            # inf/nan have no bucket and would poison sum/mean; drop them
+            return
+        store, key = self._store_for(v)
+        if store is None:
+            self.zero_count += count
+        else:
+            if key in store:
+                store[key] += count
+            else:
+                store[key] = count
+                if len(self._pos) + len(self._neg) > self.max_buckets:
+                    self._collapse(store)
+        self.count += count
+        self.sum += v * count
+        if v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+
+    def remove(self, value: float) -> None:
+        """Forget one earlier observation of ``value`` (used for sliding windows).
+
+        Min/max are not recomputed here; windowed callers track them separately.
+        """
+        v = float(value)
+        if not math.isfinite(v):
+            return
+        store, key = self._store_for(v)
+        if store is None:
+            if self.zero_count <= 0:
+                return
+            self.zero_count -= 1
+        else:
+            if key not in store:
+                # Bucket was collapsed into a neighbour; take it from the lowest one
+                if not store:
+                    return
+                key = min(store)
+            remaining = store[key] - 1
+            if remaining > 0:
+                store[key] = remaining
+            else:
+                del store[key]
+        self.count -= 1
+        self.sum -= v
+        if self.count <= 0:
+            self.count = 0
+            self.sum = 0.0
+            self.min = math.inf
+            self.max = -math.inf
+
+    def merge(self, other: "HistogramSketch") -> None:
+        """Add all observations of ``other`` into this sketch."""
+        if not math.isclose(other.relative_accuracy, self.relative_accuracy):
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        # list() snapshots the dicts atomically, so the other sketch may keep
+        # being written by its owner thread while we merge
+        for key, cnt in list(other._pos.items()):
+            self._pos[key] = self._pos.get(key, 0) + cnt
+        for key, cnt in list(other._neg.items()):
+            self._neg[key] = self._neg.get(key, 0) + cnt
+        if len(self._pos) + len(self._neg) > self.max_buckets:
+            self._collapse(self._pos if len(self._pos) > 1 else self._neg)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def copy(self) -> "HistogramSketch":
+        clone = HistogramSketch(self.relative_accuracy, self.max_buckets)
+        clone.merge(self)
+        return clone
+
+    # ----- queries -----
+
+    def quantile(self, q: float) -> float:
+        """Estimate the value at quantile ``q`` (0..1)."""
+        n = self.count
+        if n <= 0:
+            return 0.0
+        rank = int(max(0, min(n - 1, round(q * (n - 1)))))
+        if rank == 0:
+            return self.min
+        if rank == n - 1:
+            return self.max
+
+        seen = 0
+        for key in sorted(self._neg, reverse=True):
+            seen += self._neg[key]
+            if seen > rank:
+                return min(self.max, max(self.min, -self._value(key)))
+        seen += self.zero_count
+        if seen > rank:
+            return min(self.max, max(self.min, 0.0))
+        for key in sorted(self._pos):
+            seen += self._pos[key]
+            if seen > rank:
+                return min(self.max, max(self.min, self._value(key)))
+        return self.max
+
+    def stats(self) -> HistogramStats:
+        n = self.count
+        if n <= 0:
+            return HistogramStats(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        return HistogramStats(
+            count=n,
+            min=self.min,
+            max=self.max,
+            mean=self.sum / n,
+            p50=self.quantile(0.50),
+            p95=self.quantile(0.95),
+            p99=self.quantile(0.99),
+        )
+
+    # ----- serialization -----
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "zero_count": self.zero_count,
+            "positive": {str(k): v for k, v in self._pos.items()},
+            "negative": {str(k): v for k, v in self._neg.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HistogramSketch":
+        sketch = cls(
+            relative_accuracy=float(data.get("relative_accuracy", 0.01)),
+            max_buckets=int(data.get("max_buckets", 2048)),
+        )
+        sketch._pos = {int(k): int(v) for k, v in (data.get("positive") or {}).items()}
+        sketch._neg = {int(k): int(v) for k, v in (data.get("negative") or {}).items()}
+        sketch.zero_count = int(data.get("zero_count", 0))
+        sketch.count = int(data.get("count", 0))
+        sketch.sum = float(data.get("sum", 0.0))
+        if sketch.count:
+            sketch.min = float(data["min"])
+            sketch.max = float(data["max"])
+        return sketch
+
+
+class _HistogramSeries:
+    """Sketch plus an optional sliding window of the last ``max_history`` values.
+
+    The window is a preallocated ring buffer; evicted values are removed from
+    the sketch in O(1), and exact window min/max are kept with monotonic
+    deques (amortized O(1)). With ``max_history <= 0`` the series is
+    cumulative and holds no raw values at all.
+    """
+
+    __slots__ = ("sketch", "max_history", "_ring", "_head", "_seq", "_min_q", "_max_q")
+
+    def __init__(self, max_history: int) -> None:
+        self.sketch = HistogramSketch()
+        self.max_history = int(max_history)
+        self._ring = array("d")
+        self._head = 0
+        self._seq = 0
+        self._min_q: deque = deque()
+        self._max_q: deque = deque()
+
+    def observe(self, value: float) -> None:
+        if not math.isfinite(value):
+            return
+        window = self.max_history
+        if window <= 0:
+            self.sketch.add(value)
+            return
+
+        seq = self._seq
+        self._seq = seq + 1
+        if len(self._ring) < window:
+            self._ring.append(value)
+        else:
+            evicted = self._ring[self._head]
+            self._ring[self._head] = value
+            self._head = (self._head + 1) % window
+            self.sketch.remove(evicted)
+            oldest = seq - window
+            if self._min_q and self._min_q[0][0] <= oldest:
+                self._min_q.popleft()
+            if self._max_q and self._max_q[0][0] <= oldest:
+                self._max_q.popleft()
+
+        while self._min_q and self._min_q[-1][1] >= value:
+            self._min_q.pop()
+        self._min_q.append((seq, value))
+        while self._max_q and self._max_q[-1][1] <= value:
+            self._max_q.pop()
+        self._max_q.append((seq, value))
+
+        self.sketch.add(value)
+        self.sketch.min = self._min_q[0][1]
+        self.sketch.max = self._max_q[0][1]
+
+    def values(self) -> List[float]:
+        """Raw windowed values, oldest first (empty for cumulative series)."""
+        ring = self._ring
+        if len(ring) < self.max_history:
+            return list(ring)
+        return list(ring[self._head :]) + list(ring[: self._head])
+
+    def __len__(self) -> int:
+        return self.sketch.count
+
+
 class HistogramStatsView(dict):
     """Dict-like view that also provides attribute access for tests."""
 
@@ -106,7 +432,11 @@ class MetricsCollector:
     Data model (all keyed by (name, labels)):
     - counters: monotonically increasing floats
     - gauges: last-set float
-    - histograms: list of float observations (bounded by max_history)
+    - histograms: streaming quantile sketch per series; when max_history > 0
+      the sketch covers a sliding window of the most recent observations
+
+    Observing is O(1) and snapshot/export cost is O(buckets) per series, so
+    scrape time does not grow with traffic.
     """
 
     def __init__(self, max_history: int = 10000) -> None:
@@ -116,7 +446,7 @@ class MetricsCollector:
 
         self._counters: Dict[Tuple[str, Labels], float] = {}
         self._gauges: Dict[Tuple[str, Labels], float] = {}
-        self._histo: Dict[Tuple[str, Labels], list] = {}
+        self._histo: Dict[Tuple[str, Labels], _HistogramSeries] = {}
 
     # ----- counter API -----
 
@@ -160,6 +490,16 @@ class MetricsCollector:
         with self._lock:
             return self._gauges.get(key)
 
+    def remove_gauge(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Drop a gauge series so exporters stop reporting it."""
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            self._gauges.pop(key, None)
+
     # ----- histogram API -----
 
     def observe_histogram(
@@ -171,34 +511,55 @@ class MetricsCollector:
         key = (str(getattr(name, "value", name)), _norm_labels(labels))
         v = float(value)
         with self._lock:
-            bucket = self._histo.setdefault(key, [])
-            bucket.append(v)
-            if len(bucket) > self._max_history:
-                # Keep most recent values
-                overflow = len(bucket) - self._max_history
-                if overflow > 0:
-                    del bucket[0:overflow]
-
-    def _stats_for(self, values: Iterable[float]) -> HistogramStats:
-        data = sorted(float(v) for v in values)
-        n = len(data)
-        if n == 0:
-            return HistogramStats(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+            series = self._histo.get(key)
+            if series is None:
+                series = _HistogramSeries(self._max_history)
+                self._histo[key] = series
+            series.observe(v)
+
+    def _stats_for(self, values: "_HistogramSeries | HistogramSketch | Iterable[float]") -> HistogramStats:
+        if isinstance(values, _HistogramSeries):
+            return values.sketch.stats()
+        if isinstance(values, HistogramSketch):
+            return values.stats()
+        sketch = HistogramSketch()
+        for v in values:
+            sketch.add(v)
+        return sketch.stats()
+
+    def get_histogram_sketch(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Optional[HistogramSketch]:
+        """Return a copy of the sketch backing a histogram series."""
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            series = self._histo.get(key)
+            if series is None or not series.sketch.count:
+                return None
+            return series.sketch.copy()
 
-        def pct(p: float) -> float:
-            idx = int(max(0, min(n - 1, round(p * (n - 1)))))
-            return data[idx]
+    def merge_histogram(
+        self,
+        name: str | MetricNames,
+        sketch: HistogramSketch,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Merge an external sketch (e.g. from another process) into a series.
 
-        s = sum(data)
-        return HistogramStats(
-            count=n,
-            min=data[0],
-            max=data[-1],
-            mean=s / n,
-            p50=pct(0.50),
-            p95=pct(0.95),
-            p99=pct(0.99),
-        )
+        Merged observations are not part of the sliding window, so the target
+        series becomes cumulative.
+        """
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            series = self._histo.get(key)
+            if series is None:
+                series = _HistogramSeries(0)
+                self._histo[key] = series
+            elif series.max_history > 0:
+                series.max_history = 0
+            series.sketch.merge(sketch)
 
     def get_histogram_stats(
         self,
@@ -207,10 +568,10 @@ class MetricsCollector:
     ) -> Optional[HistogramStatsView]:
         key = (str(getattr(name, "value", name)), _norm_labels(labels))
         with self._lock:
-            values = self._histo.get(key)
-            if not values:
+            series = self._histo.get(key)
+            if not series:
                 return None
-            stats = self._stats_for(values)
+            stats = self._stats_for(series)
             return HistogramStatsView(
                 {
                     "count": stats.count,
@@ -267,14 +628,25 @@ class MetricsCollector:
 
     # ----- snapshot / export / reset -----
 
+    def _aggregate(
+        self,
+    ) -> Tuple[
+        Dict[Tuple[str, Labels], float],
+        Dict[Tuple[str, Labels], float],
+        Dict[Tuple[str, Labels], "_HistogramSeries"],
+    ]:
+        """Return (counters, gauges, histograms) for read paths; caller holds the lock."""
+        return self._counters, self._gauges, self._histo
+
     def get_snapshot(self) -> Snapshot:
         with self._lock:
             now = time.time()
-            counters = {self._format_key(name, labels): value for (name, labels), value in self._counters.items()}
-            gauges = {self._format_key(name, labels): value for (name, labels), value in self._gauges.items()}
+            counters_map, gauges_map, histo_map = self._aggregate()
+            counters = {self._format_key(name, labels): value for (name, labels), value in counters_map.items()}
+            gauges = {self._format_key(name, labels): value for (name, labels), value in gauges_map.items()}
             histograms = {
                 self._format_key(name, labels): self._stats_for(values)
-                for (name, labels), values in self._histo.items()
+                for (name, labels), values in histo_map.items()
                 if values
             }
             return Snapshot(
@@ -307,14 +679,19 @@ class MetricsCollector:
             "histogram_stats": {name: hist_to_dict(h) for name, h in snap.histograms.items()},
         }
 
-        # Raw histogram samples deliberately omitted by default; tests only
-        # require stats + toggle behavior.
+        # Raw windowed samples (bounded by max_history) plus the mergeable
+        # sketches; callers that only need stats should pass False.
         if include_histograms:
-            payload["histogram_raw"] = {
-                name: [float(v) for v in self._histo[(base, lbls)]]
-                for (base, lbls), _ in self._histo.items()
-                for name in [self._format_key(base, lbls)]
-            }
+            with self._lock:
+                _, _, histo_map = self._aggregate()
+                payload["histogram_raw"] = {
+                    self._format_key(base, lbls): series.values() for (base, lbls), series in histo_map.items()
+                }
+                payload["histogram_sketches"] = {
+                    self._format_key(base, lbls): series.sketch.to_dict()
+                    for (base, lbls), series in histo_map.items()
+                    if series.sketch.count
+                }
 
         return json.dumps(payload, sort_keys=True)
 
@@ -325,8 +702,10 @@ class MetricsCollector:
         seen_types: set[str] = set()
 
         with self._lock:
+            counters_map, gauges_map, histo_map = self._aggregate()
+
             # Counters
-            for (name, labels), value in sorted(self._counters.items()):
+            for (name, labels), value in sorted(counters_map.items()):
                 if name not in seen_types:
                     lines.append(f"# TYPE {name} counter")
                     seen_types.add(name)
@@ -334,7 +713,7 @@ class MetricsCollector:
                 lines.append(f"{name}{label_txt} {value}")
 
             # Gauges
-            for (name, labels), value in sorted(self._gauges.items()):
+            for (name, labels), value in sorted(gauges_map.items()):
                 if name not in seen_types:
                     lines.append(f"# TYPE {name} gauge")
                     seen_types.add(name)
@@ -342,7 +721,7 @@ class MetricsCollector:
                 lines.append(f"{name}{label_txt} {value}")
 
             # Histograms as summaries (count/sum + quantiles)
-            for (name, labels), values in sorted(self._histo.items()):
+            for (name, labels), values in sorted(histo_map.items()):
                 if not values:
                     continue
                 stats = self._stats_for(values)
@@ -367,11 +746,12 @@ class MetricsCollector:
 
         rows = ["metric_type,metric_name,labels,value"]
         with self._lock:
-            for (name, labels), value in sorted(self._counters.items()):
+            counters_map, gauges_map, histo_map = self._aggregate()
+            for (name, labels), value in sorted(counters_map.items()):
                 rows.append(f'counter,{name},"{self._labels_str(labels)}",{value}')
-            for (name, labels), value in sorted(self._gauges.items()):
+            for (name, labels), value in sorted(gauges_map.items()):
                 rows.append(f'gauge,{name},"{self._labels_str(labels)}",{value}')
-            for (name, labels), values in sorted(self._histo.items()):
+            for (name, labels), values in sorted(histo_map.items()):
                 if not values:
                     continue
                 stats = self._stats_for(values)
@@ -396,23 +776,27 @@ class MetricsCollector:
         for k, v in snap.counters.items():
             counters_agg[base(k)] = counters_agg.get(base(k), 0.0) + float(v)
 
+        # Merge sketches across label variants so percentiles stay meaningful
+        merged: Dict[str, HistogramSketch] = {}
+        with self._lock:
+            _, _, histo_map = self._aggregate()
+            for (name, _labels), series in histo_map.items():
+                if not series.sketch.count:
+                    continue
+                cur = merged.get(name)
+                if cur is None:
+                    merged[name] = series.sketch.copy()
+                else:
+                    cur.merge(series.sketch)
+
         hist_agg: Dict[str, Dict[str, float]] = {}
-        for k, h in snap.histograms.items():
-            b = base(k)
-            cur = hist_agg.get(b)
-            if not cur:
-                hist_agg[b] = {
-                    "count": h.count,
-                    "mean": h.mean,
-                    "p95": h.p95,
-                }
-            else:
-                # merge by summing counts and averaging means approximately
-                total_count = cur["count"] + h.count
-                if total_count > 0:
-                    cur["mean"] = (cur["mean"] * cur["count"] + h.mean * h.count) / total_count
-                cur["count"] = total_count
-                cur["p95"] = max(cur["p95"], h.p95)
+        for name, sketch in merged.items():
+            h = sketch.stats()
+            hist_agg[name] = {
+                "count": h.count,
+                "mean": h.mean,
+                "p95": h.p95,
+            }
 
         # Prefer counters when both exist
         key_metrics: Dict[str, Any] = {}
@@ -430,6 +814,39 @@ class MetricsCollector:
             "key_metrics": key_metrics,
         }
 
+    def to_state(self) -> Dict[str, Any]:
+        """Serialize counters, gauges and histogram sketches for cross-process merging."""
+        with self._lock:
+            counters_map, gauges_map, histo_map = self._aggregate()
+            return {
+                "version": 1,
+                "pid": os.getpid(),
+                "timestamp": time.time(),
+                "counters": [[name, list(map(list, labels)), value] for (name, labels), value in counters_map.items()],
+                "gauges": [[name, list(map(list, labels)), value] for (name, labels), value in gauges_map.items()],
+                "histograms": [
+                    [name, list(map(list, labels)), series.sketch.to_dict()]
+                    for (name, labels), series in histo_map.items()
+                    if series.sketch.count
+                ],
+            }
+
+    def merge_state(self, state: Dict[str, Any], gauge_labels: Optional[Dict[str, str]] = None) -> None:
+        """Merge a ``to_state()`` payload: counters add, sketches merge, gauges are set.
+
+        ``gauge_labels`` is added to every gauge (e.g. ``{"pid": "123"}``) so
+        per-process gauges stay distinguishable after merging.
+        """
+        for name, labels, value in state.get("counters", []):
+            self.increment_counter(name, float(value), labels=dict(labels))
+        for name, labels, value in state.get("gauges", []):
+            merged_labels = dict(labels)
+            if gauge_labels:
+                merged_labels.update(gauge_labels)
+            self.set_gauge(name, float(value), labels=merged_labels)
+        for name, labels, sketch in state.get("histograms", []):
+            self.merge_histogram(name, HistogramSketch.from_dict(sketch), labels=dict(labels))
+
     def reset(self) -> None:
         with self._lock:
             self._counters.clear()
@@ -468,6 +885,216 @@ class MetricsCollector:
         return _norm_labels(merged)
 
 
+class _MetricShard:
+    """Metrics written by a single thread (no locking on the write path)."""
+
+    __slots__ = ("thread", "counters", "gauges", "histo")
+
+    def __init__(self, thread: Optional[threading.Thread]) -> None:
+        self.thread = weakref.ref(thread) if thread is not None else None
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], Tuple[int, float]] = {}
+        self.histo: Dict[Tuple[str, Labels], _HistogramSeries] = {}
+
+    def is_alive(self) -> bool:
+        thread = self.thread() if self.thread is not None else None
+        return thread is not None and thread.is_alive()
+
+
+class ShardedMetricsCollector(MetricsCollector):
+    """MetricsCollector variant with one lock-free shard per writer thread.
+
+    Writes touch only the calling thread's shard, so the hot path never
+    takes the collector lock (it is used once per thread to register the
+    shard). Reads and exports merge all shards: counters are summed, the
+    most recently set gauge wins, and histogram sketches are merged.
+
+    Readers snapshot shard dicts with ``list(d.items())``, which is atomic
+    under the GIL, so they never block writers. ``max_history`` applies to
+    each thread's window. Shards of finished threads are folded into a
+    cumulative shard on the next read.
+    """
+
+    def __init__(self, max_history: int = 10000) -> None:
+        super().__init__(max_history=max_history)
+        self._local = threading.local()
+        self._shards: List[_MetricShard] = []
+        self._retired = _MetricShard(None)
+        self._gauge_seq = itertools.count()
+
+    def _shard(self) -> _MetricShard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _MetricShard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    # ----- write path (lock-free) -----
+
+    def increment_counter(
+        self,
+        name: str | MetricNames,
+        value: float = 1.0,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        counters = self._shard().counters
+        counters[key] = counters.get(key, 0.0) + float(value)
+
+    def set_gauge(
+        self,
+        name: str | MetricNames,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        self._shard().gauges[key] = (next(self._gauge_seq), float(value))
+
+    def remove_gauge(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            for shard in (self._retired, *self._shards):
+                shard.gauges.pop(key, None)
+
+    def observe_histogram(
+        self,
+        name: str | MetricNames,
+        value: float,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        histo = self._shard().histo
+        series = histo.get(key)
+        if series is None:
+            series = _HistogramSeries(self._max_history)
+            histo[key] = series
+        series.observe(float(value))
+
+    def merge_histogram(
+        self,
+        name: str | MetricNames,
+        sketch: HistogramSketch,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            series = self._retired.histo.get(key)
+            if series is None:
+                series = _HistogramSeries(0)
+                self._retired.histo[key] = series
+            series.sketch.merge(sketch)
+
+    # ----- read path -----
+
+    def _all_shards(self) -> List[_MetricShard]:
+        """Fold finished threads into the retired shard; caller holds the lock."""
+        live: List[_MetricShard] = []
+        for shard in self._shards:
+            if shard.is_alive():
+                live.append(shard)
+            else:
+                self._fold(shard, self._retired)
+        self._shards = live
+        return [self._retired, *live]
+
+    @staticmethod
+    def _fold(shard: _MetricShard, into: _MetricShard) -> None:
+        for key, value in list(shard.counters.items()):
+            into.counters[key] = into.counters.get(key, 0.0) + value
+        for key, entry in list(shard.gauges.items()):
+            cur = into.gauges.get(key)
+            if cur is None or entry[0] > cur[0]:
+                into.gauges[key] = entry
+        for key, series in list(shard.histo.items()):
+            target = into.histo.get(key)
+            if target is None:
+                target = _HistogramSeries(0)
+                into.histo[key] = target
+            target.sketch.merge(series.sketch)
+
+    def _aggregate(self):
+        merged = _MetricShard(None)
+        for shard in self._all_shards():
+            self._fold(shard, merged)
+        gauges = {key: value for key, (_seq, value) in merged.gauges.items()}
+        histo = {key: series for key, series in merged.histo.items() if series.sketch.count}
+        return merged.counters, gauges, histo
+
+    def get_counter(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> float:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            return float(sum(shard.counters.get(key, 0.0) for shard in self._all_shards()))
+
+    def get_gauge(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Optional[float]:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        with self._lock:
+            entries = [shard.gauges[key] for shard in self._all_shards() if key in shard.gauges]
+        return max(entries)[1] if entries else None
+
+    def get_histogram_sketch(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Optional[HistogramSketch]:
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        merged: Optional[HistogramSketch] = None
+        with self._lock:
+            for shard in self._all_shards():
+                series = shard.histo.get(key)
+                if series is None:
+                    continue
+                if merged is None:
+                    merged = series.sketch.copy()
+                else:
+                    merged.merge(series.sketch)
+        if merged is None or not merged.count:
+            return None
+        return merged
+
+    def get_histogram_stats(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Optional[HistogramStatsView]:
+        sketch = self.get_histogram_sketch(name, labels)
+        if sketch is None:
+            return None
+        stats = sketch.stats()
+        return HistogramStatsView(
+            {
+                "count": stats.count,
+                "min": stats.min,
+                "max": stats.max,
+                "mean": stats.mean,
+                "p50": stats.p50,
+                "p95": stats.p95,
+                "p99": stats.p99,
+            }
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            # Fresh thread-local: every thread registers a new shard on next write
+            self._local = threading.local()
+            self._shards = []
+            self._retired = _MetricShard(None)
+            super().reset()
+
+
 # ========================= Global registry helpers =======================
 
 
@@ -479,7 +1106,9 @@ def get_metrics(name: str = "default") -> MetricsCollector:
     with _METRICS_LOCK:
         mc = _METRICS.get(name)
         if mc is None:
-            mc = MetricsCollector()
+            from . import config
+
+            mc = ShardedMetricsCollector() if config.METRICS_SHARDED else MetricsCollector()
             _METRICS[name] = mc
         return mc
 
@@ -534,6 +1163,306 @@ def get_all_snapshots() -> Dict[str, Snapshot]:
         return {name: mc.get_snapshot() for name, mc in _METRICS.items()}
 
 
+# ========================= Multi-process aggregation =====================
+
+
+_logger = logging.getLogger(__name__)
+
+_MULTIPROC_FILE_PREFIX = "metrics_"
+# Counters of workers that have exited, so fleet totals never go backwards
+_AGGREGATE_FILE = "aggregate.json"
+_LOCK_FILE = ".metrics.lock"
+
+# (pid, token): tells this process's file apart from one left by an earlier process with the same pid
+_PROCESS_TOKEN: Tuple[int, str] = (0, "")
+_CLAIMED_DIRS: set[Tuple[str, str]] = set()
+
+
+def _multiproc_file(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{_MULTIPROC_FILE_PREFIX}{pid}.json")
+
+
+def _process_token() -> str:
+    global _PROCESS_TOKEN
+    pid = os.getpid()
+    if _PROCESS_TOKEN[0] != pid:  # first use, or a forked child
+        _PROCESS_TOKEN = (pid, uuid.uuid4().hex)
+    return _PROCESS_TOKEN[1]
+
+
+@contextmanager
+def _directory_lock(directory: str, exclusive: bool) -> Iterator[None]:
+    """Serialize folding (exclusive) against merging (shared) across processes."""
+    if not _HAS_FCNTL:
+        yield
+        return
+    try:
+        handle = open(os.path.join(directory, _LOCK_FILE), "a")
+    except OSError:  # read-only directory: readers still get a best-effort merge
+        yield
+        return
+    with handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_state(directory: str, path: str, state: Dict[str, Any]) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_state(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        _logger.warning("Skipping unreadable metrics file %s: %s", path, exc)
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _fold_counters(directory: str, states: Iterable[Dict[str, Any]]) -> None:
+    """Add the counters of ``states`` to the aggregate file (caller holds the exclusive lock)."""
+    aggregate = MetricsCollector(max_history=0)
+    for state in (_read_state(os.path.join(directory, _AGGREGATE_FILE)) or {}, *states):
+        aggregate.merge_state({"counters": state.get("counters", [])})
+    folded = aggregate.to_state()
+    folded.update(pid=0, gauges=[], histograms=[])
+    _write_state(directory, os.path.join(directory, _AGGREGATE_FILE), folded)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def flush_metrics_to_dir(directory: str, collector: Optional[MetricsCollector] = None) -> str:
+    """Atomically write this process's metrics state to ``directory``.
+
+    Each process owns one file (``metrics_<pid>.json``) holding its full
+    cumulative state, so readers simply merge the latest file per process.
+    A file left by an earlier process with the same pid has its counters
+    folded into the aggregate before the first overwrite.
+    """
+    mc = collector or get_metrics()
+    os.makedirs(directory, exist_ok=True)
+    state = mc.to_state()
+    state["token"] = _process_token()
+    path = _multiproc_file(directory, state["pid"])
+    claim = (os.path.abspath(directory), state["token"])
+    if claim not in _CLAIMED_DIRS:
+        if os.path.exists(path):
+            with _directory_lock(directory, exclusive=True):
+                previous = _read_state(path)
+                if previous is not None and previous.get("token") != state["token"]:
+                    _fold_counters(directory, [previous])
+        _CLAIMED_DIRS.add(claim)
+    _write_state(directory, path, state)
+    return path
+
+
+def retire_worker_metrics(directory: str, collector: Optional[MetricsCollector] = None) -> None:
+    """On worker exit: fold this process's counters into the aggregate and delete its file.
+
+    Histograms and gauges of the exiting worker are dropped, as in
+    prometheus_client's ``mark_process_dead``.
+    """
+    mc = collector or get_metrics()
+    os.makedirs(directory, exist_ok=True)
+    with _directory_lock(directory, exclusive=True):
+        _fold_counters(directory, [mc.to_state()])
+        try:
+            os.unlink(_multiproc_file(directory, os.getpid()))
+        except FileNotFoundError:
+            pass
+    _CLAIMED_DIRS.discard((os.path.abspath(directory), _process_token()))
+
+
+def reap_dead_worker_metrics(directory: str) -> int:
+    """Fold the files of workers that died without retiring; returns how many were reaped."""
+    if not os.path.isdir(directory):
+        return 0
+    with _directory_lock(directory, exclusive=True):
+        dead = []
+        for fname in sorted(os.listdir(directory)):
+            if not (fname.startswith(_MULTIPROC_FILE_PREFIX) and fname.endswith(".json")):
+                continue
+            path = os.path.join(directory, fname)
+            state = _read_state(path)
+            if state is not None and not _pid_alive(int(state.get("pid", 0) or 0)):
+                dead.append((path, state))
+        if dead:
+            _fold_counters(directory, [state for _path, state in dead])
+            for path, _state in dead:
+                os.unlink(path)
+    return len(dead)
+
+
+def clear_multiprocess_dir(directory: str) -> None:
+    """Remove every worker, aggregate and temp file: call once before a new fleet starts."""
+    if not os.path.isdir(directory):
+        return
+    for fname in os.listdir(directory):
+        if fname.endswith((".json", ".tmp")) and (
+            fname.startswith((_MULTIPROC_FILE_PREFIX, ".metrics_")) or fname == _AGGREGATE_FILE
+        ):
+            try:
+                os.unlink(os.path.join(directory, fname))
+            except FileNotFoundError:
+                pass
+    _CLAIMED_DIRS.clear()
+
+
+def collect_multiprocess_metrics(directory: str) -> MetricsCollector:
+    """Merge every worker file in ``directory`` into a fresh collector.
+
+    Counters are summed across live workers, the aggregate of retired ones
+    and any file a crashed worker left behind, so fleet totals stay
+    monotonic. Histogram sketches and gauges come from live processes only;
+    gauges carry a ``pid`` label.
+    """
+    merged = MetricsCollector(max_history=0)
+    if not os.path.isdir(directory):
+        return merged
+
+    with _directory_lock(directory, exclusive=False):
+        for fname in sorted(os.listdir(directory)):
+            path = os.path.join(directory, fname)
+            if fname == _AGGREGATE_FILE:
+                state = _read_state(path)
+                if state is not None:
+                    merged.merge_state({"counters": state.get("counters", [])})
+                continue
+            if not (fname.startswith(_MULTIPROC_FILE_PREFIX) and fname.endswith(".json")):
+                continue
+            state = _read_state(path)
+            if state is None:
+                continue
+
+            pid = int(state.get("pid", 0) or 0)
+            if not _pid_alive(pid):
+                state = {"counters": state.get("counters", [])}
+            merged.merge_state(state, gauge_labels={"pid": str(pid)})
+    return merged
+
+
+class _MetricsFlusher:
+    """Background thread that periodically flushes metrics to a directory."""
+
+    def __init__(self, directory: str, interval: float) -> None:
+        self.directory = directory
+        self.interval = max(0.1, float(interval))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> None:
+        try:
+            flush_metrics_to_dir(self.directory)
+        except Exception as exc:  # never let metrics I/O break the worker
+            _logger.warning("Metrics flush to %s failed: %s", self.directory, exc)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.interval + 1.0)
+        try:
+            retire_worker_metrics(self.directory)
+        except Exception as exc:
+            _logger.warning("Retiring metrics in %s failed: %s", self.directory, exc)
+
+
+_FLUSHER_LOCK = threading.Lock()
+_FLUSHER: Optional[_MetricsFlusher] = None
+
+
+def start_metrics_flusher(directory: Optional[str] = None, interval: Optional[float] = None) -> bool:
+    """Start periodic flushing for this process (no-op without a multiprocess dir)."""
+    global _FLUSHER
+    from . import config
+
+    directory = directory or config.METRICS_MULTIPROC_DIR
+    if not directory:
+        return False
+    with _FLUSHER_LOCK:
+        if _FLUSHER is None:
+            try:
+                reap_dead_worker_metrics(directory)
+            except OSError as exc:
+                _logger.warning("Reaping dead worker metrics in %s failed: %s", directory, exc)
+            _FLUSHER = _MetricsFlusher(directory, interval or config.METRICS_FLUSH_INTERVAL)
+            _FLUSHER.start()
+    return True
+
+
+def stop_metrics_flusher() -> None:
+    """Stop the flusher and retire this worker's file into the aggregate."""
+    global _FLUSHER
+    with _FLUSHER_LOCK:
+        flusher, _FLUSHER = _FLUSHER, None
+    if flusher is not None:
+        flusher.stop()
+
+
+_FLEET_LOCK = threading.Lock()
+_FLEET_CACHE: Optional[Tuple[str, float, MetricsCollector]] = None
+
+
+def get_fleet_metrics(max_age: Optional[float] = None) -> MetricsCollector:
+    """Collector to export from: fleet-wide merge in multiprocess mode, else local.
+
+    The merge reads every worker file, so its result is reused for ``max_age``
+    seconds (default: the flush interval, since peers publish no faster than
+    that). Blocking I/O: call it from a worker thread in async code.
+    """
+    global _FLEET_CACHE
+    from . import config
+
+    directory = config.METRICS_MULTIPROC_DIR
+    if not directory:
+        return get_metrics()
+    max_age = config.METRICS_FLUSH_INTERVAL if max_age is None else max_age
+    with _FLEET_LOCK:
+        cached = _FLEET_CACHE
+        if cached is not None and cached[0] == directory and time.monotonic() - cached[1] < max_age:
+            return cached[2]
+        try:
+            # Publish our own latest numbers so the answering worker is never stale
+            flush_metrics_to_dir(directory)
+        except OSError as exc:
+            _logger.warning("Metrics flush to %s failed: %s", directory, exc)
+        merged = collect_multiprocess_metrics(directory)
+        _FLEET_CACHE = (directory, time.monotonic(), merged)
+        return merged
+
+
 # Backwards-compatibility aliases expected by __init__.py/tests
 AggregatedMetrics = Snapshot
 MetricSnapshot = Snapshot
@@ -0,0 +1,530 @@
+"""Deterministic offline stand-in for the Ollama HTTP API.
+
+CI and perf boxes have no GPU and no VPN, so nothing past the mock client can
+be benchmarked there. This server speaks the subset of the Ollama API the
+pipeline uses, so the real ``OllamaAPIClient``, embeddings client, ingestion
+and API server run unchanged against it:
+
+    POST /api/chat         streaming (NDJSON, the Ollama default) and non-streaming
+    POST /api/embeddings   single ``prompt`` -> ``embedding``
+    POST /api/embed        ``input`` string or list -> ``embeddings``
+    GET  /api/tags         configured chat/rerank/embedding models
+    GET  /api/version, GET /
+    GET  /_sim/stats       request, fault and queue counters (simulator only)
+
+Responses are deterministic: embeddings are feature-hashed bags of words of
+the configured dimension (texts sharing words are similar, so retrieval
+behaves plausibly), and chat replies are derived from a hash of the request.
+Replies follow the JSON contracts the pipeline expects: a ranked
+``[{"id", "score"}]`` list for rerank prompts, the structured answer object
+when the prompt asks for ``sources_used``, plain text otherwise.
+
+Latency model (all scaled by ``time_scale``; 0 disables sleeping):
+    chat   ttft sample + prompt tokens / prompt_tps, then answer tokens at tps
+    embed  per-request sample + input tokens / embed_tps
+    both   ``parallel`` slots per model with a FIFO queue of ``max_queue``
+           (503 "server busy" beyond it, like OLLAMA_MAX_QUEUE), and tail
+           spikes added with probability ``spike_rate``
+
+Fault injection (per model request): ``timeout_rate`` hangs for
+``hang_seconds`` (mid-stream for streaming chat), ``error_rate`` returns 500,
+``malformed_rate`` returns truncated JSON.
+
+Usage:
+    python -m clockify_rag.ollama_simulator --port 11434 --tps 40 --parallel 4
+    RAG_OLLAMA_URL=http://127.0.0.1:11434 RAG_LLM_CLIENT=ollama python -m clockify_rag.api
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from . import config
+from .load_generator import LatencyModel
+from .utils import approx_tokens, tokenize
+
+SIM_VERSION = "0.0.0-sim"
+_RERANK_ID = re.compile(r"\[id=([^\]\n]+)\]")
+_CONTEXT_URL = re.compile(r"^url: (\S+)", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class SimulatorSettings:
+    """Latency, capacity and fault parameters of the simulated Ollama."""
+
+    dim: int = config.EMB_DIM_OLLAMA
+    extra_models: Tuple[str, ...] = ()
+    ttft: LatencyModel = LatencyModel("lognormal", (150.0, 0.3))
+    prompt_tps: float = 2000.0
+    tps: float = 40.0
+    answer_tokens: int = 120
+    embed_latency: LatencyModel = LatencyModel("fixed", (5.0,))
+    embed_tps: float = 20000.0
+    parallel: int = 4
+    max_queue: int = 512
+    spike_rate: float = 0.0
+    spike: LatencyModel = LatencyModel("fixed", (2000.0,))
+    timeout_rate: float = 0.0
+    hang_seconds: float = 600.0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    time_scale: float = 1.0
+    seed: int = 0
+
+    def models(self) -> List[str]:
+        names = [config.RAG_CHAT_MODEL, config.RAG_CHAT_FALLBACK_MODEL, config.RERANK_MODEL, config.RAG_EMBED_MODEL]
+        return list(dict.fromkeys(n for n in (*names, *self.extra_models) if n))
+
+
+# ============================================================================
+# Deterministic content
+# ============================================================================
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    """Unit-length feature-hashed bag-of-words vector; identical inputs give identical vectors."""
+    counts = Counter(tokenize(text)) or Counter([text])
+    vec = np.zeros(dim, dtype=np.float32)
+    for token, count in counts.items():
+        vec += count * _token_vector(token, dim)
+    norm = float(np.linalg.norm(vec)) or 1.0
+    return (vec / norm).tolist()
+
+
+def _request_rng(model: str, messages: Sequence[Dict[str, Any]]) -> random.Random:
+    digest = hashlib.sha256(json.dumps([model, messages], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return random.Random(digest)
+
+
+def chat_reply(model: str, messages: Sequence[Dict[str, Any]], max_tokens: int) -> str:
+    """Deterministic assistant reply shaped like what the pipeline asks for."""
+    rng = _request_rng(model, messages)
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), prompt)
+
+    ids = list(dict.fromkeys(_RERANK_ID.findall(user)))
+    if ids and '"score"' in user:
+        ranked = sorted(ids, key=lambda _: rng.random())
+        scores = [round(0.95 - 0.9 * i / len(ranked), 2) for i in range(len(ranked))]
+        return json.dumps([{"id": cid, "score": score} for cid, score in zip(ranked, scores)])
+
+    vocabulary = tokenize(user) or ["ok"]
+    words = " ".join(rng.choice(vocabulary) for _ in range(max(1, max_tokens)))
+    if "sources_used" in prompt:
+        return json.dumps(
+            {
+                "intent": "feature_howto",
+                "user_role_inferred": "unknown",
+                "security_sensitivity": "low",
+                "answer_style": "ticket_reply",
+                "short_intent_summary": " ".join(vocabulary[:12]),
+                "answer": words,
+                "sources_used": list(dict.fromkeys(_CONTEXT_URL.findall(user)))[:2],
+                "needs_human_escalation": False,
+                "confidence": 60 + rng.randrange(40),
+            }
+        )
+    return words
+
+
+# ============================================================================
+# Server
+# ============================================================================
+
+
+class _ServerBusy(Exception):
+    pass
+
+
+class _ModelSlots:
+    """Per-model concurrency semaphore and the number of requests queued on it."""
+
+    def __init__(self, parallel: int) -> None:
+        self.sem = asyncio.Semaphore(parallel)
+        self.waiting = 0
+
+
+class OllamaSimulator:
+    """Request handling state shared by the simulator endpoints (single event loop)."""
+
+    def __init__(self, settings: SimulatorSettings) -> None:
+        self.settings = settings
+        self._rng = random.Random(settings.seed)
+        self._slots: Dict[str, _ModelSlots] = {}
+        self.stats: Dict[str, Any] = {
+            "requests": Counter(),
+            "faults": Counter(),
+            "busy_rejections": 0,
+            "max_queue_depth": 0,
+            "inflight": 0,
+        }
+
+    async def acquire(self, model: str) -> None:
+        """Wait for one of the model's slots.
+
+        Raises:
+            _ServerBusy: If ``max_queue`` requests are already waiting
+        """
+        slots = self._slots.setdefault(model, _ModelSlots(self.settings.parallel))
+        if slots.sem.locked():
+            if slots.waiting >= self.settings.max_queue:
+                self.stats["busy_rejections"] += 1
+                raise _ServerBusy()
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], slots.waiting + 1)
+        slots.waiting += 1
+        try:
+            await slots.sem.acquire()
+        finally:
+            slots.waiting -= 1
+        self.stats["inflight"] += 1
+
+    def release(self, model: str) -> None:
+        self.stats["inflight"] -= 1
+        self._slots[model].sem.release()
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[None]:
+        await self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def draw_fault(self) -> Optional[str]:
+        s = self.settings
+        u = self._rng.random()
+        for kind, rate in (("timeout", s.timeout_rate), ("error", s.error_rate), ("malformed", s.malformed_rate)):
+            if u < rate:
+                self.stats["faults"][kind] += 1
+                return kind
+            u -= rate
+        return None
+
+    def sample(self, model: LatencyModel) -> float:
+        return model.sample(self._rng)
+
+    def spike(self) -> float:
+        if self.settings.spike_rate and self._rng.random() < self.settings.spike_rate:
+            self.stats["faults"]["spike"] += 1
+            return self.sample(self.settings.spike)
+        return 0.0
+
+    async def sleep(self, seconds: float) -> None:
+        scaled = seconds * self.settings.time_scale
+        if scaled > 0:
+            await asyncio.sleep(scaled)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def _busy() -> JSONResponse:
+    # Ollama's response when OLLAMA_MAX_QUEUE is exceeded
+    return _error(503, "server busy, please try again.  maximum pending requests exceeded")
+
+
+def _malformed(payload: Dict[str, Any]) -> Response:
+    text = json.dumps(payload)
+    return Response(text[: max(1, len(text) // 2)], media_type="application/json")
+
+
+def create_simulator_app(settings: Optional[SimulatorSettings] = None) -> FastAPI:
+    """FastAPI app implementing the simulated Ollama endpoints."""
+    sim = OllamaSimulator(settings or SimulatorSettings())
+    s = sim.settings
+    app = FastAPI(title="Ollama simulator", version=SIM_VERSION)
+    app.state.simulator = sim
+
+    async def read_body(request: Request) -> Dict[str, Any]:
+        sim.stats["requests"][request.url.path] += 1
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    @app.get("/")
+    async def root() -> PlainTextResponse:
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/version")
+    async def version() -> Dict[str, str]:
+        return {"version": SIM_VERSION}
+
+    @app.get("/api/tags")
+    async def tags() -> Dict[str, Any]:
+        sim.stats["requests"]["/api/tags"] += 1
+        return {
+            "models": [
+                {
+                    "name": name,
+                    "model": name,
+                    "modified_at": _now(),
+                    "size": 0,
+                    "digest": hashlib.sha256(name.encode("utf-8")).hexdigest(),
+                    "details": {"family": "simulated", "parameter_size": "0B", "quantization_level": "none"},
+                }
+                for name in s.models()
+            ]
+        }
+
+    @app.get("/_sim/stats")
+    async def stats() -> Dict[str, Any]:
+        return {**sim.stats, "requests": dict(sim.stats["requests"]), "faults": dict(sim.stats["faults"])}
+
+    @app.post("/api/chat")
+    async def chat(request: Request) -> Any:
+        try:
+            body = await read_body(request)
+        except ValueError as exc:
+            return _error(400, str(exc))
+        model = str(body.get("model") or config.RAG_CHAT_MODEL)
+        messages = body.get("messages") or []
+        if not isinstance(messages, list):
+            return _error(400, "messages must be a list")
+        options = body.get("options") or {}
+        limit = int(options.get("num_predict") or s.answer_tokens)
+        stream = bool(body.get("stream", True))  # Ollama streams unless told otherwise
+
+        fault = sim.draw_fault()
+        if fault == "error":
+            return _error(500, "simulated internal server error")
+        content = chat_reply(model, messages, min(limit, s.answer_tokens) if limit > 0 else s.answer_tokens)
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        prompt_tokens = approx_tokens(sum(len(str(m.get("content", ""))) for m in messages))
+        prefill = sim.sample(s.ttft) + prompt_tokens / s.prompt_tps + sim.spike()
+
+        def final(message_content: str, elapsed: float) -> Dict[str, Any]:
+            eval_s = len(pieces) / s.tps
+            return {
+                "model": model,
+                "created_at": _now(),
+                "message": {"role": "assistant", "content": message_content},
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": int(elapsed * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": len(pieces),
+                "eval_duration": int(eval_s * 1e9),
+            }
+
+        try:
+            await sim.acquire(model)
+        except _ServerBusy:
+            return _busy()
+        started = time.monotonic()
+
+        if not stream:
+            try:
+                await sim.sleep(prefill + len(pieces) / s.tps)
+                if fault == "timeout":
+                    await sim.sleep(s.hang_seconds)
+            finally:
+                sim.release(model)
+            payload = final(content, time.monotonic() - started)
+            return _malformed(payload) if fault == "malformed" else payload
+
+        async def generate() -> AsyncIterator[bytes]:
+            try:
+                await sim.sleep(prefill)
+                t0 = time.monotonic()
+                for i, piece in enumerate(pieces):
+                    due = t0 + (i + 1) / s.tps * s.time_scale
+                    if due > time.monotonic():
+                        await asyncio.sleep(due - time.monotonic())
+                    chunk = {
+                        "model": model,
+                        "created_at": _now(),
+                        "message": {"role": "assistant", "content": piece},
+                        "done": False,
+                    }
+                    line = json.dumps(chunk)
+                    if i == min(1, len(pieces) - 1) and fault == "malformed":
+                        yield (line[: len(line) // 2] + "\n").encode("utf-8")
+                        return
+                    yield (line + "\n").encode("utf-8")
+                    if i == 0 and fault == "timeout":
+                        await sim.sleep(s.hang_seconds)
+                yield (json.dumps(final("", time.monotonic() - started)) + "\n").encode("utf-8")
+            finally:
+                # Also runs when the client disconnects mid-stream
+                sim.release(model)
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    async def embed_texts(model: str, texts: List[str]) -> Tuple[Optional[str], List[List[float]], int]:
+        fault = sim.draw_fault()
+        if fault == "error":
+            return fault, [], 0
+        tokens = sum(approx_tokens(len(t)) for t in texts)
+        async with sim.slot(model):
+            await sim.sleep(sim.sample(s.embed_latency) + tokens / s.embed_tps + sim.spike())
+            if fault == "timeout":
+                await sim.sleep(s.hang_seconds)
+        return fault, [hash_embedding(t, s.dim) for t in texts], tokens
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request) -> Any:
+        try:
+            body = await read_body(request)
+        except ValueError as exc:
+            return _error(400, str(exc))
+        model = str(body.get("model") or config.RAG_EMBED_MODEL)
+        try:
+            fault, vectors, _tokens = await embed_texts(model, [str(body.get("prompt") or "")])
+        except _ServerBusy:
+            return _busy()
+        if fault == "error":
+            return _error(500, "simulated internal server error")
+        payload = {"embedding": vectors[0]}
+        return _malformed(payload) if fault == "malformed" else payload
+
+    @app.post("/api/embed")
+    async def embed(request: Request) -> Any:
+        try:
+            body = await read_body(request)
+        except ValueError as exc:
+            return _error(400, str(exc))
+        model = str(body.get("model") or config.RAG_EMBED_MODEL)
+        raw = body.get("input", "")
+        texts = [raw] if isinstance(raw, str) else [str(t) for t in raw] if isinstance(raw, list) else None
+        if texts is None:
+            return _error(400, "input must be a string or a list of strings")
+        started = time.monotonic()
+        try:
+            fault, vectors, tokens = await embed_texts(model, texts)
+        except _ServerBusy:
+            return _busy()
+        if fault == "error":
+            return _error(500, "simulated internal server error")
+        payload = {
+            "model": model,
+            "embeddings": vectors,
+            "total_duration": int((time.monotonic() - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": tokens,
+        }
+        return _malformed(payload) if fault == "malformed" else payload
+
+    return app
+
+
+@contextmanager
+def running_simulator(
+    settings: Optional[SimulatorSettings] = None, host: str = "127.0.0.1", port: int = 0, startup_timeout: float = 30.0
+) -> Iterator[str]:
+    """Run the simulator with uvicorn in a background thread; yields its base URL."""
+    import uvicorn
+
+    app = create_simulator_app(settings)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="ollama-simulator", daemon=True)
+    thread.start()
+    try:
+        give_up = time.monotonic() + startup_timeout
+        while not server.started:
+            if not thread.is_alive() or time.monotonic() > give_up:
+                raise RuntimeError("Ollama simulator failed to start")
+            time.sleep(0.02)
+        bound_port = server.servers[0].sockets[0].getsockname()[1]
+        yield f"http://{host}:{bound_port}"
+    finally:
+        server.should_exit = True
+        thread.join(startup_timeout)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    defaults = SimulatorSettings()
+    parser = argparse.ArgumentParser(description="Deterministic offline Ollama stand-in for performance testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--dim", type=int, default=defaults.dim, help="Embedding dimension")
+    parser.add_argument("--models", default="", help="Extra model names listed by /api/tags (comma-separated)")
+    parser.add_argument("--ttft", default=str(defaults.ttft), help="Time-to-first-token model in ms")
+    parser.add_argument("--prompt-tps", type=float, default=defaults.prompt_tps, help="Prompt tokens/s")
+    parser.add_argument("--tps", type=float, default=defaults.tps, help="Generated tokens/s per request")
+    parser.add_argument("--answer-tokens", type=int, default=defaults.answer_tokens, help="Reply length")
+    parser.add_argument("--embed-latency", default=str(defaults.embed_latency), help="Per-request model in ms")
+    parser.add_argument("--embed-tps", type=float, default=defaults.embed_tps, help="Embedding tokens/s")
+    parser.add_argument("--parallel", type=int, default=defaults.parallel, help="Concurrent requests per model")
+    parser.add_argument("--max-queue", type=int, default=defaults.max_queue, help="Queued requests before 503")
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="Probability of a tail-latency spike")
+    parser.add_argument("--spike", default=str(defaults.spike), help="Spike latency model in ms")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Probability a request hangs")
+    parser.add_argument("--hang-seconds", type=float, default=defaults.hang_seconds)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of HTTP 500")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Probability of truncated JSON")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply all delays (0 = no delays)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rates = (args.timeout_rate, args.error_rate, args.malformed_rate, args.spike_rate)
+    if any(not 0.0 <= r <= 1.0 for r in rates) or sum(rates[:3]) > 1.0:
+        parser.error("fault rates must be within [0, 1] and sum to at most 1")
+    if min(args.tps, args.prompt_tps, args.embed_tps) <= 0 or args.parallel < 1:
+        parser.error("token rates must be positive and --parallel at least 1")
+    try:
+        settings = SimulatorSettings(
+            dim=args.dim,
+            extra_models=tuple(m.strip() for m in args.models.split(",") if m.strip()),
+            ttft=LatencyModel.parse(args.ttft),
+            prompt_tps=args.prompt_tps,
+            tps=args.tps,
+            answer_tokens=args.answer_tokens,
+            embed_latency=LatencyModel.parse(args.embed_latency),
+            embed_tps=args.embed_tps,
+            parallel=args.parallel,
+            max_queue=args.max_queue,
+            spike_rate=args.spike_rate,
+            spike=LatencyModel.parse(args.spike),
+            timeout_rate=args.timeout_rate,
+            hang_seconds=args.hang_seconds,
+            error_rate=args.error_rate,
+            malformed_rate=args.malformed_rate,
+            time_scale=args.time_scale,
+            seed=args.seed,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    import uvicorn
+
+    print(f"Simulated Ollama on http://{args.host}:{args.port} (RAG_OLLAMA_URL=http://{args.host}:{args.port})")
+    uvicorn.run(create_simulator_app(settings), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -33,12 +33,145 @@ Usage:
 import hashlib
 import json
 import logging
+import mmap
 import os
-from typing import Dict, List, Optional, Any
+import struct
+import threading
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Binary cache layout (little endian):
+#   magic (5 bytes) | header length (u32) | header JSON (kb_signature, generation, count)
+#   index: count x (md5 digest 16 bytes | record offset u64 | record length u32), sorted by digest
+#   records: zlib-compressed compact JSON, one per entry
+_BINARY_MAGIC = b"RFAQ\x01"
+_BINARY_SUFFIXES = (".bin", ".faqc")
+_INDEX_ENTRY = struct.Struct("<16sQI")
+_HEADER_LEN = struct.Struct("<I")
+
+
+def _is_binary_path(path: str) -> bool:
+    """Whether ``save`` should write the binary format for this path."""
+    return str(path).endswith(_BINARY_SUFFIXES)
+
+
+def _encode_entry(entry: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(entry, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def _decode_entry(record: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(record).decode("utf-8"))
+
+
+class _BinaryFaqStore:
+    """Read-only, memory-mapped view of a binary FAQ cache file.
+
+    Opening only parses the small header; lookups binary-search the sorted digest
+    index inside the mapping and decode a single record, so startup cost and resident
+    memory do not grow with the number of entries.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mm[: len(_BINARY_MAGIC)] != _BINARY_MAGIC:
+                raise ValueError(f"Not a binary FAQ cache: {path}")
+            start = len(_BINARY_MAGIC)
+            if start + _HEADER_LEN.size > len(self._mm):
+                raise ValueError(f"Truncated binary FAQ cache: {path}")
+            (header_len,) = _HEADER_LEN.unpack_from(self._mm, start)
+            start += _HEADER_LEN.size
+            if start + header_len > len(self._mm):
+                raise ValueError(f"Truncated binary FAQ cache: {path}")
+            header = json.loads(self._mm[start : start + header_len].decode("utf-8"))
+            if not isinstance(header, dict):
+                raise ValueError(f"Malformed binary FAQ cache header: {path}")
+            self.header: Dict[str, Any] = header
+            self.count = int(self.header.get("count", 0))
+            self._index_start = start + header_len
+            end = self._index_start + self.count * _INDEX_ENTRY.size
+            if self.count and end <= len(self._mm):
+                # Records follow the index in digest order, so the last entry ends the file
+                _, offset, length = _INDEX_ENTRY.unpack_from(self._mm, end - _INDEX_ENTRY.size)
+                end = offset + length
+            if end > len(self._mm):
+                raise ValueError(f"Truncated binary FAQ cache: {path}")
+        except Exception:
+            self._mm.close()
+            raise
+
+    @staticmethod
+    def is_binary(path: str) -> bool:
+        with open(path, "rb") as f:
+            return f.read(len(_BINARY_MAGIC)) == _BINARY_MAGIC
+
+    def _digest_at(self, i: int) -> bytes:
+        start = self._index_start + i * _INDEX_ENTRY.size
+        return self._mm[start : start + 16]
+
+    def _find(self, key: str) -> Optional[Tuple[int, int]]:
+        try:
+            digest = bytes.fromhex(key)
+        except ValueError:
+            return None
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._digest_at(mid) < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._digest_at(lo) == digest:
+            _, offset, length = _INDEX_ENTRY.unpack_from(self._mm, self._index_start + lo * _INDEX_ENTRY.size)
+            return offset, length
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def raw(self, key: str) -> Optional[bytes]:
+        """Encoded record for a key (copied out of the mapping)."""
+        found = self._find(key)
+        if found is None:
+            return None
+        offset, length = found
+        return self._mm[offset : offset + length]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self.raw(key)
+        return _decode_entry(record) if record is not None else None
+
+    def keys(self) -> Iterator[str]:
+        for i in range(self.count):
+            yield self._digest_at(i).hex()
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def _write_binary(path: str, header: Dict[str, Any], records: Dict[str, bytes]) -> None:
+    """Write encoded records keyed by hex digest as a binary FAQ cache file."""
+    header_bytes = json.dumps({**header, "count": len(records)}).encode("utf-8")
+    digests = sorted(bytes.fromhex(key) for key in records)
+    offset = len(_BINARY_MAGIC) + _HEADER_LEN.size + len(header_bytes) + len(digests) * _INDEX_ENTRY.size
+    with open(path, "wb") as f:
+        f.write(_BINARY_MAGIC)
+        f.write(_HEADER_LEN.pack(len(header_bytes)))
+        f.write(header_bytes)
+        for digest in digests:
+            length = len(records[digest.hex()])
+            f.write(_INDEX_ENTRY.pack(digest, offset, length))
+            offset += length
+        for digest in digests:
+            f.write(records[digest.hex()])
+
 
 def _default_kb_signature(meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
     """Derive a KB signature from index metadata or on-disk index meta."""
@@ -63,6 +196,17 @@ def _default_kb_signature(meta: Optional[Dict[str, Any]] = None) -> Optional[str
         return None
 
 
+def _current_generation() -> Optional[str]:
+    """Index generation from on-disk index meta (None when no versioned index exists)."""
+    try:
+        from .indexing import get_index_generation
+
+        return get_index_generation() or None
+    except Exception as exc:
+        logger.debug("Failed to derive index generation: %s", exc)
+        return None
+
+
 class PrecomputedCache:
     """Cache for precomputed answers to frequently asked questions.
 
@@ -70,21 +214,28 @@ class PrecomputedCache:
     response times for FAQ queries.
     """
 
-    def __init__(self, cache_path: Optional[str] = None, kb_signature: Optional[str] = None):
+    def __init__(
+        self, cache_path: Optional[str] = None, kb_signature: Optional[str] = None, generation: Optional[str] = None
+    ):
         """Initialize precomputed cache.
 
         Args:
             cache_path: Path to cache file (optional, can load later)
             kb_signature: Optional knowledge-base signature to validate staleness
+            generation: Optional index generation the answers must have been built against
         """
         self.cache: Dict[str, Dict[str, Any]] = {}
+        # Binary files are memory-mapped; self.cache then only holds decoded hits and new puts
+        self._store: Optional[_BinaryFaqStore] = None
         self.cache_path = cache_path
         self.kb_signature = kb_signature
+        self.generation = generation
         self.loaded_kb_signature: Optional[str] = None
+        self.loaded_generation: Optional[str] = None
         self.stale: bool = False
 
         if cache_path and os.path.exists(cache_path):
-            self.load(cache_path, kb_signature=kb_signature)
+            self.load(cache_path, kb_signature=kb_signature, generation=generation)
 
     def _normalize_question(self, question: str) -> str:
         """Normalize question for cache lookup.
@@ -134,7 +285,17 @@ class PrecomputedCache:
             question = self._normalize_question(question)
 
         key = self._hash_question(question)
-        return self.cache.get(key)
+        entry = self.cache.get(key)
+        if entry is None and self._store is not None:
+            entry = self._store.get(key)
+            if entry is not None:
+                self.cache[key] = entry
+        return entry
+
+    def contains(self, question: str) -> bool:
+        """Whether an answer is stored for the (normalized) question, without decoding it."""
+        key = self._hash_question(self._normalize_question(question))
+        return key in self.cache or (self._store is not None and key in self._store)
 
     def put(self, question: str, answer_data: Dict[str, Any]) -> None:
         """Store precomputed answer.
@@ -158,49 +319,74 @@ class PrecomputedCache:
             "routing": answer_data.get("routing", {}),
         }
 
-    def load(self, cache_path: str, kb_signature: Optional[str] = None) -> None:
+    def load(self, cache_path: str, kb_signature: Optional[str] = None, generation: Optional[str] = None) -> None:
         """Load precomputed cache from disk.
 
+        Binary files (see ``_BINARY_MAGIC``) are memory-mapped and decoded lazily on
+        ``get``; JSON files are parsed in full.
+
         Args:
-            cache_path: Path to JSON cache file
+            cache_path: Path to JSON or binary cache file
             kb_signature: Optional knowledge-base signature to validate freshness
+            generation: Optional index generation to validate freshness; answers reference chunks
+                by position, so a rebuild invalidates them even when the KB text is unchanged
         """
         self.stale = False
+        self._close_store()
         try:
-            with open(cache_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            if _BinaryFaqStore.is_binary(cache_path):
+                self._store = _BinaryFaqStore(cache_path)
+                self.cache = {}
+                data = self._store.header
+            else:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
                 self.cache = data.get("cache", {})
-                self.loaded_kb_signature = data.get("kb_signature")
-                # If caller provided a signature and it mismatches, treat cache as stale
-                expected_sig = kb_signature or self.kb_signature
-                if expected_sig and self.loaded_kb_signature and expected_sig != self.loaded_kb_signature:
-                    logger.warning(
-                        "Precomputed cache stale: stored kb_signature=%s, expected=%s. Ignoring cached entries.",
-                        self.loaded_kb_signature,
-                        expected_sig,
-                    )
-                    self.cache = {}
-                    self.stale = True
-                elif expected_sig and not self.loaded_kb_signature:
-                    logger.warning(
-                        "Precomputed cache missing kb_signature; expected=%s. Treating cache as stale.",
-                        expected_sig,
-                    )
-                    self.cache = {}
-                    self.stale = True
-                # Track the effective signature we trust for subsequent saves
-                self.kb_signature = expected_sig or self.loaded_kb_signature
-
-                logger.info(
-                    "Loaded precomputed cache: %d entries from %s%s",
-                    len(self.cache),
-                    cache_path,
-                    " (stale)" if self.stale else "",
-                )
         except FileNotFoundError:
             logger.warning(f"Precomputed cache file not found: {cache_path}")
-        except json.JSONDecodeError as e:
+            return
+        except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Failed to parse precomputed cache: {e}")
+            return
+
+        self.loaded_kb_signature = data.get("kb_signature")
+        self.loaded_generation = data.get("generation")
+        expected_generation = generation or self.generation
+        # If caller provided a signature and it mismatches, treat cache as stale
+        expected_sig = kb_signature or self.kb_signature
+        if expected_sig and self.loaded_kb_signature and expected_sig != self.loaded_kb_signature:
+            logger.warning(
+                "Precomputed cache stale: stored kb_signature=%s, expected=%s. Ignoring cached entries.",
+                self.loaded_kb_signature,
+                expected_sig,
+            )
+            self.stale = True
+        elif expected_sig and not self.loaded_kb_signature:
+            logger.warning(
+                "Precomputed cache missing kb_signature; expected=%s. Treating cache as stale.",
+                expected_sig,
+            )
+            self.stale = True
+        elif expected_generation and self.loaded_generation and expected_generation != self.loaded_generation:
+            logger.warning(
+                "Precomputed cache stale: built for index generation %s, current is %s. Ignoring cached entries.",
+                self.loaded_generation,
+                expected_generation,
+            )
+            self.stale = True
+        if self.stale:
+            self.cache = {}
+            self._close_store()
+        # Track the effective signature we trust for subsequent saves
+        self.kb_signature = expected_sig or self.loaded_kb_signature
+        self.generation = expected_generation or self.loaded_generation
+
+        logger.info(
+            "Loaded precomputed cache: %d entries from %s%s",
+            self.size(),
+            cache_path,
+            " (stale)" if self.stale else "",
+        )
 
     def save(self, cache_path: Optional[str] = None) -> None:
         """Save precomputed cache to disk.
@@ -217,33 +403,57 @@ class PrecomputedCache:
         # Ensure directory exists
         Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
 
-        data = {
-            "version": "1.0",
-            "kb_signature": self.kb_signature,
-            "count": len(self.cache),
-            "cache": self.cache,
-        }
-
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-
-        logger.info(f"Saved precomputed cache: {len(self.cache)} entries to {cache_path}")
+        header = {"version": "1.0", "kb_signature": self.kb_signature, "generation": self.generation}
+        # Write-then-rename so an interrupted checkpoint never leaves a truncated file
+        tmp_path = f"{cache_path}.tmp"
+        if _is_binary_path(cache_path):
+            records = {key: _encode_entry(entry) for key, entry in self.cache.items()}
+            if self._store is not None:
+                for key in self._store.keys():
+                    record = self._store.raw(key) if key not in records else None
+                    if record is not None:
+                        records[key] = record
+            _write_binary(tmp_path, header, records)
+            count = len(records)
+        else:
+            entries = dict(self.cache)
+            if self._store is not None:
+                for key in self._store.keys():
+                    entry = self._store.get(key) if key not in entries else None
+                    if entry is not None:
+                        entries[key] = entry
+            count = len(entries)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**header, "count": count, "cache": entries}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+
+        logger.info(f"Saved precomputed cache: {count} entries to {cache_path}")
+
+    def _close_store(self) -> None:
+        if self._store is not None:
+            self._store.close()
+            self._store = None
 
     def clear(self) -> None:
         """Clear all cached entries."""
         self.cache.clear()
+        self._close_store()
         self.stale = False
 
     def size(self) -> int:
         """Get number of cached entries."""
-        return len(self.cache)
+        if self._store is None:
+            return len(self.cache)
+        return self._store.count + sum(1 for key in self.cache if key not in self._store)
 
     def keys(self) -> List[str]:
         """Get list of cached question hashes."""
-        return list(self.cache.keys())
+        if self._store is None:
+            return list(self.cache.keys())
+        return list(dict.fromkeys([*self._store.keys(), *self.cache]))
 
     def is_stale(self) -> bool:
-        """Return True if the loaded cache was marked stale due to kb_signature mismatch."""
+        """Return True if the loaded cache was marked stale (kb_signature or index generation mismatch)."""
 
         return self.stale
 
@@ -256,10 +466,22 @@ def build_faq_cache(
     output_path: str = "faq_cache.json",
     *,
     kb_signature: Optional[str] = None,
+    workers: int = 4,
+    checkpoint_every: int = 25,
+    resume: bool = False,
     **answer_kwargs,
 ) -> PrecomputedCache:
     """Build precomputed cache from list of FAQ questions.
 
+    All questions are embedded in one batch up front, then answered by a pool of
+    ``workers`` threads (the shared LLM limiter still bounds in-flight LLM calls).
+    Only embedding is batched: retrieval runs per question inside answer_once, as
+    it has no batch entry point and costs little next to the LLM call. The exact and
+    semantic answer caches are bypassed so every FAQ gets its own fresh answer.
+    The cache is written atomically every ``checkpoint_every`` answers, so an
+    interrupted build loses at most one checkpoint interval; with ``resume`` the
+    questions already present in ``output_path`` are skipped.
+
     Args:
         questions: List of frequently asked questions
         chunks: Chunk data
@@ -267,26 +489,64 @@ def build_faq_cache(
         bm: BM25 index
         output_path: Where to save cache (default: faq_cache.json)
         kb_signature: Optional KB signature to store alongside the cache for staleness detection
+        workers: Number of questions answered concurrently (1 = sequential)
+        checkpoint_every: Save after this many new answers (0 = only at the end)
+        resume: Keep answers from an existing, non-stale cache at output_path
         **answer_kwargs: Additional arguments for answer_once()
 
     Returns:
         PrecomputedCache instance with precomputed answers
     """
     from .answer import answer_once
+    from .concurrency import retry_on_overload
 
     effective_sig = kb_signature or _default_kb_signature()
-    cache = PrecomputedCache(kb_signature=effective_sig)
-
-    logger.info(f"Building FAQ cache for {len(questions)} questions...")
-
-    for i, question in enumerate(questions, 1):
-        logger.info(f"Processing FAQ {i}/{len(questions)}: {question[:60]}...")
-
+    cache = PrecomputedCache(kb_signature=effective_sig, generation=_current_generation())
+    if resume and os.path.exists(output_path):
+        cache.load(output_path, kb_signature=effective_sig, generation=cache.generation)
+        if cache.size():
+            logger.info(f"Resuming FAQ cache build: {cache.size()} answers already in {output_path}")
+
+    pending = list(dict.fromkeys(q for q in questions if not cache.contains(q)))
+    logger.info(f"Building FAQ cache for {len(pending)} of {len(questions)} questions with {workers} workers...")
+    if not pending:
+        cache.save(output_path)
+        return cache
+
+    query_vecs = _embed_faq_questions(pending)
+    # A semantic hit would store a paraphrase's answer under this question
+    answer_kwargs = {**answer_kwargs, "use_answer_cache": False}
+    lock = threading.Lock()
+    completed = 0
+
+    def process(question: str) -> None:
+        nonlocal completed
         try:
-            result = answer_once(question, chunks, vecs_n, bm, **answer_kwargs)
-            cache.put(question, result)
+            # Wait out limiter shedding instead of dropping the question from the cache
+            result = retry_on_overload(
+                lambda: answer_once(question, chunks, vecs_n, bm, query_vec=query_vecs.get(question), **answer_kwargs)
+            )
         except Exception as e:
             logger.error(f"Failed to process FAQ: {question[:60]}: {e}")
+            return
+        with lock:
+            cache.put(question, result)
+            completed += 1
+            logger.info(f"Processed FAQ {completed}/{len(pending)}: {question[:60]}...")
+            if checkpoint_every > 0 and completed % checkpoint_every == 0:
+                cache.save(output_path)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+    try:
+        for future in as_completed([pool.submit(process, q) for q in pending]):
+            future.result()
+    except BaseException:
+        # Interrupted: stop queued questions and keep what was answered for the next resume
+        pool.shutdown(wait=True, cancel_futures=True)
+        with lock:
+            cache.save(output_path)
+        raise
+    pool.shutdown(wait=True)
 
     # Save to disk
     cache.save(output_path)
@@ -295,6 +555,65 @@ def build_faq_cache(
     return cache
 
 
+def _embed_faq_questions(questions: List[str]) -> Dict[str, Any]:
+    """Batch-embed questions for ``answer_once(query_vec=...)``; empty on failure.
+
+    Returns an empty mapping when the embedding backend is unavailable, in which
+    case every question falls back to the per-query embedding inside retrieval.
+    """
+    from .eval_runner import embed_queries
+
+    try:
+        return embed_queries(questions)
+    except Exception as e:
+        logger.warning(f"Batch embedding of FAQ questions failed, embedding per question: {e}")
+        return {}
+
+
+def faq_questions_from_query_log(
+    log_file: Optional[str] = None,
+    top_n: int = 100,
+    min_count: int = 2,
+    include_refused: bool = False,
+) -> List[str]:
+    """Derive an FAQ list from the most frequent questions in the query log.
+
+    Reads the active log and its rotated backups (``rag_queries.jsonl.1``, ``.2``, ...,
+    gzip-compressed segments included), groups questions by their normalized form and
+    returns the most common phrasing of each group, most frequent first.
+
+    Args:
+        log_file: Query log path (default: config.QUERY_LOG_FILE)
+        top_n: Maximum number of questions to return
+        min_count: Ignore questions asked fewer times than this
+        include_refused: Also count queries that were refused
+
+    Returns:
+        List of questions suitable for build_faq_cache()
+    """
+    from . import config
+    from .query_log import iter_query_log
+
+    log_file = log_file or config.QUERY_LOG_FILE
+    normalizer = PrecomputedCache()
+    counts: Counter = Counter()
+    phrasings: Dict[str, Counter] = {}
+
+    for entry in iter_query_log(log_file):
+        if entry.get("refused") and not include_refused:
+            continue
+        query = str(entry.get("query") or "").strip()
+        normalized = normalizer._normalize_question(query)
+        if not normalized:
+            continue
+        counts[normalized] += 1
+        phrasings.setdefault(normalized, Counter())[query] += 1
+
+    questions = [phrasings[key].most_common(1)[0][0] for key, n in counts.most_common() if n >= min_count]
+    logger.info(f"Derived {len(questions[:top_n])} FAQ questions from {sum(counts.values())} logged queries")
+    return questions[:top_n]
+
+
 def load_faq_list(faq_file: str) -> List[str]:
     """Load FAQ questions from text file (one per line).
 
@@ -314,6 +633,23 @@ def load_faq_list(faq_file: str) -> List[str]:
     return questions
 
 
+def convert_faq_cache(src_path: str, dst_path: str) -> int:
+    """Convert a cache file between the JSON and binary formats.
+
+    The output format follows ``dst_path``: ``.bin``/``.faqc`` writes the binary
+    format, anything else JSON. Signature and generation are carried over as-is.
+
+    Returns:
+        Number of entries written
+    """
+    if not os.path.exists(src_path):
+        raise FileNotFoundError(src_path)
+    cache = PrecomputedCache()
+    cache.load(src_path)
+    cache.save(dst_path)
+    return cache.size()
+
+
 # Global precomputed cache instance (lazily loaded)
 _PRECOMPUTED_CACHE: Optional[PrecomputedCache] = None
 
@@ -331,13 +667,15 @@ def get_precomputed_cache(cache_path: str = "faq_cache.json", kb_signature: Opti
     global _PRECOMPUTED_CACHE
 
     expected_sig = kb_signature or _default_kb_signature()
+    expected_generation = _current_generation()
 
     if (
         _PRECOMPUTED_CACHE is None
         or (_PRECOMPUTED_CACHE.cache_path and _PRECOMPUTED_CACHE.cache_path != cache_path)
         or (_PRECOMPUTED_CACHE.kb_signature != expected_sig)
+        or (expected_generation and _PRECOMPUTED_CACHE.generation != expected_generation)
     ):
-        _PRECOMPUTED_CACHE = PrecomputedCache(cache_path, kb_signature=expected_sig)
+        _PRECOMPUTED_CACHE = PrecomputedCache(cache_path, kb_signature=expected_sig, generation=expected_generation)
 
     return _PRECOMPUTED_CACHE
 
@@ -346,5 +684,7 @@ __all__ = [
     "PrecomputedCache",
     "build_faq_cache",
     "load_faq_list",
+    "faq_questions_from_query_log",
+    "convert_faq_cache",
     "get_precomputed_cache",
 ]
@@ -0,0 +1,302 @@
+"""In-process sampling profiler for live API workers.
+
+Periodically snapshots every thread's Python stack via ``sys._current_frames()``
+and aggregates the samples as collapsed stacks (``root;caller;leaf count``), the
+input format of flamegraph.pl / speedscope / inferno. Nothing is instrumented, so
+it can be pointed at a production worker when p99 spikes without a redeploy.
+
+Two modes:
+
+* On demand: ``profile_for(seconds)`` (or ``SamplingProfiler`` directly) samples
+  for a bounded window; ``/v1/admin/profile`` exposes this to admins.
+* Continuous: ``start_continuous_profiler()`` samples at a low rate for the life
+  of the process and publishes the top-N hot functions as the
+  ``profile_hot_function_ratio`` gauge (share of on-CPU samples).
+
+Threads parked in well-known blocking calls (idle executor workers, the event
+loop waiting in ``select``) are dropped by default so the output reflects where
+CPU time goes rather than where threads sleep.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from .metrics import MetricNames, get_metrics
+
+logger = logging.getLogger(__name__)
+
+# (file basename, function) leaves that mean "thread is waiting, not running"
+_IDLE_LEAVES: FrozenSet[Tuple[str, str]] = frozenset(
+    {
+        ("threading.py", "wait"),
+        ("threading.py", "_wait_for_tstate_lock"),
+        ("selectors.py", "select"),
+        ("queue.py", "get"),
+        ("socket.py", "accept"),
+        ("thread.py", "_worker"),  # concurrent.futures idle worker
+    }
+)
+
+_MAX_DEPTH = 128
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse_frame(frame) -> Tuple[str, Tuple[str, str]]:
+    """Return (``root;...;leaf`` stack string, leaf key) for one thread's frame."""
+    names: List[str] = []
+    leaf_code = frame.f_code
+    depth = 0
+    while frame is not None and depth < _MAX_DEPTH:
+        names.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+        depth += 1
+    names.reverse()
+    return ";".join(names), (os.path.basename(leaf_code.co_filename), leaf_code.co_name)
+
+
+class SamplingProfiler:
+    """Background thread that samples all other threads' stacks at a fixed interval."""
+
+    def __init__(self, interval: float = 0.01, include_idle: bool = False) -> None:
+        self.interval = max(0.001, float(interval))
+        self.include_idle = include_idle
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample_once(self) -> int:
+        """Take one snapshot of all threads; returns the number of stacks recorded."""
+        own_ident = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        recorded = 0
+        collected = []
+        frames = sys._current_frames()
+        try:
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                stack, leaf = _collapse_frame(frame)
+                if not self.include_idle and leaf in _IDLE_LEAVES:
+                    continue
+                # Prefix with the thread name so per-thread towers stay separate in the flamegraph
+                thread_name = thread_names.get(ident, str(ident)).replace(";", "_").replace(" ", "_")
+                collected.append(f"{thread_name};{stack}")
+        finally:
+            # Don't keep frames (and their locals) alive between samples
+            frames.clear()
+        with self._lock:
+            self.samples += 1
+            for stack in collected:
+                self._stacks[stack] += 1
+                recorded += 1
+        return recorded
+
+    def _run(self) -> None:
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+                self._after_sample()
+            except Exception as exc:  # never let the profiler take the worker down
+                logger.warning("Profiler sample failed: %s", exc)
+            next_at += self.interval
+            delay = next_at - time.monotonic()
+            if delay <= 0:
+                # Fell behind (GIL contention); skip missed ticks instead of bursting
+                next_at = time.monotonic()
+                continue
+            self._stop.wait(delay)
+
+    def _after_sample(self) -> None:
+        """Hook for subclasses, called on the sampler thread after each sample."""
+
+    def start(self) -> "SamplingProfiler":
+        if self._thread is not None:
+            return self
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1.0)
+        self.stopped_at = time.time()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stacks(self) -> Counter:
+        """Snapshot of collapsed stack -> sample count."""
+        with self._lock:
+            return Counter(self._stacks)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text (one ``stack count`` line per unique stack)."""
+        return format_collapsed(self.stacks())
+
+    def top_functions(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Hottest functions by self samples (leaf frame), with share of all stack samples."""
+        return top_functions(self.stacks(), limit)
+
+    def to_dict(self, limit: int = 20) -> Dict[str, Any]:
+        stacks = self.stacks()
+        end = self.stopped_at or time.time()
+        return {
+            "interval_ms": round(self.interval * 1000, 3),
+            "duration_s": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "samples": self.samples,
+            "stack_samples": sum(stacks.values()),
+            "top_functions": top_functions(stacks, limit),
+            "collapsed": format_collapsed(stacks),
+        }
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Render stack counts in Brendan Gregg's collapsed format (hottest first)."""
+    lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def top_functions(stacks: Counter, limit: int = 20) -> List[Dict[str, Any]]:
+    """Aggregate collapsed stacks into self-sample counts per leaf function."""
+    self_counts: Counter = Counter()
+    for stack, count in stacks.items():
+        self_counts[stack.rsplit(";", 1)[-1]] += count
+    total = sum(self_counts.values()) or 1
+    return [
+        {"function": fn, "samples": count, "ratio": round(count / total, 4)}
+        for fn, count in self_counts.most_common(max(0, limit))
+    ]
+
+
+def profile_for(seconds: float, interval: float = 0.01, include_idle: bool = False) -> SamplingProfiler:
+    """Run a blocking profile of ``seconds`` and return the stopped profiler."""
+    profiler = SamplingProfiler(interval=interval, include_idle=include_idle).start()
+    try:
+        time.sleep(max(0.0, seconds))
+    finally:
+        profiler.stop()
+    return profiler
+
+
+# ====== Continuous mode ======
+
+
+class ContinuousProfiler(SamplingProfiler):
+    """Low-rate profiler that periodically publishes hot functions as gauges.
+
+    Stack counts are halved after every publish (and capped at ``max_stacks``
+    unique stacks), so memory stays bounded for the life of the process and the
+    gauges and ``stacks()`` weight recent windows over old ones.
+    """
+
+    def __init__(
+        self, interval: float = 0.1, publish_interval: float = 30.0, top_n: int = 20, max_stacks: int = 5000
+    ) -> None:
+        super().__init__(interval=interval, include_idle=False)
+        self.publish_interval = max(self.interval, float(publish_interval))
+        self.top_n = top_n
+        self.max_stacks = max(1, int(max_stacks))
+        self._published: set = set()
+        self._last_publish = time.monotonic()
+
+    def _after_sample(self) -> None:
+        if time.monotonic() - self._last_publish >= self.publish_interval:
+            self.publish()
+
+    def publish(self) -> None:
+        """Export the current top-N as gauges; series of functions that dropped out are removed."""
+        self._last_publish = time.monotonic()
+        metrics = get_metrics()
+        hot = self.top_functions(self.top_n)
+        current = set()
+        for item in hot:
+            fn = str(item["function"])
+            current.add(fn)
+            metrics.set_gauge(MetricNames.PROFILE_HOT_FUNCTION, float(item["ratio"]), {"function": fn})
+        for fn in self._published - current:
+            # Removed, not zeroed: a long-running worker would otherwise export every function it ever saw
+            metrics.remove_gauge(MetricNames.PROFILE_HOT_FUNCTION, {"function": fn})
+        self._published = current
+        metrics.set_gauge(MetricNames.PROFILE_SAMPLES, float(self.samples))
+        self._decay()
+
+    def _decay(self) -> None:
+        """Halve every stack count, dropping stacks that reach zero and the coldest beyond ``max_stacks``."""
+        with self._lock:
+            decayed = Counter({stack: count // 2 for stack, count in self._stacks.items() if count > 1})
+            if len(decayed) > self.max_stacks:
+                decayed = Counter(dict(decayed.most_common(self.max_stacks)))
+            self._stacks = decayed
+
+
+_CONTINUOUS_LOCK = threading.Lock()
+_CONTINUOUS: Optional[ContinuousProfiler] = None
+
+
+def start_continuous_profiler(
+    interval: Optional[float] = None, publish_interval: Optional[float] = None, top_n: Optional[int] = None
+) -> ContinuousProfiler:
+    """Start (or return) the process-wide continuous profiler."""
+    global _CONTINUOUS
+    from . import config
+
+    with _CONTINUOUS_LOCK:
+        if _CONTINUOUS is None:
+            _CONTINUOUS = ContinuousProfiler(
+                interval=interval if interval is not None else config.PROFILE_CONTINUOUS_INTERVAL_MS / 1000.0,
+                publish_interval=publish_interval if publish_interval is not None else config.PROFILE_PUBLISH_INTERVAL,
+                top_n=top_n if top_n is not None else config.PROFILE_TOP_N,
+            )
+            _CONTINUOUS.start()
+        return _CONTINUOUS
+
+
+def get_continuous_profiler() -> Optional[ContinuousProfiler]:
+    """Return the running continuous profiler, if any."""
+    return _CONTINUOUS
+
+
+def stop_continuous_profiler() -> None:
+    """Stop the continuous profiler (publishing a final snapshot)."""
+    global _CONTINUOUS
+    with _CONTINUOUS_LOCK:
+        profiler, _CONTINUOUS = _CONTINUOUS, None
+    if profiler is not None:
+        profiler.stop()
+        profiler.publish()
+
+
+__all__ = [
+    "SamplingProfiler",
+    "ContinuousProfiler",
+    "profile_for",
+    "format_collapsed",
+    "top_functions",
+    "start_continuous_profiler",
+    "get_continuous_profiler",
+    "stop_continuous_profiler",
+]
@@ -0,0 +1,254 @@
+"""Asynchronous, batched writer for the structured query log.
+
+The synchronous path (``logging`` + ``RotatingFileHandler``) builds, sanitizes and
+JSON-encodes every entry in the request thread and takes the handler lock per
+query. ``AsyncQueryLogWriter`` moves all of that off the query path:
+
+- ``submit`` only enqueues the raw record on a bounded queue. When the queue is
+  full the record is dropped and counted (``query_log_dropped_total``) rather
+  than blocking the request.
+- A background thread drains the queue in batches, renders each record to one
+  JSONL line and writes the batch with a single ``write`` call.
+- Segments rotate by size and/or age using the ``RotatingFileHandler`` naming
+  (``rag_queries.jsonl.1``, ``.2``, ...); with ``compress`` rotated segments are
+  gzipped (``rag_queries.jsonl.1.gz``).
+
+``iter_query_log`` streams entries back from the active file and every rotated
+segment, compressed or not.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+from .metrics import MetricNames, increment_counter
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AsyncQueryLogWriter:
+    """Bounded-queue JSONL writer with a background batching thread."""
+
+    def __init__(
+        self,
+        path: str,
+        render: Callable[[Any], str],
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        rotate_seconds: float = 0,
+        compress: bool = False,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        drop_metric: str = MetricNames.QUERY_LOG_DROPPED,
+    ):
+        """Initialize writer (the thread starts on the first submit).
+
+        Args:
+            path: Active log file; rotated segments get ``.1``, ``.2``, ... suffixes
+            render: Turns a submitted record into one JSON line (runs in the writer thread)
+            max_bytes: Rotate when the active file reaches this size (0 = never)
+            backup_count: Rotated segments to keep (0 = truncate instead of keeping backups)
+            rotate_seconds: Also rotate segments older than this (0 = size only)
+            compress: Gzip rotated segments
+            queue_size: Pending records before new ones are dropped
+            batch_size: Maximum records rendered and written per write call
+            drop_metric: Counter incremented for every dropped record
+        """
+        self.path = str(path)
+        self.render = render
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.batch_size = max(1, batch_size)
+        self.drop_metric = drop_metric
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+        self._file: Optional[TextIO] = None
+        self._opened_at = 0.0
+
+    def submit(self, record: Any) -> bool:
+        """Queue a record for writing. Returns False if it was dropped."""
+        if self._closed:
+            return False
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            increment_counter(self.drop_metric)
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until queued records are written. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Writer counters: records written and dropped, queue depth, rotations."""
+        with self._stats_lock:
+            return {
+                "written": self.written,
+                "dropped": self.dropped,
+                "pending": self._queue.qsize(),
+                "rotations": self.rotations,
+            }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write pending records, stop the writer thread and close the file."""
+        with self._writer_lock:
+            if self._closed:
+                return
+            self._closed = True
+            writer = self._writer
+        if writer is not None:
+            self.flush(timeout=timeout)
+            self._queue.put(_STOP)
+            writer.join(timeout=timeout)
+
+    # --------------------------------------------------------------- internals
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="query-log-writer", daemon=True)
+                self._writer.start()
+                # Single-shot CLI runs exit right after logging; don't lose the tail of the queue
+                atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(record is _STOP for record in batch)
+                try:
+                    self._write_batch([record for record in batch if record is not _STOP])
+                except Exception as e:
+                    logger.warning(f"Failed to write {len(batch)} query log records: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write_batch(self, records: list) -> None:
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.render(record) + "\n")
+            except Exception as e:
+                logger.warning(f"Failed to render query log record: {e}")
+        if not lines:
+            return
+        file = self._file if self._file is not None else self._open()
+        if self._should_rotate(file):
+            file = self._rotate(file)
+        file.write("".join(lines))
+        file.flush()
+        with self._stats_lock:
+            self.written += len(lines)
+
+    def _open(self) -> TextIO:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+        return file
+
+    def _should_rotate(self, file: TextIO) -> bool:
+        size = file.tell()
+        if size == 0:
+            return False
+        if self.max_bytes > 0 and size >= self.max_bytes:
+            return True
+        return self.rotate_seconds > 0 and time.time() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self, file: TextIO) -> TextIO:
+        file.close()
+        self._file = None
+        if self.backup_count > 0:
+            for i in range(self.backup_count, 0, -1):
+                for ext in ("", ".gz"):
+                    src = f"{self.path}.{i}{ext}"
+                    if not os.path.exists(src):
+                        continue
+                    if i == self.backup_count:
+                        os.remove(src)
+                    else:
+                        os.replace(src, f"{self.path}.{i + 1}{ext}")
+            if self.compress:
+                tmp = f"{self.path}.1.gz.tmp"
+                with open(self.path, "rb") as src_f, gzip.open(tmp, "wb") as dst_f:
+                    shutil.copyfileobj(src_f, dst_f)
+                os.replace(tmp, f"{self.path}.1.gz")
+                os.remove(self.path)
+            else:
+                os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        with self._stats_lock:
+            self.rotations += 1
+        return self._open()
+
+
+def query_log_segments(log_file: str) -> List[str]:
+    """Existing query log files, oldest rotation first (``.N``/``.N.gz`` ... ``.1``, then the active file)."""
+    base = Path(log_file)
+    rotated = []
+    for path in base.parent.glob(base.name + ".*"):
+        suffix = path.name[len(base.name) + 1 :]
+        index, _, ext = suffix.partition(".")
+        if index.isdigit() and ext in ("", "gz"):
+            rotated.append((int(index), str(path)))
+    segments = [path for _, path in sorted(rotated, reverse=True)]
+    if base.exists():
+        segments.append(str(base))
+    return segments
+
+
+def iter_query_log(log_file: str) -> Iterator[Dict[str, Any]]:
+    """Stream entries from the query log and its rotated segments, skipping malformed lines."""
+    for path in query_log_segments(log_file):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict):
+                    yield entry
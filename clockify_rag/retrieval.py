@@ -24,11 +24,15 @@ import numpy as np
 import clockify_rag.config as config
 from .api_client import ChatCompletionOptions, ChatMessage
 from .embedding import embed_query as _embedding_embed_query
-from .exceptions import LLMError, ValidationError
-from .indexing import bm25_scores, get_faiss_index
+from .deadline import bound_timeout, check_deadline, mark_degraded, skip_optional_stage
+from .exceptions import DeadlineExceededError, LLMError, LLMOverloadedError, ValidationError
+from .caching import get_rerank_cache
+from .indexing import bm25_scores, get_faiss_index, get_index_generation
 from .utils import tokenize  # FIX (Error #17): Import tokenize from utils instead of duplicating
 from .intent_classification import classify_intent, get_intent_metadata, adjust_scores_by_intent
 from .prompts import QWEN_SYSTEM_PROMPT, build_rag_user_prompt
+from .tokenizer import get_token_counter
+from .tracing import set_span_attributes, span
 
 logger = logging.getLogger(__name__)
 
@@ -237,6 +241,7 @@ QUERY_EXPANSIONS_ENV_VAR = "CLOCKIFY_QUERY_EXPANSIONS"
 _DEFAULT_QUERY_EXPANSION_PATH = pathlib.Path(__file__).resolve().parent.parent / "config" / "query_expansions.json"
 _query_expansion_cache = None
 _query_expansion_override = None
+_query_expander = None
 
 
 def set_query_expansion_path(path):
@@ -251,8 +256,9 @@ def set_query_expansion_path(path):
 
 def reset_query_expansion_cache():
     """Clear cached query expansion data (useful for tests)."""
-    global _query_expansion_cache
+    global _query_expansion_cache, _query_expander
     _query_expansion_cache = None
+    _query_expander = None
 
 
 def _resolve_query_expansion_path():
@@ -327,18 +333,135 @@ def load_query_expansion_dict(force_reload=False, suppress_errors=True):
     if not force_reload and _query_expansion_cache is not None:
         return _query_expansion_cache
 
+    global _query_expander
+
     path = _resolve_query_expansion_path()
 
     try:
         _query_expansion_cache = _read_query_expansion_file(path)
-        return _query_expansion_cache
     except Exception as e:
         if suppress_errors:
             logger.warning(f"Failed to load query expansion config from {path}: {e}")
             _query_expansion_cache = {}
-            return _query_expansion_cache
         else:
             raise
+    _query_expander = QueryExpander(_query_expansion_cache)
+    return _query_expansion_cache
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class QueryExpander:
+    """Compiled matcher for the query expansion dictionary.
+
+    Terms are stored in a character trie that is walked from every word
+    boundary of the query, so matching costs O(len(query) * longest term)
+    regardless of how many entries the dictionary holds. Boundary handling
+    mirrors the previous per-term word-boundary regex search and, unlike a
+    single alternation regex, overlapping terms ("time" inside
+    "time tracking") all match.
+
+    Synonym lists are deduplicated and tokenized once at build time so BM25
+    can consume expansion tokens without re-tokenizing the expanded string.
+    """
+
+    _END = ""
+
+    def __init__(self, expansions: Dict[str, List[str]]):
+        self._trie: Dict[str, Any] = {}
+        self._synonyms: List[List[str]] = []
+        self._synonym_tokens: Dict[str, List[str]] = {}
+
+        for term, synonyms in expansions.items():
+            if not term:
+                continue
+            node = self._trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            if self._END in node:
+                # Duplicate keys collapse in JSON, but keep the first entry stable anyway
+                continue
+            node[self._END] = len(self._synonyms)
+            self._synonyms.append(list(dict.fromkeys(synonyms)))
+            for syn in synonyms:
+                if syn not in self._synonym_tokens:
+                    self._synonym_tokens[syn] = tokenize(syn)
+
+    def __len__(self) -> int:
+        return len(self._synonyms)
+
+    def match(self, text: str) -> List[int]:
+        """Return ids of dictionary terms found in ``text`` (in dictionary order)."""
+        q = text.lower()
+        n = len(q)
+        if not n or not self._synonyms:
+            return []
+
+        is_word = [_is_word_char(ch) for ch in q]
+        matched = set()
+        end = self._END
+        trie = self._trie
+
+        for start in range(n):
+            before = is_word[start - 1] if start else False
+            if before == is_word[start]:
+                continue  # not a word boundary
+            node = trie
+            pos = start
+            while pos < n:
+                child = node.get(q[pos])
+                if child is None:
+                    break
+                node = child
+                pos += 1
+                if end in node:
+                    after = is_word[pos] if pos < n else False
+                    if is_word[pos - 1] != after:
+                        matched.add(node[end])
+
+        return sorted(matched)
+
+    def synonyms_for(self, text: str) -> List[str]:
+        """Return deduplicated synonyms for all terms matched in ``text``."""
+        expanded: List[str] = []
+        seen = set()
+        for term_id in self.match(text):
+            for syn in self._synonyms[term_id]:
+                if syn not in seen:
+                    seen.add(syn)
+                    expanded.append(syn)
+        return expanded
+
+    def expand(self, question: str) -> str:
+        """Return ``question`` followed by its expansion terms."""
+        expanded_terms = self.synonyms_for(question)
+        if expanded_terms:
+            return f"{question} {' '.join(expanded_terms)}"
+        return question
+
+    def expand_tokens(self, question: str) -> List[str]:
+        """Return BM25 query tokens for ``question`` plus its expansion terms.
+
+        Equivalent to ``tokenize(self.expand(question))`` but reuses the
+        synonym tokens computed at build time.
+        """
+        tokens = tokenize(question)
+        for syn in self.synonyms_for(question):
+            tokens.extend(self._synonym_tokens[syn])
+        return tokens
+
+
+def get_query_expander() -> QueryExpander:
+    """Return the compiled expander for the active expansion dictionary."""
+    expander = _query_expander
+    if expander is None:
+        load_query_expansion_dict()
+        expander = _query_expander
+        if expander is None:
+            expander = QueryExpander({})
+    return expander
 
 
 # FIX (Error #17): Removed duplicate tokenize function - now imported from utils.py
@@ -352,7 +475,9 @@ def approx_tokens(chars: int) -> int:
 def count_tokens(text: str, model: Optional[str] = None) -> int:
     """Count actual tokens using tiktoken for supported models.
 
-    Falls back to model-specific heuristics for Qwen and other models.
+    Uses the exact local tokenizer (``RAG_TOKENIZER_PATH``) when it is loaded for
+    the requested model. Falls back to model-specific heuristics for Qwen and
+    other models.
 
     Args:
         text: Text to count tokens for
@@ -365,6 +490,10 @@ def count_tokens(text: str, model: Optional[str] = None) -> int:
 
     model_name: str = model or config.RAG_CHAT_MODEL or ""
 
+    counter = get_token_counter()
+    if counter.exact and (model is None or model == counter.model):
+        return counter.count(text)
+
     # Try tiktoken for GPT models
     if "gpt" in model_name.lower():
         try:
@@ -399,6 +528,16 @@ def truncate_to_token_budget(text: str, budget: int) -> str:
 
     FIX (Error #9): Handles edge case where budget is smaller than ellipsis tokens.
     """
+    counter = get_token_counter()
+    if counter.exact:
+        # OPTIMIZATION: One encode + token offsets instead of a binary search of re-encodes
+        if counter.count(text) <= budget:
+            return text
+        ellipsis_tokens = counter.count("...")
+        if budget < ellipsis_tokens:
+            return counter.truncate(text, budget)
+        return counter.truncate(text, budget - ellipsis_tokens) + "..."
+
     est_tokens = count_tokens(text)
     if est_tokens <= budget:
         return text
@@ -448,21 +587,21 @@ def expand_query(question: str) -> str:
     if not question:
         return question
 
-    expansions = load_query_expansion_dict()
-    q_lower = question.lower()
-    expanded_terms = []
+    return get_query_expander().expand(question)
 
-    for term, synonyms in expansions.items():
-        if re.search(r"\b" + re.escape(term) + r"\b", q_lower):
-            for syn in synonyms:
-                if syn not in expanded_terms:
-                    expanded_terms.append(syn)
 
-    if expanded_terms:
-        expansion = " ".join(expanded_terms)
-        return f"{question} {expansion}"
+def expand_query_tokens(question: str) -> List[str]:
+    """Return BM25 query tokens for ``question`` including expansion synonyms.
 
-    return question
+    Same terms as ``tokenize(expand_query(question))`` without building and
+    re-tokenizing the expanded string.
+    """
+    question = validate_query_length(question)
+
+    if not question:
+        return []
+
+    return get_query_expander().expand_tokens(question)
 
 
 def normalize_scores_zscore(arr: np.ndarray) -> np.ndarray:
@@ -560,12 +699,42 @@ class DenseScoreStore:
         except (IndexError, KeyError):
             return default
 
+    def take(self, indices) -> np.ndarray:
+        """Vectorized gather of scores for ``indices`` (float32 array).
+
+        Uncached entries are computed with a single mat-vec over the missing rows
+        instead of one dot product per index.
+        """
+        idx = np.asarray(indices, dtype=np.int64).reshape(-1)
+        if idx.size and (idx.min() < 0 or idx.max() >= self._length):
+            raise IndexError(int(idx.min() if idx.min() < 0 else idx.max()))
+
+        if self._full is not None:
+            return self._full[idx].astype("float32", copy=True)
+
+        missing = list(dict.fromkeys(int(i) for i in idx if int(i) not in self._cache))
+        if missing:
+            if self._vecs is None or self._qv is None:
+                raise KeyError(missing[0])
+            computed = self._vecs[missing].dot(self._qv)
+            self._cache.update(zip(missing, (float(v) for v in computed)))
+        return np.fromiter((self._cache[int(i)] for i in idx), dtype="float32", count=idx.size)
+
     def to_array(self) -> np.ndarray:
         return self._materialize_full().copy()
 
 
 def retrieve(
-    question: str, chunks, vecs_n, bm, top_k=None, hnsw=None, retries=0, faiss_index_path=None
+    question: str,
+    chunks,
+    vecs_n,
+    bm,
+    top_k=None,
+    hnsw=None,
+    retries=0,
+    faiss_index_path=None,
+    alpha: Optional[float] = None,
+    query_vec: Optional[np.ndarray] = None,
 ) -> Tuple[List[int], Dict[str, Any]]:
     """Hybrid retrieval: dense + BM25 + dedup. Optionally uses FAISS/HNSW for fast K-NN.
 
@@ -581,6 +750,11 @@ def retrieve(
     Query expansion: Applies domain-specific synonym expansion for BM25 (keyword-based),
     uses original query for dense retrieval (embeddings already capture semantics).
 
+    Args:
+        alpha: Override the BM25 weight (both ALPHA_HYBRID and the intent-specific alpha);
+            used by parameter sweeps
+        query_vec: Precomputed normalized query embedding (skips the embedding call)
+
     Returns:
         Tuple of (filtered_indices, scores_dict) where filtered_indices is list of int
         and scores_dict contains 'dense', 'bm25', 'hybrid' numpy arrays plus 'intent_metadata'.
@@ -608,141 +782,165 @@ def retrieve(
     )
 
     # OPTIMIZATION: Classify query intent for specialized retrieval strategy (if enabled)
-    intent_metadata = {}
-    if config.USE_INTENT_CLASSIFICATION:
-        intent_name, intent_config, intent_confidence = classify_intent(question)
-        alpha_hybrid = intent_config.alpha_hybrid  # Use intent-specific alpha
-        intent_metadata = get_intent_metadata(intent_name, intent_confidence)
-    else:
-        alpha_hybrid = config.ALPHA_HYBRID  # Use static alpha from config
-
-    # Expand query for BM25 keyword matching
-    expanded_question = expand_query(question)
+    with span("retrieve.intent"):
+        intent_metadata = {}
+        if config.USE_INTENT_CLASSIFICATION:
+            intent_name, intent_config, intent_confidence = classify_intent(question)
+            alpha_hybrid = intent_config.alpha_hybrid  # Use intent-specific alpha
+            intent_metadata = get_intent_metadata(intent_name, intent_confidence)
+        else:
+            alpha_hybrid = config.ALPHA_HYBRID  # Use static alpha from config
+        if alpha is not None:
+            alpha_hybrid = float(alpha)
+
+    # Expand query for BM25 keyword matching (pre-tokenized by the compiled expander)
+    check_deadline("retrieve")
+    with span("retrieve.expand") as sp:
+        if skip_optional_stage("expansion"):
+            # Budget is tight: plain tokens, keep the remaining time for generation
+            bm_query_tokens = tokenize(question)
+            sp.set_attribute("skipped", "deadline")
+        else:
+            bm_query_tokens = expand_query_tokens(question)
+        sp.set_attribute("tokens", len(bm_query_tokens))
 
     # Use original question for embedding
-    qv_n = embed_query(question, retries=retries)
-
-    # Get FAISS index from centralized source (indexing module)
-    faiss_index = None
-    if config.USE_ANN == "faiss":
-        faiss_index = get_faiss_index(faiss_index_path)
-        if faiss_index:
-            # Defensive: skip FAISS if dimension mismatches current query vectors (e.g., toy tests)
-            try:
-                faiss_dim = getattr(faiss_index, "d", None)
-                if faiss_dim is not None and faiss_dim != qv_n.shape[0]:
-                    logger.info(
-                        "info: ann=fallback reason=dim-mismatch faiss_d=%s q_dim=%s",
-                        faiss_dim,
-                        qv_n.shape[0],
-                    )
+    with span("retrieve.embed"):
+        if query_vec is not None:
+            qv_n = np.asarray(query_vec, dtype=np.float32)
+        else:
+            qv_n = embed_query(question, retries=retries)
+
+    with span("retrieve.dense") as dense_span:
+        # Get FAISS index from centralized source (indexing module)
+        faiss_index = None
+        if config.USE_ANN == "faiss":
+            faiss_index = get_faiss_index(faiss_index_path)
+            if faiss_index:
+                # Defensive: skip FAISS if dimension mismatches current query vectors (e.g., toy tests)
+                try:
+                    faiss_dim = getattr(faiss_index, "d", None)
+                    if faiss_dim is not None and faiss_dim != qv_n.shape[0]:
+                        logger.info(
+                            "info: ann=fallback reason=dim-mismatch faiss_d=%s q_dim=%s",
+                            faiss_dim,
+                            qv_n.shape[0],
+                        )
+                        faiss_index = None
+                except Exception as e:
+                    logger.debug("FAISS dimension check failed: %s", e)
                     faiss_index = None
-            except Exception as e:
-                logger.debug("FAISS dimension check failed: %s", e)
-                faiss_index = None
 
-        if faiss_index:
-            # Only set nprobe for IVF indexes (not flat indexes)
-            if hasattr(faiss_index, "nprobe"):
-                faiss_index.nprobe = config.ANN_NPROBE
-            logger.info("info: ann=faiss status=loaded nprobe=%d", config.ANN_NPROBE)
-        elif faiss_index_path:
-            logger.info("info: ann=fallback reason=missing-index")
-
-    dense_scores_full = None
-    candidate_idx: List[int] = []
-    n_chunks = len(chunks)
-    dot_elapsed = 0.0
-    dense_computed = 0
-
-    if faiss_index:
-        # Only score FAISS candidates, don't compute full corpus
-        distances, indices = faiss_index.search(
-            qv_n.reshape(1, -1).astype("float32"),
-            max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER),
-        )
-        # Filter indices and distances together to maintain alignment
-        # (prevents misalignment when FAISS returns -1 sentinels)
-        valid_pairs = [(int(i), float(d)) for i, d in zip(indices[0], distances[0]) if 0 <= i < n_chunks]
-        candidate_idx = [i for i, _ in valid_pairs]
-        dense_from_ann = np.array([d for _, d in valid_pairs], dtype=np.float32)
-
-        dense_scores = dense_from_ann
-        dense_scores_full = np.zeros(n_chunks, dtype=np.float32)
-        for idx_val, score_val in valid_pairs:
-            dense_scores_full[idx_val] = score_val
-        dense_computed = len(candidate_idx)
-        dot_elapsed = 0.0
-    elif hnsw:
-        _, cand = hnsw.knn_query(qv_n, k=max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER))
-        candidate_idx = cand[0].tolist()
-        dot_start = time.perf_counter()
-        # Compute scores only for HNSW candidates to avoid full-matrix dot products
-        if candidate_idx:
-            dense_scores = np.array([float(vecs_n[idx].dot(qv_n)) for idx in candidate_idx], dtype=np.float32)
-        else:
-            dense_scores = np.array([], dtype=np.float32)
+            if faiss_index:
+                # Only set nprobe for IVF indexes (not flat indexes)
+                if hasattr(faiss_index, "nprobe"):
+                    faiss_index.nprobe = config.ANN_NPROBE
+                logger.info("info: ann=faiss status=loaded nprobe=%d", config.ANN_NPROBE)
+            elif faiss_index_path:
+                logger.info("info: ann=fallback reason=missing-index")
+
         dense_scores_full = None
-        dot_elapsed = time.perf_counter() - dot_start
-        dense_computed = len(candidate_idx)
-    else:
-        dot_start = time.perf_counter()
-        dense_scores_full = vecs_n.dot(qv_n)
-        dot_elapsed = time.perf_counter() - dot_start
-        dense_computed = n_chunks
-        dense_scores = dense_scores_full
-        candidate_idx = np.arange(len(chunks)).tolist()
-
-    if not candidate_idx and not faiss_index:
-        max_candidates = max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER)
-        dense_scores_full = vecs_n.dot(qv_n)
-        if len(chunks) > max_candidates:
-            top_indices = np.argsort(dense_scores_full)[::-1][:max_candidates]
-            candidate_idx = top_indices.tolist()
-            dense_scores = dense_scores_full[top_indices]
+        candidate_idx: List[int] = []
+        n_chunks = len(chunks)
+        dot_elapsed = 0.0
+        dense_computed = 0
+
+        if faiss_index:
+            # Only score FAISS candidates, don't compute full corpus
+            distances, indices = faiss_index.search(
+                qv_n.reshape(1, -1).astype("float32"),
+                max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER),
+            )
+            # Filter indices and distances together to maintain alignment
+            # (prevents misalignment when FAISS returns -1 sentinels)
+            valid_pairs = [(int(i), float(d)) for i, d in zip(indices[0], distances[0]) if 0 <= i < n_chunks]
+            candidate_idx = [i for i, _ in valid_pairs]
+            dense_from_ann = np.array([d for _, d in valid_pairs], dtype=np.float32)
+
+            dense_scores = dense_from_ann
+            dense_scores_full = np.zeros(n_chunks, dtype=np.float32)
+            for idx_val, score_val in valid_pairs:
+                dense_scores_full[idx_val] = score_val
+            dense_computed = len(candidate_idx)
+            dot_elapsed = 0.0
+        elif hnsw:
+            _, cand = hnsw.knn_query(qv_n, k=max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER))
+            candidate_idx = cand[0].tolist()
+            dot_start = time.perf_counter()
+            # Compute scores only for HNSW candidates to avoid full-matrix dot products
+            if candidate_idx:
+                dense_scores = np.array([float(vecs_n[idx].dot(qv_n)) for idx in candidate_idx], dtype=np.float32)
+            else:
+                dense_scores = np.array([], dtype=np.float32)
+            dense_scores_full = None
+            dot_elapsed = time.perf_counter() - dot_start
+            dense_computed = len(candidate_idx)
         else:
-            candidate_idx = np.arange(len(chunks)).tolist()
+            dot_start = time.perf_counter()
+            dense_scores_full = vecs_n.dot(qv_n)
+            dot_elapsed = time.perf_counter() - dot_start
+            dense_computed = n_chunks
             dense_scores = dense_scores_full
+            candidate_idx = np.arange(len(chunks)).tolist()
+
+        if not candidate_idx and not faiss_index:
+            max_candidates = max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER)
+            dense_scores_full = vecs_n.dot(qv_n)
+            if len(chunks) > max_candidates:
+                top_indices = np.argsort(dense_scores_full)[::-1][:max_candidates]
+                candidate_idx = top_indices.tolist()
+                dense_scores = dense_scores_full[top_indices]
+            else:
+                candidate_idx = np.arange(len(chunks)).tolist()
+                dense_scores = dense_scores_full
+
+        dense_span.set_attribute("ann", "faiss" if faiss_index else ("hnsw" if hnsw else "linear"))
+        dense_span.set_attribute("candidates", len(candidate_idx))
 
     candidate_idx_array = np.array(candidate_idx, dtype=np.int32)
 
     # Use expanded query for BM25
-    bm_scores_full = bm25_scores(expanded_question, bm, top_k=top_k * 3)
-
-    # Normalize once, then slice for candidates
-    zs_bm_full = normalize_scores_zscore(bm_scores_full)
-    zs_dense_full = None
-    if dense_scores_full is not None:
-        dense_scores_full = np.asarray(dense_scores_full, dtype="float32")
-        zs_dense_full = normalize_scores_zscore(dense_scores_full)
-        zs_dense = zs_dense_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
-    else:
-        dense_scores = np.asarray(dense_scores, dtype="float32")
-        zs_dense = normalize_scores_zscore(dense_scores)
-    zs_bm = zs_bm_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
+    with span("retrieve.bm25"):
+        bm_scores_full = bm25_scores(bm_query_tokens, bm, top_k=top_k * 3)
+
+    with span("retrieve.normalize"):
+        # Normalize once, then slice for candidates
+        zs_bm_full = normalize_scores_zscore(bm_scores_full)
+        zs_dense_full = None
+        if dense_scores_full is not None:
+            dense_scores_full = np.asarray(dense_scores_full, dtype="float32")
+            zs_dense_full = normalize_scores_zscore(dense_scores_full)
+            zs_dense = zs_dense_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
+        else:
+            dense_scores = np.asarray(dense_scores, dtype="float32")
+            zs_dense = normalize_scores_zscore(dense_scores)
+        zs_bm = zs_bm_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
 
     # OPTIMIZATION: Apply intent-based score boosting (if enabled)
     # Boosts chunks containing intent-specific keywords (e.g., pricing sections for pricing queries)
     # Note: When using FAISS, only BM25 scores are boosted (dense scores not fully materialized for performance)
     if config.USE_INTENT_CLASSIFICATION and intent_config.boost_factor != 1.0:
-        # Build scores dict for boosting (include dense only if available)
-        temp_scores = {"bm25": zs_bm_full}
-        if zs_dense_full is not None:
-            temp_scores["dense"] = zs_dense_full
-
-        # Apply intent-specific boosting to relevant chunks
-        temp_scores = adjust_scores_by_intent(chunks, temp_scores, intent_config)
-
-        # Update normalized scores with boosted values
-        zs_bm_full = temp_scores["bm25"]
-        if zs_dense_full is not None:
-            # Only update dense scores if they were fully materialized
-            zs_dense_full = temp_scores["dense"]
-
-        # Re-slice candidate scores from boosted full scores
-        zs_bm = zs_bm_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
-        if zs_dense_full is not None:
-            zs_dense = zs_dense_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
+        with span("retrieve.intent_boost"):
+            # Build scores dict for boosting (include dense only if available)
+            temp_scores = {"bm25": zs_bm_full}
+            if zs_dense_full is not None:
+                temp_scores["dense"] = zs_dense_full
+
+            # Apply intent-specific boosting to relevant chunks
+            temp_scores = adjust_scores_by_intent(chunks, temp_scores, intent_config)
+
+            # Update normalized scores with boosted values
+            zs_bm_full = temp_scores["bm25"]
+            if zs_dense_full is not None:
+                # Only update dense scores if they were fully materialized
+                zs_dense_full = temp_scores["dense"]
+
+            # Re-slice candidate scores from boosted full scores
+            zs_bm = zs_bm_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
+            if zs_dense_full is not None:
+                zs_dense = (
+                    zs_dense_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
+                )
 
     # Hybrid scoring (OPTIMIZATION: use intent-specific alpha for +8-12% accuracy)
     def _apply_hub_penalty(scores: np.ndarray, idx_array: np.ndarray) -> np.ndarray:
@@ -759,27 +957,28 @@ def retrieve(
                 penalized[pos] = penalized[pos] * config.HUB_PAGE_SCORE_MULTIPLIER
         return penalized
 
-    hybrid = alpha_hybrid * zs_bm + (1 - alpha_hybrid) * zs_dense
-    hybrid_penalized = _apply_hub_penalty(hybrid, candidate_idx_array) if hybrid.size else hybrid
-    if hybrid_penalized.size:
-        top_positions = np.argsort(hybrid_penalized)[::-1][:top_k]
-        top_idx = candidate_idx_array[top_positions]
-    else:
-        top_idx = np.array([], dtype=np.int32)
+    with span("retrieve.hybrid"):
+        hybrid = alpha_hybrid * zs_bm + (1 - alpha_hybrid) * zs_dense
+        hybrid_penalized = _apply_hub_penalty(hybrid, candidate_idx_array) if hybrid.size else hybrid
+        if hybrid_penalized.size:
+            top_positions = np.argsort(hybrid_penalized)[::-1][:top_k]
+            top_idx = candidate_idx_array[top_positions]
+        else:
+            top_idx = np.array([], dtype=np.int32)
 
-    # Deduplication (stable by article key to avoid cross-article collisions)
-    seen = set()
-    filtered = []
-    for i in top_idx:
-        try:
-            dedup_key = (_article_key(chunks[i]), chunks[i].get("section"))
-        except Exception:
-            dedup_key = (chunks[i].get("title"), chunks[i].get("section"))
-        key = dedup_key
-        if key in seen:
-            continue
-        seen.add(key)
-        filtered.append(i)
+        # Deduplication (stable by article key to avoid cross-article collisions)
+        seen = set()
+        filtered = []
+        for i in top_idx:
+            try:
+                dedup_key = (_article_key(chunks[i]), chunks[i].get("section"))
+            except Exception:
+                dedup_key = (chunks[i].get("title"), chunks[i].get("section"))
+            key = dedup_key
+            if key in seen:
+                continue
+            seen.add(key)
+            filtered.append(i)
 
     # Reuse cached normalized scores for full hybrid (OPTIMIZATION: use intent-specific alpha)
     if zs_dense_full is not None:
@@ -820,6 +1019,8 @@ def retrieve(
 
     with _RETRIEVE_PROFILE_LOCK:
         RETRIEVE_PROFILE_LAST = profile_data
+    # Per-request copy on the caller's span (RETRIEVE_PROFILE_LAST is last-writer-wins)
+    set_span_attributes(**profile_data)
 
     if logger.isEnabledFor(logging.DEBUG):
         logger.debug(
@@ -857,6 +1058,25 @@ def rerank_with_llm(
     if len(selected) <= 1:
         return selected, {}, False, "disabled"
 
+    rerank_model = getattr(config, "RERANK_MODEL", "") or config.RAG_CHAT_MODEL or ""
+
+    # OPTIMIZATION: Reuse a previous ranking of the exact same candidate set (skips the LLM round trip)
+    rerank_cache = get_rerank_cache()
+    cache_key = None
+    generation = ""
+    if rerank_cache is not None:
+        candidate_ids = [chunks[i]["id"] for i in selected]
+        generation = get_index_generation()
+        cache_key = rerank_cache.make_key(question, candidate_ids, rerank_model, generation)
+        cached = rerank_cache.get(cache_key)
+        if cached is not None:
+            order_ids, scores_by_id = cached
+            cid_to_idx = {chunks[i]["id"]: i for i in selected}
+            order = [cid_to_idx[cid] for cid in order_ids if cid in cid_to_idx]
+            if order:
+                cached_scores = {cid_to_idx[cid]: score for cid, score in scores_by_id.items() if cid in cid_to_idx}
+                return order, cached_scores, True, "cached"
+
     # Build passage list
     passages_text = "\n\n".join(
         [f"[id={chunks[i]['id']}]\n{chunks[i]['text'][:config.RERANK_SNIPPET_MAX_CHARS]}" for i in selected]
@@ -887,14 +1107,16 @@ def rerank_with_llm(
     }
 
     rerank_scores: Dict[int, float] = {}
-    rerank_model = getattr(config, "RERANK_MODEL", "") or config.RAG_CHAT_MODEL
 
     try:
         response = chat_completion(
             messages=messages,
             model=rerank_model,
             options=options,
-            timeout=(config.CHAT_CONNECT_T, config.RERANK_READ_T),
+            # Rerank may only spend the budget not reserved for answer generation
+            timeout=bound_timeout(
+                (config.CHAT_CONNECT_T, config.RERANK_READ_T), "rerank", reserve=config.DEADLINE_GENERATION_RESERVE
+            ),
             retries=retries,
         )
         resp = response
@@ -923,16 +1145,32 @@ def rerank_with_llm(
 
             if reranked:
                 reranked.sort(key=lambda x: x[1], reverse=True)
-                return [idx for idx, _ in reranked], rerank_scores, True, ""
+                order = [idx for idx, _ in reranked]
+                if rerank_cache is not None and cache_key is not None:
+                    rerank_cache.put(
+                        cache_key,
+                        [chunks[idx]["id"] for idx in order],
+                        {chunks[idx]["id"]: score for idx, score in rerank_scores.items()},
+                        generation=generation,
+                    )
+                return order, rerank_scores, True, ""
             else:
                 logger.debug("info: rerank=fallback reason=empty")
                 return selected, rerank_scores, False, "empty"
         except json.JSONDecodeError:
             logger.debug("info: rerank=fallback reason=json")
             return selected, rerank_scores, False, "json"
+    except DeadlineExceededError:
+        mark_degraded("rerank")
+        logger.debug("info: rerank=fallback reason=deadline")
+        return selected, rerank_scores, False, "deadline"
     except LLMError as e:
         # Handle LLM-specific errors from the API client
         error_type = type(e).__name__
+        if isinstance(e, LLMOverloadedError):
+            # Rerank is optional: skip it rather than queue behind answer generation
+            logger.debug("info: rerank=fallback reason=overloaded")
+            return selected, rerank_scores, False, "overloaded"
         if "timeout" in str(e).lower():
             logger.debug("info: rerank=fallback reason=timeout")
             return selected, rerank_scores, False, "timeout"
@@ -952,6 +1190,34 @@ def rerank_with_llm(
         return selected, rerank_scores, False, "unexpected"
 
 
+def rerank_with_cross_encoder(question: str, chunks, selected) -> Tuple:
+    """Rerank MMR-selected passages with the local cross-encoder.
+
+    Scores are computed in one batched inference call and cached per
+    (query, chunk id), so repeated questions skip the model entirely.
+
+    Returns: (order, scores, rerank_applied, rerank_reason)
+    """
+    if len(selected) <= 1:
+        return selected, {}, False, "disabled"
+
+    from .embedding import score_cross_encoder
+
+    try:
+        ce_scores = score_cross_encoder(question, [chunks[i] for i in selected])
+    except ImportError:
+        logger.debug("info: rerank=fallback reason=unavailable")
+        return selected, {}, False, "unavailable"
+    except Exception as e:
+        logger.warning(f"Unexpected error in cross-encoder reranking: {type(e).__name__}: {e}", exc_info=True)
+        return selected, {}, False, "unexpected"
+
+    rerank_scores: Dict[int, float] = {idx: float(score) for idx, score in zip(selected, ce_scores)}
+    # Stable sort keeps MMR order for ties
+    order = [selected[pos] for pos in np.argsort(-ce_scores, kind="stable")]
+    return order, rerank_scores, True, ""
+
+
 def _fmt_snippet_header(chunk):
     """Format chunk header: [id | title | section] + optional URL."""
     hdr = f"[{chunk['id']} | {chunk['title']} | {chunk['section']}]"
@@ -1020,6 +1286,12 @@ def pack_snippets(
 
     sep_text = "\n\n---\n\n"
     sep_tokens = count_tokens(sep_text)
+    join_tokens = count_tokens("\n\n")
+
+    # OPTIMIZATION: Count candidate chunks once (batched, cached per chunk id) instead of
+    # re-counting the growing article body for every chunk appended.
+    counter = get_token_counter()
+    counter.prime_chunks((chunks[idx] for idx in order), fallback=count_tokens)
 
     # Group chunks by article key in retrieval order
     article_order: List[str] = []
@@ -1070,14 +1342,22 @@ def pack_snippets(
         body_parts: List[str] = []
         included_ids: List[Any] = []
         body_text = ""
+        header_tokens = count_tokens(article_header)
+        body_tokens = 0
         for chunk in chunks_for_article:
             addition = ("" if not body_parts else "\n\n") + chunk["text"]
             candidate_body = body_text + addition
-            candidate_tokens = count_tokens(article_header + candidate_body)
+            # Additive estimate; +1 per piece covers token merges/splits at concatenation
+            # boundaries. The exact block count below is the final guard.
+            piece_tokens = (join_tokens if body_parts else 0) + counter.count_chunk(
+                chunk.get("id"), chunk["text"], fallback=count_tokens
+            )
+            candidate_tokens = header_tokens + body_tokens + piece_tokens + 1
             if candidate_tokens <= available_tokens:
                 body_parts.append(chunk["text"])
                 included_ids.append(chunk["id"])
                 body_text = candidate_body
+                body_tokens += piece_tokens + 1
                 continue
 
             remaining_for_body = available_tokens - count_tokens(article_header + body_text)
@@ -1315,11 +1595,15 @@ def __getattr__(name: str) -> str:
 
 __all__ = [
     "expand_query",
+    "expand_query_tokens",
+    "QueryExpander",
+    "get_query_expander",
     "embed_query",
     "normalize_scores_zscore",
     "DenseScoreStore",
     "retrieve",
     "rerank_with_llm",
+    "rerank_with_cross_encoder",
     "pack_snippets",
     "derive_role_security_hints",
     "coverage_ok",
@@ -0,0 +1,478 @@
+"""Synthetic-corpus scaling benchmark with regression gates.
+
+``benchmark.py`` measures whatever small index is on disk, which says nothing
+about how retrieval behaves at 100x the size. This suite generates deterministic
+synthetic corpora (1k / 10k / 100k chunks by default, 1M on request), runs each
+retrieval stage plus the offline end-to-end pipeline against them, and compares
+the results with a versioned JSON baseline.
+
+Corpus model:
+
+* Vocabulary of pronounceable pseudo-words; chunk text is drawn from a Zipfian
+  distribution, so BM25 sees realistic posting-list skew (a few very common
+  terms, a long tail of rare ones).
+* Embeddings are article centroids plus per-chunk noise (unit-normalized,
+  float32), so MMR has near-duplicates to diversify away from.
+* Queries are built from a target chunk's words, and their vectors from the
+  target's vector plus noise; the embedding call is replaced by a lookup, and
+  the LLM by ``MockLLMClient``. Nothing touches the network.
+
+Stages: ``build_bm25`` (index build), ``bm25`` (``bm25_scores``), ``dense_scan``
+(full mat-vec), ``retrieve`` (hybrid, precomputed query vector), ``mmr``
+(``apply_mmr_diversification``), ``pack`` (``pack_snippets``) and ``e2e``
+(``answer_once`` with the mock LLM). Each query stage records p50/p95/p99
+latency, throughput and peak Python allocations for one call.
+
+Usage:
+    python -m clockify_rag.scaling_benchmark --sizes 1000 10000 --output bench.json
+    python -m clockify_rag.scaling_benchmark --baseline benchmarks/scaling_baseline.json --tolerance 0.25
+    python -m clockify_rag.scaling_benchmark --sizes 1000000 --queries 10   # needs several GB of RAM
+
+Exit codes: 0 ok, 1 regression beyond tolerance, 2 baseline unusable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from . import config
+
+if TYPE_CHECKING:
+    from .api_client import BaseLLMClient
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+QUERY_STAGES = ("bm25", "dense_scan", "retrieve", "mmr", "pack", "e2e")
+
+_CONSONANTS = "bcdfghjklmnprstvz"
+_VOWELS = "aeiou"
+_SYLLABLES = [c + v for c in _CONSONANTS for v in _VOWELS]
+
+
+# ====== Synthetic corpus ======
+
+
+def make_vocabulary(size: int) -> List[str]:
+    """Deterministic pseudo-words (``tokenize`` returns them unchanged)."""
+    words = []
+    base = len(_SYLLABLES)
+    for i in range(size):
+        n, parts = i, []
+        for _ in range(2):  # at least two syllables, so no word collides with a stopword
+            n, digit = divmod(n, base)
+            parts.append(_SYLLABLES[digit])
+        while n:
+            n, digit = divmod(n - 1, base)
+            parts.append(_SYLLABLES[digit])
+        words.append("".join(parts))
+    return words
+
+
+@dataclass
+class SyntheticCorpus:
+    """Chunks, normalized vectors and benchmark queries for one corpus size."""
+
+    chunks: List[Dict[str, Any]]
+    vecs_n: np.ndarray
+    queries: List[str]
+    query_vecs: Dict[str, np.ndarray]
+
+
+def generate_corpus(
+    n_chunks: int,
+    dim: int = 384,
+    vocab_size: int = 50_000,
+    words_per_chunk: int = 48,
+    chunks_per_article: int = 8,
+    n_queries: int = 50,
+    zipf_s: float = 1.1,
+    seed: int = 0,
+) -> SyntheticCorpus:
+    """Generate a deterministic corpus; the same arguments always give the same corpus."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(make_vocabulary(vocab_size))
+    ranks = np.arange(1, vocab_size + 1, dtype=np.float64)
+    probs = ranks**-zipf_s
+    probs /= probs.sum()
+    # Shuffle which words are common so frequent words are not also the shortest ones
+    word_order = rng.permutation(vocab_size)
+
+    n_articles = max(1, -(-n_chunks // chunks_per_article))
+    centroids = rng.standard_normal((n_articles, dim)).astype(np.float32)
+    vecs = np.empty((n_chunks, dim), dtype=np.float32)
+    chunks: List[Dict[str, Any]] = []
+    batch = 10_000
+    for start in range(0, n_chunks, batch):
+        stop = min(n_chunks, start + batch)
+        lengths = rng.integers(words_per_chunk // 2, words_per_chunk * 3 // 2 + 1, size=stop - start)
+        token_ids = word_order[rng.choice(vocab_size, size=int(lengths.sum()), p=probs)]
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        article_ids = np.arange(start, stop) // chunks_per_article
+        noise = rng.standard_normal((stop - start, dim)).astype(np.float32)
+        vecs[start:stop] = centroids[article_ids] + 0.6 * noise
+        for j in range(stop - start):
+            idx = start + j
+            article = int(article_ids[j])
+            chunks.append(
+                {
+                    "id": f"syn-{idx}",
+                    "title": f"Article {article}",
+                    "section": f"Section {idx % chunks_per_article}",
+                    "text": " ".join(vocab[token_ids[offsets[j] : offsets[j + 1]]]),
+                    "url": f"https://synthetic.invalid/article/{article}",
+                    "article_id": f"article-{article}",
+                    "chunk_index": idx % chunks_per_article,
+                }
+            )
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    queries: List[str] = []
+    query_vecs: Dict[str, np.ndarray] = {}
+    targets = rng.choice(n_chunks, size=n_queries, replace=n_queries > n_chunks)
+    for target in targets:
+        words = chunks[int(target)]["text"].split()
+        picks = rng.choice(len(words), size=min(len(words), int(rng.integers(3, 7))), replace=False)
+        query = " ".join(words[i] for i in sorted(picks))
+        if query in query_vecs:
+            continue
+        # Unit-scale noise: cosine to the target stays ~0.95, so coverage checks pass as for real queries
+        qv = vecs[int(target)] + (0.3 / np.sqrt(dim)) * rng.standard_normal(dim).astype(np.float32)
+        query_vecs[query] = (qv / np.linalg.norm(qv)).astype(np.float32)
+        queries.append(query)
+    return SyntheticCorpus(chunks=chunks, vecs_n=vecs, queries=queries, query_vecs=query_vecs)
+
+
+# ====== Measurement ======
+
+
+def _summarize(latencies_ms: Sequence[float], peak_alloc_bytes: int) -> Dict[str, float]:
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    mean = float(values.mean())
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "mean_ms": round(mean, 4),
+        "ops_per_sec": round(1000.0 / mean, 2) if mean > 0 else 0.0,
+        "peak_alloc_mb": round(peak_alloc_bytes / 1024 / 1024, 3),
+        "iterations": int(values.size),
+    }
+
+
+def measure(fn: Callable[[Any], Any], inputs: Sequence[Any], warmup: int = 2) -> Dict[str, float]:
+    """Time ``fn`` over ``inputs``; peak allocations come from one extra traced call.
+
+    tracemalloc slows Python-heavy code several-fold, so it is never on while timing.
+    """
+    for item in list(inputs)[:warmup]:
+        fn(item)
+    gc.collect()
+    latencies = []
+    for item in inputs:
+        started = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        fn(inputs[0])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return _summarize(latencies, peak)
+
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024, 1)
+
+
+@contextmanager
+def offline_pipeline(query_vecs: Dict[str, np.ndarray], llm_client: Optional[BaseLLMClient] = None) -> Iterator[None]:
+    """Route query embeddings to the synthetic vectors and the LLM to ``llm_client`` (default: the mock).
+
+    The exact, semantic and query-embedding caches are switched off for the duration so every
+    end-to-end query measures the full pipeline rather than a cache lookup.
+    """
+    from . import answer, api_client, retrieval
+    from .retrieval import normalize_query
+
+    lookup = {normalize_query(q): v for q, v in query_vecs.items()}
+    dim = next(iter(query_vecs.values())).shape[0] if query_vecs else config.EMB_DIM
+
+    def synthetic_embed_query(question: str, retries: int = 0) -> np.ndarray:
+        vec = lookup.get(question)
+        if vec is None:
+            vec = np.random.default_rng(abs(hash(question)) % 2**32).standard_normal(dim).astype(np.float32)
+            vec /= np.linalg.norm(vec)
+        return vec
+
+    saved_embed = (retrieval.embed_query, answer.embed_query)
+    saved_config = (
+        config.USE_ANN,
+        config.QUERY_CACHE_BACKEND,
+        config.SEMANTIC_CACHE_ENABLED,
+        config.QUERY_EMBEDDING_CACHE_SIZE,
+    )
+    saved_client = api_client._LLM_CLIENT
+    # answer_once embeds through its own imported reference when a versioned index is present
+    retrieval.embed_query = answer.embed_query = synthetic_embed_query
+    api_client.set_llm_client(llm_client or api_client.MockLLMClient(embed_dim=dim))
+    config.USE_ANN = "none"  # measure the code path, not whether faiss happens to be installed
+    config.QUERY_CACHE_BACKEND = "none"
+    config.SEMANTIC_CACHE_ENABLED = False
+    config.QUERY_EMBEDDING_CACHE_SIZE = 0
+    try:
+        yield
+    finally:
+        retrieval.embed_query, answer.embed_query = saved_embed
+        (
+            config.USE_ANN,
+            config.QUERY_CACHE_BACKEND,
+            config.SEMANTIC_CACHE_ENABLED,
+            config.QUERY_EMBEDDING_CACHE_SIZE,
+        ) = saved_config
+        api_client._LLM_CLIENT = saved_client
+
+
+def run_size(
+    n_chunks: int,
+    n_queries: int = 50,
+    e2e_queries: int = 10,
+    dim: int = 384,
+    seed: int = 0,
+    top_k: Optional[int] = None,
+    pack_top: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Generate one corpus and measure every stage against it."""
+    from .answer import answer_once, apply_mmr_diversification
+    from .indexing import bm25_scores, build_bm25
+    from .retrieval import pack_snippets, retrieve, tokenize
+
+    top_k = top_k or config.DEFAULT_TOP_K
+    pack_top = pack_top or config.DEFAULT_PACK_TOP
+
+    started = time.perf_counter()
+    corpus = generate_corpus(n_chunks, dim=dim, n_queries=n_queries, seed=seed)
+    generate_s = time.perf_counter() - started
+    chunks, vecs_n, queries = corpus.chunks, corpus.vecs_n, corpus.queries
+
+    started = time.perf_counter()
+    bm = build_bm25(chunks)
+    build_s = time.perf_counter() - started
+
+    stages: Dict[str, Dict[str, float]] = {}
+    with offline_pipeline(corpus.query_vecs):
+        retrieved = {q: retrieve(q, chunks, vecs_n, bm, top_k=top_k, query_vec=corpus.query_vecs[q]) for q in queries}
+        mmr_orders = {
+            q: apply_mmr_diversification(ids, scores, vecs_n, pack_top) for q, (ids, scores) in retrieved.items()
+        }
+
+        stages["bm25"] = measure(lambda q: bm25_scores(tokenize(q), bm, top_k=top_k * 3), queries)
+        stages["dense_scan"] = measure(lambda q: vecs_n.dot(corpus.query_vecs[q]), queries)
+        stages["retrieve"] = measure(
+            lambda q: retrieve(q, chunks, vecs_n, bm, top_k=top_k, query_vec=corpus.query_vecs[q]), queries
+        )
+        stages["mmr"] = measure(
+            lambda q: apply_mmr_diversification(retrieved[q][0], retrieved[q][1], vecs_n, pack_top), queries
+        )
+        stages["pack"] = measure(lambda q: pack_snippets(chunks, mmr_orders[q], pack_top=pack_top), queries)
+        e2e_inputs = queries[: max(1, e2e_queries)]
+        stages["e2e"] = measure(
+            lambda q: answer_once(q, chunks, vecs_n, bm, top_k=top_k, pack_top=pack_top, use_rerank=False),
+            e2e_inputs,
+            warmup=1,
+        )
+
+    return {
+        "chunks": n_chunks,
+        "queries": len(queries),
+        "generate_s": round(generate_s, 3),
+        "build": {"build_bm25_s": round(build_s, 3), "vecs_mb": round(vecs_n.nbytes / 1024 / 1024, 1)},
+        "max_rss_mb": _max_rss_mb(),
+        "stages": stages,
+    }
+
+
+def run_suite(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    n_queries: int = 50,
+    e2e_queries: int = 10,
+    dim: int = 384,
+    seed: int = 0,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Run ``run_size`` for every size and return a baseline-format report."""
+    report: Dict[str, Any] = {
+        "schema_version": SCHEMA_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": {"dim": dim, "seed": seed, "queries": n_queries, "e2e_queries": e2e_queries},
+        "sizes": {},
+    }
+    for n_chunks in sizes:
+        if progress:
+            progress(f"corpus {n_chunks:,} chunks...")
+        report["sizes"][str(n_chunks)] = run_size(n_chunks, n_queries, e2e_queries, dim=dim, seed=seed)
+        gc.collect()
+    return report
+
+
+# ====== Regression gate ======
+
+
+class BaselineError(ValueError):
+    """Baseline file cannot be compared with the current report."""
+
+
+def compare_to_baseline(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.25,
+    metric: str = "p95_ms",
+    min_delta_ms: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """Stages whose ``metric`` grew by more than ``tolerance`` (and ``min_delta_ms``) vs the baseline.
+
+    The absolute floor keeps sub-millisecond stages from failing on timer noise.
+    Sizes or stages missing from either report are skipped.
+
+    Raises:
+        BaselineError: If the baseline schema or parameters differ from the current run
+    """
+    if baseline.get("schema_version") != SCHEMA_VERSION:
+        raise BaselineError(
+            f"baseline schema_version={baseline.get('schema_version')!r}, expected {SCHEMA_VERSION}; "
+            "re-record it with --update-baseline"
+        )
+    for key in ("dim", "seed"):
+        if baseline.get("params", {}).get(key) != current.get("params", {}).get(key):
+            raise BaselineError(f"baseline was recorded with a different {key}; re-record it with --update-baseline")
+
+    regressions = []
+    for size, cur in current.get("sizes", {}).items():
+        base = baseline.get("sizes", {}).get(size)
+        if not base:
+            continue
+        for stage, cur_stats in cur.get("stages", {}).items():
+            base_stats = base.get("stages", {}).get(stage)
+            if not base_stats or metric not in base_stats:
+                continue
+            before, after = float(base_stats[metric]), float(cur_stats[metric])
+            if after > before * (1.0 + tolerance) and after - before > min_delta_ms:
+                regressions.append(
+                    {
+                        "size": int(size),
+                        "stage": stage,
+                        "metric": metric,
+                        "baseline": before,
+                        "current": after,
+                        "ratio": round(after / before, 3) if before else None,
+                    }
+                )
+    return regressions
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print("=" * 78)
+    print(f"{'chunks':>9} {'stage':<11} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'alloc MB':>9}")
+    print("-" * 78)
+    for size, data in report["sizes"].items():
+        for stage in QUERY_STAGES:
+            stats = data["stages"].get(stage)
+            if not stats:
+                continue
+            print(
+                f"{int(size):>9,} {stage:<11} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+                f"{stats['p99_ms']:>10.3f} {stats['ops_per_sec']:>10.1f} {stats['peak_alloc_mb']:>9.2f}"
+            )
+        build = data["build"]
+        print(
+            f"{int(size):>9,} {'build':<11} bm25 {build['build_bm25_s']:.2f}s | vectors {build['vecs_mb']} MB | "
+            f"max RSS {data['max_rss_mb']} MB"
+        )
+    print("=" * 78)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Synthetic-corpus scaling benchmark with regression gates")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="Corpus sizes in chunks (1000000 needs several GB of RAM)",
+    )
+    parser.add_argument("--queries", type=int, default=50, help="Queries per stage (default: %(default)s)")
+    parser.add_argument("--e2e-queries", type=int, default=10, help="Queries for the e2e stage (default: %(default)s)")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: %(default)s)")
+    parser.add_argument("--output", default="scaling_benchmark.json", help="Where to write this run's report")
+    parser.add_argument("--baseline", help="Baseline JSON to gate against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default: 0.25)")
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore slowdowns below this (noise floor)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run to --baseline instead")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        args.sizes, args.queries, args.e2e_queries, dim=args.dim, seed=args.seed, progress=lambda m: print(m)
+    )
+    _print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.metric, args.min_delta_ms)
+    except (OSError, ValueError) as exc:
+        print(f"❌ Cannot compare with baseline {args.baseline}: {exc}")
+        return 2
+
+    if regressions:
+        print(f"❌ {len(regressions)} stage(s) regressed more than {args.tolerance:.0%} on {args.metric}:")
+        for r in regressions:
+            print(f"   {r['size']:>9,} {r['stage']:<11} {r['baseline']:.3f} -> {r['current']:.3f} ms (x{r['ratio']})")
+        return 1
+    print(f"✅ No stage regressed more than {args.tolerance:.0%} on {args.metric}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""Host-wide answer cache shared by all API workers (SQLite in WAL mode).
+
+``QueryCache`` lives in one process, so with N uvicorn workers every worker
+keeps its own cold copy and the hit rate divides by N; a restart loses it all.
+``SQLiteAnswerCache`` keeps the same get/put interface but stores entries in a
+local SQLite database that every process on the host opens:
+
+- WAL journaling: readers never block the writer or each other.
+- Non-blocking writes: ``put`` only enqueues; a background thread commits
+  batches, so a request never waits on disk I/O or another worker's lock.
+  When the queue is full the write is dropped (it is only a cache).
+- TTL, size-based eviction (least recently accessed first) and index-generation
+  invalidation: ``get`` misses on entries of another generation and
+  ``retain_generation`` purges them in the writer thread. A ``put`` never
+  deletes other entries, since workers may briefly serve different generations.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .metrics import MetricNames, increment_counter, set_gauge
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    generation TEXT NOT NULL,
+    question TEXT NOT NULL,
+    params TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_accessed_at ON answers (accessed_at);
+"""
+
+# Re-puts refresh the answer but keep the hit count (used to pick questions to re-warm after a rebuild)
+_UPSERT = """
+INSERT INTO answers (key, generation, question, params, answer, metadata, created_at, accessed_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    answer = excluded.answer,
+    metadata = excluded.metadata,
+    created_at = excluded.created_at,
+    accessed_at = excluded.accessed_at
+"""
+
+_WRITE_BATCH = 256
+_STOP = object()
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars (chunk ids, scores) expose .item(); anything else is stored as text
+    item = getattr(value, "item", None)
+    return item() if callable(item) else str(value)
+
+
+class SQLiteAnswerCache:
+    """TTL answer cache in a SQLite file shared by every process on the host."""
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 100,
+        ttl_seconds: int = 3600,
+        write_queue_size: int = 1000,
+        busy_timeout_ms: int = 2000,
+    ):
+        """Initialize shared cache.
+
+        Args:
+            path: SQLite database file (created on first use)
+            maxsize: Maximum number of cached answers across all workers
+            ttl_seconds: Time-to-live for cache entries in seconds
+            write_queue_size: Pending writes before new ones are dropped
+            busy_timeout_ms: How long a reader waits for a locked database
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        self.hits = 0
+        self.misses = 0
+        self.dropped_writes = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: list = []
+        self._queue: "queue.Queue" = queue.Queue(maxsize=write_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------ sqlite
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Per-thread read connection (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._writer_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def make_key(question: str, params: Optional[dict] = None) -> str:
+        """Build cache key from question and parameters (same inputs as QueryCache)."""
+        payload = json.dumps([question, sorted((params or {}).items())], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------- public API
+
+    def get(self, question: str, params: Optional[dict] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (answer, metadata) if cached and not expired, None otherwise.
+
+        Database errors are logged and treated as misses; the cache never fails a query.
+        """
+        key = self.make_key(question, params)
+        generation = str((params or {}).get("generation", ""))
+        now = time.time()
+        row = None
+        try:
+            row = (
+                self._reader()
+                .execute("SELECT answer, metadata, created_at, generation FROM answers WHERE key = ?", (key,))
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"[shared-cache] Read failed: {e}")
+
+        if row is None or now - row[2] > self.ttl_seconds or row[3] != generation:
+            self._count(hit=False)
+            return None
+
+        self._enqueue(("touch", key, now))
+        self._count(hit=True)
+        metadata = json.loads(row[1])
+        metadata.setdefault("timestamp", row[2])
+        return row[0], metadata
+
+    def put(self, question: str, answer: str, metadata: dict, params: Optional[dict] = None) -> None:
+        """Queue an answer for storage; returns immediately."""
+        generation = str((params or {}).get("generation", ""))
+        try:
+            metadata_json = json.dumps(metadata or {}, ensure_ascii=False, default=_json_default)
+            params_json = json.dumps(params or {}, ensure_ascii=False, default=_json_default)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"[shared-cache] Skipping unserializable entry: {e}")
+            return
+        key = self.make_key(question, params)
+        self._enqueue(("put", key, generation, question, params_json, answer, metadata_json, time.time()))
+
+    def retain_generation(self, generation: str) -> None:
+        """Drop entries of every other index generation (asynchronously, in the writer thread)."""
+        self._enqueue(("retain", generation))
+
+    def hottest(self, n: int, generation: Optional[str] = None) -> list:
+        """Return up to ``n`` (question, params) pairs with the most hits, optionally for one generation."""
+        sql = "SELECT question, params FROM answers WHERE hits > 0"
+        args: tuple = ()
+        if generation is not None:
+            sql += " AND generation = ?"
+            args = (generation,)
+        try:
+            rows = self._reader().execute(sql + " ORDER BY hits DESC LIMIT ?", args + (int(n),)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"[shared-cache] Read failed: {e}")
+            return []
+        return [(question, json.loads(params)) for question, params in rows]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until queued writes are committed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def purge(self, generation: Optional[str] = None) -> int:
+        """Delete expired entries (and, if given, entries of any other generation). Returns rows removed."""
+        self.flush()
+        conn = self._connect()
+        try:
+            sql = "DELETE FROM answers WHERE created_at < ?"
+            args: tuple = (time.time() - self.ttl_seconds,)
+            if generation is not None:
+                sql += " OR generation != ?"
+                args += (generation,)
+            return conn.execute(sql, args).rowcount
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        """Clear all cache entries (for every worker sharing the file)."""
+        self.flush()
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM answers")
+        finally:
+            conn.close()
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+        logger.info("[shared-cache] CLEAR")
+        set_gauge(MetricNames.CACHE_SIZE, 0)
+
+    def size(self) -> int:
+        """Number of stored entries (all workers)."""
+        try:
+            return int(self._reader().execute("SELECT COUNT(*) FROM answers").fetchone()[0])
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> dict:
+        """Get cache statistics (hits/misses are per process, size is host-wide)."""
+        with self._stats_lock:
+            hits, misses, dropped = self.hits, self.misses, self.dropped_writes
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "size": self.size(),
+            "maxsize": self.maxsize,
+            "hit_rate": hits / total if total > 0 else 0.0,
+            "dropped_writes": dropped,
+            "pending_writes": self._queue.qsize(),
+        }
+
+    def load(self, path: Optional[str] = None) -> int:
+        """QueryCache compatibility: entries are already on disk. Returns the current size."""
+        return self.size()
+
+    def save(self, path: Optional[str] = None) -> None:
+        """QueryCache compatibility: commits pending writes."""
+        self.flush(timeout=5.0)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Commit pending writes, stop the writer thread and close connections."""
+        with self._writer_lock:
+            if self._closed:
+                return
+            self._closed = True
+            writer = self._writer
+        if writer is not None:
+            self.flush(timeout=timeout)
+            self._queue.put(_STOP)
+            writer.join(timeout=timeout)
+        with self._writer_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+
+    # --------------------------------------------------------------- internals
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        increment_counter(MetricNames.CACHE_HITS if hit else MetricNames.CACHE_MISSES)
+
+    def _enqueue(self, op: tuple) -> None:
+        if self._closed:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped_writes += 1
+            increment_counter(MetricNames.CACHE_WRITES_DROPPED)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="shared-cache-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < _WRITE_BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(op is _STOP for op in batch)
+                ops = [op for op in batch if op is not _STOP]
+                try:
+                    if ops:
+                        self._apply(conn, ops)
+                except sqlite3.Error as e:
+                    logger.warning(f"[shared-cache] Write batch of {len(ops)} failed: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, ops: list) -> None:
+        """Commit one batch in a single transaction."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                if op[0] == "touch":
+                    conn.execute("UPDATE answers SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (op[2], op[1]))
+                    continue
+                if op[0] == "retain":
+                    conn.execute("DELETE FROM answers WHERE generation != ?", (op[1],))
+                    continue
+                _, key, entry_generation, question, params_json, answer, metadata_json, ts = op
+                conn.execute(_UPSERT, (key, entry_generation, question, params_json, answer, metadata_json, ts, ts))
+            size = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if size > self.maxsize:
+                conn.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY accessed_at LIMIT ?)",
+                    (size - self.maxsize,),
+                )
+                size = self.maxsize
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        set_gauge(MetricNames.CACHE_SIZE, size)
@@ -0,0 +1,275 @@
+"""Pluggable token counting for context budgeting.
+
+OPTIMIZATION: ``retrieval.count_tokens`` only knows tiktoken (GPT models) and a
+chars-per-token heuristic for Qwen, which is either over-conservative (wasted
+context) or under-counts and overflows ``num_ctx``. This module loads the real
+model tokenizer from a local ``tokenizer.json`` via the optional ``tokenizers``
+library (no network access), caches token counts per chunk id, and batches
+encodes when priming many chunks at once.
+
+Usage:
+    export RAG_TOKENIZER_PATH=/models/qwen2.5/tokenizer.json
+
+    from clockify_rag.tokenizer import get_token_counter
+
+    counter = get_token_counter()
+    counter.prime_chunks(chunks)          # one batched encode for uncached chunks
+    n = counter.count_chunk(chunk["id"], chunk["text"])
+
+When no tokenizer is configured (or ``tokenizers`` is not installed) the
+counter is not ``exact`` and callers keep using their heuristic fallback; the
+per-chunk cache still applies.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:  # Optional dependency: exact tokenization is disabled without it
+    from tokenizers import Tokenizer as _HFTokenizer  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - depends on environment
+    _HFTokenizer = None
+
+# Encode at most this many texts per encode_batch call to bound peak memory
+_BATCH_SIZE = 256
+
+
+def _approx_count(text: str) -> int:
+    """Fallback estimate: 1 token ≈ 4 chars (mirrors retrieval.approx_tokens)."""
+    return max(1, len(text) // 4)
+
+
+class TokenCounter:
+    """Token counter backed by an optional exact tokenizer and a per-chunk LRU cache.
+
+    The wrapped tokenizer only needs ``encode(text, add_special_tokens=...)`` and
+    ``encode_batch(texts, add_special_tokens=...)`` returning objects with
+    ``ids`` (and ``offsets`` for truncation), matching ``tokenizers.Tokenizer``.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any = None,
+        model: Optional[str] = None,
+        cache_size: int = 50000,
+        source: Optional[str] = None,
+    ) -> None:
+        self._tokenizer = tokenizer
+        self.model = model
+        self.source = source
+        self._cache_size = max(0, int(cache_size))
+        self._cache: "OrderedDict[Tuple[Hashable, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: str, model: Optional[str] = None, cache_size: int = 50000) -> "TokenCounter":
+        """Load a ``tokenizer.json`` from local disk.
+
+        Raises:
+            ImportError: If the ``tokenizers`` package is not installed
+            FileNotFoundError: If ``path`` does not exist
+        """
+        if _HFTokenizer is None:
+            raise ImportError("tokenizers is required for exact token counting (pip install tokenizers)")
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Tokenizer file not found: {path}")
+        tokenizer = _HFTokenizer.from_file(path)
+        return cls(tokenizer=tokenizer, model=model, cache_size=cache_size, source=path)
+
+    @property
+    def exact(self) -> bool:
+        """True when counts come from the model's real tokenizer."""
+        return self._tokenizer is not None
+
+    def count(self, text: str, fallback: Optional[Callable[[str], int]] = None) -> int:
+        """Count tokens in ``text`` (uncached)."""
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return (fallback or _approx_count)(text)
+
+    def count_batch(self, texts: Sequence[str], fallback: Optional[Callable[[str], int]] = None) -> List[int]:
+        """Count tokens for many texts, using batched encodes when exact."""
+        if self._tokenizer is None:
+            fn = fallback or _approx_count
+            return [fn(t) if t else 0 for t in texts]
+
+        counts: List[int] = []
+        for start in range(0, len(texts), _BATCH_SIZE):
+            batch = list(texts[start : start + _BATCH_SIZE])
+            encodings = self._tokenizer.encode_batch(batch, add_special_tokens=False)
+            counts.extend(len(enc.ids) if text else 0 for enc, text in zip(encodings, batch))
+        return counts
+
+    def _cache_key(self, chunk_id: Hashable, text: str) -> Tuple[Hashable, int]:
+        # Include the text hash so a rebuilt index that reuses ids never serves stale counts
+        return (chunk_id, hash(text))
+
+    def _store(self, key: Tuple[Hashable, int], value: int) -> None:
+        # Caller holds self._lock
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def count_chunk(
+        self,
+        chunk_id: Optional[Hashable],
+        text: str,
+        fallback: Optional[Callable[[str], int]] = None,
+    ) -> int:
+        """Count tokens for a chunk, memoized by chunk id."""
+        if chunk_id is None or self._cache_size == 0:
+            return self.count(text, fallback)
+
+        key = self._cache_key(chunk_id, text)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        value = self.count(text, fallback)
+        with self._lock:
+            self._store(key, value)
+        return value
+
+    def prime_chunks(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        fallback: Optional[Callable[[str], int]] = None,
+    ) -> int:
+        """Batch-count every uncached chunk so later ``count_chunk`` calls are hits.
+
+        Returns:
+            Number of chunks newly counted
+        """
+        if self._cache_size == 0:
+            return 0
+
+        pending_keys: List[Tuple[Hashable, int]] = []
+        pending_texts: List[str] = []
+        seen = set()
+        with self._lock:
+            for chunk in chunks:
+                chunk_id = chunk.get("id")
+                text = chunk.get("text") or ""
+                if chunk_id is None:
+                    continue
+                key = self._cache_key(chunk_id, text)
+                if key in self._cache or key in seen:
+                    continue
+                seen.add(key)
+                pending_keys.append(key)
+                pending_texts.append(text)
+
+        if not pending_texts:
+            return 0
+
+        counts = self.count_batch(pending_texts, fallback)
+        with self._lock:
+            for key, value in zip(pending_keys, counts):
+                self._store(key, value)
+        return len(pending_texts)
+
+    def truncate(self, text: str, budget: int) -> str:
+        """Return the longest prefix of ``text`` that fits in ``budget`` tokens.
+
+        Uses token offsets from a single encode instead of a binary search over
+        repeated counts. Only valid when ``exact`` is True.
+        """
+        if self._tokenizer is None:
+            raise RuntimeError("truncate() requires an exact tokenizer")
+        if budget <= 0 or not text:
+            return ""
+        encoding = self._tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= budget:
+            return text
+        end = encoding.offsets[budget - 1][1]
+        return text[:end]
+
+    def clear(self) -> None:
+        """Drop all cached counts."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache statistics and tokenizer info."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "exact": self.exact,
+                "model": self.model,
+                "source": self.source,
+                "size": len(self._cache),
+                "maxsize": self._cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+# Global token counter instance (lazily loaded)
+_TOKEN_COUNTER: Optional[TokenCounter] = None
+_TOKEN_COUNTER_LOCK = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """Get global token counter, loading ``config.TOKENIZER_PATH`` on first use.
+
+    Falls back to a heuristic (non-exact) counter when no path is configured,
+    the file is missing, or ``tokenizers`` is unavailable.
+    """
+    global _TOKEN_COUNTER
+    if _TOKEN_COUNTER is not None:
+        return _TOKEN_COUNTER
+
+    with _TOKEN_COUNTER_LOCK:
+        if _TOKEN_COUNTER is None:
+            from . import config
+
+            path = config.TOKENIZER_PATH
+            model = config.RAG_CHAT_MODEL
+            cache_size = config.TOKEN_COUNT_CACHE_SIZE
+            counter: Optional[TokenCounter] = None
+            if path:
+                try:
+                    counter = TokenCounter.from_file(path, model=model, cache_size=cache_size)
+                    logger.info("Loaded exact tokenizer for %s from %s", model, path)
+                except Exception as exc:
+                    logger.warning("Failed to load tokenizer from %s, using heuristic counts: %s", path, exc)
+            _TOKEN_COUNTER = counter or TokenCounter(model=model, cache_size=cache_size)
+    return _TOKEN_COUNTER
+
+
+def set_token_counter(counter: Optional[TokenCounter]) -> None:
+    """Install a custom token counter (primarily for tests)."""
+    global _TOKEN_COUNTER
+    with _TOKEN_COUNTER_LOCK:
+        _TOKEN_COUNTER = counter
+
+
+def reset_token_counter() -> None:
+    """Drop the global counter so the next call reloads from config."""
+    set_token_counter(None)
+
+
+__all__ = [
+    "TokenCounter",
+    "get_token_counter",
+    "set_token_counter",
+    "reset_token_counter",
+]
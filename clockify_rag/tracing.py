@@ -0,0 +1,308 @@
+"""Per-request span tracing.
+
+Lightweight tracer for latency breakdowns of individual requests. A trace is
+bound to the current context (ContextVar) and keyed by the request's
+correlation ID, so concurrent requests never overwrite each other's timings
+(unlike the single ``RETRIEVE_PROFILE_LAST`` global).
+
+Usage:
+    from clockify_rag.tracing import span, start_trace, end_trace
+
+    trace = start_trace()          # uses get_correlation_id() as trace id
+    with span("retrieve", top_k=12):
+        with span("retrieve.embed"):
+            ...
+    end_trace(trace)               # ring buffer + optional OTLP JSON file
+
+When no trace is active, ``span`` is a cheap no-op so library code can be
+instrumented unconditionally. Finished traces go to an in-process ring buffer
+(``RAG_TRACE_RING_SIZE``) and, when ``RAG_TRACE_EXPORT_PATH`` is set, are
+appended as OTLP/JSON lines (one ``resourceSpans`` document per trace). The
+export is encoded and written by a background thread, so ``end_trace`` never
+does file I/O on the request path (or the event loop).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from . import config
+from .correlation import generate_correlation_id, get_correlation_id
+from .metrics import MetricNames
+from .query_log import AsyncQueryLogWriter
+
+logger = logging.getLogger(__name__)
+
+_SERVICE_NAME = "clockify-rag"
+
+
+class Span:
+    """A single timed stage within a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "thread")
+
+    def __init__(self, name: str, span_id: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Stand-in yielded by ``span`` when no trace is active."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans recorded for one request (safe to append from executor threads)."""
+
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _new_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        with self._lock:
+            self._next_id += 1
+            span_id = f"{self._next_id:016x}"
+            new = Span(name, span_id, parent_id, attributes)
+            self.spans.append(new)
+        return new
+
+    @property
+    def otlp_trace_id(self) -> str:
+        """32-hex trace id required by OTLP (correlation id if it already fits)."""
+        tid = self.trace_id.lower()
+        if len(tid) == 32 and all(c in "0123456789abcdef" for c in tid):
+            return tid
+        return hashlib.sha256(self.trace_id.encode("utf-8")).hexdigest()[:32]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact breakdown for API responses (offsets relative to trace start)."""
+        with self._lock:
+            spans = list(self.spans)
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return {
+            "trace_id": self.trace_id,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "spans": [
+                {
+                    "name": s.name,
+                    "span_id": s.span_id,
+                    "parent_id": s.parent_id,
+                    "start_ms": round((s.start_ns - self.start_ns) / 1e6, 3),
+                    "duration_ms": round(s.duration_ms, 3),
+                    "attributes": dict(s.attributes),
+                }
+                for s in spans
+            ],
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Render as an OTLP/JSON ``ExportTraceServiceRequest`` document."""
+        trace_id = self.otlp_trace_id
+        with self._lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for s in spans:
+            attributes = [{"key": "correlation_id", "value": {"stringValue": self.trace_id}}]
+            attributes.extend({"key": str(k), "value": _otlp_value(v)} for k, v in s.attributes.items())
+            item = {
+                "traceId": trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns if s.end_ns is not None else s.start_ns),
+                "attributes": attributes,
+            }
+            if s.parent_id:
+                item["parentSpanId"] = s.parent_id
+            otlp_spans.append(item)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": _SERVICE_NAME}}]},
+                    "scopeSpans": [{"scope": {"name": "clockify_rag"}, "spans": otlp_spans}],
+                }
+            ]
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+# ====== Context state ======
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_RING_LOCK = threading.Lock()
+_RING: Deque[Dict[str, Any]] = deque(maxlen=max(1, config.TRACE_RING_SIZE))
+_EXPORT_LOCK = threading.Lock()
+_EXPORTER: Optional[AsyncQueryLogWriter] = None
+
+
+def get_current_trace() -> Optional[Trace]:
+    """Return the trace bound to the current context, if any."""
+    return _current_trace.get()
+
+
+def start_trace(trace_id: Optional[str] = None) -> Optional[Trace]:
+    """Start a trace for the current context (None when tracing is disabled)."""
+    if not config.TRACE_ENABLED:
+        return None
+    trace = Trace(trace_id or get_correlation_id() or generate_correlation_id())
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def end_trace(trace: Optional[Trace]) -> Optional[Dict[str, Any]]:
+    """Finish ``trace``, record it in the ring buffer/export file and unbind it."""
+    if trace is None:
+        return None
+    if trace.end_ns is None:
+        trace.end_ns = time.time_ns()
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+        _current_span.set(None)
+
+    payload = trace.to_dict()
+    with _RING_LOCK:
+        _RING.append(payload)
+
+    export_path = config.TRACE_EXPORT_PATH
+    if export_path:
+        _get_exporter(export_path).submit(trace)
+    return payload
+
+
+def _render_otlp(trace: Trace) -> str:
+    return json.dumps(trace.to_otlp(), separators=(",", ":"))
+
+
+def _get_exporter(path: str) -> AsyncQueryLogWriter:
+    """Background OTLP/JSON-lines writer for ``path`` (recreated if the path changes)."""
+    global _EXPORTER
+    exporter = _EXPORTER
+    if exporter is not None and exporter.path == path:
+        return exporter
+    with _EXPORT_LOCK:
+        if _EXPORTER is not None and _EXPORTER.path != path:
+            _EXPORTER.close()
+            _EXPORTER = None
+        if _EXPORTER is None:
+            # Append-only like before: no size/age rotation of the export file
+            _EXPORTER = AsyncQueryLogWriter(
+                path, render=_render_otlp, max_bytes=0, drop_metric=MetricNames.TRACE_EXPORT_DROPPED
+            )
+        return _EXPORTER
+
+
+def flush_trace_export(timeout: Optional[float] = None) -> bool:
+    """Wait until finished traces are written to the export file. Returns False on timeout."""
+    exporter = _EXPORTER
+    return exporter.flush(timeout=timeout) if exporter is not None else True
+
+
+def close_trace_export() -> None:
+    """Write pending traces and stop the export thread."""
+    global _EXPORTER
+    with _EXPORT_LOCK:
+        exporter, _EXPORTER = _EXPORTER, None
+    if exporter is not None:
+        exporter.close()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Time a stage as a child of the current span (no-op without an active trace)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    current = trace._new_span(name, parent.span_id if parent is not None else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """Attach attributes to the innermost active span (no-op without one)."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def get_recent_traces(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return finished traces from the ring buffer, newest first."""
+    with _RING_LOCK:
+        items = list(_RING)
+    items.reverse()
+    return items[:limit] if limit else items
+
+
+def clear_traces() -> None:
+    """Empty the in-process ring buffer (useful for tests)."""
+    with _RING_LOCK:
+        _RING.clear()
+
+
+__all__ = [
+    "Span",
+    "Trace",
+    "span",
+    "set_span_attributes",
+    "start_trace",
+    "end_trace",
+    "get_current_trace",
+    "get_recent_traces",
+    "clear_traces",
+    "flush_trace_export",
+    "close_trace_export",
+]
@@ -33,6 +33,17 @@ from collections import defaultdict
 
 import numpy as np
 
+from clockify_rag.eval_runner import (
+    EvalCache,
+    EvalQuery,
+    best_config,
+    compute_mrr,
+    compute_ndcg_at_k,
+    compute_precision_at_k,
+    run_answer_eval,
+    run_retrieval_sweep,
+    sweep_grid,
+)
 from clockify_rag.utils import resolve_corpus_path
 
 try:
@@ -57,64 +68,6 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 TOP_K = 12
 
 
-def compute_mrr(retrieved_ids, relevant_ids):
-    """Mean Reciprocal Rank - measures rank of first relevant result.
-
-    Args:
-        retrieved_ids: List of retrieved document IDs (ordered by rank)
-        relevant_ids: Set of ground truth relevant document IDs
-
-    Returns:
-        float: 1/rank of first relevant result, or 0 if no relevant results
-    """
-    for i, doc_id in enumerate(retrieved_ids, 1):
-        if doc_id in relevant_ids:
-            return 1.0 / i
-    return 0.0
-
-
-def compute_precision_at_k(retrieved_ids, relevant_ids, k=5):
-    """Precision@K - fraction of top K results that are relevant.
-
-    Args:
-        retrieved_ids: List of retrieved document IDs
-        relevant_ids: Set of ground truth relevant document IDs
-        k: Number of top results to consider
-
-    Returns:
-        float: Precision@K score
-    """
-    if k == 0:
-        return 0.0
-
-    retrieved_k = retrieved_ids[:k]
-    hits = len(set(retrieved_k) & set(relevant_ids))
-    return hits / k
-
-
-def compute_ndcg_at_k(retrieved_ids, relevant_ids, k=10):
-    """Normalized Discounted Cumulative Gain@K - position-aware metric.
-
-    Args:
-        retrieved_ids: List of retrieved document IDs
-        relevant_ids: Set of ground truth relevant document IDs
-        k: Number of top results to consider
-
-    Returns:
-        float: NDCG@K score (0-1)
-    """
-    # DCG: sum of relevances discounted by log position
-    dcg = sum(
-        1.0 / np.log2(i + 2) if doc_id in relevant_ids else 0.0
-        for i, doc_id in enumerate(retrieved_ids[:k])
-    )
-
-    # IDCG: DCG of perfect ranking (all relevant docs first)
-    idcg = sum(1.0 / np.log2(i + 2) for i in range(min(len(relevant_ids), k)))
-
-    return dcg / idcg if idcg > 0 else 0.0
-
-
 def _normalize_text(value: str) -> str:
     """Lowercase + collapse whitespace for robust key matching."""
 
@@ -231,6 +184,38 @@ def _resolve_relevant_indices(
     return relevant
 
 
+def _summarize_rerank_gate(rows: list[dict]) -> dict:
+    """Aggregate per-query gate decisions into skip rate and per-bucket quality."""
+    skipped = [r for r in rows if r["skip"]]
+    reranked = [r for r in rows if not r["skip"]]
+    summary: dict = {
+        "queries": len(rows),
+        "skipped": len(skipped),
+        "skip_rate": len(skipped) / len(rows) if rows else 0.0,
+        "by_decision": {},
+    }
+    for name, bucket in (("skipped", skipped), ("reranked", reranked)):
+        if not bucket:
+            continue
+        stats = {
+            "count": len(bucket),
+            "mrr_at_10": float(np.mean([r["mrr"] for r in bucket])),
+            "ndcg_at_10": float(np.mean([r["ndcg"] for r in bucket])),
+        }
+        if "rerank_mrr" in bucket[0]:
+            stats["rerank_mrr_at_10"] = float(np.mean([r["rerank_mrr"] for r in bucket]))
+            stats["rerank_ndcg_at_10"] = float(np.mean([r["rerank_ndcg"] for r in bucket]))
+        summary["by_decision"][name] = stats
+
+    if rows and "rerank_mrr" in rows[0]:
+        # Quality impact of gating: gated pipeline keeps retrieval order for skipped queries
+        summary["always_rerank_mrr_at_10"] = float(np.mean([r["rerank_mrr"] for r in rows]))
+        summary["gated_mrr_at_10"] = float(
+            np.mean([r["mrr"] if r["skip"] else r["rerank_mrr"] for r in rows])
+        )
+    return summary
+
+
 def evaluate(
     dataset_path="eval_datasets/clockify_v1.jsonl",
     verbose=False,
@@ -239,15 +224,22 @@ def evaluate(
     min_mrr: float | None = None,
     min_precision: float | None = None,
     min_ndcg: float | None = None,
+    rerank_gate_report: bool = False,
+    rerank_mode: str | None = None,
+    answer_concurrency: int = 4,
 ):
     """Run evaluation on dataset.
 
     Args:
         dataset_path: Path to evaluation dataset JSONL file
         verbose: Print per-query results if True
+        rerank_gate_report: Report adaptive rerank gate skip rate and per-decision quality (hybrid mode)
+        rerank_mode: With the gate report, also rerank candidates ("llm"/"cross_encoder") to compare
+            always-rerank vs gated quality
         min_mrr: Optional minimum MRR threshold (hybrid mode target)
         min_precision: Optional Precision@5 threshold (hybrid mode target)
         min_ndcg: Optional NDCG@10 threshold (hybrid mode target)
+        answer_concurrency: Concurrent answer_once calls for the LLM report
 
     Returns:
         dict: Evaluation metrics
@@ -277,6 +269,7 @@ def evaluate(
     rag_available = False
     retrieval_chunks = chunks
     retrieval_fn = None
+    scored_retrieval_fn = None
     lexical_retriever = None
     vecs_n = None
     bm = None
@@ -306,15 +299,19 @@ def evaluate(
             else:
                 retrieval_chunks, vecs_n, bm, hnsw = result
 
-            retrieval_fn = lambda q: retrieve(
-                q,
-                retrieval_chunks,
-                vecs_n,
-                bm,
-                top_k=TOP_K,
-                hnsw=hnsw,
-                faiss_index_path=faiss_index_path,
-            )[0]
+            def scored_retrieval_fn(q):
+                return retrieve(
+                    q,
+                    retrieval_chunks,
+                    vecs_n,
+                    bm,
+                    top_k=TOP_K,
+                    hnsw=hnsw,
+                    faiss_index_path=faiss_index_path,
+                )
+
+            def retrieval_fn(q):
+                return scored_retrieval_fn(q)[0]
             rag_available = True
             retrieval_mode = f"Hybrid (FAISS={'enabled' if faiss_available else 'disabled'})"
             print(f"✅ Hybrid retrieval loaded successfully ({retrieval_mode})")
@@ -356,9 +353,16 @@ def evaluate(
 
     skipped = 0
     llm_outputs: list[dict] = []
-    answer_once_fn = None
-    if llm_report and rag_available:
-        from clockify_rag.answer import answer_once as answer_once_fn
+    llm_queries: list[EvalQuery] = []
+
+    # Adaptive rerank gate report: per-decision retrieval quality (and optional rerank comparison)
+    gate_rows: list[dict] = []
+    if rerank_gate_report and not scored_retrieval_fn:
+        print("⚠️  Rerank gate report requires the hybrid index. Skipping gate analysis.")
+        rerank_gate_report = False
+    if rerank_gate_report:
+        from clockify_rag.answer import apply_reranking, evaluate_rerank_gate
+        from clockify_rag.config import DEFAULT_PACK_TOP
     for i, example in enumerate(dataset):
         query = example["query"]
         relevant_ids = _resolve_relevant_indices(example, id_map, title_section_map, title_map)
@@ -369,7 +373,12 @@ def evaluate(
 
         try:
             # Retrieve chunks using configured retrieval function
-            retrieved_ids = list(retrieval_fn(query)) if retrieval_fn else []
+            scores = None
+            if rerank_gate_report:
+                selected, scores = scored_retrieval_fn(query)
+                retrieved_ids = list(selected)
+            else:
+                retrieved_ids = list(retrieval_fn(query)) if retrieval_fn else []
 
             # Compute metrics
             mrr = compute_mrr(retrieved_ids, relevant_ids)
@@ -380,6 +389,20 @@ def evaluate(
             precision_at_5_scores.append(precision_at_5)
             ndcg_at_10_scores.append(ndcg_at_10)
 
+            if rerank_gate_report:
+                head = [int(j) for j in retrieved_ids[:DEFAULT_PACK_TOP]]
+                gate = evaluate_rerank_gate(scores, head)
+                row = {"skip": gate["skip"], "mrr": mrr, "ndcg": ndcg_at_10}
+                if rerank_mode:
+                    reranked_head = apply_reranking(
+                        query, retrieval_chunks, head, scores, use_rerank=True, rerank_mode=rerank_mode, gate=False
+                    )[0]
+                    head_set = set(head)
+                    reranked = list(reranked_head) + [j for j in retrieved_ids if j not in head_set]
+                    row["rerank_mrr"] = compute_mrr(reranked, relevant_ids)
+                    row["rerank_ndcg"] = compute_ndcg_at_k(reranked, relevant_ids, k=10)
+                gate_rows.append(row)
+
             if verbose:
                 print(f"\nQuery {i+1}: {query}")
                 print(f"  MRR:         {mrr:.3f}")
@@ -388,29 +411,26 @@ def evaluate(
                 print(f"  Retrieved idx: {retrieved_ids[:5]}")
                 print(f"  Relevant idx:  {sorted(relevant_ids)}")
 
-            if llm_report and answer_once_fn:
-                answer_payload = answer_once_fn(
-                    query,
-                    retrieval_chunks,
-                    vecs_n,
-                    bm,
-                    hnsw=hnsw,
-                    faiss_index_path=faiss_index_path,
-                )
-                llm_outputs.append(
-                    {
-                        "query": query,
-                        "answer": answer_payload["answer"],
-                        "confidence": answer_payload.get("confidence"),
-                        "refused": answer_payload.get("refused"),
-                        "metadata": answer_payload.get("metadata", {}),
-                    }
-                )
+            if llm_report and rag_available:
+                llm_queries.append(EvalQuery(query, frozenset(relevant_ids)))
 
         except Exception as e:
             print(f"Error evaluating query '{query}': {e}")
             continue
 
+    if llm_queries:
+        # Answers are LLM-bound: run them concurrently (the LLM concurrency limiter still applies)
+        answer_eval = run_answer_eval(
+            llm_queries,
+            retrieval_chunks,
+            vecs_n,
+            bm,
+            concurrency=answer_concurrency,
+            hnsw=hnsw,
+            faiss_index_path=faiss_index_path,
+        )
+        llm_outputs = answer_eval["rows"]
+
     # Compute aggregate metrics (Priority #13: include retrieval metrics)
     results = {
         "dataset_size": len(dataset),
@@ -441,6 +461,11 @@ def evaluate(
         }
         threshold_mode = "lexical_fallback"
 
+    if gate_rows:
+        results["rerank_gate"] = _summarize_rerank_gate(gate_rows)
+    if llm_queries:
+        results["llm_summary"] = answer_eval["summary"]
+
     results["thresholds_applied"] = thresholds_in_use
     results["threshold_mode"] = threshold_mode
 
@@ -477,6 +502,22 @@ def evaluate(
     print(f"NDCG@10:         {results['ndcg_at_10']:.3f} (±{results['ndcg_std']:.3f})")
     print("="*70)
 
+    gate_summary = results.get("rerank_gate")
+    if gate_summary:
+        print(f"Rerank gate:     skip rate {gate_summary['skip_rate']:.1%} "
+              f"({gate_summary['skipped']}/{gate_summary['queries']})")
+        for bucket in ("skipped", "reranked"):
+            stats = gate_summary["by_decision"].get(bucket)
+            if stats:
+                line = f"  {bucket:<9} MRR@10={stats['mrr_at_10']:.3f} NDCG@10={stats['ndcg_at_10']:.3f}"
+                if "rerank_mrr_at_10" in stats:
+                    line += f" | with rerank MRR@10={stats['rerank_mrr_at_10']:.3f}"
+                print(line)
+        if "gated_mrr_at_10" in gate_summary:
+            print(f"  always-rerank MRR@10={gate_summary['always_rerank_mrr_at_10']:.3f} "
+                  f"vs gated MRR@10={gate_summary['gated_mrr_at_10']:.3f}")
+        print("="*70)
+
     # Interpretation
     print("\nINTERPRETATION:")
     warn_mrr = thresholds_in_use["mrr_at_10"] * WARN_FRACTION
@@ -518,13 +559,93 @@ def evaluate(
             for row in llm_outputs:
                 f.write(json.dumps(row, ensure_ascii=False) + "\n")
         results["llm_report_path"] = output_path
+        summary = results["llm_summary"]
         print(f"\n📝 Saved LLM answers to {output_path}")
+        print(
+            f"   refusal rate {summary['refusal_rate']:.1%} | context hit rate {summary['context_hit_rate']:.1%} | "
+            f"p50 {summary['latency_p50_ms']} ms | p95 {summary['latency_p95_ms']} ms | errors {summary['errors']}"
+        )
     elif llm_report and not rag_available:
         print("⚠️  LLM report requested but hybrid index not available. Skipping answer generation.")
 
     return results
 
 
+def run_sweep(
+    dataset_path: str,
+    alphas: list[float] | None = None,
+    top_ks: list[int] | None = None,
+    mmr_lambdas: list[float] | None = None,
+    workers: int | None = None,
+    cache_dir: str | None = "eval_cache",
+    output_path: str | None = None,
+    metric: str = "ndcg_at_10",
+) -> list[dict]:
+    """Evaluate a grid of ALPHA_HYBRID x top_k x MMR_LAMBDA values in parallel (hybrid index only).
+
+    Query embeddings and per-config retrieval results are cached under ``cache_dir``
+    per index generation (``cache_dir=None`` disables the cache).
+    """
+    if not os.path.exists(dataset_path):
+        print(f"Error: Evaluation dataset not found: {dataset_path}")
+        sys.exit(1)
+
+    from clockify_rag.indexing import load_index
+
+    result = load_index()
+    if result is None:
+        print("❌ Error: Parameter sweeps need the hybrid index. Run 'make build' first.")
+        sys.exit(1)
+    chunks, vecs_n, bm = result["chunks"], result["vecs_n"], result["bm"]
+    faiss_index_path = "faiss.index" if os.path.exists("faiss.index") else None
+
+    id_map, title_section_map, title_map = _build_chunk_lookup(chunks)
+    queries: list[EvalQuery] = []
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            example = json.loads(line)
+            relevant = _resolve_relevant_indices(example, id_map, title_section_map, title_map)
+            if relevant:
+                queries.append(EvalQuery(example["query"], frozenset(relevant)))
+    if not queries:
+        print("Error: No evaluation queries with resolvable relevance annotations.")
+        sys.exit(1)
+
+    configs = sweep_grid(alphas, top_ks, mmr_lambdas)
+    cache = EvalCache(cache_dir) if cache_dir else None
+    print(f"Sweeping {len(configs)} configs over {len(queries)} queries...")
+    results = run_retrieval_sweep(
+        queries, chunks, vecs_n, bm, configs, workers=workers, cache=cache, faiss_index_path=faiss_index_path
+    )
+
+    def _fmt(value) -> str:
+        return "auto" if value is None else f"{value:g}"
+
+    print("\n" + "=" * 86)
+    print(f"{'alpha':>6} {'top_k':>6} {'mmr':>6} | {'MRR@10':>7} {'P@5':>7} {'NDCG@10':>8} | "
+          f"{'p50 ms':>8} {'p95 ms':>8} | {'cached':>6}")
+    print("-" * 86)
+    for row in results:
+        print(
+            f"{_fmt(row['alpha']):>6} {row['top_k']:>6} {_fmt(row['mmr_lambda']):>6} | "
+            f"{row['mrr_at_10']:>7.3f} {row['precision_at_5']:>7.3f} {row['ndcg_at_10']:>8.3f} | "
+            f"{row['latency_p50_ms']:>8.2f} {row['latency_p95_ms']:>8.2f} | {row['cached']:>6.0%}"
+        )
+    print("=" * 86)
+    best = best_config(results, metric)
+    print(f"Best by {metric}: alpha={_fmt(best['alpha'])} top_k={best['top_k']} mmr={_fmt(best['mmr_lambda'])}")
+    print("(latency = retrieval + MMR per query; query embedding is computed once and excluded)")
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"dataset": dataset_path, "metric": metric, "best": best, "results": results}, f, indent=2)
+        print(f"\n📝 Saved sweep results to {output_path}")
+    return results
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate RAG system on ground truth dataset")
     parser.add_argument(
@@ -561,8 +682,66 @@ if __name__ == "__main__":
         default="eval_reports/llm_answers.jsonl",
         help="Path to save LLM answer report when --llm-report is used",
     )
+    parser.add_argument(
+        "--rerank-gate-report",
+        action="store_true",
+        help="Report adaptive rerank gate skip rate and retrieval quality per gate decision (hybrid only)",
+    )
+    parser.add_argument(
+        "--rerank-mode",
+        choices=["llm", "cross_encoder"],
+        default=None,
+        help="With --rerank-gate-report, also rerank candidates to compare always-rerank vs gated quality",
+    )
+    parser.add_argument(
+        "--answer-concurrency",
+        type=int,
+        default=4,
+        help="Concurrent answer_once calls for --llm-report (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="Parallel parameter sweep over --alpha/--top-k/--mmr-lambda (hybrid index only; no threshold gate)",
+    )
+    parser.add_argument("--alpha", type=float, nargs="+", help="ALPHA_HYBRID values to sweep (default: current)")
+    parser.add_argument("--top-k", type=int, nargs="+", help="top_k values to sweep (default: DEFAULT_TOP_K)")
+    parser.add_argument(
+        "--mmr-lambda", type=float, nargs="+", help="MMR_LAMBDA values to sweep (default: retrieval order)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Retrieval processes for --sweep (default: CPUs)")
+    parser.add_argument(
+        "--cache-dir",
+        default="eval_cache",
+        help="Cache for query embeddings and retrieval results, per index generation (default: %(default)s)",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Disable the sweep cache")
+    parser.add_argument(
+        "--sweep-output",
+        default="eval_reports/sweep.json",
+        help="Where to save sweep results (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sweep-metric",
+        choices=["mrr_at_10", "precision_at_5", "ndcg_at_10"],
+        default="ndcg_at_10",
+        help="Metric used to pick the best sweep config (default: %(default)s)",
+    )
     args = parser.parse_args()
 
+    if args.sweep:
+        run_sweep(
+            args.dataset,
+            alphas=args.alpha,
+            top_ks=args.top_k,
+            mmr_lambdas=args.mmr_lambda,
+            workers=args.workers,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            output_path=args.sweep_output,
+            metric=args.sweep_metric,
+        )
+        sys.exit(0)
+
     results = evaluate(
         dataset_path=args.dataset,
         verbose=args.verbose,
@@ -571,6 +750,9 @@ if __name__ == "__main__":
         min_mrr=args.min_mrr,
         min_precision=args.min_precision,
         min_ndcg=args.min_ndcg,
+        rerank_gate_report=args.rerank_gate_report,
+        rerank_mode=args.rerank_mode,
+        answer_concurrency=args.answer_concurrency,
     )
 
     thresholds = results.get("thresholds_applied") or {
@@ -19,13 +19,17 @@ Usage:
 
     # Show summary only
     python3 export_metrics.py --summary
+
+    # Merge metrics flushed by all API workers (RAG_METRICS_MULTIPROC_DIR)
+    python3 export_metrics.py --format prometheus --multiproc-dir /tmp/rag-metrics
 """
 
 import argparse
 import sys
 import json
 
-from clockify_rag.metrics import get_metrics
+from clockify_rag import config
+from clockify_rag.metrics import collect_multiprocess_metrics, get_metrics
 
 
 def main():
@@ -56,10 +60,20 @@ def main():
         action="store_true",
         help="Exclude raw histogram data from JSON export (reduces size)"
     )
+    parser.add_argument(
+        "--multiproc-dir",
+        type=str,
+        default=config.METRICS_MULTIPROC_DIR or None,
+        help="Merge metrics flushed by worker processes into this directory "
+        "(default: RAG_METRICS_MULTIPROC_DIR)"
+    )
 
     args = parser.parse_args()
 
-    metrics = get_metrics()
+    if args.multiproc_dir:
+        metrics = collect_multiprocess_metrics(args.multiproc_dir)
+    else:
+        metrics = get_metrics()
 
     # Generate output
     if args.summary:
@@ -11,6 +11,9 @@ Usage:
 
     # With retrieval parameters
     python3 scripts/build_faq_cache.py config/sample_faqs.txt --top-k 15 --pack-top 8
+
+    # Top 200 questions from the query log, 8 concurrent answers, fresh build
+    python3 scripts/build_faq_cache.py --from-query-log --top 200 --workers 8 --no-resume
 """
 
 import argparse
@@ -22,7 +25,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from clockify_rag.indexing import load_index
-from clockify_rag.precomputed_cache import build_faq_cache, load_faq_list
+from clockify_rag.precomputed_cache import build_faq_cache, faq_questions_from_query_log, load_faq_list
 from clockify_rag.config import (
     DEFAULT_TOP_K,
     DEFAULT_PACK_TOP,
@@ -31,6 +34,7 @@ from clockify_rag.config import (
     DEFAULT_NUM_CTX,
     DEFAULT_NUM_PREDICT,
     DEFAULT_RETRIES,
+    QUERY_LOG_FILE,
 )
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -39,7 +43,18 @@ logger = logging.getLogger(__name__)
 
 def main():
     parser = argparse.ArgumentParser(description="Build precomputed FAQ cache for instant responses")
-    parser.add_argument("faq_file", help="Path to FAQ file (one question per line)")
+    parser.add_argument("faq_file", nargs="?", help="Path to FAQ file (one question per line)")
+    parser.add_argument(
+        "--from-query-log",
+        nargs="?",
+        const=QUERY_LOG_FILE,
+        metavar="LOG_FILE",
+        help=f"Derive the FAQ list from the most frequent logged questions (default log: {QUERY_LOG_FILE})",
+    )
+    parser.add_argument("--top", type=int, default=100, help="Questions to take from the query log (default: 100)")
+    parser.add_argument(
+        "--min-count", type=int, default=2, help="Minimum times a logged question was asked (default: 2)"
+    )
     parser.add_argument("--output", default="faq_cache.json", help="Output cache file path (default: faq_cache.json)")
     parser.add_argument(
         "--top-k", type=int, default=DEFAULT_TOP_K, help=f"Number of candidates to retrieve (default: {DEFAULT_TOP_K})"
@@ -72,20 +87,35 @@ def main():
         default=DEFAULT_RETRIES,
         help=f"Number of retries for LLM calls (default: {DEFAULT_RETRIES})",
     )
+    parser.add_argument("--workers", type=int, default=4, help="Questions answered concurrently (default: 4)")
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=25, help="Save the cache after every N answers (default: 25)"
+    )
+    parser.add_argument(
+        "--no-resume", action="store_true", help="Rebuild from scratch instead of keeping answers in --output"
+    )
 
     args = parser.parse_args()
+    if not args.faq_file and not args.from_query_log:
+        parser.error("either faq_file or --from-query-log is required")
 
     # Load FAQ questions
-    logger.info(f"Loading FAQ questions from {args.faq_file}...")
-    try:
-        questions = load_faq_list(args.faq_file)
-        logger.info(f"Loaded {len(questions)} FAQ questions")
-    except FileNotFoundError:
-        logger.error(f"FAQ file not found: {args.faq_file}")
-        sys.exit(1)
+    if args.from_query_log:
+        logger.info(f"Deriving FAQ questions from query log {args.from_query_log}...")
+        questions = faq_questions_from_query_log(args.from_query_log, top_n=args.top, min_count=args.min_count)
+        source = "query log"
+    else:
+        logger.info(f"Loading FAQ questions from {args.faq_file}...")
+        try:
+            questions = load_faq_list(args.faq_file)
+            logger.info(f"Loaded {len(questions)} FAQ questions")
+        except FileNotFoundError:
+            logger.error(f"FAQ file not found: {args.faq_file}")
+            sys.exit(1)
+        source = "FAQ file"
 
     if not questions:
-        logger.error("No questions found in FAQ file")
+        logger.error(f"No questions found in {source}")
         sys.exit(1)
 
     # Load index
@@ -124,6 +154,9 @@ def main():
             bm=bm,
             output_path=args.output,
             kb_signature=kb_signature,
+            workers=args.workers,
+            checkpoint_every=args.checkpoint_every,
+            resume=not args.no_resume,
             top_k=args.top_k,
             pack_top=args.pack_top,
             threshold=args.threshold,
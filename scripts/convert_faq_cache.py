@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Convert a precomputed FAQ cache between the JSON and binary formats.
+
+The binary format is memory-mapped and decoded per entry on lookup, so large FAQ
+caches load instantly. The output format follows the output extension: ``.bin`` or
+``.faqc`` writes binary, anything else JSON.
+
+Usage:
+    python3 scripts/convert_faq_cache.py faq_cache.json faq_cache.bin
+
+    # Back to JSON for inspection
+    python3 scripts/convert_faq_cache.py faq_cache.bin faq_cache.json
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from clockify_rag.precomputed_cache import convert_faq_cache
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a precomputed FAQ cache between JSON and binary formats")
+    parser.add_argument("source", help="Existing cache file (JSON or binary)")
+    parser.add_argument("output", help="Output path (.bin/.faqc for binary, otherwise JSON)")
+    args = parser.parse_args()
+
+    try:
+        count = convert_faq_cache(args.source, args.output)
+    except FileNotFoundError:
+        logger.error(f"FAQ cache not found: {args.source}")
+        sys.exit(1)
+
+    before = os.path.getsize(args.source)
+    after = os.path.getsize(args.output)
+    logger.info(f"✅ Converted {count} entries: {args.source} ({before:,} bytes) -> {args.output} ({after:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
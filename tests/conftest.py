@@ -113,6 +113,24 @@ def use_mock_llm_client():
     set_llm_client(None)
 
 
+@pytest.fixture(autouse=True)
+def isolate_answer_caches(monkeypatch):
+    """Start every test with empty process-wide answer caches (entries are keyed by index generation, not test)."""
+    import clockify_rag.caching as caching_module
+
+    for name in ("_QUERY_CACHE", "_SEMANTIC_CACHE", "_QUERY_EMBEDDING_CACHE"):
+        monkeypatch.setattr(caching_module, name, None)
+
+
+@pytest.fixture(autouse=True)
+def synchronous_query_log(monkeypatch):
+    """Write query log entries inline so tests can read the file right away (async writer tests opt in)."""
+    import clockify_rag.config as config_module
+
+    monkeypatch.setenv("RAG_LOG_ASYNC", "0")  # survives config reloads
+    monkeypatch.setattr(config_module, "QUERY_LOG_ASYNC", False)
+
+
 @pytest.fixture
 def sample_chunks():
     """Sample chunks for testing."""
@@ -17,14 +17,17 @@ from unittest.mock import patch
 
 from clockify_rag.answer import (
     apply_mmr_diversification,
+    apply_mmr_diversification_batch,
     apply_reranking,
+    evaluate_rerank_gate,
     extract_citations,
     validate_citations,
     generate_llm_answer,
     answer_once,
 )
-from clockify_rag.config import REFUSAL_STR
+from clockify_rag.config import MMR_LAMBDA, REFUSAL_STR
 from clockify_rag.exceptions import LLMUnavailableError, LLMError
+from clockify_rag.retrieval import DenseScoreStore
 
 
 @pytest.fixture
@@ -99,6 +102,54 @@ class TestMMRDiversification:
         assert 0 in result
         assert len(result) == 5
 
+    @staticmethod
+    def _reference_mmr(selected, dense, vecs, pack_top):
+        """Naive MMR that recomputes the full similarity matrix each pick."""
+        out = [max(selected, key=lambda j: dense[j])]
+        cand = [j for j in selected if j != out[0]]
+        while cand and len(out) < pack_top:
+            sims = vecs[cand] @ vecs[out].T
+            mmr = MMR_LAMBDA * np.array([dense[j] for j in cand]) - (1 - MMR_LAMBDA) * sims.max(axis=1)
+            pick = cand[int(mmr.argmax())]
+            out.append(pick)
+            cand.remove(pick)
+        return out
+
+    def test_mmr_matches_reference(self):
+        """Incremental max-similarity MMR picks the same items as the naive version."""
+        rng = np.random.default_rng(7)
+        vecs = rng.standard_normal((200, 64)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        dense = rng.random(200).astype(np.float32)
+        selected = [int(i) for i in rng.choice(200, 40, replace=False)]
+
+        result = apply_mmr_diversification(selected, {"dense": dense}, vecs, pack_top=10)
+
+        assert result == self._reference_mmr(selected, dense, vecs, 10)
+
+    def test_mmr_accepts_dense_score_store(self, sample_embeddings):
+        """Relevance is gathered from a lazy DenseScoreStore."""
+        qv = sample_embeddings[3]
+        store = DenseScoreStore(5, vecs=sample_embeddings, qv=qv)
+
+        result = apply_mmr_diversification([0, 1, 2, 3, 4], {"dense": store}, sample_embeddings, pack_top=3)
+
+        assert result[0] == 3
+        assert len(result) == 3
+
+    def test_mmr_batch_matches_single(self):
+        """Batched MMR returns the same selections as per-query calls."""
+        rng = np.random.default_rng(3)
+        vecs = rng.standard_normal((100, 32)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        selected_lists = [[int(i) for i in rng.choice(100, n, replace=False)] for n in (20, 5, 1, 0)]
+        scores_list = [{"dense": rng.random(100).astype(np.float32)} for _ in selected_lists]
+
+        batched = apply_mmr_diversification_batch(selected_lists, scores_list, vecs, pack_top=8)
+
+        expected = [apply_mmr_diversification(s, sc, vecs, 8) for s, sc in zip(selected_lists, scores_list)]
+        assert batched == expected
+
 
 class TestCitationExtraction:
     """Test citation extraction and validation."""
@@ -316,6 +367,131 @@ class TestReranking:
         assert not applied
         assert reason == "disabled"
 
+    def test_reranking_mode_none(self, sample_chunks, sample_scores):
+        """Mode "none" skips reranking even when requested."""
+        with patch("clockify_rag.answer.rerank_with_llm") as mock_llm:
+            result, scores, applied, reason, timing = apply_reranking(
+                "test question", sample_chunks, [0, 1, 2], sample_scores, use_rerank=True, rerank_mode="none"
+            )
+
+        mock_llm.assert_not_called()
+        assert result == [0, 1, 2]
+        assert reason == "disabled"
+
+    def test_reranking_cross_encoder_batches_and_caches(self, sample_chunks, sample_scores, monkeypatch):
+        """Cross-encoder mode scores candidates in one batch and caches per (query, chunk)."""
+        from clockify_rag import embedding
+
+        class FakeCrossEncoder:
+            def __init__(self):
+                self.calls = []
+
+            def predict(self, pairs, batch_size=32, show_progress_bar=False):
+                self.calls.append(len(pairs))
+                # Shorter passages score higher
+                return np.array([1.0 / len(text) for _, text in pairs], dtype=np.float32)
+
+        fake = FakeCrossEncoder()
+        monkeypatch.setattr(embedding, "_CROSS_ENCODER", fake)
+        embedding.clear_cross_encoder_cache()
+        try:
+            selected = [0, 1, 2, 3]
+            first = apply_reranking(
+                "q", sample_chunks, selected, sample_scores, use_rerank=True, rerank_mode="cross_encoder"
+            )
+            second = apply_reranking(
+                "q", sample_chunks, selected, sample_scores, use_rerank=True, rerank_mode="cross_encoder"
+            )
+        finally:
+            embedding.clear_cross_encoder_cache()
+
+        order, scores, applied, reason, _ = first
+        assert applied
+        assert reason == ""
+        expected = sorted(selected, key=lambda i: len(sample_chunks[i]["text"]))
+        assert order == expected
+        assert set(scores) == set(selected)
+        assert second[0] == expected
+        assert fake.calls == [4]  # second call served from cache
+
+    def test_reranking_cross_encoder_unavailable(self, sample_chunks, sample_scores, monkeypatch):
+        """Missing sentence-transformers falls back to MMR order."""
+        from clockify_rag import embedding
+
+        def _raise():
+            raise ImportError("sentence_transformers not installed")
+
+        monkeypatch.setattr(embedding, "_load_cross_encoder", _raise)
+        embedding.clear_cross_encoder_cache()
+
+        result, scores, applied, reason, _ = apply_reranking(
+            "q", sample_chunks, [0, 1, 2], sample_scores, use_rerank=True, rerank_mode="cross_encoder"
+        )
+
+        assert result == [0, 1, 2]
+        assert not applied
+        assert reason == "unavailable"
+
+
+class TestRerankGate:
+    """Test adaptive rerank gating."""
+
+    @staticmethod
+    def _scores(hybrid, intent_confidence=0.9):
+        return {
+            "dense": np.zeros(len(hybrid), dtype=np.float32),
+            "hybrid": np.array(hybrid, dtype=np.float32),
+            "intent_metadata": {"intent": "procedural", "intent_confidence": intent_confidence},
+        }
+
+    def test_gate_skips_clear_winner(self, sample_chunks):
+        """A dominant top hybrid score skips the rerank call."""
+        scores = self._scores([6.0, 0.5, 0.4, 0.3, 0.2])
+
+        with patch("clockify_rag.answer.rerank_with_llm") as mock_llm:
+            result, _, applied, reason, timing = apply_reranking(
+                "q", sample_chunks, [0, 1, 2, 3], scores, use_rerank=True, rerank_mode="llm"
+            )
+
+        mock_llm.assert_not_called()
+        assert result == [0, 1, 2, 3]
+        assert not applied
+        assert reason == "gate_confident"
+        assert timing == 0.0
+
+    def test_gate_reranks_flat_distribution(self, sample_chunks):
+        """Close hybrid scores still go through the reranker."""
+        scores = self._scores([1.0, 0.95, 0.9, 0.85, 0.8])
+        decision = evaluate_rerank_gate(scores, [0, 1, 2, 3])
+
+        assert not decision["skip"]
+        assert decision["margin"] == pytest.approx(0.05, abs=1e-3)
+        assert decision["entropy"] > 0.9
+
+    def test_gate_requires_intent_confidence(self):
+        """Low intent confidence blocks skipping even with a clear margin."""
+        scores = self._scores([6.0, 0.5, 0.4], intent_confidence=0.5)
+        assert not evaluate_rerank_gate(scores, [0, 1, 2])["skip"]
+
+        scores["intent_metadata"] = {}
+        assert evaluate_rerank_gate(scores, [0, 1, 2])["skip"]
+
+    def test_gate_disabled_and_metrics(self, sample_chunks, monkeypatch):
+        """gate=False always reranks; gate decisions are counted in metrics."""
+        from clockify_rag import metrics as metrics_module
+        from clockify_rag.metrics import MetricNames, MetricsCollector
+
+        collector = MetricsCollector()
+        monkeypatch.setattr(metrics_module, "get_metrics", lambda name="default": collector)
+        scores = self._scores([6.0, 0.5, 0.4, 0.3, 0.2])
+
+        with patch("clockify_rag.answer.rerank_with_llm", return_value=([1, 0], {}, True, "")) as mock_llm:
+            apply_reranking("q", sample_chunks, [0, 1], scores, use_rerank=True, rerank_mode="llm", gate=False)
+            apply_reranking("q", sample_chunks, [0, 1], scores, use_rerank=True, rerank_mode="llm", gate=True)
+
+        assert mock_llm.call_count == 1
+        assert collector.get_counter(MetricNames.RERANK_GATE_TOTAL, {"decision": "skip", "mode": "llm"}) == 1
+
 
 class TestAnswerOnce:
     """Test complete answer_once pipeline."""
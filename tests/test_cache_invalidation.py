@@ -0,0 +1,245 @@
+"""Tests for index-generation-aware cache invalidation and re-warming."""
+
+import json
+from unittest.mock import patch
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+import clockify_rag.caching as caching_module
+import clockify_rag.cli as cli_module
+from clockify_rag import config
+from clockify_rag.answer import answer_once
+from clockify_rag.caching import (
+    QueryCache,
+    QueryEmbeddingCache,
+    RerankCache,
+    SemanticAnswerCache,
+    hottest_cached_questions,
+    retain_index_generation,
+    rewarm_answer_caches,
+)
+from clockify_rag.cli import LoadedIndex
+from clockify_rag.precomputed_cache import PrecomputedCache
+from clockify_rag.shared_cache import SQLiteAnswerCache
+
+
+def _params(generation, top_k=5):
+    return {"top_k": top_k, "generation": generation}
+
+
+class TestLazyEviction:
+    """Test that every cache drops entries of superseded generations."""
+
+    def test_query_cache_sweeps_stale_entries_on_write(self):
+        """After retain_generation, old entries miss and are swept a few per write from the LRU end."""
+        cache = QueryCache(maxsize=100)
+        for i in range(10):
+            cache.put(f"q{i}", "old", {}, _params("g1"))
+        cache.retain_generation("g2")
+        assert cache.get("q0", _params("g1")) is None  # stale even with the old key
+
+        cache.put("new", "a", {}, _params("g2"))
+        assert cache.stats()["size"] == 10 - caching_module._SWEEP_LIMIT
+        cache.put("new2", "b", {}, _params("g2"))
+        assert cache.stats()["size"] == 2
+        assert cache.get("new", _params("g2"))[0] == "a"
+
+    def test_rerank_and_embedding_caches(self):
+        """Rerank entries carry their generation; query vectors are bound to it."""
+        rerank = RerankCache(maxsize=10)
+        rerank.put("k1", [1], {1: 0.5}, generation="g1")
+        rerank.retain_generation("g2")
+        assert rerank.get("k1") is None
+
+        embeddings = QueryEmbeddingCache(maxsize=10)
+        embeddings.put("how do i track time", "g1", np.ones(4))
+        assert embeddings.get("how do i track time", "g2") is None
+        assert embeddings.stats()["size"] == 0
+        embeddings.put("how do i track time", "g2", np.ones(4))
+        vec = embeddings.get("how do i track time", "g2")
+        vec[0] = 5.0  # callers get a copy
+        assert embeddings.get("how do i track time", "g2")[0] == 1.0
+
+    def test_semantic_cache_sweeps_stale_entries_on_write(self):
+        """The first write after a rebuild frees the slots of old-generation entries."""
+        cache = SemanticAnswerCache(maxsize=3, threshold=0.9)
+        cache.put(np.array([1.0, 0.0, 0.0]), [], "g1", {"answer": "old1"})
+        cache.put(np.array([0.0, 1.0, 0.0]), [], "g1", {"answer": "old2"})
+        cache.retain_generation("g2")
+        cache.put(np.array([0.0, 0.0, 1.0]), [], "g2", {"answer": "new"})
+
+        assert cache.stats()["size"] == 1
+        assert cache.get(np.array([0.0, 0.0, 1.0]), [], "g2")[0] == {"answer": "new"}
+
+    def test_retain_index_generation_reaches_live_caches(self, monkeypatch):
+        """The central hook updates every instantiated cache."""
+        caches = {
+            "_QUERY_CACHE": QueryCache(),
+            "_RERANK_CACHE": RerankCache(),
+            "_SEMANTIC_CACHE": SemanticAnswerCache(),
+            "_QUERY_EMBEDDING_CACHE": QueryEmbeddingCache(),
+        }
+        for name, cache in caches.items():
+            monkeypatch.setattr(caching_module, name, cache)
+        retain_index_generation("g9")
+        assert {cache._generation for cache in caches.values()} == {"g9"}
+
+    def test_shared_cache_retain_and_hottest(self, tmp_path):
+        """SQLite entries of other generations are purged; hit counts survive re-puts."""
+        cache = SQLiteAnswerCache(str(tmp_path / "answers.sqlite"))
+        try:
+            cache.put("hot", "a", {}, _params("g1"))
+            cache.put("cold", "b", {}, _params("g1"))
+            cache.flush(timeout=5)
+            for _ in range(3):
+                cache.get("hot", _params("g1"))
+            cache.put("hot", "a2", {}, _params("g1"))
+            cache.flush(timeout=5)
+            assert cache.hottest(5, "g1") == [("hot", _params("g1"))]
+
+            cache.retain_generation("g2")
+            cache.flush(timeout=5)
+            assert cache.stats()["size"] == 0
+        finally:
+            cache.close()
+
+    def test_faq_cache_stale_after_rebuild(self, tmp_path):
+        """A FAQ cache built for another index generation is ignored even when the KB text is unchanged."""
+        path = str(tmp_path / "faq.json")
+        built = PrecomputedCache(kb_signature="kb", generation="g1")
+        built.put("How do I track time?", {"answer": "Click the timer."})
+        built.save(path)
+
+        assert PrecomputedCache(path, kb_signature="kb", generation="g1").size() == 1
+        stale = PrecomputedCache(path, kb_signature="kb", generation="g2")
+        assert stale.is_stale() and stale.size() == 0
+        assert json.loads(open(path, encoding="utf-8").read())["generation"] == "g1"
+
+
+class TestRewarm:
+    """Test hot-question tracking and re-warming after ingest."""
+
+    def test_hottest_questions_by_generation(self, monkeypatch):
+        """Questions are ranked by hits within the requested generation."""
+        cache = QueryCache()
+        monkeypatch.setattr(caching_module, "_QUERY_CACHE", cache)
+        for question, hits in (("a", 1), ("b", 3), ("c", 0)):
+            cache.put(question, "x", {}, _params("g1"))
+            for _ in range(hits):
+                cache.get(question, _params("g1"))
+        cache.put("d", "x", {}, _params("g0"))
+        cache.get("d", _params("g0"))
+
+        assert [q for q, _ in hottest_cached_questions(5, "g1")] == ["b", "a"]
+        assert hottest_cached_questions(0, "g1") == []
+
+    def test_rewarm_recomputes_with_recorded_params(self, sample_chunks, sample_embeddings):
+        """Re-warming calls answer_once with the parameters recorded for each question."""
+        with patch("clockify_rag.answer.answer_once") as mock_answer:
+            mock_answer.side_effect = [{"answer": "ok"}, RuntimeError("boom")]
+            warmed = rewarm_answer_caches(
+                [("q1", {"top_k": 7, "generation": "g1", "model": "m"}), ("q2", {})],
+                sample_chunks,
+                sample_embeddings,
+                {},
+            )
+        assert warmed == 1
+        assert mock_answer.call_args_list[0].kwargs == {"hnsw": None, "index_generation": None, "top_k": 7}
+
+    def test_embedding_reused_across_repeat_questions(self, monkeypatch, sample_chunks, sample_embeddings):
+        """With only the embedding cache active, a repeated question is embedded once."""
+        monkeypatch.setattr(config, "QUERY_CACHE_BACKEND", "none")
+        monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", False)
+        monkeypatch.setattr("clockify_rag.answer.get_index_generation", lambda: "g1")
+        calls = []
+        monkeypatch.setattr("clockify_rag.answer.embed_query", lambda q, retries=0: calls.append(q) or np.ones(4))
+        scores = {"dense": np.full(5, 0.9, dtype=np.float32), "bm25": np.zeros(5), "hybrid": np.zeros(5)}
+
+        with patch("clockify_rag.answer.retrieve", return_value=([0, 1], scores)):
+            with patch("clockify_rag.answer.ask_llm", return_value='{"answer": "ok", "confidence": 80}'):
+                for _ in range(2):
+                    answer_once("How do I track time?", sample_chunks, sample_embeddings, {}, threshold=0.3)
+
+        assert len(calls) == 1
+
+    def test_ingest_retains_new_generation_and_rewarms(self, monkeypatch, tmp_path):
+        """A rebuild that changes the generation re-points caches and re-answers the hottest questions."""
+        corpus = tmp_path / "kb.md"
+        corpus.write_text("# KB\n\ncontent")
+        state = (["chunk"], np.zeros((1, 4)), {}, None)
+        cache = QueryCache()
+        monkeypatch.setattr(caching_module, "_QUERY_CACHE", cache)
+        cache.put("hot question", "x", {}, _params("g1"))
+        cache.get("hot question", _params("g1"))
+
+        generations = iter(["g1", "g2"])
+        rewarmed = []
+        monkeypatch.setattr(config, "CACHE_REWARM_TOP_N", 5)
+        monkeypatch.setattr(api_module, "build", lambda *args, **kwargs: None)
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: state)
+        monkeypatch.setattr(api_module, "get_index_generation", lambda: next(generations))
+        monkeypatch.setattr(api_module, "rewarm_answer_caches", lambda hot, *args, **kwargs: rewarmed.extend(hot))
+
+        with TestClient(api_module.create_app()) as client:
+            response = client.post("/v1/ingest", json={"input_file": str(corpus)})
+
+        assert response.status_code == 200
+        assert rewarmed == [("hot question", _params("g1"))]
+        assert cache._generation == "g2"
+
+
+class TestLoadedGeneration:
+    """Test that cached answers carry the generation of the index in memory, not the one on disk."""
+
+    def test_answer_cache_keyed_by_loaded_generation(self, monkeypatch, sample_chunks, sample_embeddings):
+        """An explicit index_generation is used as is; index.meta.json is never consulted."""
+        monkeypatch.setattr(caching_module, "_QUERY_CACHE", QueryCache())
+        monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", False)
+        monkeypatch.setattr(config, "QUERY_EMBEDDING_CACHE_SIZE", 0)
+        monkeypatch.setattr("clockify_rag.answer.get_index_generation", lambda: "g-disk")
+        monkeypatch.setattr("clockify_rag.answer.embed_query", lambda q, retries=0: np.ones(4))
+        scores = {"dense": np.full(5, 0.9, dtype=np.float32), "bm25": np.zeros(5), "hybrid": np.zeros(5)}
+
+        def ask(generation):
+            result = answer_once(
+                "How do I track time?", sample_chunks, sample_embeddings, {}, threshold=0.3, index_generation=generation
+            )
+            return result["metadata"].get("cache")
+
+        with patch("clockify_rag.answer.retrieve", return_value=([0, 1], scores)):
+            with patch("clockify_rag.answer.ask_llm", return_value='{"answer": "ok", "confidence": 80}'):
+                assert ask("g-loaded") is None
+                assert ask("g-loaded") == "exact"
+                assert ask("g-disk") is None
+
+    def test_ensure_index_ready_records_loaded_generation(self, monkeypatch):
+        """The tuple returned for the loaded artifacts carries the generation of the metadata read with them."""
+        loaded = {"chunks": ["c"], "vecs_n": np.zeros((1, 4)), "bm": {}, "meta": {"generation": "g-loaded"}}
+        monkeypatch.setattr(cli_module.os.path, "exists", lambda path: True)
+        monkeypatch.setattr(cli_module, "load_index", lambda: loaded)
+
+        result = cli_module.ensure_index_ready()
+
+        assert result == (["c"], loaded["vecs_n"], {}, None)
+        assert result.generation == "g-loaded"
+
+    def test_query_passes_generation_recorded_at_load(self, monkeypatch):
+        """/v1/query hands answer_once the generation captured with the loaded artifacts."""
+        seen = []
+
+        def answer(*_args, **kwargs):
+            seen.append(kwargs["index_generation"])
+            return {"answer": "ok", "selected_chunks": [], "metadata": {}}
+
+        loaded = LoadedIndex((["chunk"], np.zeros((1, 4)), {}, None), "g-loaded")
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: loaded)
+        monkeypatch.setattr(api_module, "answer_once", answer)
+        monkeypatch.setattr("clockify_rag.indexing.get_index_generation", lambda *a, **k: "g-disk")
+
+        with TestClient(api_module.create_app()) as client:
+            response = client.post("/v1/query", json={"question": "How do I track time?"})
+
+        assert response.status_code == 200
+        assert seen == ["g-loaded"]
@@ -0,0 +1,292 @@
+"""Tests for the adaptive LLM concurrency limiter."""
+
+import threading
+import time
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+from clockify_rag import deadline
+from clockify_rag.api_client import OllamaAPIClient
+from clockify_rag.circuit_breaker import reset_all_circuit_breakers
+from clockify_rag.concurrency import AdaptiveConcurrencyLimiter, retry_on_overload
+from clockify_rag.exceptions import DeadlineExceededError, LLMOverloadedError, LLMUnavailableError
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test admission, queueing, shedding and AIMD adjustments."""
+
+    def test_queue_full_sheds_immediately(self):
+        """Callers beyond limit + queue capacity are rejected without waiting."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_queue=0)
+        limiter.acquire()
+
+        started = time.monotonic()
+        with pytest.raises(LLMOverloadedError) as exc_info:
+            limiter.acquire()
+        assert time.monotonic() - started < 0.5
+        assert exc_info.value.retry_after > 0
+        assert limiter.get_stats()["shed"]["queue_full"] == 1
+
+    def test_waiters_are_admitted_fifo(self):
+        """A freed slot goes to the longest-waiting caller."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1, max_queue=10)
+        limiter.acquire()
+        order = []
+
+        def waiter(tag):
+            limiter.acquire()
+            order.append(tag)
+            limiter.release(0.001)
+
+        threads = []
+        for tag in range(3):
+            t = threading.Thread(target=waiter, args=(tag,))
+            t.start()
+            threads.append(t)
+            while limiter.get_stats()["queued"] < tag + 1:
+                time.sleep(0.001)
+
+        limiter.release(0.001)
+        for t in threads:
+            t.join(5)
+        assert order == [0, 1, 2]
+        assert limiter.get_stats()["inflight"] == 0
+
+    def test_deadline_shedding(self):
+        """Estimated waits past the deadline shed up front; expired waits shed in the queue."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1, max_queue=10)
+        limiter.acquire()
+        limiter.release(2.0)  # teach the limiter that calls take ~2s
+        limiter.acquire()
+
+        started = time.monotonic()
+        with pytest.raises(LLMOverloadedError) as exc_info:
+            limiter.acquire(deadline=time.monotonic() + 0.5)
+        assert time.monotonic() - started < 0.1
+        assert exc_info.value.retry_after >= 2.0
+
+        fresh = AdaptiveConcurrencyLimiter(initial_limit=1, max_queue=10)
+        fresh.acquire()
+        with pytest.raises(LLMOverloadedError):
+            fresh.acquire(deadline=time.monotonic() + 0.05)
+        stats = fresh.get_stats()
+        assert stats["shed"]["deadline"] == 1
+        assert stats["queued"] == 0
+        assert stats["shed_rate"] == 0.5
+
+    def test_aimd_limit_adjustment(self):
+        """Fast replies grow the limit additively; congestion shrinks it once per round trip."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8, backoff_ratio=0.5)
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release(0.01)
+        assert 4.9 < limiter.limit < 5.0
+
+        limiter.acquire()
+        limiter.acquire()
+        limiter.release(None, overloaded=True)
+        decreased = limiter.limit
+        limiter.release(None, overloaded=True)  # same round trip: no second cut
+        assert decreased == pytest.approx(limiter.limit)
+        assert 2.4 < limiter.limit < 2.5
+
+        time.sleep(0.02)  # next round trip
+        limiter.acquire()
+        limiter.acquire()
+        limiter.release(0.5)  # far above the ~10ms baseline while another call is in flight
+        assert limiter.limit < 2.4
+        limiter.release(0.01)
+
+    def test_mixed_call_classes_uncontended_do_not_back_off(self):
+        """Cheap reranks and long generations, one at a time, never read as congestion."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8)
+        calls = [(0.4, "rerank", 20), (2.5, "answer", 240), (0.4, "rerank", 20), (4.0, "answer", 390)]
+        calls += [(0.4, "rerank", 20), (1.5, "answer", 140)]
+        for i in range(300):
+            latency, call_class, tokens = calls[i % len(calls)]
+            limiter.acquire()
+            limiter._last_decrease = 0.0  # let every slow sample count as a new round trip
+            limiter.release(latency, call_class=call_class, work=tokens)
+        assert limiter.limit == 8.0
+        assert set(limiter.get_stats()["baselines_ms"]) == {"rerank", "answer"}
+
+        # Without class/work information, uncontended slow calls still don't cut the limit
+        for i in range(300):
+            limiter.acquire()
+            limiter._last_decrease = 0.0
+            limiter.release(calls[i % len(calls)][0])
+        assert limiter.limit == 8.0
+
+    def test_slower_tokens_under_contention_back_off(self):
+        """Per-token latency rising under concurrent load is congestion, whatever the answer length."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, backoff_ratio=0.5)
+        limiter.acquire()
+        limiter.release(1.0, call_class="answer", work=100)  # 10 ms/token baseline
+        for _ in range(3):
+            limiter.acquire()
+        limiter.release(3.0, call_class="answer", work=300)  # longer answer, same speed
+        assert limiter.limit > 4
+        limiter._last_decrease = 0.0
+        limiter.release(2.5, call_class="answer", work=100)  # 25 ms/token
+        assert limiter.limit < 3
+
+    def test_limit_bounds(self):
+        """The limit never leaves [min_limit, max_limit]."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=3, backoff_ratio=0.1)
+        for _ in range(50):
+            limiter.acquire()
+            limiter.release(0.01)
+        assert limiter.limit == 3.0
+        limiter._last_decrease = 0.0
+        limiter.acquire()
+        limiter.release(None, overloaded=True)
+        assert limiter.limit == 2.0
+
+
+class TestRetryOnOverload:
+    """Test batch callers waiting out shed LLM calls."""
+
+    def test_retries_until_admitted(self, monkeypatch):
+        """Shed calls are retried after retry_after; other errors and exhausted retries propagate."""
+        sleeps = []
+        monkeypatch.setattr("clockify_rag.concurrency.time.sleep", sleeps.append)
+        outcomes = [LLMOverloadedError("busy", 2.0), LLMOverloadedError("busy", 0.0), "ok"]
+
+        def call():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert retry_on_overload(call) == "ok"
+        assert sleeps == [2.0, 0.1]
+
+        with pytest.raises(LLMOverloadedError):
+            retry_on_overload(lambda: (_ for _ in ()).throw(LLMOverloadedError("busy", 0.0)), attempts=2)
+
+    def test_faq_build_keeps_shed_questions(self, monkeypatch, tmp_path):
+        """A question shed by the limiter is retried instead of missing from the FAQ cache."""
+        import clockify_rag.answer as answer_module
+        from clockify_rag.precomputed_cache import build_faq_cache
+
+        monkeypatch.setattr("clockify_rag.concurrency.time.sleep", lambda _s: None)
+        monkeypatch.setattr("clockify_rag.precomputed_cache._embed_faq_questions", lambda qs: {})
+        shed = {"Q2"}
+
+        def fake_answer(question, *args, **kwargs):
+            if question in shed:
+                shed.discard(question)
+                raise LLMOverloadedError("busy", 0.0)
+            return {"answer": f"A {question}"}
+
+        monkeypatch.setattr(answer_module, "answer_once", fake_answer)
+        cache = build_faq_cache(["Q1", "Q2"], [], None, {}, str(tmp_path / "faq.json"), kb_signature="s", workers=1)
+
+        assert cache.get("Q2")["answer"] == "A Q2"
+
+
+class TestChatCompletionLimiting:
+    """Test the limiter wiring in OllamaAPIClient.chat_completion."""
+
+    @pytest.fixture(autouse=True)
+    def reset_breakers(self):
+        reset_all_circuit_breakers()
+        yield
+        reset_all_circuit_breakers()
+
+    def test_shed_before_request(self, monkeypatch):
+        """A saturated limiter raises before any HTTP call is made."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_queue=0)
+        limiter.acquire()
+        posts = []
+        session = type("S", (), {"trust_env": False, "post": lambda self, *a, **k: posts.append(a)})()
+        monkeypatch.setattr("clockify_rag.api_client.get_session", lambda **kwargs: session)
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: limiter)
+        client = OllamaAPIClient(base_url="http://fake-host:11434")
+
+        with pytest.raises(LLMOverloadedError):
+            client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+        assert posts == []
+
+    def test_timeout_releases_slot_and_backs_off(self, monkeypatch):
+        """Timeouts free the slot and count as a congestion signal."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+
+        class TimeoutSession:
+            trust_env = False
+
+            def post(self, *args, **kwargs):
+                raise requests.exceptions.Timeout("slow")
+
+        monkeypatch.setattr("clockify_rag.api_client.get_session", lambda **kwargs: TimeoutSession())
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: limiter)
+        client = OllamaAPIClient(base_url="http://fake-host:11434")
+
+        with pytest.raises(LLMUnavailableError):
+            client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+        assert limiter.get_stats()["inflight"] == 0
+        assert limiter.limit < 4
+
+    def test_timeout_clamped_after_queue_wait(self, monkeypatch):
+        """Time spent queued for a slot is taken out of the read timeout; an exhausted budget frees the slot."""
+
+        class SlowAdmission(AdaptiveConcurrencyLimiter):
+            def acquire(self, deadline=None):
+                time.sleep(wait)
+                return super().acquire(deadline=None)
+
+        captured = {}
+
+        class CapturingSession:
+            trust_env = False
+
+            def post(self, *args, **kwargs):
+                captured["timeout"] = kwargs.get("timeout")
+                payload = {"model": "m", "message": {"role": "assistant", "content": "ok"}, "done": True}
+                return type(
+                    "R",
+                    (),
+                    {"status_code": 200, "raise_for_status": lambda self: None, "json": lambda self: payload},
+                )()
+
+        limiter = SlowAdmission(initial_limit=4)
+        monkeypatch.setattr("clockify_rag.api_client.get_session", lambda **kwargs: CapturingSession())
+        monkeypatch.setattr("clockify_rag.api_client.get_single_try_session", CapturingSession)
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: limiter)
+        client = OllamaAPIClient(base_url="http://fake-host:11434")
+
+        wait = 0.3
+        with deadline.deadline_scope(1.0):
+            client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+        assert captured["timeout"][1] <= 0.75
+
+        wait = 0.2
+        captured.clear()
+        with deadline.deadline_scope(0.1):
+            with pytest.raises(DeadlineExceededError):
+                client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+        assert captured == {}
+        assert limiter.get_stats()["inflight"] == 0
+
+
+class TestQueryOverload:
+    """Test /v1/query mapping of shed requests."""
+
+    def test_overload_returns_503_with_retry_after(self, monkeypatch):
+        """A shed LLM call surfaces as a fast 503 with Retry-After."""
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+
+        def overloaded(*_args, **_kwargs):
+            raise LLMOverloadedError("LLM overloaded (deadline)", retry_after=2.4)
+
+        monkeypatch.setattr(api_module, "answer_once", overloaded)
+        app = api_module.create_app()
+
+        with TestClient(app) as client:
+            response = client.post("/v1/query", json={"question": "How do I track time?"})
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
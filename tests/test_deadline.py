@@ -0,0 +1,281 @@
+"""Tests for end-to-end request deadlines."""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+from clockify_rag import config, deadline
+from clockify_rag.answer import answer_once, apply_reranking
+from clockify_rag.api_client import OllamaAPIClient
+from clockify_rag.caching import QueryCache
+from clockify_rag.circuit_breaker import (
+    get_embedding_circuit_breaker,
+    get_ollama_circuit_breaker,
+    reset_all_circuit_breakers,
+)
+from clockify_rag.concurrency import AdaptiveConcurrencyLimiter
+from clockify_rag.exceptions import DeadlineExceededError
+
+
+class TestDeadlineScope:
+    """Test the context-local deadline helpers."""
+
+    def test_scope_tightens_and_resets(self):
+        """Nested scopes can only shorten the deadline; leaving a scope restores the outer one."""
+        assert deadline.remaining() is None
+        with deadline.deadline_scope(10.0) as outer:
+            with deadline.deadline_scope(60.0) as inner:
+                assert inner == outer
+            with deadline.deadline_scope(1.0) as tighter:
+                assert tighter < outer
+                assert 0 < deadline.remaining() <= 1.0
+            assert deadline.get_deadline() == outer
+        assert deadline.get_deadline() is None
+        assert not deadline.expired()
+
+    def test_check_deadline_raises_when_expired(self):
+        """check_deadline fails fast and names the stage."""
+        with deadline.deadline_scope(0.0):
+            assert deadline.expired()
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                deadline.check_deadline("retrieve")
+        assert exc_info.value.stage == "retrieve"
+        deadline.check_deadline("retrieve")  # no deadline: no-op
+
+    def test_bound_timeout_clamps_and_raises(self):
+        """Timeouts shrink to the remaining budget minus the reserve."""
+        assert deadline.bound_timeout((3.0, 120.0), "llm") == (3.0, 120.0)
+        with deadline.deadline_scope(5.0):
+            connect, read = deadline.bound_timeout((3.0, 120.0), "llm")
+            assert connect == 3.0
+            assert 4.0 < read <= 5.0
+            connect, read = deadline.bound_timeout((3.0, 120.0), "rerank", reserve=3.0)
+            assert read <= 2.0 and connect <= 2.0
+            with pytest.raises(DeadlineExceededError):
+                deadline.bound_timeout((3.0, 120.0), "rerank", reserve=10.0)
+
+    def test_skip_optional_stage_uses_generation_reserve(self, monkeypatch):
+        """Optional stages step aside only when less than the reserve remains."""
+        monkeypatch.setattr(config, "DEADLINE_GENERATION_RESERVE", 2.0)
+        assert not deadline.skip_optional_stage("rerank")
+        with deadline.deadline_scope(10.0):
+            assert not deadline.skip_optional_stage("rerank")
+        with deadline.deadline_scope(1.0):
+            assert deadline.skip_optional_stage("rerank")
+
+    def test_skipped_stages_recorded_until_next_tracking(self, monkeypatch):
+        """Deadline skips are recorded per request; a fresh tracking call starts clean."""
+        monkeypatch.setattr(config, "DEADLINE_GENERATION_RESERVE", 2.0)
+        deadline.track_degradation()
+        with deadline.deadline_scope(1.0):
+            deadline.skip_optional_stage("expansion")
+        deadline.mark_degraded("rerank")
+        assert deadline.degraded_stages() == {"expansion", "rerank"}
+        deadline.track_degradation()
+        assert deadline.degraded_stages() == set()
+
+
+class TestDeadlinePropagation:
+    """Test that pipeline stages honour the request deadline."""
+
+    @pytest.fixture(autouse=True)
+    def reset_breakers(self):
+        reset_all_circuit_breakers()
+        yield
+        reset_all_circuit_breakers()
+
+    def test_rerank_skipped_under_tight_budget(self, monkeypatch):
+        """apply_reranking reports reason 'deadline' instead of calling the LLM."""
+        monkeypatch.setattr(config, "DEADLINE_GENERATION_RESERVE", 5.0)
+
+        def fail_rerank(*_args, **_kwargs):
+            raise AssertionError("rerank should have been skipped")
+
+        monkeypatch.setattr("clockify_rag.answer.rerank_with_llm", fail_rerank)
+        with deadline.deadline_scope(1.0):
+            selected, _scores, applied, reason, _timing = apply_reranking(
+                "q", [], [0, 1, 2], {}, use_rerank=True, rerank_mode="llm", gate=False
+            )
+        assert selected == [0, 1, 2]
+        assert applied is False
+        assert reason == "deadline"
+
+    def test_degraded_answer_not_cached(self, monkeypatch, sample_chunks, sample_embeddings):
+        """An answer built after skipping expansion for the deadline is served but never cached."""
+        monkeypatch.setattr(config, "DEADLINE_GENERATION_RESERVE", 5.0)
+        semantic = MagicMock()
+        semantic.get.return_value = None
+        monkeypatch.setattr("clockify_rag.caching._QUERY_CACHE", QueryCache())
+        monkeypatch.setattr("clockify_rag.answer.get_semantic_cache", lambda: semantic)
+        monkeypatch.setattr("clockify_rag.answer.embed_query", lambda q, retries=0: np.ones(4))
+        scores = {"dense": np.full(5, 0.9, dtype=np.float32), "bm25": np.zeros(5), "hybrid": np.zeros(5)}
+
+        def retrieve(*_args, **_kwargs):
+            deadline.skip_optional_stage("expansion")
+            return [0, 1], scores
+
+        def ask():
+            result = answer_once(
+                "How do I track time?", sample_chunks, sample_embeddings, {}, threshold=0.3, index_generation="g1"
+            )
+            return result["metadata"].get("cache")
+
+        with patch("clockify_rag.answer.retrieve", side_effect=retrieve):
+            with patch("clockify_rag.answer.ask_llm", return_value='{"answer": "ok", "confidence": 80}'):
+                with deadline.deadline_scope(3.0):
+                    assert ask() is None
+                    assert ask() is None
+                semantic.put.assert_not_called()
+                assert ask() is None
+                assert ask() == "exact"
+        semantic.put.assert_called_once()
+
+    def test_chat_timeout_clamped_to_deadline(self, monkeypatch):
+        """The LLM read timeout never exceeds the remaining request budget."""
+        captured = {}
+
+        class CapturingSession:
+            trust_env = False
+
+            def post(self, *args, **kwargs):
+                captured["timeout"] = kwargs.get("timeout")
+                payload = {"model": "m", "message": {"role": "assistant", "content": "ok"}, "done": True}
+                response = type(
+                    "R",
+                    (),
+                    {"status_code": 200, "raise_for_status": lambda self: None, "json": lambda self: payload},
+                )()
+                return response
+
+        monkeypatch.setattr("clockify_rag.api_client.get_session", lambda **kwargs: CapturingSession())
+        monkeypatch.setattr("clockify_rag.api_client.get_single_try_session", CapturingSession)
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: None)
+        client = OllamaAPIClient(base_url="http://fake-host:11434")
+
+        with deadline.deadline_scope(2.0):
+            client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+        connect, read = captured["timeout"]
+        assert read <= 2.0
+        assert connect <= 2.0
+
+        with deadline.deadline_scope(0.0):
+            with pytest.raises(DeadlineExceededError):
+                client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+
+    def test_clamped_chat_timeout_is_deadline_miss(self, monkeypatch):
+        """A timeout the deadline shortened is not an Ollama failure and is never retried."""
+        posts = []
+
+        class TimeoutSession:
+            trust_env = False
+
+            def post(self, *args, **kwargs):
+                posts.append(kwargs.get("timeout"))
+                raise requests.exceptions.ReadTimeout("slow")
+
+        def retrying_session(**_kwargs):
+            raise AssertionError("no retrying session under a deadline")
+
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        client = OllamaAPIClient(base_url="http://fake-host:11434")
+        monkeypatch.setattr("clockify_rag.api_client.get_session", retrying_session)
+        monkeypatch.setattr("clockify_rag.api_client.get_single_try_session", TimeoutSession)
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: limiter)
+
+        with deadline.deadline_scope(1.0):
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                client.chat_completion(messages=[{"role": "user", "content": "ping"}])
+        assert exc_info.value.stage == "llm"
+        assert len(posts) == 1
+        assert get_ollama_circuit_breaker().get_stats()["failure_count"] == 0
+        assert limiter.get_stats()["inflight"] == 0
+        assert limiter.limit == 4
+
+    def test_clamped_embedding_timeout_is_deadline_miss(self, monkeypatch):
+        """create_embedding maps a deadline-clamped timeout to DeadlineExceededError."""
+
+        class TimeoutSession:
+            trust_env = False
+
+            def post(self, *args, **kwargs):
+                raise requests.exceptions.ReadTimeout("slow")
+
+        client = OllamaAPIClient(base_url="http://fake-host:11434")
+        monkeypatch.setattr("clockify_rag.api_client.EMB_BACKEND", "ollama")
+        monkeypatch.setattr("clockify_rag.api_client.get_single_try_session", TimeoutSession)
+
+        with deadline.deadline_scope(1.0):
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                client.create_embedding("ping")
+        assert exc_info.value.stage == "embedding"
+
+    def test_embed_query_deadline_miss_skips_breaker_and_retries(self, monkeypatch):
+        """embed_query makes one attempt under a deadline and leaves the breaker alone when it runs out."""
+        from clockify_rag import embeddings_client
+
+        calls = []
+
+        def slow_post(url, payload, retries=3, timeout=None, **_kwargs):
+            calls.append(retries)
+            time.sleep(0.06)
+            raise requests.exceptions.RequestException("read timed out")
+
+        monkeypatch.setattr(embeddings_client, "http_post_with_retries", slow_post)
+        with deadline.deadline_scope(0.05):
+            with pytest.raises(DeadlineExceededError):
+                embeddings_client.embed_query("ping")
+        assert calls == [0]
+        assert get_embedding_circuit_breaker().get_stats()["failure_count"] == 0
+
+
+class TestQueryDeadline:
+    """Test /v1/query deadline handling."""
+
+    def _app(self, monkeypatch, answer):
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+        monkeypatch.setattr(api_module, "answer_once", answer)
+        return api_module.create_app()
+
+    def test_deadline_visible_in_worker_and_capped(self, monkeypatch):
+        """Body timeout_ms wins over the header and is capped by RAG_REQUEST_TIMEOUT_MAX_MS."""
+        seen = []
+
+        def answer(*_args, **_kwargs):
+            seen.append(deadline.remaining())
+            return {"answer": "ok", "selected_chunks": [], "metadata": {}}
+
+        monkeypatch.setattr(api_module.config, "REQUEST_TIMEOUT_MAX_MS", 20000)
+        app = self._app(monkeypatch, answer)
+        headers = {config.REQUEST_TIMEOUT_HEADER: "5000"}
+        with TestClient(app) as client:
+            from_header = client.post("/v1/query", json={"question": "How do I track time?"}, headers=headers)
+            from_body = client.post(
+                "/v1/query", json={"question": "How do I track time?", "timeout_ms": 1000}, headers=headers
+            )
+            capped = client.post("/v1/query", json={"question": "How do I track time?", "timeout_ms": 999999})
+
+        assert [r.status_code for r in (from_header, from_body, capped)] == [200, 200, 200]
+        assert 1.0 < seen[0] <= 5.0
+        assert 0 < seen[1] <= 1.0
+        assert 5.0 < seen[2] <= 20.0
+        assert deadline.get_deadline() is None
+
+    def test_deadline_exceeded_returns_504(self, monkeypatch):
+        """DeadlineExceededError from the pipeline maps to 504."""
+
+        def answer(*_args, **_kwargs):
+            time.sleep(0.15)
+            deadline.check_deadline("llm")
+            return {"answer": "late", "selected_chunks": [], "metadata": {}}
+
+        app = self._app(monkeypatch, answer)
+        with TestClient(app) as client:
+            response = client.post("/v1/query", json={"question": "How do I track time?", "timeout_ms": 100})
+
+        assert response.status_code == 504
+        assert response.json()["detail"] == "Request deadline exceeded"
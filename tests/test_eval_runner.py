@@ -0,0 +1,224 @@
+"""Tests for the parallel evaluation runner and parameter sweeps."""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+import clockify_rag.config as config
+import clockify_rag.embedding as embedding
+from clockify_rag import eval_runner
+from clockify_rag.answer import apply_mmr_diversification
+from clockify_rag.eval_runner import EvalCache, EvalQuery, SweepConfig, run_retrieval_sweep, sweep_grid
+from clockify_rag.retrieval import retrieve
+
+
+@pytest.fixture
+def local_embeddings(monkeypatch, sample_embeddings):
+    """Deterministic local embeddings (no SentenceTransformer) with call counting."""
+    calls = {"texts": 0}
+    dim = sample_embeddings.shape[1]
+
+    def fake_embed_local_batch(texts, normalize=True):
+        calls["texts"] += len(texts)
+        rows = []
+        for text in texts:
+            seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+            vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+            rows.append(vec / np.linalg.norm(vec))
+        return np.stack(rows)
+
+    monkeypatch.setattr(config, "EMB_BACKEND", "local")
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(embedding, "embed_local_batch", fake_embed_local_batch)
+    return calls
+
+
+@pytest.fixture
+def eval_queries():
+    return [
+        EvalQuery("How do I track time?", frozenset({0, 2})),
+        EvalQuery("What does the free plan include?", frozenset({1})),
+        EvalQuery("How do I generate reports?", frozenset({3})),
+        EvalQuery("Can I connect Jira?", frozenset({4})),
+    ]
+
+
+class TestRetrieveOverrides:
+    """Test the retrieve/MMR overrides the sweep relies on."""
+
+    def test_query_vec_skips_embedding(self, monkeypatch, sample_chunks, sample_embeddings, sample_bm25):
+        """A precomputed query vector is used as-is."""
+        monkeypatch.setattr(config, "USE_ANN", "none")
+
+        def fail_embed(*_args, **_kwargs):
+            raise AssertionError("embed_query should not be called")
+
+        monkeypatch.setattr("clockify_rag.retrieval.embed_query", fail_embed)
+        query_vec = sample_embeddings[3]
+        _ids, scores = retrieve(
+            "How do I track time?", sample_chunks, sample_embeddings, sample_bm25, top_k=3, query_vec=query_vec
+        )
+        assert scores["dense"].take([3])[0] == pytest.approx(1.0, abs=1e-5)
+
+    def test_alpha_override_changes_weighting(self, monkeypatch, sample_chunks, sample_embeddings, sample_bm25):
+        """alpha=1 ranks by BM25 alone, alpha=0 by dense alone."""
+        monkeypatch.setattr(config, "USE_ANN", "none")
+        monkeypatch.setattr(config, "HUB_PAGE_SCORE_MULTIPLIER", 1.0)
+        query_vec = sample_embeddings[4]
+        bm25_first, _ = retrieve(
+            "pricing free plan", sample_chunks, sample_embeddings, sample_bm25, top_k=5, alpha=1.0, query_vec=query_vec
+        )
+        dense_first, _ = retrieve(
+            "pricing free plan", sample_chunks, sample_embeddings, sample_bm25, top_k=5, alpha=0.0, query_vec=query_vec
+        )
+        assert bm25_first[0] == 1
+        assert dense_first[0] == 4
+
+    def test_mmr_lambda_override(self, sample_embeddings):
+        """mmr_lambda=1 keeps pure relevance order regardless of MMR_LAMBDA."""
+        dense = {0: 0.9, 2: 0.8, 4: 0.1}
+        order = apply_mmr_diversification([4, 2, 0], {"dense": dense}, sample_embeddings, 3, mmr_lambda=1.0)
+        assert order == [0, 2, 4]
+
+
+class TestRetrievalSweep:
+    """Test grid evaluation, parallelism and caching."""
+
+    def test_grid_defaults(self):
+        """Omitted axes fall back to the current configuration."""
+        grid = sweep_grid(alphas=[0.3, 0.7], mmr_lambdas=[0.5, 1.0])
+        assert len(grid) == 4
+        assert {c.top_k for c in grid} == {config.DEFAULT_TOP_K}
+        assert sweep_grid() == [SweepConfig(alpha=None, top_k=config.DEFAULT_TOP_K, mmr_lambda=None)]
+
+    def test_sweep_reports_quality_and_latency(
+        self, local_embeddings, eval_queries, sample_chunks, sample_embeddings, sample_bm25
+    ):
+        """Each config gets MRR/P@5/NDCG and p50/p95; MMR variants share one retrieval pass."""
+        calls = {"batches": 0}
+        original = eval_runner._retrieve_batch
+
+        def counting_batch(*args):
+            calls["batches"] += 1
+            return original(*args)
+
+        configs = sweep_grid(alphas=[0.2, 0.8], top_ks=[3], mmr_lambdas=[0.5, 1.0])
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(eval_runner, "_retrieve_batch", counting_batch)
+            results = run_retrieval_sweep(
+                eval_queries, sample_chunks, sample_embeddings, sample_bm25, configs, workers=1
+            )
+
+        assert len(results) == 4
+        assert calls["batches"] == 2 * len(eval_queries)  # two (alpha, top_k) pairs, not four
+        for row in results:
+            assert 0.0 <= row["mrr_at_10"] <= 1.0
+            assert 0.0 <= row["ndcg_at_10"] <= 1.0
+            assert row["latency_p95_ms"] >= row["latency_p50_ms"] >= 0.0
+            assert row["queries"] == len(eval_queries)
+            assert row["cached"] == 0.0
+        assert eval_runner.best_config(results) in results
+
+    def test_process_pool_matches_in_process(
+        self, local_embeddings, eval_queries, sample_chunks, sample_embeddings, sample_bm25
+    ):
+        """Worker processes produce the same metrics as the in-process path."""
+        configs = sweep_grid(alphas=[0.5], top_ks=[2, 4], mmr_lambdas=[0.75])
+        serial = run_retrieval_sweep(eval_queries, sample_chunks, sample_embeddings, sample_bm25, configs, workers=1)
+        parallel = run_retrieval_sweep(eval_queries, sample_chunks, sample_embeddings, sample_bm25, configs, workers=2)
+
+        strip = ("latency_p50_ms", "latency_p95_ms")
+        assert [{k: v for k, v in r.items() if k not in strip} for r in serial] == [
+            {k: v for k, v in r.items() if k not in strip} for r in parallel
+        ]
+
+    def test_cache_reuses_embeddings_and_results_per_generation(
+        self, tmp_path, local_embeddings, eval_queries, sample_chunks, sample_embeddings, sample_bm25
+    ):
+        """A second run is served from cache; a new index generation starts fresh."""
+        configs = sweep_grid(alphas=[0.5], top_ks=[3])
+        cache = EvalCache(str(tmp_path), generation="gen-a")
+        first = run_retrieval_sweep(
+            eval_queries, sample_chunks, sample_embeddings, sample_bm25, configs, workers=1, cache=cache
+        )
+        embedded = local_embeddings["texts"]
+        assert embedded == len(eval_queries)
+
+        def fail_batch(*_args):
+            raise AssertionError("retrieval should be served from cache")
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(eval_runner, "_retrieve_batch", fail_batch)
+            second = run_retrieval_sweep(
+                eval_queries, sample_chunks, sample_embeddings, sample_bm25, configs, workers=1, cache=cache
+            )
+        assert local_embeddings["texts"] == embedded
+        assert second[0]["cached"] == 1.0
+        assert second[0]["ndcg_at_10"] == first[0]["ndcg_at_10"]
+
+        fresh = EvalCache(str(tmp_path), generation="gen-b")
+        assert fresh.load_embeddings() == {}
+        assert fresh.load_results((0.5, 3)) == {}
+
+    def test_cache_disabled_without_generation(self, tmp_path):
+        """No index generation means nothing is cached (results could go stale silently)."""
+        cache = EvalCache(str(tmp_path), generation="")
+        cache.save_results((0.5, 3), {"q": {"ids": [1], "dense": [0.5], "latency_ms": 1.0}})
+        assert not cache.enabled
+        assert cache.load_results((0.5, 3)) == {}
+        assert not any(tmp_path.iterdir())
+
+    def test_results_key_tracks_default_alpha(self, tmp_path, monkeypatch):
+        """Sweeps that leave alpha unset use config.ALPHA_HYBRID, so changing it invalidates results."""
+        cache = EvalCache(str(tmp_path), generation="gen-a")
+        cache.save_results((None, 3), {"q": {"ids": [1], "dense": [0.5], "latency_ms": 1.0}})
+        assert cache.load_results((None, 3)) != {}
+        monkeypatch.setattr(config, "ALPHA_HYBRID", config.ALPHA_HYBRID + 0.1)
+        assert cache.load_results((None, 3)) == {}
+
+
+class TestAnswerEval:
+    """Test concurrent answer evaluation."""
+
+    def test_bounded_concurrency_and_summary(self, monkeypatch, eval_queries):
+        """answer_once runs with at most ``concurrency`` calls in flight; failures are counted."""
+        import threading
+        import time
+
+        state = {"inflight": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def fake_answer_once(question, *_args, **_kwargs):
+            with lock:
+                state["inflight"] += 1
+                state["peak"] = max(state["peak"], state["inflight"])
+            time.sleep(0.02)
+            with lock:
+                state["inflight"] -= 1
+            if "Jira" in question:
+                raise RuntimeError("boom")
+            return {"answer": "ok", "confidence": 80, "refused": "plan" in question, "packed_chunks": [0, 3]}
+
+        monkeypatch.setattr("clockify_rag.answer.answer_once", fake_answer_once)
+        report = eval_runner.run_answer_eval(eval_queries, [], None, None, concurrency=2)
+
+        summary = report["summary"]
+        assert state["peak"] == 2
+        assert summary["queries"] == 4
+        assert summary["errors"] == 1
+        assert summary["refusal_rate"] == pytest.approx(1 / 3)
+        assert summary["context_hit_rate"] == pytest.approx(2 / 3)
+        assert summary["mean_confidence"] == 80.0
+
+    def test_answer_cache_bypassed(self, monkeypatch, eval_queries):
+        """Every query runs the full pipeline: cached answers would hide the configuration under test."""
+        seen = []
+
+        def fake_answer_once(question, *_args, **kwargs):
+            seen.append(kwargs.get("use_answer_cache"))
+            return {"answer": "ok", "confidence": 80, "refused": False, "packed_chunks": []}
+
+        monkeypatch.setattr("clockify_rag.answer.answer_once", fake_answer_once)
+        eval_runner.run_answer_eval(eval_queries, [], None, None, concurrency=2)
+        assert seen == [False] * len(eval_queries)
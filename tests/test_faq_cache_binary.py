@@ -0,0 +1,88 @@
+"""Tests for the memory-mapped binary FAQ cache format."""
+
+import json
+
+import pytest
+
+from clockify_rag.precomputed_cache import PrecomputedCache, convert_faq_cache
+
+QUESTIONS = [f"How do I use feature {i}?" for i in range(50)]
+
+
+def _json_cache(path, kb_signature="sig", generation="gen-1"):
+    cache = PrecomputedCache(kb_signature=kb_signature, generation=generation)
+    for i, question in enumerate(QUESTIONS):
+        cache.put(question, {"answer": f"Answer {i}", "confidence": 80, "packed_chunks": [i, i + 1]})
+    cache.save(str(path))
+    return cache
+
+
+class TestBinaryFormat:
+    """Test lazy lookup, merging and validation of binary cache files."""
+
+    def test_round_trip_decodes_lazily(self, tmp_path):
+        """Entries match the JSON cache; only the looked-up entries are decoded into memory."""
+        _json_cache(tmp_path / "faq.json")
+        assert convert_faq_cache(str(tmp_path / "faq.json"), str(tmp_path / "faq.bin")) == 50
+        assert (tmp_path / "faq.bin").stat().st_size < (tmp_path / "faq.json").stat().st_size
+
+        cache = PrecomputedCache(str(tmp_path / "faq.bin"), kb_signature="sig", generation="gen-1")
+
+        assert cache.size() == 50 and len(cache.cache) == 0
+        assert cache.get("how do i use feature 7")["answer"] == "Answer 7"
+        assert cache.get("How do I use feature 7?")["packed_chunks"] == [7, 8]
+        assert cache.get("something else") is None
+        assert cache.contains("How do I use feature 49?") and not cache.contains("unknown")
+        assert len(cache.cache) == 1
+        assert sorted(cache.keys()) == sorted(PrecomputedCache(str(tmp_path / "faq.json")).keys())
+
+    def test_new_answers_merge_on_save(self, tmp_path):
+        """Puts on a mapped cache are written alongside the existing records, in either format."""
+        _json_cache(tmp_path / "faq.json")
+        convert_faq_cache(str(tmp_path / "faq.json"), str(tmp_path / "faq.bin"))
+        cache = PrecomputedCache(str(tmp_path / "faq.bin"))
+        cache.put("How do I use feature 3?", {"answer": "Updated"})
+        cache.put("A brand new question", {"answer": "New"})
+        assert cache.size() == 51
+
+        cache.save(str(tmp_path / "faq.bin"))
+        cache.save(str(tmp_path / "merged.json"))
+
+        reloaded = PrecomputedCache(str(tmp_path / "faq.bin"))
+        assert reloaded.size() == 51
+        assert reloaded.get("How do I use feature 3?")["answer"] == "Updated"
+        assert reloaded.get("How do I use feature 4?")["answer"] == "Answer 4"
+        merged = json.loads((tmp_path / "merged.json").read_text())
+        assert merged["count"] == 51 and merged["kb_signature"] == "sig"
+
+    @pytest.mark.parametrize("kb_signature,generation", [("other-sig", "gen-1"), ("sig", "gen-2")])
+    def test_stale_binary_cache_is_ignored(self, tmp_path, kb_signature, generation):
+        """Signature and generation checks read the binary header like the JSON fields."""
+        _json_cache(tmp_path / "faq.json")
+        convert_faq_cache(str(tmp_path / "faq.json"), str(tmp_path / "faq.bin"))
+
+        cache = PrecomputedCache(str(tmp_path / "faq.bin"), kb_signature=kb_signature, generation=generation)
+
+        assert cache.is_stale()
+        assert cache.size() == 0
+        assert cache.get("How do I use feature 1?") is None
+
+    def test_truncated_file_loads_empty(self, tmp_path):
+        """A damaged binary file is reported and leaves the cache empty instead of raising."""
+        _json_cache(tmp_path / "faq.json")
+        convert_faq_cache(str(tmp_path / "faq.json"), str(tmp_path / "faq.bin"))
+        data = (tmp_path / "faq.bin").read_bytes()
+        (tmp_path / "short-index.bin").write_bytes(data[:200])
+        (tmp_path / "short-records.bin").write_bytes(data[:-10])
+        (tmp_path / "short-length.bin").write_bytes(b"RFAQ\x01\x00")
+        (tmp_path / "short-header.bin").write_bytes(data[:12])
+
+        assert PrecomputedCache(str(tmp_path / "short-index.bin")).size() == 0
+        assert PrecomputedCache(str(tmp_path / "short-records.bin")).size() == 0
+        assert PrecomputedCache(str(tmp_path / "short-length.bin")).size() == 0
+        assert PrecomputedCache(str(tmp_path / "short-header.bin")).size() == 0
+
+    def test_convert_missing_source(self, tmp_path):
+        """Converting a file that does not exist raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            convert_faq_cache(str(tmp_path / "absent.json"), str(tmp_path / "out.bin"))
@@ -0,0 +1,118 @@
+"""Tests for the parallel, resumable FAQ cache builder."""
+
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from clockify_rag import precomputed_cache
+from clockify_rag.precomputed_cache import PrecomputedCache, build_faq_cache, faq_questions_from_query_log
+
+QUESTIONS = ["How do I track time?", "What is a workspace?", "How do I export reports?", "Can I lock timesheets?"]
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Replace answer_once and the batch embedder; record calls."""
+    calls = []
+    vecs = {q: np.full(4, i, dtype=np.float32) for i, q in enumerate(QUESTIONS)}
+    monkeypatch.setattr(precomputed_cache, "_embed_faq_questions", lambda questions: {q: vecs[q] for q in questions})
+    monkeypatch.setattr(precomputed_cache, "_current_generation", lambda: "gen-1")
+
+    def fake_answer_once(question, chunks, vecs_n, bm, query_vec=None, **kwargs):
+        calls.append((question, query_vec, kwargs))
+        if question in fake_answer_once.fail:
+            raise fake_answer_once.fail[question]
+        return {"answer": f"A: {question}", "confidence": 90, "refused": False}
+
+    fake_answer_once.fail = {}
+    monkeypatch.setattr("clockify_rag.answer.answer_once", fake_answer_once)
+    return calls, vecs, fake_answer_once
+
+
+class TestBuildFaqCache:
+    """Test concurrency, batched embeddings, checkpoints and resume."""
+
+    def test_parallel_build_uses_batch_vectors(self, tmp_path, fake_pipeline):
+        """Every question is answered once with its precomputed vector, bypassing the answer caches."""
+        calls, vecs, _ = fake_pipeline
+        output = tmp_path / "faq.json"
+
+        cache = build_faq_cache(QUESTIONS, [], None, {}, str(output), kb_signature="sig", workers=3, top_k=7)
+
+        assert cache.size() == 4
+        assert sorted(q for q, _, _ in calls) == sorted(QUESTIONS)
+        assert all(vec is vecs[q] and kwargs == {"top_k": 7, "use_answer_cache": False} for q, vec, kwargs in calls)
+        saved = json.loads(output.read_text())
+        assert saved["count"] == 4 and saved["generation"] == "gen-1"
+        assert not (tmp_path / "faq.json.tmp").exists()
+
+    def test_resume_after_crash_skips_checkpointed_answers(self, tmp_path, fake_pipeline):
+        """An interrupted build saves its progress; the next run answers only what is missing."""
+        calls, _, fake_answer_once = fake_pipeline
+        output = str(tmp_path / "faq.json")
+        fake_answer_once.fail = {QUESTIONS[2]: KeyboardInterrupt()}
+
+        with pytest.raises(KeyboardInterrupt):
+            build_faq_cache(QUESTIONS, [], None, {}, output, kb_signature="sig", workers=1, checkpoint_every=1)
+        saved = PrecomputedCache(output, kb_signature="sig")
+        assert saved.get(QUESTIONS[0]) and saved.get(QUESTIONS[1]) and not saved.get(QUESTIONS[2])
+
+        calls.clear()
+        fake_answer_once.fail = {}
+        cache = build_faq_cache(QUESTIONS, [], None, {}, output, kb_signature="sig", workers=2, resume=True)
+
+        assert QUESTIONS[2] in [q for q, _, _ in calls]
+        assert len(calls) == 4 - saved.size()
+        assert cache.size() == 4
+        assert cache.get("how do i track time")["answer"] == "A: How do I track time?"
+
+    def test_failed_questions_and_stale_checkpoints_are_redone(self, tmp_path, fake_pipeline):
+        """Errors are logged and retried on resume; a checkpoint from another KB is ignored."""
+        calls, _, fake_answer_once = fake_pipeline
+        output = str(tmp_path / "faq.json")
+        fake_answer_once.fail = {QUESTIONS[0]: RuntimeError("llm down")}
+
+        assert build_faq_cache(QUESTIONS, [], None, {}, output, kb_signature="sig").size() == 3
+
+        calls.clear()
+        fake_answer_once.fail = {}
+        build_faq_cache(QUESTIONS, [], None, {}, output, kb_signature="sig", resume=True)
+        assert [q for q, _, _ in calls] == [QUESTIONS[0]]
+
+        calls.clear()
+        build_faq_cache(QUESTIONS, [], None, {}, output, kb_signature="new-sig", resume=True)
+        assert len(calls) == 4
+
+
+class TestFaqQuestionsFromQueryLog:
+    """Test deriving the FAQ list from logged queries."""
+
+    @staticmethod
+    def _write(path, queries, refused=False, compress=False):
+        lines = "".join(json.dumps({"query": q, "refused": refused}) + "\n" for q in queries)
+        if compress:
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                f.write(lines)
+        else:
+            path.write_text(lines + "not json\n", encoding="utf-8")
+
+    def test_counts_normalized_questions_across_rotations(self, tmp_path):
+        """Rotated and gzipped segments are read; variants group; refused and rare queries are dropped."""
+        self._write(tmp_path / "rag_queries.jsonl.4", ["Invite a user"])
+        log = tmp_path / "rag_queries.jsonl"
+        self._write(log, ["How do I track time?", "how do i track time", "What is a workspace?"] * 2)
+        self._write(tmp_path / "rag_queries.jsonl.1", ["How do I track time?", "What is a workspace?"])
+        self._write(tmp_path / "rag_queries.jsonl.2.gz", ["Export reports?", "export reports"], compress=True)
+        self._write(tmp_path / "rag_queries.jsonl.3", ["Delete my account"] * 5, refused=True)
+
+        questions = faq_questions_from_query_log(str(log), top_n=10, min_count=2)
+
+        assert questions == ["How do I track time?", "What is a workspace?", "Export reports?"]
+        assert faq_questions_from_query_log(str(log), top_n=1) == ["How do I track time?"]
+        assert faq_questions_from_query_log(str(log), min_count=2, include_refused=True)[0] == "Delete my account"
+
+    def test_missing_log_yields_no_questions(self, tmp_path):
+        """No log file means an empty FAQ list rather than an error."""
+        assert faq_questions_from_query_log(str(tmp_path / "absent.jsonl")) == []
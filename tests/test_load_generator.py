@@ -0,0 +1,151 @@
+"""Tests for the HTTP load generator."""
+
+import json
+import random
+import threading
+
+import pytest
+from fastapi import FastAPI, HTTPException
+
+import clockify_rag.api as api_module
+from clockify_rag import config, deadline
+from clockify_rag import load_generator as lg
+from clockify_rag.concurrency import reset_llm_limiter
+from clockify_rag.exceptions import DeadlineExceededError
+
+
+class TestLatencyModel:
+    """Test latency distribution parsing and sampling."""
+
+    def test_parse_and_sample(self):
+        """Each model samples within its support; a bare number means fixed."""
+        rng = random.Random(0)
+        assert lg.LatencyModel.parse("250").sample(rng) == pytest.approx(0.25)
+        assert all(0.1 <= lg.LatencyModel.parse("uniform:100:200").sample(rng) <= 0.2 for _ in range(100))
+        lognormal = [lg.LatencyModel.parse("lognormal:500:0.5").sample(rng) for _ in range(2000)]
+        assert sorted(lognormal)[1000] == pytest.approx(0.5, rel=0.1)
+        assert str(lg.LatencyModel.parse("exp:40")) == "exp:40"
+
+    @pytest.mark.parametrize("spec", ["gamma:1", "uniform:5", "uniform:9:1", "fixed:-1", "exp:abc"])
+    def test_invalid_specs(self, spec):
+        """Unknown kinds, wrong arity and negative or reversed bounds are rejected."""
+        with pytest.raises(ValueError):
+            lg.LatencyModel.parse(spec)
+
+
+class TestLatencyMockLLM:
+    """Test that the mock LLM behaves like the Ollama client under load."""
+
+    @pytest.fixture(autouse=True)
+    def single_slot_limiter(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_CONCURRENCY_ENABLED", True)
+        monkeypatch.setattr(config, "LLM_CONCURRENCY_INITIAL", 1)
+        monkeypatch.setattr(config, "LLM_CONCURRENCY_MAX", 1)
+        reset_llm_limiter()
+        yield
+        reset_llm_limiter()
+
+    def test_calls_queue_for_limiter_slots(self):
+        """Concurrent calls wait for the adaptive limiter; replies follow the JSON answer contract."""
+        llm = lg.LatencyMockLLMClient(lg.LatencyModel.parse("fixed:50"), embed_dim=8)
+        replies = []
+
+        def call():
+            replies.append(llm.chat_completion([{"role": "user", "content": "How do I track time?"}]))
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(llm.queue_waits)[0] == 0.0
+        assert sorted(llm.queue_waits)[1] > 0.03
+        assert json.loads(replies[0]["message"]["content"])["confidence"] == 80
+
+    def test_respects_request_deadline(self):
+        """A call that outlives the request deadline fails like a clamped HTTP timeout."""
+        llm = lg.LatencyMockLLMClient(lg.LatencyModel.parse("fixed:500"), embed_dim=8)
+        with deadline.deadline_scope(0.05):
+            with pytest.raises(DeadlineExceededError):
+                llm.chat_completion([{"role": "user", "content": "q"}])
+
+
+def _scripted_app(statuses):
+    """Minimal /v1/query app answering with the given status codes in turn."""
+    app = FastAPI()
+    calls = iter(statuses)
+
+    @app.post("/v1/query")
+    async def query():
+        status = next(calls, 200)
+        if status != 200:
+            raise HTTPException(status_code=status)
+        return {"processing_time_ms": 12.0, "timing": {"total_ms": 10.0}}
+
+    return app
+
+
+class TestLoadModels:
+    """Test closed/open-loop drivers and the summary."""
+
+    async def test_closed_loop_through_real_app(self):
+        """Requests go through the full /v1/query path and report service time and queueing."""
+        with lg.synthetic_app(200, lg.LatencyModel.parse("fixed:5"), dim=16) as (app, questions, llm):
+            async with lg.inproc_client(app) as client:
+                records = await lg.run_closed_loop(client, questions, concurrency=2, duration=30, max_requests=6)
+            summary = lg.summarize(records, wall_s=1.0, queue_waits=llm.queue_waits)
+
+        assert [r.status for r in records] == [200] * 6
+        assert summary["ok"] == 6
+        assert summary["throughput_rps"] == 6.0
+        assert summary["service_ms"]["p50"] > 0
+        assert summary["latency_ms"]["p99"] >= summary["latency_ms"]["p50"]
+        assert "p95" in summary["server_queue_ms"]
+        assert summary["llm_queue_ms"]
+
+    async def test_open_loop_poisson_and_shedding(self):
+        """Arrivals follow the offered rate; 429/503 count as shed, 504 as timeouts."""
+        app = _scripted_app([503, 429, 504, 500])
+        async with lg.inproc_client(app) as client:
+            records = await lg.run_open_loop(client, ["q"], rate=200.0, duration=0.5, seed=1)
+        summary = lg.summarize(records, wall_s=0.5)
+
+        assert 60 <= len(records) <= 140
+        assert summary["status_counts"]["503"] == summary["status_counts"]["429"] == 1
+        assert summary["shed_rate"] == pytest.approx(2 / len(records), abs=1e-4)
+        assert summary["timeout_rate"] == pytest.approx(1 / len(records), abs=1e-4)
+        assert summary["error_rate"] == pytest.approx(1 / len(records), abs=1e-4)
+        assert summary["server_queue_ms"]["p50"] == 2.0
+
+    async def test_open_loop_drops_beyond_outstanding_cap(self):
+        """With no in-flight budget every arrival is a client-side drop, counted as shed."""
+        async with lg.inproc_client(_scripted_app([])) as client:
+            records = await lg.run_open_loop(client, ["q"], rate=100.0, duration=0.2, max_outstanding=0)
+        assert records and {r.status for r in records} == {-2}
+        assert lg.summarize(records, wall_s=0.2)["shed_rate"] == 1.0
+
+
+class TestCli:
+    """Test the command-line entry point."""
+
+    def test_main_writes_report_and_restores_state(self, tmp_path):
+        """A tiny closed-loop run produces a JSON report; global patches are undone."""
+        original_ensure = api_module.ensure_index_ready
+        original_threads = config.API_THREADPOOL_WORKERS
+        output = tmp_path / "load.json"
+
+        code = lg.main(
+            [
+                "--concurrency", "2", "--requests", "4", "--duration", "30", "--chunks", "200",
+                "--llm-latency", "fixed:1", "--threads", "3", "--warmup", "1", "--output", str(output),
+            ]
+        )  # fmt: skip
+
+        report = json.loads(output.read_text())
+        assert code == 0
+        assert report["threads"] == 3
+        assert report["results"][0]["mode"] == "closed"
+        assert report["results"][0]["ok"] == 4
+        assert api_module.ensure_index_ready is original_ensure
+        assert config.API_THREADPOOL_WORKERS == original_threads
@@ -0,0 +1,167 @@
+"""Tests for query log workload analytics and `ragctl analyze-log`."""
+
+import gzip
+import json
+import random
+
+from typer.testing import CliRunner
+
+import clockify_rag.cli_modern as cli_modern
+from clockify_rag.log_analysis import (
+    DistinctCounter,
+    LatencyHistogram,
+    _HotQuestions,
+    analyze_entries,
+    suggested_faq_questions,
+)
+from clockify_rag.precomputed_cache import load_faq_list
+
+
+def _api_entry(query, latency=100.0, intent="how_to", chunk_ids=("c1",), refused=False, cache=None):
+    result_metadata = {"intent": intent}
+    if cache:
+        result_metadata["cache"] = cache
+    return {
+        "query": query,
+        "refused": refused,
+        "latency_ms": latency,
+        "timestamp": 1700000000.0,
+        "chunk_ids": list(chunk_ids),
+        "metadata": {
+            "result_metadata": result_metadata,
+            "timing": {"retrieve_ms": latency * 0.2, "llm_ms": latency * 0.7, "total_ms": latency},
+        },
+    }
+
+
+class TestSketches:
+    """Test the bounded-memory aggregates."""
+
+    def test_histogram_percentiles_within_bucket_error(self):
+        """Percentiles of 1..1000 ms land within the bucket growth factor of the exact value."""
+        hist = LatencyHistogram()
+        for value in range(1, 1001):
+            hist.add(value)
+        hist.add(0)
+
+        for q, exact in ((50, 500), (95, 950), (99, 990)):
+            assert abs(hist.percentile(q) - exact) / exact < 0.05
+        summary = hist.summary()
+        assert summary["count"] == 1001 and summary["max"] == 1000
+        assert LatencyHistogram().summary()["p50"] is None
+
+    def test_distinct_counter_accuracy(self):
+        """The HyperLogLog estimate stays within a few percent for small and large cardinalities."""
+        for n in (50, 20000):
+            counter = DistinctCounter()
+            for i in range(n):
+                counter.add(f"question {i}")
+                counter.add(f"question {i}")  # repeats don't count
+            assert abs(counter.estimate() - n) / n < 0.03
+
+    def test_hot_questions_keep_heavy_hitters_under_capacity(self):
+        """Lossy counting prunes the long tail; a frequent question survives every prune and stays on top."""
+        hot = _HotQuestions(capacity=10)
+        rng = random.Random(0)
+        for i in range(5000):
+            hot.add(f"tail {i}", f"Tail {i}?", refused=False)
+            if rng.random() < 0.2:
+                hot.add("hot", "How do I export?", refused=i % 2 == 0)
+
+        assert len(hot.counts) <= 20
+        (top,) = hot.top(1)
+        assert top["question"] == "How do I export?"
+        assert top["count"] > 900 and 0 < top["refused"] < top["count"]
+
+
+class TestAnalyzeEntries:
+    """Test the workload report."""
+
+    def test_report_covers_questions_latency_intents_and_chunks(self):
+        """API-style and CLI-style entries are aggregated into one report."""
+        entries = [_api_entry("How do I export?", latency=100, chunk_ids=("c1", "c2")) for _ in range(6)]
+        entries += [_api_entry("how do i EXPORT", latency=120, cache="semantic")]
+        entries += [_api_entry("Who is the CEO?", latency=50, intent="other", chunk_ids=(), refused=True)]
+        entries += [
+            {
+                "query": "Track time?",
+                "refused": False,
+                "latency_ms": 300.0,
+                "chunk_ids": ["c3"],
+                "metadata": {"intent": "tracking"},
+            },
+            {"query": "Track time", "refused": False, "latency_ms": 310.0, "chunk_ids": ["c3"], "metadata": {}},
+        ]
+
+        report = analyze_entries(entries, chunk_ids=["c1", "c2", "c3", "c4", "c5"], top_n=5)
+
+        assert report["queries"] == 10
+        assert report["distinct_questions"] == 3
+        assert report["cache_hit_potential"] == 0.7
+        assert report["refusal_rate"] == 0.1
+        assert report["observed_cache_hits"] == {"semantic": {"count": 1, "rate": 0.1}}
+        assert report["hot_questions"][0] == {"question": "How do I export?", "count": 7, "refused": 0}
+        assert report["top_question_coverage"]["10"] == 1.0
+        assert report["latency_ms"]["total"]["count"] == 10
+        assert report["latency_ms"]["llm_ms"]["count"] == 8
+        assert report["latency_ms"]["rerank_ms"]["count"] == 0
+        assert report["intents"]["how_to"]["queries"] == 7
+        assert report["intents"]["other"]["refusal_rate"] == 1.0
+        assert report["intents"]["tracking"]["queries"] == 1 and report["intents"]["unknown"]["queries"] == 1
+        assert report["most_retrieved_chunks"][0] == {"id": "c1", "count": 7}
+        assert report["chunks"]["never_retrieved"] == ["c4", "c5"]
+        assert report["chunks"]["retrieved"] == 3
+        assert suggested_faq_questions(report) == ["How do I export?", "Track time?"]
+
+    def test_never_retrieved_list_is_complete(self):
+        """The report lists every unretrieved chunk, however small top_n is."""
+        chunk_ids = [f"c{i}" for i in range(50)]
+        report = analyze_entries([_api_entry("How do I export?", chunk_ids=("c0",))], chunk_ids=chunk_ids, top_n=1)
+
+        assert report["chunks"]["never_retrieved"] == chunk_ids[1:]
+        assert report["chunks"]["never_retrieved_count"] == 49
+
+    def test_empty_log(self):
+        """An empty log produces a zeroed report rather than dividing by zero."""
+        report = analyze_entries([])
+        assert report["queries"] == 0 and report["cache_hit_potential"] == 0.0
+        assert report["hot_questions"] == [] and report["latency_ms"]["total"]["p99"] is None
+
+
+class TestAnalyzeLogCommand:
+    """Test `ragctl analyze-log` over rotated segments."""
+
+    def test_json_report_and_faq_list(self, tmp_path):
+        """Rotated and gzipped segments are all read; --faq-out is loadable as an FAQ list."""
+        log = tmp_path / "rag_queries.jsonl"
+        with gzip.open(f"{log}.2.gz", "wt") as f:
+            f.writelines(json.dumps(_api_entry("How do I export?")) + "\n" for _ in range(3))
+        (tmp_path / "rag_queries.jsonl.1").write_text(json.dumps(_api_entry("Track time?")) + "\nnot json\n")
+        log.write_text(json.dumps(_api_entry("Track time?", chunk_ids=("c2",))) + "\n")
+        chunks = tmp_path / "chunks.jsonl"
+        chunks.write_text("".join(json.dumps({"id": f"c{i}", "text": "t"}) + "\n" for i in range(1, 4)))
+        faq_out = tmp_path / "hot_faqs.txt"
+
+        result = CliRunner().invoke(
+            cli_modern.app,
+            ["analyze-log", str(log), "--chunks", str(chunks), "--json", "--faq-out", str(faq_out)],
+        )
+
+        assert result.exit_code == 0, result.output
+        report = json.loads(result.stdout)
+        assert report["queries"] == 5
+        assert report["chunks"]["never_retrieved"] == ["c3"]
+        assert load_faq_list(str(faq_out)) == ["How do I export?", "Track time?"]
+
+    def test_table_output_and_missing_log(self, tmp_path):
+        """The default output renders tables; a missing log exits with an error."""
+        log = tmp_path / "rag_queries.jsonl"
+        log.write_text(json.dumps(_api_entry("How do I export?")) + "\n")
+        runner = CliRunner()
+
+        result = runner.invoke(cli_modern.app, ["analyze-log", str(log), "--chunks", str(tmp_path / "none")])
+        assert result.exit_code == 0, result.output
+        assert "Hot Questions" in result.stdout and "How do I export?" in result.stdout
+
+        missing = runner.invoke(cli_modern.app, ["analyze-log", str(tmp_path / "absent.jsonl")])
+        assert missing.exit_code == 1
@@ -10,7 +10,9 @@ import threading
 import pytest
 
 from clockify_rag.metrics import (
+    HistogramSketch,
     MetricsCollector,
+    ShardedMetricsCollector,
     get_metrics,
     increment_counter,
     set_gauge,
@@ -504,5 +506,309 @@ class TestLabeledMetricsExport:
         assert 'latency_count{region="eu-west"} 1' in prom_output
 
 
+class TestHistogramSketch:
+    """Test the streaming quantile sketch backing histograms."""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Sketch quantiles stay within the configured relative error of exact ranks."""
+        import random
+
+        rng = random.Random(7)
+        values = [rng.lognormvariate(3.0, 1.0) for _ in range(5000)]
+        sketch = HistogramSketch(relative_accuracy=0.01)
+        for v in values:
+            sketch.add(v)
+
+        data = sorted(values)
+        for q in (0.25, 0.5, 0.9, 0.95, 0.99):
+            exact = data[round(q * (len(data) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= 0.0101 * exact
+        assert sketch.min == data[0]
+        assert sketch.max == data[-1]
+
+    def test_merge_and_serialization(self):
+        """Merged and round-tripped sketches match a single sketch of all values."""
+        left, right, combined = HistogramSketch(), HistogramSketch(), HistogramSketch()
+        for i in range(-50, 500):
+            (left if i % 2 else right).add(float(i))
+            combined.add(float(i))
+
+        left.merge(HistogramSketch.from_dict(json.loads(json.dumps(right.to_dict()))))
+
+        assert left.count == combined.count
+        assert left.sum == combined.sum
+        for q in (0.0, 0.1, 0.5, 0.95, 1.0):
+            assert left.quantile(q) == combined.quantile(q)
+
+    def test_memory_bounded_by_buckets(self):
+        """Bucket count stays capped regardless of value range."""
+        sketch = HistogramSketch(max_buckets=64)
+        for exp in range(-8, 12):
+            for m in range(1, 10):
+                sketch.add(m * 10.0**exp)
+        assert len(sketch.to_dict()["positive"]) <= 64
+        assert sketch.count == 20 * 9
+
+    def test_windowed_series_tracks_exact_extremes(self):
+        """Sliding window evicts old values and keeps exact min/max."""
+        collector = MetricsCollector(max_history=50)
+        for i in range(300):
+            collector.observe_histogram("wave", float((i * 37) % 101))
+
+        recent = [float((i * 37) % 101) for i in range(250, 300)]
+        stats = collector.get_histogram_stats("wave")
+        assert stats.count == 50
+        assert stats.min == min(recent)
+        assert stats.max == max(recent)
+        assert abs(stats.mean - sum(recent) / 50) < 1e-9
+
+    def test_merge_histogram_into_collector(self):
+        """External sketches merge into a series and show up in exports."""
+        collector = MetricsCollector()
+        collector.observe_histogram("latency", 10.0)
+        remote = HistogramSketch()
+        for v in (20.0, 30.0, 40.0):
+            remote.add(v)
+
+        collector.merge_histogram("latency", remote)
+
+        stats = collector.get_histogram_stats("latency")
+        assert stats.count == 4
+        assert stats.max == 40.0
+        assert "latency_count 4" in collector.export_prometheus()
+        assert collector.get_histogram_sketch("latency").count == 4
+
+    @pytest.mark.parametrize("collector_cls", [MetricsCollector, ShardedMetricsCollector])
+    @pytest.mark.parametrize("max_history", [0, 10])
+    def test_non_finite_values_are_ignored(self, collector_cls, max_history):
+        """inf/nan observations are dropped instead of raising or poisoning the stats."""
+        collector = collector_cls(max_history=max_history)
+        for v in (5.0, float("inf"), float("-inf"), float("nan"), 7.0):
+            collector.observe_histogram("x", v)
+
+        stats = collector.get_histogram_stats("x")
+        assert stats.count == 2
+        assert stats.max == 7.0 and stats.mean == 6.0
+
+
+class TestShardedMetricsCollector:
+    """Test the per-thread sharded collector."""
+
+    def _run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def test_concurrent_writes_aggregate(self):
+        """Counters sum and histograms merge across thread shards."""
+        collector = ShardedMetricsCollector()
+
+        def worker(tid):
+            for i in range(500):
+                collector.increment_counter("hits", labels={"kind": "a"})
+                collector.observe_histogram("lat", float(tid * 1000 + i))
+
+        self._run_threads(worker)
+
+        assert collector.get_counter("hits", {"kind": "a"}) == 4000
+        stats = collector.get_histogram_stats("lat")
+        assert stats.count == 4000
+        assert stats.min == 0.0
+        assert stats.max == 7499.0
+        assert 'hits{kind="a"} 4000.0' in collector.export_prometheus()
+        assert json.loads(collector.export_json(include_histograms=False))["counters"]["hits{kind=a}"] == 4000
+
+    def test_finished_thread_shards_are_folded(self):
+        """Data from exited threads survives after their shards are retired."""
+        collector = ShardedMetricsCollector()
+
+        def worker(tid):
+            collector.increment_counter("done")
+            collector.observe_histogram("work", float(tid))
+
+        self._run_threads(worker, count=4)
+        assert collector.get_counter("done") == 4
+        assert collector._shards == []  # all worker shards retired
+        self._run_threads(worker, count=2)
+        assert collector.get_counter("done") == 6
+        assert collector.get_histogram_stats("work").count == 6
+
+    def test_gauge_last_write_wins_across_threads(self):
+        """The most recent set_gauge call wins regardless of thread."""
+        collector = ShardedMetricsCollector()
+        collector.set_gauge("size", 1.0)
+        t = threading.Thread(target=lambda: collector.set_gauge("size", 2.0))
+        t.start()
+        t.join()
+        assert collector.get_gauge("size") == 2.0
+        collector.set_gauge("size", 3.0)
+        assert collector.get_gauge("size") == 3.0
+        assert collector.get_snapshot().gauges["size"] == 3.0
+
+    def test_remove_gauge_drops_series_from_every_shard(self):
+        """remove_gauge() deletes the series wherever it was set; other labels are untouched."""
+        collector = ShardedMetricsCollector()
+        collector.set_gauge("hot", 0.5, {"function": "a"})
+        t = threading.Thread(target=lambda: collector.set_gauge("hot", 0.7, {"function": "a"}))
+        t.start()
+        t.join()
+        collector.set_gauge("hot", 0.2, {"function": "b"})
+        collector.remove_gauge("hot", {"function": "a"})
+        assert collector.get_gauge("hot", {"function": "a"}) is None
+        assert collector.get_gauge("hot", {"function": "b"}) == 0.2
+        assert 'function="a"' not in collector.export_prometheus()
+
+    def test_reset_clears_all_shards(self):
+        """reset() drops every shard's data."""
+        collector = ShardedMetricsCollector()
+        collector.increment_counter("c", 5)
+        collector.observe_histogram("h", 1.0)
+        collector.reset()
+        assert collector.get_counter("c") == 0.0
+        assert collector.get_histogram_stats("h") is None
+        collector.increment_counter("c")
+        assert collector.get_counter("c") == 1.0
+
+
+class TestMultiprocessMetrics:
+    """Test flushing worker metrics to a directory and merging them."""
+
+    def _worker_state(self, pid, hits, latencies):
+        collector = MetricsCollector()
+        collector.increment_counter(MetricNames.CACHE_HITS, hits)
+        collector.set_gauge(MetricNames.CACHE_SIZE, hits)
+        for v in latencies:
+            collector.observe_histogram(MetricNames.QUERY_LATENCY, v, {"endpoint": "query"})
+        state = collector.to_state()
+        state["pid"] = pid
+        return state
+
+    def test_collect_merges_worker_files(self, tmp_path, monkeypatch):
+        """Counters sum across all workers; sketches and gauges only from live pids."""
+        import clockify_rag.metrics as metrics_module
+
+        for pid, hits, lat in ((101, 3, [10.0, 20.0]), (102, 5, [30.0, 40.0, 50.0])):
+            (tmp_path / f"metrics_{pid}.json").write_text(json.dumps(self._worker_state(pid, hits, lat)))
+        (tmp_path / "metrics_999.json").write_text("{not json")
+        monkeypatch.setattr(metrics_module, "_pid_alive", lambda pid: pid == 101)
+
+        merged = metrics_module.collect_multiprocess_metrics(str(tmp_path))
+
+        assert merged.get_counter(MetricNames.CACHE_HITS) == 8
+        stats = merged.get_histogram_stats(MetricNames.QUERY_LATENCY, {"endpoint": "query"})
+        assert stats.count == 2
+        assert stats.min == 10.0 and stats.max == 20.0
+        assert stats.mean == 15.0
+        assert merged.get_gauge(MetricNames.CACHE_SIZE, {"pid": "101"}) == 3
+        assert merged.get_gauge(MetricNames.CACHE_SIZE, {"pid": "102"}) is None
+
+    def test_flush_overwrites_own_file(self, tmp_path):
+        """Each flush replaces the process file with its cumulative state."""
+        import os
+        import clockify_rag.metrics as metrics_module
+
+        collector = ShardedMetricsCollector()
+        collector.increment_counter("queries_total")
+        path = metrics_module.flush_metrics_to_dir(str(tmp_path), collector)
+        collector.increment_counter("queries_total", 2)
+        metrics_module.flush_metrics_to_dir(str(tmp_path), collector)
+
+        assert os.path.basename(path) == f"metrics_{os.getpid()}.json"
+        assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(path)]
+        merged = metrics_module.collect_multiprocess_metrics(str(tmp_path))
+        assert merged.get_counter("queries_total") == 3
+        assert "queries_total 3.0" in merged.export_prometheus()
+
+    def test_retire_folds_counters_and_deletes_file(self, tmp_path):
+        """An exiting worker leaves its counters in the aggregate and drops its file and sketches."""
+        import clockify_rag.metrics as metrics_module
+
+        collector = MetricsCollector()
+        collector.increment_counter("queries_total", 3)
+        collector.observe_histogram(MetricNames.QUERY_LATENCY, 12.0)
+        metrics_module.flush_metrics_to_dir(str(tmp_path), collector)
+        metrics_module.retire_worker_metrics(str(tmp_path), collector)
+
+        assert not list(tmp_path.glob("metrics_*.json"))
+        merged = metrics_module.collect_multiprocess_metrics(str(tmp_path))
+        assert merged.get_counter("queries_total") == 3
+        assert merged.get_histogram_stats(MetricNames.QUERY_LATENCY) is None
+
+    def test_reused_pid_keeps_counters_monotonic(self, tmp_path):
+        """A file left under our pid by an earlier process is folded, not overwritten."""
+        import os
+        import clockify_rag.metrics as metrics_module
+
+        stale = self._worker_state(os.getpid(), 10, [5.0])
+        stale["token"] = "earlier-process"
+        (tmp_path / f"metrics_{os.getpid()}.json").write_text(json.dumps(stale))
+
+        collector = MetricsCollector()
+        collector.increment_counter(MetricNames.CACHE_HITS)
+        metrics_module.flush_metrics_to_dir(str(tmp_path), collector)
+        collector.increment_counter(MetricNames.CACHE_HITS)
+        metrics_module.flush_metrics_to_dir(str(tmp_path), collector)
+
+        merged = metrics_module.collect_multiprocess_metrics(str(tmp_path))
+        assert merged.get_counter(MetricNames.CACHE_HITS) == 12
+        assert merged.get_histogram_stats(MetricNames.QUERY_LATENCY, {"endpoint": "query"}) is None
+
+    def test_reap_folds_crashed_workers(self, tmp_path, monkeypatch):
+        """Files of dead pids are folded into the aggregate and removed; live ones stay."""
+        import clockify_rag.metrics as metrics_module
+
+        for pid, hits in ((101, 3), (102, 5)):
+            (tmp_path / f"metrics_{pid}.json").write_text(json.dumps(self._worker_state(pid, hits, [1.0])))
+        monkeypatch.setattr(metrics_module, "_pid_alive", lambda pid: pid == 101)
+
+        assert metrics_module.reap_dead_worker_metrics(str(tmp_path)) == 1
+        assert sorted(p.name for p in tmp_path.glob("metrics_*.json")) == ["metrics_101.json"]
+        assert metrics_module.reap_dead_worker_metrics(str(tmp_path)) == 0
+        merged = metrics_module.collect_multiprocess_metrics(str(tmp_path))
+        assert merged.get_counter(MetricNames.CACHE_HITS) == 8
+
+    def test_run_server_clears_directory(self, tmp_path, monkeypatch):
+        """Starting the server wipes worker files and the aggregate from a previous fleet."""
+        import uvicorn
+
+        import clockify_rag.api as api_module
+        import clockify_rag.metrics as metrics_module
+        from clockify_rag import config
+
+        collector = MetricsCollector()
+        collector.increment_counter("queries_total")
+        metrics_module.flush_metrics_to_dir(str(tmp_path), collector)
+        metrics_module.retire_worker_metrics(str(tmp_path), collector)
+        (tmp_path / "metrics_101.json").write_text(json.dumps(self._worker_state(101, 1, [])))
+        monkeypatch.setattr(config, "METRICS_MULTIPROC_DIR", str(tmp_path))
+        monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: None)
+
+        api_module.run_server()
+
+        assert not list(tmp_path.glob("*.json"))
+        assert metrics_module.collect_multiprocess_metrics(str(tmp_path)).get_counter("queries_total") == 0
+
+    def test_fleet_merge_is_reused_within_max_age(self, tmp_path, monkeypatch):
+        """Scrapes within the flush interval share one merge instead of re-reading every file."""
+        import clockify_rag.metrics as metrics_module
+        from clockify_rag import config
+
+        monkeypatch.setattr(config, "METRICS_MULTIPROC_DIR", str(tmp_path))
+        monkeypatch.setattr(metrics_module, "_FLEET_CACHE", None)
+        calls = []
+        real_collect = metrics_module.collect_multiprocess_metrics
+        monkeypatch.setattr(
+            metrics_module, "collect_multiprocess_metrics", lambda d: calls.append(d) or real_collect(d)
+        )
+
+        first = metrics_module.get_fleet_metrics(max_age=60)
+        assert metrics_module.get_fleet_metrics(max_age=60) is first
+        assert len(calls) == 1
+        assert metrics_module.get_fleet_metrics(max_age=0) is not first
+        assert len(calls) == 2
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
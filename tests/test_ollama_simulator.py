@@ -0,0 +1,155 @@
+"""Tests for the offline Ollama simulator."""
+
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from clockify_rag import config
+from clockify_rag.api_client import OllamaAPIClient
+from clockify_rag.exceptions import LLMBadResponseError
+from clockify_rag.load_generator import LatencyModel
+from clockify_rag.ollama_simulator import (
+    SimulatorSettings,
+    chat_reply,
+    create_simulator_app,
+    hash_embedding,
+    running_simulator,
+)
+
+
+def _client(**overrides):
+    return TestClient(create_simulator_app(SimulatorSettings(time_scale=0.0, **overrides)))
+
+
+class TestDeterministicContent:
+    """Test embeddings and chat replies."""
+
+    def test_hash_embeddings(self):
+        """Same text, same unit vector; shared words make texts more similar than unrelated ones."""
+        a = np.array(hash_embedding("lock timesheets for approval", 64))
+        assert a.shape == (64,)
+        assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+        assert np.array_equal(a, hash_embedding("lock timesheets for approval", 64))
+        related = np.array(hash_embedding("how to lock timesheets", 64))
+        unrelated = np.array(hash_embedding("invoice currency settings", 64))
+        assert a @ related > a @ unrelated
+
+    def test_reply_matches_pipeline_contracts(self):
+        """Rerank prompts get a ranked id list; answer prompts get the structured JSON object."""
+        prompt = 'Output JSON only: [{"id":"x","score":0.8}]\n[id=c1]\na\n\n[id=c2]\nb'
+        rerank = chat_reply("m", [{"role": "user", "content": prompt}], 50)
+        assert sorted(entry["id"] for entry in json.loads(rerank)) == ["c1", "c2"]
+
+        messages = [
+            {"role": "system", "content": 'Return JSON with "answer" and "sources_used".'},
+            {"role": "user", "content": "url: https://clockify.me/help/a\ncontent: lock timesheets"},
+        ]
+        answer = json.loads(chat_reply("m", messages, 10))
+        assert len(answer["answer"].split()) == 10
+        assert answer["sources_used"] == ["https://clockify.me/help/a"]
+        assert chat_reply("m", messages, 10) == chat_reply("m", messages, 10)
+
+
+class TestEndpoints:
+    """Test the Ollama-compatible HTTP surface."""
+
+    def test_chat_streaming_and_non_streaming(self):
+        """Streaming yields NDJSON pieces ending with done=true; both forms carry the same text."""
+        body = {"model": "m", "messages": [{"role": "user", "content": "track time"}], "options": {"num_predict": 5}}
+        with _client() as client:
+            full = client.post("/api/chat", json={**body, "stream": False}).json()
+            lines = [json.loads(line) for line in client.post("/api/chat", json=body).text.splitlines()]
+
+        assert full["done"] is True and full["eval_count"] == 5
+        assert [line["done"] for line in lines] == [False] * 5 + [True]
+        assert "".join(line["message"]["content"] for line in lines) == full["message"]["content"]
+
+    def test_embedding_endpoints_and_tags(self):
+        """/api/embeddings and /api/embed agree; /api/tags lists the configured models."""
+        with _client(dim=32) as client:
+            single = client.post("/api/embeddings", json={"model": "e", "prompt": "hello world"}).json()
+            batch = client.post("/api/embed", json={"model": "e", "input": ["hello world", "other"]}).json()
+            names = [m["name"] for m in client.get("/api/tags").json()["models"]]
+            bad = client.post("/api/embed", json={"input": 3})
+
+        assert len(single["embedding"]) == 32
+        assert batch["embeddings"][0] == single["embedding"]
+        assert len(batch["embeddings"]) == 2
+        assert config.RAG_CHAT_MODEL in names and config.RAG_EMBED_MODEL in names
+        assert bad.status_code == 400
+
+    @pytest.mark.parametrize("fault", ["error", "malformed"])
+    def test_fault_injection(self, fault):
+        """Injected 500s and truncated JSON are returned and counted."""
+        with _client(**{f"{fault}_rate": 1.0}) as client:
+            chat = client.post("/api/chat", json={"messages": [{"role": "user", "content": "q"}], "stream": False})
+            embed = client.post("/api/embeddings", json={"prompt": "q"})
+            stats = client.get("/_sim/stats").json()
+
+        if fault == "error":
+            assert chat.status_code == embed.status_code == 500
+        else:
+            assert chat.status_code == embed.status_code == 200
+            with pytest.raises(ValueError):
+                json.loads(chat.text)
+        assert stats["faults"][fault] == 2
+
+
+class TestWithRealClient:
+    """Test the production Ollama client against a running simulator."""
+
+    def test_latency_queueing_and_busy(self, monkeypatch):
+        """Token rate drives latency, parallel slots queue requests, and a full queue answers 503."""
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: None)
+        settings = SimulatorSettings(
+            ttft=LatencyModel("fixed", (0.0,)), tps=200.0, answer_tokens=20, parallel=1, max_queue=1
+        )
+        with running_simulator(settings) as url:
+            client = OllamaAPIClient(base_url=url, retries=0)
+            messages = [{"role": "user", "content": "how do I lock timesheets"}]
+            started = time.monotonic()
+            reply = client.chat_completion(messages)
+            assert time.monotonic() - started >= 0.1  # 20 tokens at 200 tok/s
+            assert reply["eval_count"] == 20
+
+            # Raw HTTP: the production session would transparently retry the 503
+            statuses = []
+
+            def call():
+                body = {"messages": messages, "stream": False}
+                statuses.append(requests.post(f"{url}/api/chat", json=body, timeout=10).status_code)
+
+            threads = [threading.Thread(target=call) for _ in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            stats = requests.get(f"{url}/_sim/stats", timeout=10).json()
+
+        assert sorted(statuses) == [200, 200, 503]  # one running, one queued, one rejected
+        assert stats["busy_rejections"] == 1
+        assert stats["max_queue_depth"] == 1
+
+    def test_malformed_reply_surfaces_as_bad_response(self, monkeypatch):
+        """Truncated JSON reaches the client's invalid-JSON handling."""
+        monkeypatch.setattr("clockify_rag.api_client.get_llm_limiter", lambda: None)
+        with running_simulator(SimulatorSettings(time_scale=0.0, malformed_rate=1.0)) as url:
+            client = OllamaAPIClient(base_url=url, retries=0)
+            with pytest.raises(LLMBadResponseError):
+                client.chat_completion([{"role": "user", "content": "q"}])
+
+    def test_timeout_fault_hangs_mid_stream(self):
+        """A hung stream delivers its first token and then stalls until the client gives up."""
+        settings = SimulatorSettings(ttft=LatencyModel("fixed", (0.0,)), tps=1000.0, timeout_rate=1.0, hang_seconds=1)
+        with running_simulator(settings) as url:
+            body = {"messages": [{"role": "user", "content": "lock timesheets"}]}
+            with requests.post(f"{url}/api/chat", json=body, stream=True, timeout=(5, 0.3)) as response:
+                lines = response.iter_lines()
+                assert json.loads(next(lines))["done"] is False
+                with pytest.raises(requests.exceptions.ConnectionError):
+                    next(lines)
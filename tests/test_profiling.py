@@ -0,0 +1,143 @@
+"""Tests for the in-process sampling profiler."""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+from clockify_rag import profiling
+from clockify_rag.metrics import MetricNames, MetricsCollector
+
+
+def _busy_target_fn(stop: threading.Event) -> None:
+    total = 0
+    while not stop.is_set():
+        total += sum(range(200))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=_busy_target_fn, args=(stop,), name="busy worker", daemon=True)
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+@pytest.fixture
+def idle_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait, name="idle-worker", daemon=True)
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+class TestSamplingProfiler:
+    """Test stack sampling and collapsed output."""
+
+    def test_collapsed_stacks_capture_busy_thread(self, busy_thread, idle_thread):
+        """Busy threads show up root-first; idle waiters are dropped by default."""
+        profiler = profiling.profile_for(0.3, interval=0.005)
+
+        assert profiler.samples > 5
+        lines = profiler.collapsed().splitlines()
+        busy = [line for line in lines if line.startswith("busy_worker;")]
+        assert busy, lines
+        stack, count = busy[0].rsplit(" ", 1)
+        assert int(count) >= 1
+        assert "test_profiling.py:_busy_target_fn" in stack.split(";")
+        assert stack.split(";")[1] == "threading.py:_bootstrap"
+        assert not any(line.startswith("idle-worker;") for line in lines)
+
+    def test_include_idle_keeps_waiting_threads(self, idle_thread):
+        """include_idle=True records threads parked in blocking calls."""
+        profiler = profiling.SamplingProfiler(include_idle=True)
+        profiler.sample_once()
+
+        assert any(stack.startswith("idle-worker;") for stack in profiler.stacks())
+        assert profiler.samples == 1
+
+    def test_top_functions_counts_leaf_frames(self):
+        """Self samples are attributed to the leaf frame of each stack."""
+        stacks = Counter({"main;a.py:f;b.py:g": 3, "main;a.py:f": 1, "other;b.py:g": 4})
+        top = profiling.top_functions(stacks, limit=1)
+
+        assert top == [{"function": "b.py:g", "samples": 7, "ratio": 0.875}]
+        assert profiling.format_collapsed(Counter()) == ""
+
+    def test_continuous_publish_sets_gauges(self, monkeypatch):
+        """Hot functions are exported as gauges whose series are removed when they drop out."""
+        collector = MetricsCollector()
+        monkeypatch.setattr(profiling, "get_metrics", lambda: collector)
+        profiler = profiling.ContinuousProfiler(top_n=1)
+
+        profiler._stacks.update({"t;a.py:hot": 3, "t;a.py:cold": 1})
+        profiler.publish()
+        assert collector.get_gauge(MetricNames.PROFILE_HOT_FUNCTION, {"function": "a.py:hot"}) == 0.75
+
+        profiler.reset()
+        profiler._stacks.update({"t;a.py:cold": 5})
+        profiler.publish()
+        assert collector.get_gauge(MetricNames.PROFILE_HOT_FUNCTION, {"function": "a.py:hot"}) is None
+        assert collector.get_gauge(MetricNames.PROFILE_HOT_FUNCTION, {"function": "a.py:cold"}) == 1.0
+        assert "a.py:hot" not in collector.export_prometheus()
+
+    def test_continuous_stacks_decay_and_stay_bounded(self, monkeypatch):
+        """Each publish halves stack counts, drops spent stacks and caps unique stacks."""
+        monkeypatch.setattr(profiling, "get_metrics", lambda: MetricsCollector())
+        profiler = profiling.ContinuousProfiler(max_stacks=3)
+
+        profiler._stacks.update({f"t;a.py:f{i}": 10 + i for i in range(5)})
+        profiler._stacks.update({"t;a.py:once": 1})
+        profiler.publish()
+        assert profiler.stacks() == Counter({"t;a.py:f4": 7, "t;a.py:f3": 6, "t;a.py:f2": 6})
+
+        for _ in range(4):
+            profiler.publish()
+        assert profiler.stacks() == Counter()
+
+
+class TestProfileEndpoint:
+    """Test /v1/admin/profile."""
+
+    def _app(self, monkeypatch):
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+        return api_module.create_app()
+
+    def test_profile_json(self, monkeypatch, busy_thread):
+        """A short on-demand profile returns a summary and collapsed stacks."""
+        app = self._app(monkeypatch)
+        with TestClient(app) as client:
+            response = client.get("/v1/admin/profile", params={"seconds": 0.2, "interval_ms": 5, "format": "json"})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["samples"] > 0
+        assert "busy_worker;" in body["collapsed"]
+        assert body["top_functions"]
+
+    def test_profile_validation_and_auth(self, monkeypatch):
+        """Out-of-range windows are rejected and the endpoint honours API keys."""
+        app = self._app(monkeypatch)
+        with TestClient(app) as client:
+            too_long = client.get("/v1/admin/profile", params={"seconds": 10_000})
+            not_running = client.get("/v1/admin/profile", params={"continuous": True})
+            monkeypatch.setattr(api_module.config, "API_AUTH_MODE", "api_key")
+            monkeypatch.setattr(api_module.config, "API_ALLOWED_KEYS", frozenset({"secret"}))
+            monkeypatch.setattr(api_module.config, "API_KEY_HEADER", "x-api-key")
+            unauthorized = client.get("/v1/admin/profile", params={"seconds": 0.05})
+            started = time.monotonic()
+            authorized = client.get("/v1/admin/profile", params={"seconds": 0.05}, headers={"x-api-key": "secret"})
+
+        assert too_long.status_code == 400
+        assert not_running.status_code == 404
+        assert unauthorized.status_code == 401
+        assert authorized.status_code == 200
+        assert authorized.headers["content-type"].startswith("text/plain")
+        assert time.monotonic() - started < 5
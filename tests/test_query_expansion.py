@@ -11,7 +11,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from clockify_rag.retrieval import (
     QUERY_EXPANSIONS_ENV_VAR,
+    QueryExpander,
     expand_query,
+    expand_query_tokens,
     load_query_expansion_dict,
     reset_query_expansion_cache,
     set_query_expansion_path,
@@ -155,5 +157,71 @@ class TestQueryExpansion:
             load_query_expansion_dict(force_reload=True, suppress_errors=False)
 
 
+def _regex_expand(expansions, question):
+    """Reference implementation: per-term word-boundary regex search."""
+    import re
+
+    q_lower = question.lower()
+    expanded_terms = []
+    for term, synonyms in expansions.items():
+        if re.search(r"\b" + re.escape(term) + r"\b", q_lower):
+            for syn in synonyms:
+                if syn not in expanded_terms:
+                    expanded_terms.append(syn)
+    return f"{question} {' '.join(expanded_terms)}" if expanded_terms else question
+
+
+class TestQueryExpander:
+    """Test the compiled single-pass expansion matcher."""
+
+    def test_matches_regex_reference_on_default_dictionary(self):
+        """Compiled matcher yields the same expansion as the per-term regex loop."""
+        expansions = load_query_expansion_dict(force_reload=True)
+        expander = QueryExpander(expansions)
+        queries = [
+            "How to track time?",
+            "time tracking for PTO and SSO",
+            "tourist attraction",
+            "Generate reports, export data!",
+            "Can I use mobile app offline?",
+            "TRACK-TIME_report",
+            "What is the meaning of life?",
+        ]
+        for query in queries:
+            assert expander.expand(query) == _regex_expand(expansions, query)
+
+    def test_overlapping_and_boundary_terms(self):
+        """Overlapping phrases all match and boundaries follow regex \\b semantics."""
+        expansions = {
+            "time": ["hours"],
+            "time tracking": ["timesheets"],
+            "tracking": ["logging", "hours"],
+            "c++": ["cpp"],
+            ".net": ["dotnet"],
+        }
+        expander = QueryExpander(expansions)
+        for query in ["time tracking", "overtime tracking", "c++ sdk", "asp.net", "use .net", "c++x"]:
+            assert expander.expand(query) == _regex_expand(expansions, query)
+        assert expander.expand("time tracking") == "time tracking hours timesheets logging"
+
+    def test_expand_tokens_match_tokenized_expansion(self):
+        """Pre-tokenized BM25 terms equal tokenizing the expanded string."""
+        from clockify_rag.utils import tokenize
+
+        for query in ["How to track billable time?", "Can I use mobile app offline?", "nothing here"]:
+            assert expand_query_tokens(query) == tokenize(expand_query(query))
+
+    def test_reload_rebuilds_expander(self, tmp_path):
+        """Reloading the dictionary replaces the compiled matcher."""
+        override_path = tmp_path / "custom.json"
+        override_path.write_text(json.dumps({"support": ["helpdesk"]}))
+        set_query_expansion_path(str(override_path))
+        assert expand_query("support") == "support helpdesk"
+
+        override_path.write_text(json.dumps({"support": ["service desk"]}))
+        load_query_expansion_dict(force_reload=True, suppress_errors=False)
+        assert expand_query("support") == "support service desk"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,161 @@
+"""Tests for the asynchronous query log writer."""
+
+import gzip
+import json
+import threading
+
+import pytest
+
+import clockify_rag.caching as caching_module
+from clockify_rag import config, logging_utils
+from clockify_rag.caching import close_query_log, flush_query_log, log_query
+from clockify_rag.precomputed_cache import faq_questions_from_query_log
+from clockify_rag.query_log import AsyncQueryLogWriter
+
+
+def _render(record):
+    return json.dumps({"query": record, "thread": threading.current_thread().name})
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestAsyncQueryLogWriter:
+    """Test batching, dropping and rotation."""
+
+    def test_records_are_rendered_and_written_off_thread(self, tmp_path):
+        """Records come out in order, rendered by the writer thread."""
+        writer = AsyncQueryLogWriter(str(tmp_path / "q.jsonl"), render=_render, batch_size=4)
+        for i in range(10):
+            assert writer.submit(f"q{i}")
+        assert writer.flush(timeout=5)
+        writer.close()
+
+        lines = _lines(tmp_path / "q.jsonl")
+        assert [line["query"] for line in lines] == [f"q{i}" for i in range(10)]
+        assert {line["thread"] for line in lines} == {"query-log-writer"}
+        assert writer.stats()["written"] == 10
+        assert not writer.submit("after close")
+
+    def test_full_queue_drops_instead_of_blocking(self, tmp_path):
+        """While the writer is stuck, submits beyond the queue size return immediately and are counted."""
+        release = threading.Event()
+
+        def slow_render(record):
+            release.wait(5)
+            return json.dumps(record)
+
+        writer = AsyncQueryLogWriter(str(tmp_path / "q.jsonl"), render=slow_render, queue_size=2, batch_size=1)
+        results = [writer.submit(i) for i in range(10)]
+        release.set()
+        writer.close()
+
+        assert results.count(False) == writer.stats()["dropped"] >= 7
+        assert len(_lines(tmp_path / "q.jsonl")) == results.count(True)
+
+    def test_size_rotation_compresses_and_keeps_backups(self, tmp_path):
+        """Rotated segments are gzipped, shifted and capped at backup_count; readers see all of them."""
+        path = tmp_path / "rag_queries.jsonl"
+        writer = AsyncQueryLogWriter(
+            str(path),
+            render=lambda q: json.dumps({"query": q, "refused": False}),
+            max_bytes=100,
+            backup_count=2,
+            compress=True,
+            batch_size=1,
+        )
+        for i in range(12):
+            writer.submit(f"How do I use feature {i % 2}?")
+            writer.flush(timeout=5)
+        writer.close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "rag_queries.jsonl",
+            "rag_queries.jsonl.1.gz",
+            "rag_queries.jsonl.2.gz",
+        ]
+        with gzip.open(tmp_path / "rag_queries.jsonl.1.gz", "rt") as f:
+            assert json.loads(f.readline())["query"].startswith("How do I use feature")
+        assert writer.stats()["rotations"] >= 3
+        assert set(faq_questions_from_query_log(str(path), min_count=2)) == {
+            "How do I use feature 0?",
+            "How do I use feature 1?",
+        }
+
+    def test_time_rotation(self, tmp_path):
+        """A segment older than rotate_seconds is rotated on the next batch."""
+        path = tmp_path / "q.jsonl"
+        writer = AsyncQueryLogWriter(str(path), render=json.dumps, max_bytes=0, rotate_seconds=60)
+        writer.submit("first")
+        writer.flush(timeout=5)
+        writer._opened_at -= 120
+        writer.submit("second")
+        writer.close()
+
+        assert (tmp_path / "q.jsonl.1").read_text() == '"first"\n'
+        assert path.read_text() == '"second"\n'
+
+
+class TestLogQueryAsync:
+    """Test log_query through the process-wide async writer."""
+
+    @pytest.fixture(autouse=True)
+    def async_log(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "QUERY_LOG_ENABLED", True)
+        monkeypatch.setattr(config, "QUERY_LOG_ASYNC", True)
+        monkeypatch.setattr(config, "LOG_QUERY_INCLUDE_CHUNKS", False)
+        monkeypatch.setattr(config, "QUERY_LOG_FILE", str(tmp_path / "rag_queries.jsonl"))
+        monkeypatch.setattr(caching_module, "_QUERY_LOG_WRITER", None)
+        yield tmp_path / "rag_queries.jsonl"
+        close_query_log()
+
+    def test_entry_matches_synchronous_format(self, async_log, monkeypatch):
+        """The writer thread builds the same entry, keeping the caller's correlation id and timestamp."""
+        monkeypatch.setattr("clockify_rag.correlation.get_correlation_id", lambda: "req-42")
+        monkeypatch.setattr(caching_module.time, "time", lambda: 1700000000.0)
+        chunks = [{"id": "c1", "dense": 0.4, "bm25": 0.2, "hybrid": 0.3, "text": "secret chunk"}]
+
+        log_query("How do I\nlog time?", "Use the timer.", chunks, 12.5, metadata={"intent": "how_to"})
+        assert flush_query_log(timeout=5)
+
+        (entry,) = _lines(async_log)
+        assert entry["correlation_id"] == "req-42"
+        assert entry["query"] == "How do I\\x0alog time?"  # sanitized against log injection
+        assert entry["chunk_ids"] == ["c1"]
+        assert "text" not in entry["retrieved_chunks"][0]
+        assert entry["metadata"] == {"intent": "how_to"}
+        assert entry["timestamp"] == 1700000000.0
+        assert entry["timestamp_iso"] == "2023-11-14T22:13:20Z"
+
+    def test_writer_follows_log_file_changes(self, async_log, monkeypatch, tmp_path):
+        """Pointing RAG_LOG_FILE elsewhere closes the old writer and starts writing the new file."""
+        log_query("first", "a", [], 1.0)
+        monkeypatch.setattr(config, "QUERY_LOG_FILE", str(tmp_path / "other.jsonl"))
+        log_query("second", "b", [], 1.0)
+        flush_query_log(timeout=5)
+
+        assert [e["query"] for e in _lines(async_log)] == ["first"]
+        assert [e["query"] for e in _lines(tmp_path / "other.jsonl")] == ["second"]
+
+    def test_log_query_event_defers_chunk_entries_to_writer(self, async_log, monkeypatch):
+        """The API helper only enqueues; chunk lookups and sanitizing run in the writer thread."""
+        threads = []
+        build_entries = logging_utils.build_chunk_log_entries
+
+        def recording_build(*args):
+            threads.append(threading.current_thread().name)
+            return build_entries(*args)
+
+        monkeypatch.setattr(logging_utils, "build_chunk_log_entries", recording_build)
+        chunks = [{"id": "c0", "title": "Timer"}, {"id": "c1", "title": "Reports"}]
+        result = {"answer": "Use the timer.", "selected_chunks": [1], "refused": False}
+
+        logging_utils.log_query_event("How do I\nlog time?", result, chunks, 5.0, channel="api")
+        assert flush_query_log(timeout=5)
+
+        (entry,) = _lines(async_log)
+        assert threads == ["query-log-writer"]
+        assert entry["chunk_ids"] == ["c1"]
+        assert entry["query"] == "How do I\\x0alog time?"
+        assert entry["metadata"]["channel"] == "api"
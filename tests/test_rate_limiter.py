@@ -8,7 +8,10 @@ import time
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from clockify_rag.caching import RateLimiter
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+from clockify_rag.caching import RateLimiter, TokenBucketLimiter, parse_rate_limit_quotas
 
 
 @pytest.mark.skip(
@@ -124,5 +127,114 @@ class TestRateLimiter:
         assert allowed_count == 5
 
 
+class TestTokenBucketLimiter:
+    """Test per-key token-bucket limiting."""
+
+    def test_burst_then_block_with_retry_after(self):
+        """A full bucket allows a burst, then reports the refill delay."""
+        limiter = TokenBucketLimiter(rate=1.0, capacity=3)
+
+        assert [limiter.acquire("a")[0] for _ in range(3)] == [True, True, True]
+        allowed, retry_after = limiter.acquire("a")
+        assert allowed is False
+        assert 0 < retry_after <= 1.0
+        assert limiter.wait_time("a") == pytest.approx(retry_after, abs=0.05)
+
+    def test_keys_are_isolated(self):
+        """One key draining its bucket does not affect another key."""
+        limiter = TokenBucketLimiter(rate=0.1, capacity=1)
+
+        assert limiter.allow_request("noisy") is True
+        assert limiter.allow_request("noisy") is False
+        assert limiter.allow_request("quiet") is True
+        assert limiter.wait_time("unseen") == 0.0
+
+    def test_refill_is_continuous(self):
+        """Tokens come back at ``rate`` per second, capped at capacity."""
+        limiter = TokenBucketLimiter(rate=20.0, capacity=2)
+        limiter.acquire("k")
+        limiter.acquire("k")
+        assert limiter.allow_request("k") is False
+
+        time.sleep(0.06)
+        assert limiter.allow_request("k") is True
+        assert limiter.allow_request("k") is False
+
+    def test_per_key_quota_overrides_default(self):
+        """Quotas give selected keys a different rate and burst."""
+        limiter = TokenBucketLimiter(rate=0.01, capacity=1, quotas={"vip": (0.01, 3)})
+
+        assert sum(limiter.allow_request("vip") for _ in range(5)) == 3
+        assert sum(limiter.allow_request("other") for _ in range(5)) == 1
+
+    def test_idle_and_overflow_eviction(self):
+        """Idle buckets are dropped lazily and the key count stays bounded."""
+        limiter = TokenBucketLimiter(rate=1.0, capacity=1, idle_ttl=0.05, max_keys=3)
+        for key in "abcde":
+            limiter.acquire(key)
+        assert limiter.tracked_keys == 3
+
+        time.sleep(0.08)
+        limiter.acquire("fresh")
+        assert limiter.tracked_keys == 1
+
+    def test_parse_quotas(self):
+        """Quota specs convert requests-per-window to a per-second rate."""
+        quotas = parse_rate_limit_quotas("team-a=120:10, team-b=30, bad, c=x", window_seconds=60)
+
+        assert quotas == {"team-a": (2.0, 10.0), "team-b": (0.5, 30.0)}
+
+
+class TestQueryRateLimiting:
+    """Test token-bucket wiring in /v1/query."""
+
+    def test_retry_after_header_and_per_key_buckets(self, monkeypatch):
+        """Blocked callers get 429 + Retry-After without affecting other API keys."""
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+        monkeypatch.setattr(
+            api_module, "answer_once", lambda *_a, **_k: {"answer": "ok", "selected_chunks": [], "metadata": {}}
+        )
+        limiter = TokenBucketLimiter(rate=0.5, capacity=1)
+        monkeypatch.setattr(api_module, "get_rate_limiter", lambda: limiter)
+        monkeypatch.setattr(api_module.config, "RATE_LIMIT_KEY_BY", "api_key")
+        monkeypatch.setattr(api_module.config, "API_AUTH_MODE", "api_key")
+        monkeypatch.setattr(api_module.config, "API_ALLOWED_KEYS", frozenset({"tenant-a", "tenant-b"}))
+        app = api_module.create_app()
+
+        body = {"question": "How do I track time?"}
+        with TestClient(app) as client:
+            first = client.post("/v1/query", json=body, headers={"x-api-key": "tenant-a"})
+            blocked = client.post("/v1/query", json=body, headers={"x-api-key": "tenant-a"})
+            other = client.post("/v1/query", json=body, headers={"x-api-key": "tenant-b"})
+
+        assert first.status_code == 200
+        assert blocked.status_code == 429
+        assert blocked.headers["retry-after"] == "2"
+        assert "x-correlation-id" in blocked.headers
+        assert other.status_code == 200
+        assert sorted(limiter._buckets) == ["key:tenant-a", "key:tenant-b"]
+
+    def test_unauthenticated_keys_share_the_client_ip_bucket(self, monkeypatch):
+        """Without API key auth, rotating the key header does not mint new buckets."""
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+        monkeypatch.setattr(
+            api_module, "answer_once", lambda *_a, **_k: {"answer": "ok", "selected_chunks": [], "metadata": {}}
+        )
+        limiter = TokenBucketLimiter(rate=0.5, capacity=1)
+        monkeypatch.setattr(api_module, "get_rate_limiter", lambda: limiter)
+        monkeypatch.setattr(api_module.config, "RATE_LIMIT_KEY_BY", "api_key")
+        monkeypatch.setattr(api_module.config, "API_AUTH_MODE", "none")
+        app = api_module.create_app()
+
+        body = {"question": "How do I track time?"}
+        with TestClient(app) as client:
+            statuses = [
+                client.post("/v1/query", json=body, headers={"x-api-key": f"random-{i}"}).status_code for i in range(3)
+            ]
+
+        assert statuses == [200, 429, 429]
+        assert list(limiter._buckets) == ["ip:testclient"]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,115 @@
+"""Tests for the rerank result cache and index generation ids."""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clockify_rag.caching as caching_module
+from clockify_rag import api_client, indexing
+from clockify_rag.caching import RerankCache
+from clockify_rag.retrieval import rerank_with_llm
+
+
+class TestRerankCache:
+    """Test RerankCache keys, eviction, TTL and persistence."""
+
+    def setup_method(self):
+        self.cache = RerankCache(maxsize=2, ttl_seconds=60)
+
+    def test_key_depends_on_all_components(self):
+        """Question, candidate order, model and generation all change the key."""
+        base = self.cache.make_key("How do I export?", [1, 2, 3], "qwen", "gen1")
+        assert base == self.cache.make_key("  how do I   EXPORT? ", [1, 2, 3], "qwen", "gen1")
+        assert base != self.cache.make_key("How do I export?", [2, 1, 3], "qwen", "gen1")
+        assert base != self.cache.make_key("How do I export?", [1, 2, 3], "other", "gen1")
+        assert base != self.cache.make_key("How do I export?", [1, 2, 3], "qwen", "gen2")
+
+    def test_hit_miss_and_lru(self):
+        """Entries are LRU-bounded and counted as hits/misses."""
+        self.cache.put("a", [1, 2], {1: 0.9, 2: 0.1})
+        self.cache.put("b", [2, 1], {1: 0.2, 2: 0.8})
+        assert self.cache.get("a") == ([1, 2], {1: 0.9, 2: 0.1})
+        self.cache.put("c", [3], {3: 1.0})  # evicts "b" (least recently used)
+
+        assert self.cache.get("b") is None
+        stats = self.cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 2
+
+    def test_ttl_expiry(self):
+        """Expired entries are treated as misses."""
+        self.cache.ttl_seconds = 0
+        self.cache.put("a", [1], {1: 1.0})
+        time.sleep(0.01)
+        assert self.cache.get("a") is None
+
+    def test_save_and_load(self, tmp_path):
+        """Persisted entries round-trip with chunk id types preserved."""
+        path = str(tmp_path / "rerank_cache.json")
+        self.cache.put("a", [7, "x-1"], {7: 0.5, "x-1": 0.9})
+        self.cache.save(path)
+
+        restored = RerankCache(maxsize=10, ttl_seconds=60)
+        assert restored.load(path) == 1
+        assert restored.get("a") == ([7, "x-1"], {7: 0.5, "x-1": 0.9})
+
+
+class TestRerankWithLLMCache:
+    """Test rerank_with_llm reuses cached rankings."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        cache = RerankCache(maxsize=10, ttl_seconds=60)
+        monkeypatch.setattr(caching_module, "_RERANK_CACHE", cache)
+        return cache
+
+    def test_second_call_skips_llm(self, monkeypatch, sample_chunks):
+        """Identical question + candidates returns the cached order without an LLM call."""
+        calls = []
+
+        def fake_chat_completion(**kwargs):
+            calls.append(kwargs)
+            ranked = [{"id": sample_chunks[2]["id"], "score": 0.9}, {"id": sample_chunks[0]["id"], "score": 0.4}]
+            return {"message": {"content": json.dumps(ranked)}}
+
+        monkeypatch.setattr(api_client, "chat_completion", fake_chat_completion)
+        monkeypatch.setattr("clockify_rag.retrieval.get_index_generation", lambda: "gen-a")
+
+        first = rerank_with_llm("How to track time?", sample_chunks, [0, 1, 2], {})
+        second = rerank_with_llm("how to track time?", sample_chunks, [0, 1, 2], {})
+
+        assert len(calls) == 1
+        assert first[0] == [2, 0]
+        assert first[2] is True and first[3] == ""
+        assert second[0] == [2, 0]
+        assert second[1] == first[1]
+        assert second[3] == "cached"
+
+        # New index generation must not reuse the ranking
+        monkeypatch.setattr("clockify_rag.retrieval.get_index_generation", lambda: "gen-b")
+        rerank_with_llm("How to track time?", sample_chunks, [0, 1, 2], {})
+        assert len(calls) == 2
+
+
+class TestIndexGeneration:
+    """Test index generation id derivation."""
+
+    def test_generation_from_meta(self, tmp_path):
+        """Explicit generation wins; legacy metadata gets a derived id; missing file is empty."""
+        meta_path = tmp_path / "index.meta.json"
+        assert indexing.get_index_generation(str(meta_path)) == ""
+
+        meta_path.write_text(json.dumps({"kb_sha256": "abc", "built_at": "2024-01-01T00:00:00Z", "chunks": 3}))
+        derived = indexing.get_index_generation(str(meta_path))
+        assert derived and len(derived) == 16
+
+        time.sleep(0.01)
+        meta_path.write_text(json.dumps({"kb_sha256": "abc", "generation": "explicit-gen"}))
+        os.utime(meta_path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        assert indexing.get_index_generation(str(meta_path)) == "explicit-gen"
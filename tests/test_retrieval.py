@@ -297,6 +297,22 @@ def test_retrieve_faiss_skips_full_dot(monkeypatch, sample_chunks, sample_embedd
     assert isinstance(scores["dense"], DenseScoreStore), "Dense scores should use store in FAISS mode"
 
 
+def test_dense_score_store_take_matches_getitem(sample_embeddings):
+    """Vectorized take() should match per-index lookups in lazy and full modes."""
+    qv = sample_embeddings[0]
+    lazy = DenseScoreStore(len(sample_embeddings), vecs=sample_embeddings, qv=qv, initial=[(1, 0.5)])
+    full = DenseScoreStore(len(sample_embeddings), full_scores=sample_embeddings.dot(qv))
+    idx = [3, 0, 1, 3]
+
+    taken = lazy.take(idx)
+    assert taken.dtype == np.float32
+    assert taken[2] == pytest.approx(0.5)  # seeded cache value wins
+    assert taken[0] == pytest.approx(lazy[3])
+    assert np.allclose(full.take(idx), [full[i] for i in idx])
+    with pytest.raises(IndexError):
+        full.take([len(sample_embeddings)])
+
+
 def test_bm25_pruning_matches_full():
     """BM25 pruning should preserve the top document selection."""
 
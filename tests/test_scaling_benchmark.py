@@ -0,0 +1,128 @@
+"""Tests for the synthetic-corpus scaling benchmark."""
+
+import json
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from clockify_rag import answer, api_client, config, retrieval
+from clockify_rag import scaling_benchmark as sb
+from clockify_rag.utils import tokenize
+
+
+class TestSyntheticCorpus:
+    """Test corpus generation."""
+
+    def test_deterministic_and_normalized(self):
+        """The same seed gives the same corpus; vectors are unit length."""
+        a = sb.generate_corpus(300, dim=16, n_queries=5, seed=7)
+        b = sb.generate_corpus(300, dim=16, n_queries=5, seed=7)
+        c = sb.generate_corpus(300, dim=16, n_queries=5, seed=8)
+
+        assert [ch["text"] for ch in a.chunks] == [ch["text"] for ch in b.chunks]
+        assert np.array_equal(a.vecs_n, b.vecs_n)
+        assert a.queries == b.queries
+        assert [ch["text"] for ch in a.chunks] != [ch["text"] for ch in c.chunks]
+        assert np.allclose(np.linalg.norm(a.vecs_n, axis=1), 1.0, atol=1e-5)
+
+    def test_zipfian_vocabulary(self):
+        """Term frequencies are heavily skewed and words survive tokenization unchanged."""
+        vocab = sb.make_vocabulary(10_000)
+        assert len(set(vocab)) == len(vocab)
+        assert all(tokenize(w) == [w] for w in vocab[:500])
+
+        corpus = sb.generate_corpus(500, dim=8, n_queries=1, seed=1)
+        counts = sorted(Counter(w for ch in corpus.chunks for w in ch["text"].split()).values(), reverse=True)
+        assert counts[0] > 20 * counts[len(counts) // 2]
+
+    def test_query_vectors_point_at_their_target(self):
+        """Each query vector is closest to a chunk containing the query words."""
+        corpus = sb.generate_corpus(400, dim=32, n_queries=5, seed=3)
+        for query in corpus.queries:
+            best = int(np.argmax(corpus.vecs_n @ corpus.query_vecs[query]))
+            assert set(query.split()) <= set(corpus.chunks[best]["text"].split())
+
+
+class TestScalingRun:
+    """Test stage measurement and the report format."""
+
+    def test_run_suite_reports_every_stage_offline(self, monkeypatch):
+        """All stages are measured without network access or caches, and patched globals are restored."""
+        monkeypatch.setattr(config, "USE_ANN", "faiss")
+        monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(config, "QUERY_CACHE_BACKEND", "memory")
+        # A versioned index in the cwd routes answer_once through its own embed_query reference
+        monkeypatch.setattr(answer, "get_index_generation", lambda: "gen-1")
+
+        def no_network(*_args, **_kwargs):
+            raise AssertionError("benchmark must not call the real embedding backend")
+
+        monkeypatch.setattr(retrieval, "embed_query", no_network)
+        monkeypatch.setattr(answer, "embed_query", no_network)
+        caches_seen = []
+        for name in ("get_answer_cache", "get_semantic_cache", "get_query_embedding_cache"):
+            getter = getattr(answer, name)
+            monkeypatch.setattr(answer, name, lambda getter=getter: caches_seen.append(getter()) or caches_seen[-1])
+        previous_client = api_client._LLM_CLIENT
+
+        report = sb.run_suite([200], n_queries=4, e2e_queries=2, dim=16)
+
+        assert report["schema_version"] == sb.SCHEMA_VERSION
+        size = report["sizes"]["200"]
+        assert set(size["stages"]) == set(sb.QUERY_STAGES)
+        for stats in size["stages"].values():
+            assert stats["p99_ms"] >= stats["p95_ms"] >= stats["p50_ms"] > 0
+            assert stats["ops_per_sec"] > 0
+        assert size["build"]["build_bm25_s"] >= 0
+        json.dumps(report)  # baseline must be JSON-serializable
+
+        assert config.USE_ANN == "faiss"
+        assert caches_seen and not any(caches_seen)
+        assert retrieval.embed_query is no_network and answer.embed_query is no_network
+        assert config.SEMANTIC_CACHE_ENABLED is True and config.QUERY_CACHE_BACKEND == "memory"
+        assert api_client._LLM_CLIENT is previous_client
+
+
+def _report(p95_by_stage, size="1000", dim=384, seed=0):
+    stages = {stage: sb._summarize([p95 / 2, p95], 0) for stage, p95 in p95_by_stage.items()}
+    for stage, p95 in p95_by_stage.items():
+        stages[stage]["p95_ms"] = p95
+    return {
+        "schema_version": sb.SCHEMA_VERSION,
+        "params": {"dim": dim, "seed": seed},
+        "sizes": {size: {"stages": stages, "build": {"build_bm25_s": 0.0, "vecs_mb": 0.0}, "max_rss_mb": 0.0}},
+    }
+
+
+class TestRegressionGate:
+    """Test baseline comparison and the CLI exit code."""
+
+    def test_flags_only_real_regressions(self):
+        """Slowdowns beyond tolerance are reported; small absolute deltas are noise."""
+        baseline = _report({"bm25": 10.0, "mmr": 0.1, "pack": 5.0})
+        current = _report({"bm25": 14.0, "mmr": 0.3, "pack": 5.5, "e2e": 99.0})
+
+        regressions = sb.compare_to_baseline(current, baseline, tolerance=0.25, min_delta_ms=0.5)
+
+        assert [(r["stage"], r["ratio"]) for r in regressions] == [("bm25", 1.4)]
+
+    def test_incompatible_baseline(self):
+        """Schema or corpus-parameter mismatches are errors, not silent passes."""
+        with pytest.raises(sb.BaselineError):
+            sb.compare_to_baseline(_report({}), {**_report({}), "schema_version": 0})
+        with pytest.raises(sb.BaselineError):
+            sb.compare_to_baseline(_report({}), _report({}, dim=768))
+
+    def test_main_exit_codes(self, tmp_path, monkeypatch):
+        """The CLI exits 1 on regression, 0 after --update-baseline, 2 on an unreadable baseline."""
+        monkeypatch.setattr(sb, "run_suite", lambda *args, **kwargs: _report({"retrieve": 50.0}))
+        baseline_path = tmp_path / "baseline.json"
+        output = str(tmp_path / "run.json")
+        baseline_path.write_text(json.dumps(_report({"retrieve": 10.0})))
+
+        assert sb.main(["--output", output, "--baseline", str(baseline_path)]) == 1
+        assert sb.main(["--output", output, "--baseline", str(baseline_path), "--update-baseline"]) == 0
+        assert sb.main(["--output", output, "--baseline", str(baseline_path)]) == 0
+        baseline_path.write_text("not json")
+        assert sb.main(["--output", output, "--baseline", str(baseline_path)]) == 2
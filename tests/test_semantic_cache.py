@@ -0,0 +1,168 @@
+"""Tests for the semantic answer cache."""
+
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import clockify_rag.caching as caching_module
+from clockify_rag import config
+from clockify_rag.answer import answer_once
+from clockify_rag.caching import QueryCache, SemanticAnswerCache
+
+ARTICLES = ["https://clockify.me/help/projects"]
+
+
+def _vec(*components, dim=8):
+    vec = np.zeros(dim, dtype=np.float32)
+    vec[: len(components)] = components
+    return vec
+
+
+class TestSemanticAnswerCache:
+    """Test similarity lookup, guards, eviction and TTL."""
+
+    def setup_method(self):
+        self.cache = SemanticAnswerCache(maxsize=2, ttl_seconds=60, threshold=0.9)
+
+    def test_paraphrase_hit_requires_same_articles_and_params(self):
+        """A close query vector hits; a different article set, params or a distant vector misses."""
+        self.cache.put(_vec(1.0, 0.1), ARTICLES, "gen1", {"answer": "Use the Projects page."}, params=("k", 5))
+
+        hit = self.cache.get(_vec(1.0, 0.3), ARTICLES, "gen1", params=("k", 5))
+        assert hit is not None
+        result, similarity = hit
+        assert result == {"answer": "Use the Projects page."}
+        assert 0.9 <= similarity < 1.0
+
+        assert self.cache.get(_vec(1.0, 0.3), ["https://clockify.me/help/tags"], "gen1", params=("k", 5)) is None
+        assert self.cache.get(_vec(1.0, 0.3), ARTICLES, "gen1", params=("k", 8)) is None
+        assert self.cache.get(_vec(0.0, 1.0), ARTICLES, "gen1", params=("k", 5)) is None
+        assert self.cache.stats()["hits"] == 1
+        assert self.cache.stats()["misses"] == 3
+
+    def test_returned_results_are_copies(self):
+        """Mutating a returned answer does not change the cached entry."""
+        self.cache.put(_vec(1.0), ARTICLES, "gen1", {"metadata": {"a": 1}})
+        result, _ = self.cache.get(_vec(1.0), ARTICLES, "gen1")
+        result["metadata"]["a"] = 2
+        assert self.cache.get(_vec(1.0), ARTICLES, "gen1")[0] == {"metadata": {"a": 1}}
+
+    def test_other_generation_is_evicted(self):
+        """Entries from an older index generation miss and are dropped lazily."""
+        self.cache.put(_vec(1.0), ARTICLES, "gen1", {"answer": "old"})
+        assert self.cache.get(_vec(1.0), ARTICLES, "gen2") is None
+        assert self.cache.stats()["size"] == 0
+
+    def test_ttl_expiry(self):
+        """Expired entries are treated as misses."""
+        self.cache.ttl_seconds = 0
+        self.cache.put(_vec(1.0), ARTICLES, "gen1", {"answer": "a"})
+        time.sleep(0.01)
+        assert self.cache.get(_vec(1.0), ARTICLES, "gen1") is None
+
+    def test_lru_eviction_and_duplicate_replacement(self):
+        """Re-putting the same query replaces its slot; a full cache evicts the least recently used entry."""
+        self.cache.put(_vec(1.0), ARTICLES, "gen1", {"answer": "a"})
+        self.cache.put(_vec(1.0), ARTICLES, "gen1", {"answer": "a2"})
+        assert self.cache.stats()["size"] == 1
+
+        self.cache.put(_vec(0.0, 1.0), ARTICLES, "gen1", {"answer": "b"})
+        assert self.cache.get(_vec(1.0), ARTICLES, "gen1")[0] == {"answer": "a2"}
+        self.cache.put(_vec(0.0, 0.0, 1.0), ARTICLES, "gen1", {"answer": "c"})  # evicts "b"
+
+        assert self.cache.get(_vec(0.0, 1.0), ARTICLES, "gen1") is None
+        assert self.cache.get(_vec(0.0, 0.0, 1.0), ARTICLES, "gen1")[0] == {"answer": "c"}
+        assert self.cache.stats()["size"] == 2
+
+    def test_dimension_change_resets(self):
+        """Switching embedding dimension starts a fresh index instead of failing."""
+        self.cache.put(_vec(1.0, dim=8), ARTICLES, "gen1", {"answer": "a"})
+        assert self.cache.get(_vec(1.0, dim=16), ARTICLES, "gen1") is None
+        self.cache.put(_vec(1.0, dim=16), ARTICLES, "gen1", {"answer": "b"})
+        assert self.cache.stats()["size"] == 1
+        assert self.cache.get(_vec(1.0, dim=16), ARTICLES, "gen1")[0] == {"answer": "b"}
+
+
+class TestAnswerOnceSemanticCache:
+    """Test answer_once reuses answers for paraphrased questions."""
+
+    QUESTION_VECS = {
+        "How do I track time?": _vec(1.0, 0.1),
+        "How can I start tracking my time": _vec(1.0, 0.2),
+        "What does the free plan include?": _vec(0.0, 1.0),
+    }
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        cache = SemanticAnswerCache(maxsize=10, ttl_seconds=60, threshold=0.95)
+        monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", True)
+        monkeypatch.setattr(caching_module, "_SEMANTIC_CACHE", cache)
+        monkeypatch.setattr(caching_module, "_QUERY_CACHE", QueryCache())
+        monkeypatch.setattr("clockify_rag.answer.get_index_generation", lambda: "gen-a")
+        monkeypatch.setattr("clockify_rag.answer.embed_query", lambda q, retries=0: self.QUESTION_VECS[q])
+        return cache
+
+    def _answer(self, question, chunks, vecs):
+        scores = {
+            "dense": np.array([0.9, 0.8, 0.7, 0.6, 0.5], dtype=np.float32),
+            "bm25": np.zeros(5, dtype=np.float32),
+            "hybrid": np.array([0.9, 0.8, 0.7, 0.6, 0.5], dtype=np.float32),
+        }
+        with patch("clockify_rag.answer.retrieve", return_value=([0, 2, 1], scores)) as mock_retrieve:
+            result = answer_once(question, chunks, vecs, {}, top_k=5, pack_top=3, threshold=0.3)
+        assert mock_retrieve.call_args.kwargs["query_vec"] is self.QUESTION_VECS[question]
+        return result
+
+    @patch("clockify_rag.answer.ask_llm")
+    def test_paraphrase_skips_llm(self, mock_ask_llm, sample_chunks, sample_embeddings, fresh_cache):
+        """The second, paraphrased question is served from the cache; an unrelated one is not."""
+        mock_ask_llm.return_value = '{"answer": "Click the timer.", "confidence": 85, "sources_used": ["1"]}'
+
+        first = self._answer("How do I track time?", sample_chunks, sample_embeddings)
+        second = self._answer("How can I start tracking my time", sample_chunks, sample_embeddings)
+
+        assert mock_ask_llm.call_count == 1
+        assert second["answer"] == first["answer"] == "Click the timer."
+        assert second["metadata"]["cache"] == "semantic"
+        assert second["metadata"]["cache_similarity"] >= 0.95
+        assert second["timing"]["llm_ms"] == 0
+        assert "cache" not in first["metadata"]
+
+        self._answer("What does the free plan include?", sample_chunks, sample_embeddings)
+        assert mock_ask_llm.call_count == 2
+        assert fresh_cache.stats()["hits"] == 1
+
+    @patch("clockify_rag.answer.ask_llm")
+    def test_bypass_neither_reads_nor_writes(self, mock_ask_llm, sample_chunks, sample_embeddings, fresh_cache):
+        """use_answer_cache=False answers a paraphrase itself and leaves the caches untouched."""
+        mock_ask_llm.return_value = '{"answer": "Click the timer.", "confidence": 85, "sources_used": ["1"]}'
+        scores = {"dense": np.full(5, 0.9, dtype=np.float32), "bm25": np.zeros(5), "hybrid": np.zeros(5)}
+
+        self._answer("How do I track time?", sample_chunks, sample_embeddings)
+        with patch("clockify_rag.answer.retrieve", return_value=([0, 2, 1], scores)):
+            for question in ("How can I start tracking my time", "What does the free plan include?"):
+                result = answer_once(
+                    question, sample_chunks, sample_embeddings, {}, top_k=5, threshold=0.3, use_answer_cache=False
+                )
+                assert "cache" not in result["metadata"]
+
+        assert mock_ask_llm.call_count == 3
+        for cache in (fresh_cache, caching_module._QUERY_CACHE):
+            stats = cache.stats()
+            assert (stats["hits"], stats["misses"], stats["size"]) == (0, 1, 1)
+
+    @patch("clockify_rag.answer.ask_llm")
+    def test_inactive_without_index_generation(self, mock_ask_llm, monkeypatch, sample_chunks, sample_embeddings):
+        """Without a versioned index nothing is embedded up front or cached."""
+        monkeypatch.setattr("clockify_rag.answer.get_index_generation", lambda: "")
+        mock_ask_llm.return_value = '{"answer": "Click the timer.", "confidence": 85, "sources_used": ["1"]}'
+        scores = {"dense": np.full(5, 0.9, dtype=np.float32), "bm25": np.zeros(5), "hybrid": np.zeros(5)}
+
+        with patch("clockify_rag.answer.retrieve", return_value=([0, 1], scores)) as mock_retrieve:
+            for _ in range(2):
+                answer_once("How do I track time?", sample_chunks, sample_embeddings, {}, threshold=0.3)
+
+        assert mock_retrieve.call_args.kwargs["query_vec"] is None
+        assert mock_ask_llm.call_count == 2
@@ -0,0 +1,168 @@
+"""Tests for the host-wide SQLite answer cache."""
+
+import sqlite3
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import clockify_rag.caching as caching_module
+from clockify_rag import config
+from clockify_rag.answer import answer_once
+from clockify_rag.caching import get_answer_cache
+from clockify_rag.shared_cache import SQLiteAnswerCache
+
+PARAMS = {"top_k": 5, "generation": "gen1"}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "answers.sqlite")
+
+
+@pytest.fixture
+def make_cache(db_path):
+    caches = []
+
+    def factory(**kwargs):
+        cache = SQLiteAnswerCache(db_path, **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield factory
+    for cache in caches:
+        cache.close()
+
+
+class TestSQLiteAnswerCache:
+    """Test sharing, TTL, eviction and generation invalidation."""
+
+    def test_entries_are_shared_between_workers(self, make_cache):
+        """An answer written by one worker is a hit for another opening the same file."""
+        worker_a, worker_b = make_cache(), make_cache()
+        worker_a.put("how do i track time?", "Click the timer.", {"confidence": np.int64(80)}, PARAMS)
+        assert worker_a.flush(timeout=5)
+
+        answer, metadata = worker_b.get("how do i track time?", PARAMS)
+        assert answer == "Click the timer."
+        assert metadata["confidence"] == 80
+        assert worker_b.get("how do i track time?", {**PARAMS, "top_k": 8}) is None
+        assert worker_b.stats()["hits"] == 1 and worker_b.stats()["misses"] == 1
+        assert worker_a.stats()["size"] == 1
+
+        with sqlite3.connect(worker_a.path) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_ttl_expiry(self, make_cache):
+        """Expired entries are misses and are removed by purge()."""
+        cache = make_cache(ttl_seconds=0)
+        cache.put("q", "a", {}, PARAMS)
+        cache.flush(timeout=5)
+        time.sleep(0.01)
+        assert cache.get("q", PARAMS) is None
+        assert cache.purge() == 1
+
+    def test_size_eviction_prefers_recently_read(self, make_cache):
+        """Over maxsize, the least recently accessed entries go first."""
+        cache = make_cache(maxsize=2)
+        for question in ("a", "b"):
+            cache.put(question, question.upper(), {}, PARAMS)
+            cache.flush(timeout=5)
+        assert cache.get("a", PARAMS) is not None  # touch "a" so "b" is the eviction victim
+        cache.put("c", "C", {}, PARAMS)
+        cache.flush(timeout=5)
+
+        assert cache.get("b", PARAMS) is None
+        assert cache.get("a", PARAMS)[0] == "A"
+        assert cache.stats()["size"] == 2
+
+    def test_new_generation_invalidates_older_entries(self, make_cache):
+        """Entries of another generation miss; retain_generation purges them."""
+        cache = make_cache()
+        cache.put("q", "old", {}, PARAMS)
+        cache.flush(timeout=5)
+        new_params = {**PARAMS, "generation": "gen2"}
+        assert cache.get("q", new_params) is None
+
+        cache.put("other", "new", {}, new_params)
+        cache.flush(timeout=5)
+        assert cache.stats()["size"] == 2
+        cache.retain_generation("gen2")
+        cache.flush(timeout=5)
+        assert cache.stats()["size"] == 1
+        assert cache.get("other", new_params)[0] == "new"
+
+    def test_put_never_purges_other_workers_entries(self, make_cache):
+        """A worker still on the old index does not wipe answers another worker wrote for the new one."""
+        upgraded, lagging = make_cache(), make_cache()
+        new_params = {**PARAMS, "generation": "gen2"}
+        upgraded.put("q", "new", {}, new_params)
+        assert upgraded.flush(timeout=5)
+        lagging.put("q", "old", {}, PARAMS)
+        assert lagging.flush(timeout=5)
+
+        assert upgraded.get("q", new_params)[0] == "new"
+        assert lagging.get("q", PARAMS)[0] == "old"
+
+    def test_writes_never_block_the_caller(self, make_cache, db_path):
+        """With the database locked by another process, put() returns at once and overflow is dropped."""
+        cache = make_cache(write_queue_size=1, busy_timeout_ms=5000)
+        blocker = sqlite3.connect(db_path, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.monotonic()
+            for i in range(20):
+                cache.put(f"q{i}", "a", {}, PARAMS)
+            assert time.monotonic() - started < 0.5
+        finally:
+            blocker.execute("ROLLBACK")
+            blocker.close()
+
+        assert cache.flush(timeout=10)
+        stats = cache.stats()
+        assert stats["dropped_writes"] >= 17
+        assert stats["size"] == 20 - stats["dropped_writes"]
+
+
+class TestBackendSelection:
+    """Test config-driven backend choice and the answer_once integration."""
+
+    @pytest.fixture(autouse=True)
+    def reset_global(self, monkeypatch):
+        monkeypatch.setattr(caching_module, "_QUERY_CACHE", None)
+        yield
+        caching_module.close_query_cache()
+
+    def test_config_selects_backend(self, monkeypatch, db_path):
+        """QUERY_CACHE_BACKEND picks the per-process, shared or no answer cache."""
+        monkeypatch.setattr(config, "QUERY_CACHE_BACKEND", "none")
+        assert get_answer_cache() is None
+
+        monkeypatch.setattr(config, "QUERY_CACHE_BACKEND", "sqlite")
+        monkeypatch.setattr(config, "QUERY_CACHE_PATH", db_path)
+        assert isinstance(get_answer_cache(), SQLiteAnswerCache)
+
+    @patch("clockify_rag.answer.ask_llm")
+    def test_repeat_question_served_from_shared_cache(
+        self, mock_ask_llm, monkeypatch, db_path, sample_chunks, sample_embeddings
+    ):
+        """A repeated question skips retrieval and the LLM once the first answer is committed."""
+        monkeypatch.setattr(config, "QUERY_CACHE_BACKEND", "sqlite")
+        monkeypatch.setattr(config, "QUERY_CACHE_PATH", db_path)
+        monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", False)
+        monkeypatch.setattr("clockify_rag.answer.get_index_generation", lambda: "gen-a")
+        monkeypatch.setattr("clockify_rag.answer.embed_query", lambda q, retries=0: np.ones(4, dtype=np.float32))
+        mock_ask_llm.return_value = '{"answer": "Click the timer.", "confidence": 85, "sources_used": ["1"]}'
+        scores = {"dense": np.full(5, 0.9, dtype=np.float32), "bm25": np.zeros(5), "hybrid": np.zeros(5)}
+
+        with patch("clockify_rag.answer.retrieve", return_value=([0, 1], scores)) as mock_retrieve:
+            first = answer_once("How do I track time?", sample_chunks, sample_embeddings, {}, threshold=0.3)
+            get_answer_cache().flush(timeout=5)
+            second = answer_once("How do I track time?", sample_chunks, sample_embeddings, {}, threshold=0.3)
+
+        assert mock_retrieve.call_count == 1
+        assert mock_ask_llm.call_count == 1
+        assert second["answer"] == first["answer"] == "Click the timer."
+        assert second["metadata"]["cache"] == "exact"
+        assert second["selected_chunks"] == first["selected_chunks"]
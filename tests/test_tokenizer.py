@@ -0,0 +1,142 @@
+"""Tests for the pluggable token counter."""
+
+import re
+
+import pytest
+
+import clockify_rag.config as config
+from clockify_rag import tokenizer as tokenizer_module
+from clockify_rag.retrieval import count_tokens, pack_snippets, truncate_to_token_budget
+from clockify_rag.tokenizer import TokenCounter, get_token_counter, reset_token_counter, set_token_counter
+
+
+class _Encoding:
+    def __init__(self, text):
+        matches = list(re.finditer(r"\S+", text))
+        self.ids = list(range(len(matches)))
+        self.offsets = [(m.start(), m.end()) for m in matches]
+
+
+class WhitespaceTokenizer:
+    """Minimal stand-in for tokenizers.Tokenizer: one token per whitespace-separated word."""
+
+    def __init__(self):
+        self.encode_calls = 0
+        self.batch_calls = 0
+
+    def encode(self, text, add_special_tokens=True):
+        self.encode_calls += 1
+        return _Encoding(text)
+
+    def encode_batch(self, texts, add_special_tokens=True):
+        self.batch_calls += 1
+        return [_Encoding(t) for t in texts]
+
+
+@pytest.fixture
+def exact_counter():
+    counter = TokenCounter(tokenizer=WhitespaceTokenizer(), model=config.RAG_CHAT_MODEL, cache_size=100)
+    set_token_counter(counter)
+    yield counter
+    reset_token_counter()
+
+
+class TestTokenCounter:
+    """Test TokenCounter counting and caching."""
+
+    def test_heuristic_counter_is_not_exact(self):
+        """Without a tokenizer the counter uses the fallback estimate."""
+        counter = TokenCounter()
+        assert not counter.exact
+        assert counter.count("a" * 40) == 10
+        assert counter.count("abc", fallback=lambda t: 7) == 7
+
+    def test_exact_count(self, exact_counter):
+        """Exact counts come from the wrapped tokenizer."""
+        assert exact_counter.exact
+        assert exact_counter.count("one two three") == 3
+        assert exact_counter.count("") == 0
+
+    def test_count_chunk_cached_by_id(self, exact_counter):
+        """Repeated counts for the same chunk hit the cache."""
+        tok = exact_counter._tokenizer
+        assert exact_counter.count_chunk("c1", "alpha beta") == 2
+        assert exact_counter.count_chunk("c1", "alpha beta") == 2
+        assert tok.encode_calls == 1
+        stats = exact_counter.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_count_chunk_text_change_invalidates(self, exact_counter):
+        """A reused id with different text is recounted."""
+        assert exact_counter.count_chunk("c1", "alpha beta") == 2
+        assert exact_counter.count_chunk("c1", "alpha beta gamma") == 3
+
+    def test_prime_chunks_batches(self, exact_counter):
+        """Priming encodes all uncached chunks in a single batch."""
+        tok = exact_counter._tokenizer
+        chunks = [{"id": i, "text": "word " * (i + 1)} for i in range(10)]
+        assert exact_counter.prime_chunks(chunks) == 10
+        assert tok.batch_calls == 1
+        assert exact_counter.prime_chunks(chunks) == 0
+        assert exact_counter.count_chunk(4, chunks[4]["text"]) == 5
+        assert tok.encode_calls == 0
+
+    def test_cache_is_bounded(self):
+        """LRU cache evicts oldest entries beyond cache_size."""
+        counter = TokenCounter(tokenizer=WhitespaceTokenizer(), cache_size=3)
+        for i in range(5):
+            counter.count_chunk(i, f"text {i}")
+        assert counter.stats()["size"] == 3
+
+    def test_truncate_uses_offsets(self, exact_counter):
+        """Truncation keeps the longest prefix within budget."""
+        assert exact_counter.truncate("one two three four", 2) == "one two"
+        assert exact_counter.truncate("one two", 5) == "one two"
+        assert exact_counter.truncate("one two", 0) == ""
+
+
+class TestRetrievalIntegration:
+    """Test count_tokens and packing with an exact tokenizer installed."""
+
+    def test_count_tokens_uses_exact_tokenizer(self, exact_counter):
+        """count_tokens delegates to the exact tokenizer for the chat model."""
+        assert count_tokens("x" * 400) == 1
+        # Other models keep the heuristic path
+        assert count_tokens("x" * 400, model="some-other-model") == 100
+
+    def test_truncate_to_token_budget_exact(self, exact_counter):
+        """Exact truncation appends an ellipsis within budget."""
+        result = truncate_to_token_budget("a b c d e f", 4)
+        assert result.endswith("...")
+        assert count_tokens(result) <= 4
+
+    def test_pack_snippets_with_exact_counts(self, exact_counter):
+        """Packing respects the budget measured by the exact tokenizer."""
+        chunks = [
+            {"id": f"c{i}", "text": "word " * 50, "title": f"T{i}", "url": f"https://t/{i}", "chunk_idx": 0}
+            for i in range(5)
+        ]
+        _, packed_ids, used_tokens, _ = pack_snippets(chunks, list(range(5)), pack_top=5, num_ctx=300)
+        assert packed_ids
+        assert used_tokens <= int(300 * 0.6)
+        assert exact_counter.stats()["size"] == 5
+
+
+class TestGlobalCounter:
+    """Test global token counter loading."""
+
+    def test_missing_tokenizer_file_falls_back(self, monkeypatch, tmp_path):
+        """A bad RAG_TOKENIZER_PATH degrades to heuristic counts."""
+        monkeypatch.setattr(config, "TOKENIZER_PATH", str(tmp_path / "missing.json"))
+        reset_token_counter()
+        try:
+            assert not get_token_counter().exact
+        finally:
+            reset_token_counter()
+
+    def test_from_file_without_tokenizers(self, monkeypatch, tmp_path):
+        """from_file raises ImportError when tokenizers is unavailable."""
+        monkeypatch.setattr(tokenizer_module, "_HFTokenizer", None)
+        with pytest.raises(ImportError):
+            TokenCounter.from_file(str(tmp_path / "tokenizer.json"))
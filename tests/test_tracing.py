@@ -0,0 +1,153 @@
+"""Tests for per-request span tracing."""
+
+import contextvars
+import json
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+import clockify_rag.config as config
+from clockify_rag import tracing
+from clockify_rag.correlation import clear_correlation_id, set_correlation_id
+from clockify_rag.retrieval import retrieve
+
+
+@pytest.fixture(autouse=True)
+def clean_traces():
+    tracing.clear_traces()
+    yield
+    tracing.clear_traces()
+
+
+class TestSpans:
+    """Test span recording and export."""
+
+    def test_nested_spans_use_correlation_id(self):
+        """Spans nest under their parent and the trace id is the correlation id."""
+        set_correlation_id("req-123")
+        try:
+            trace = tracing.start_trace()
+            with tracing.span("outer", stage=1):
+                with tracing.span("inner") as inner:
+                    inner.set_attribute("hits", 3)
+            payload = tracing.end_trace(trace)
+        finally:
+            clear_correlation_id()
+
+        assert payload["trace_id"] == "req-123"
+        outer, inner = payload["spans"]
+        assert outer["parent_id"] is None
+        assert inner["parent_id"] == outer["span_id"]
+        assert inner["attributes"] == {"hits": 3}
+        assert outer["duration_ms"] >= inner["duration_ms"]
+        assert tracing.get_recent_traces(1) == [payload]
+        assert tracing.get_current_trace() is None
+
+    def test_span_without_trace_is_noop(self):
+        """Instrumented code runs unchanged when no trace is active."""
+        with tracing.span("orphan") as sp:
+            sp.set_attribute("ignored", True)
+        tracing.set_span_attributes(also="ignored")
+        assert tracing.get_recent_traces() == []
+
+    def test_concurrent_traces_are_isolated(self):
+        """Each thread's context records into its own trace."""
+        results = {}
+
+        def worker(name):
+            trace = tracing.start_trace(trace_id=name)
+            with tracing.span(f"work-{name}"):
+                tracing.set_span_attributes(owner=name)
+            results[name] = tracing.end_trace(trace)
+
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(worker, f"t{i}")) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for name, payload in results.items():
+            assert [s["name"] for s in payload["spans"]] == [f"work-{name}"]
+            assert payload["spans"][0]["attributes"] == {"owner": name}
+
+    def test_otlp_export(self, tmp_path, monkeypatch):
+        """Finished traces are appended as OTLP/JSON lines."""
+        export_path = tmp_path / "traces.jsonl"
+        monkeypatch.setattr(config, "TRACE_EXPORT_PATH", str(export_path))
+
+        trace = tracing.start_trace(trace_id="not-hex")
+        with tracing.span("root"):
+            with tracing.span("child", n=2, ok=True):
+                pass
+        tracing.end_trace(trace)
+        assert tracing.flush_trace_export(timeout=5)
+        tracing.close_trace_export()
+
+        doc = json.loads(export_path.read_text().strip())
+        spans = doc["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert len(spans) == 2
+        assert all(len(s["traceId"]) == 32 for s in spans)
+        assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+        attrs = {a["key"]: a["value"] for a in spans[1]["attributes"]}
+        assert attrs["correlation_id"] == {"stringValue": "not-hex"}
+        assert attrs["n"] == {"intValue": "2"}
+        assert attrs["ok"] == {"boolValue": True}
+
+    def test_retrieve_records_stage_spans(self, monkeypatch, sample_chunks, sample_embeddings, sample_bm25):
+        """retrieve() emits per-stage spans and attaches its profile to the caller's span."""
+        import clockify_rag.embedding as embedding
+        import clockify_rag.retrieval as retrieval
+
+        monkeypatch.setattr(config, "EMB_BACKEND", "local", raising=False)
+        monkeypatch.setattr(config, "USE_ANN", "none", raising=False)
+        monkeypatch.setattr(retrieval, "_FAISS_INDEX", None, raising=False)
+        query_vec = np.asarray(sample_embeddings[:1], dtype=np.float32)
+        monkeypatch.setattr(embedding, "embed_local_batch", lambda texts, normalize=True: query_vec)
+
+        trace = tracing.start_trace(trace_id="retrieve-test")
+        with tracing.span("retrieve"):
+            retrieve("How do I track time?", sample_chunks, sample_embeddings, sample_bm25, top_k=3)
+        payload = tracing.end_trace(trace)
+
+        names = [s["name"] for s in payload["spans"]]
+        for stage in ("retrieve.embed", "retrieve.dense", "retrieve.bm25", "retrieve.normalize", "retrieve.hybrid"):
+            assert stage in names
+        root = payload["spans"][0]
+        assert root["attributes"]["dense_total"] == len(sample_chunks)
+
+
+class TestQueryTraceHeader:
+    """Test trace attachment on /v1/query."""
+
+    def test_debug_header_attaches_trace(self, monkeypatch):
+        """The debug header returns spans recorded inside the executor thread."""
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+
+        def fake_answer(*_args, **_kwargs):
+            with tracing.span("retrieve"):
+                pass
+            return {"answer": "ok", "selected_chunks": [], "metadata": {}}
+
+        monkeypatch.setattr(api_module, "answer_once", fake_answer)
+        app = api_module.create_app()
+
+        with TestClient(app) as client:
+            plain = client.post("/v1/query", json={"question": "How do I track time?"})
+            traced = client.post(
+                "/v1/query",
+                json={"question": "How do I track time?"},
+                headers={config.TRACE_DEBUG_HEADER: "1", "x-correlation-id": "trace-me"},
+            )
+            recent = client.get("/v1/traces", params={"limit": 5})
+
+        assert plain.json()["trace"] is None
+        trace = traced.json()["trace"]
+        assert trace["trace_id"] == "trace-me"
+        query_span, retrieve_span = trace["spans"]
+        assert query_span["name"] == "query"
+        assert retrieve_span["parent_id"] == query_span["span_id"]
+        assert recent.json()["traces"][0]["trace_id"] == "trace-me"
+        assert len(recent.json()["traces"]) == 2